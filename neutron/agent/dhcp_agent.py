@@ -53,6 +53,9 @@ METADATA_PORT = 80
 
 
 class DhcpAgent(manager.Manager):
+    # 1.1 Added ports_update_end
+    RPC_API_VERSION = '1.1'
+
     OPTS = [
         cfg.IntOpt('resync_interval', default=5,
                    help=_("Interval to resync.")),
@@ -290,6 +293,19 @@ class DhcpAgent(manager.Manager):
     # Use the update handler for the port create event.
     port_create_end = port_update_end
 
+    @utils.synchronized('dhcp-agent')
+    def ports_update_end(self, context, payload):
+        """Handle a batch of port create and update notifications."""
+        networks = {}
+        for port in payload['ports']:
+            port = DictModel(port)
+            network = self.cache.get_network_by_id(port.network_id)
+            if network:
+                self.cache.put_port(port)
+                networks[network.id] = network
+        for network in networks.itervalues():
+            self.call_driver('reload_allocations', network)
+
     @utils.synchronized('dhcp-agent')
     def port_delete_end(self, context, payload):
         """Handle the port.delete.end notification event."""
@@ -371,10 +387,13 @@ class DhcpPluginApi(proxy.RpcProxy):
 
     def get_active_networks_info(self):
         """Make a remote process call to retrieve all network info."""
-        networks = self.call(self.context,
+        def fetch(**paging):
+            return self.call(self.context,
                              self.make_msg('get_active_networks_info',
-                                           host=self.host),
+                                           host=self.host, **paging),
                              topic=self.topic)
+
+        networks = agent_rpc.fetch_paged(fetch, cfg.CONF.AGENT.rpc_page_size)
         return [DictModel(n) for n in networks]
 
     def get_network_info(self, network_id):
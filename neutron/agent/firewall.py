@@ -18,6 +18,46 @@
 import abc
 import contextlib
 
+import netaddr
+
+from neutron.common import constants
+
+
+IP_MASK = {constants.IPv4: 32,
+           constants.IPv6: 128}
+DIRECTION_IP_PREFIX = {'ingress': 'source_ip_prefix',
+                       'egress': 'dest_ip_prefix'}
+
+
+def expand_port_sg_rules(port, sg_rules, sg_member_ips):
+    """Return the rules of a port given the shared security groups.
+
+    The rules of the port security groups are appended to its own rules,
+    a rule with a remote group being converted into one rule per member IP.
+
+    :param sg_rules: rules of each security group by id
+    :param sg_member_ips: IPs of the members of each remote group by id
+    """
+    rules = list(port.get('security_group_rules', []))
+    for sg_id in port.get('security_groups', []):
+        for rule in sg_rules.get(sg_id, []):
+            remote_group_id = rule.get('remote_group_id')
+            if not remote_group_id:
+                rules.append(rule)
+                continue
+            direction_ip_prefix = DIRECTION_IP_PREFIX[rule['direction']]
+            for ip in sg_member_ips.get(remote_group_id, []):
+                if ip in port.get('fixed_ips', []):
+                    continue
+                ethertype = 'IPv%s' % netaddr.IPAddress(ip).version
+                if rule['ethertype'] != ethertype:
+                    continue
+                ip_rule = rule.copy()
+                ip_rule[direction_ip_prefix] = '%s/%s' % (
+                    ip, IP_MASK[ethertype])
+                rules.append(ip_rule)
+    return rules
+
 
 class FirewallDriver(object):
     """Firewall Driver base class.
@@ -84,6 +124,19 @@ class FirewallDriver(object):
         """Stop filtering port."""
         raise NotImplementedError()
 
+    def update_security_group_rules(self, sg_id, sg_rules):
+        """Update the rules shared by the members of a security group.
+
+        Ports then only hold their own rules and the ids of their
+        security groups, see expand_port_sg_rules. The filters of the
+        ports are refreshed by update_port_filter.
+        """
+        raise NotImplementedError()
+
+    def update_security_group_members(self, sg_id, sg_member_ips):
+        """Update the IPs of the members of a remote security group."""
+        raise NotImplementedError()
+
     def filter_defer_apply_on(self):
         """Defer application of filtering rule."""
         pass
@@ -126,6 +179,12 @@ class NoopFirewallDriver(FirewallDriver):
     def remove_port_filter(self, port):
         pass
 
+    def update_security_group_rules(self, sg_id, sg_rules):
+        pass
+
+    def update_security_group_members(self, sg_id, sg_member_ips):
+        pass
+
     def filter_defer_apply_on(self):
         pass
 
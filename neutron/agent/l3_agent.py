@@ -69,11 +69,16 @@ class L3PluginApi(proxy.RpcProxy):
     def get_routers(self, context, fullsync=True, router_id=None):
         """Make a remote process call to retrieve the sync data for routers."""
         router_ids = [router_id] if router_id else None
-        return self.call(context,
-                         self.make_msg('sync_routers', host=self.host,
-                                       fullsync=fullsync,
-                                       router_ids=router_ids),
-                         topic=self.topic)
+
+        def fetch(**paging):
+            return self.call(context,
+                             self.make_msg('sync_routers', host=self.host,
+                                           fullsync=fullsync,
+                                           router_ids=router_ids,
+                                           **paging),
+                             topic=self.topic)
+
+        return agent_rpc.fetch_paged(fetch, cfg.CONF.AGENT.rpc_page_size)
 
     def get_external_network_id(self, context):
         """Make a remote process call to retrieve the external network id.
@@ -46,6 +46,9 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
             use_ipv6=True)
         # list of port which has security group
         self.filtered_ports = {}
+        # rules and member IPs shared by the ports of a security group
+        self.sg_rules = {}
+        self.sg_member_ips = {}
         self._add_fallback_chain_v4v6()
 
     @property
@@ -79,13 +82,38 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
             return
         self._remove_chains()
         self.filtered_ports.pop(port['device'], None)
+        self._prune_security_groups()
         self._setup_chains()
         self.iptables.apply()
 
+    def update_security_group_rules(self, sg_id, sg_rules):
+        LOG.debug(_("Update rules of security group (%s)"), sg_id)
+        self.sg_rules[sg_id] = sg_rules
+
+    def update_security_group_members(self, sg_id, sg_member_ips):
+        LOG.debug(_("Update members of security group (%s)"), sg_id)
+        self.sg_member_ips[sg_id] = sg_member_ips
+
+    def _prune_security_groups(self):
+        """Forget the security groups no filtered port refers to."""
+        sg_ids = set()
+        for port in self.filtered_ports.values():
+            sg_ids.update(port.get('security_groups', []))
+        remote_sg_ids = set()
+        for sg_id in sg_ids:
+            for rule in self.sg_rules.get(sg_id, []):
+                if rule.get('remote_group_id'):
+                    remote_sg_ids.add(rule['remote_group_id'])
+        for sg_id in set(self.sg_rules) - sg_ids:
+            del self.sg_rules[sg_id]
+        for sg_id in set(self.sg_member_ips) - remote_sg_ids:
+            del self.sg_member_ips[sg_id]
+
     def _setup_chains(self):
         """Setup ingress and egress chain for a port."""
         self._add_chain_by_name_v4v6(SG_CHAIN)
         for port in self.filtered_ports.values():
+            port = self._expand_port_sg_rules(port)
             self._setup_chain(port, INGRESS_DIRECTION)
             self._setup_chain(port, EGRESS_DIRECTION)
             self.iptables.ipv4['filter'].add_rule(SG_CHAIN, '-j ACCEPT')
@@ -170,6 +198,13 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
                 ipv6_sg_rules.append(rule)
         return ipv4_sg_rules, ipv6_sg_rules
 
+    def _expand_port_sg_rules(self, port):
+        """Return a copy of port holding the rules of its security groups."""
+        port = port.copy()
+        port['security_group_rules'] = firewall.expand_port_sg_rules(
+            port, self.sg_rules, self.sg_member_ips)
+        return port
+
     def _select_sgr_by_direction(self, port, direction):
         return [rule
                 for rule in port.get('security_group_rules', [])
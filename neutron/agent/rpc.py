@@ -15,6 +15,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from oslo.config import cfg
+
 from neutron.common import topics
 
 from neutron.openstack.common import log as logging
@@ -25,26 +27,69 @@ from neutron.openstack.common import timeutils
 
 LOG = logging.getLogger(__name__)
 
+rpc_opts = [
+    cfg.IntOpt('rpc_page_size', default=500,
+               help=_("Number of networks, routers or devices requested "
+                      "per RPC call when an agent synchronizes its state "
+                      "with the plugin. 0 fetches everything in one call.")),
+]
+cfg.CONF.register_opts(rpc_opts, 'AGENT')
+
 
 def create_consumers(dispatcher, prefix, topic_details):
     """Create agent RPC consumers.
 
     :param dispatcher: The dispatcher to process the incoming messages.
     :param prefix: Common prefix for the plugin/agent message queues.
-    :param topic_details: A list of topics. Each topic has a name and a
-                          operation.
+    :param topic_details: A list of topics. Each topic has a name, an
+                          operation and optionally a host name: the agent
+                          then also consumes the messages sent to that
+                          host only.
 
     :returns: A common Connection.
     """
 
     connection = rpc.create_connection(new=True)
-    for topic, operation in topic_details:
+    for details in topic_details:
+        topic, operation = details[:2]
         topic_name = topics.get_topic_name(prefix, topic, operation)
         connection.create_consumer(topic_name, dispatcher, fanout=True)
+        if len(details) > 2:
+            host_topic_name = topics.get_topic_name(prefix, topic,
+                                                    operation, details[2])
+            connection.create_consumer(host_topic_name, dispatcher,
+                                       fanout=False)
     connection.consume_in_thread()
     return connection
 
 
+def fetch_paged(fetch, page_size):
+    """Fetch a collection from the plugin one keyset page at a time.
+
+    :param fetch: callable taking limit and marker keyword arguments and
+                  returning a list of dicts sorted by their 'id' key.
+    :param page_size: maximum number of items to request per call. Paging
+                      is disabled when it is 0.
+
+    :returns: the concatenated list of items.
+    """
+    if page_size <= 0:
+        return fetch()
+    items = []
+    marker = None
+    while True:
+        page = fetch(limit=page_size, marker=marker)
+        # A plugin which does not support paging ignores limit and marker
+        # and always returns the whole collection.
+        if (len(page) > page_size or
+                (marker and any(item['id'] == marker for item in page))):
+            return page
+        items.extend(page)
+        if len(page) < page_size:
+            return items
+        marker = page[-1]['id']
+
+
 class PluginReportStateAPI(proxy.RpcProxy):
     BASE_RPC_API_VERSION = '1.0'
 
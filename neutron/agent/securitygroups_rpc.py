@@ -18,6 +18,8 @@
 
 from oslo.config import cfg
 
+from neutron.agent import firewall
+from neutron.agent import rpc as agent_rpc  # noqa
 from neutron.common import topics
 from neutron.openstack.common import importutils
 from neutron.openstack.common import log as logging
@@ -47,14 +49,71 @@ def disable_security_group_extension_if_noop_driver(
 
 class SecurityGroupServerRpcApiMixin(object):
     """A mix-in that enable SecurityGroup support in plugin rpc."""
+    def _device_pages(self, devices):
+        page_size = cfg.CONF.AGENT.rpc_page_size
+        if page_size <= 0 or len(devices) <= page_size:
+            yield devices
+            return
+        # Request the rules for a bounded number of devices per call so
+        # that neither the plugin nor the agent has to build the reply
+        # for every port of the host at once.
+        devices = sorted(devices)
+        for i in xrange(0, len(devices), page_size):
+            yield devices[i:i + page_size]
+
     def security_group_rules_for_devices(self, context, devices):
         LOG.debug(_("Get security group rules "
                     "for devices via rpc %r"), devices)
-        return self.call(context,
-                         self.make_msg('security_group_rules_for_devices',
-                                       devices=devices),
-                         version=SG_RPC_VERSION,
-                         topic=self.topic)
+        pages = list(self._device_pages(devices))
+        if len(pages) == 1:
+            return self._security_group_rules_for_devices(context, devices)
+        rules = {}
+        for page in pages:
+            rules.update(self._security_group_rules_for_devices(
+                context, page))
+        return rules
+
+    def _security_group_rules_for_devices(self, context, devices):
+        # Ask for the compact reply, a plugin not knowing it ignores the
+        # argument and returns the rules inline in every port.
+        reply = self.call(context,
+                          self.make_msg('security_group_rules_for_devices',
+                                        devices=devices, compact=True),
+                          version=SG_RPC_VERSION,
+                          topic=self.topic)
+        return expand_security_group_rules(reply)
+
+    def security_group_info_for_devices(self, context, devices):
+        """Get the ports with their shared security groups.
+
+        Raises AttributeError if the plugin does not know the call.
+        """
+        LOG.debug(_("Get security group information "
+                    "for devices via rpc %r"), devices)
+        sg_info = {'devices': {}, 'security_groups': {}, 'sg_member_ips': {}}
+        for page in self._device_pages(devices):
+            reply = self.call(context,
+                              self.make_msg('security_group_info_for_devices',
+                                            devices=page),
+                              version=SG_RPC_VERSION,
+                              topic=self.topic)
+            for key, value in sg_info.iteritems():
+                value.update(reply[key])
+        return sg_info
+
+
+def expand_security_group_rules(reply):
+    """Rebuild the rules of each port from a compact reply."""
+    if not (isinstance(reply, dict) and
+            set(reply) == set(['rules', 'ports']) and
+            isinstance(reply['rules'], list)):
+        return reply
+    rules = reply['rules']
+    ports = reply['ports']
+    for port in ports.itervalues():
+        port['security_group_rules'] = [
+            rules[i] for i in port.get('security_group_rules', [])]
+    return ports
 
 
 class SecurityGroupAgentRpcCallbackMixin(object):
@@ -94,6 +153,9 @@ class SecurityGroupAgentRpcMixin(object):
     """A mix-in that enable SecurityGroup agent
     support in agent implementations.
     """
+    # whether the plugin sends the rules of the security groups once
+    # instead of copying them into every port, None until known
+    use_sg_info_rpc = None
 
     def init_firewall(self):
         firewall_driver = cfg.CONF.SECURITYGROUP.firewall_driver
@@ -104,12 +166,46 @@ class SecurityGroupAgentRpcMixin(object):
         if not device_ids:
             return
         LOG.info(_("Preparing filters for devices %s"), device_ids)
-        devices = self.plugin_rpc.security_group_rules_for_devices(
-            self.context, list(device_ids))
+        devices = self._get_devices_with_rules(device_ids)
         with self.firewall.defer_apply():
             for device in devices.values():
                 self.firewall.prepare_port_filter(device)
 
+    def _get_devices_with_rules(self, device_ids):
+        if self.use_sg_info_rpc is not False:
+            try:
+                sg_info = self.plugin_rpc.security_group_info_for_devices(
+                    self.context, list(device_ids))
+            except AttributeError:
+                LOG.info(_("Plugin does not provide shared security group "
+                           "information, getting the rules of every port"))
+                self.use_sg_info_rpc = False
+            else:
+                self.use_sg_info_rpc = True
+                return self._set_security_group_info(sg_info)
+        return self.plugin_rpc.security_group_rules_for_devices(
+            self.context, list(device_ids))
+
+    def _set_security_group_info(self, sg_info):
+        """Give the shared security groups to the firewall.
+
+        The rules are expanded into every port here for a firewall driver
+        not handling security groups itself.
+        """
+        devices = sg_info['devices']
+        try:
+            for sg_id, sg_rules in sg_info['security_groups'].iteritems():
+                self.firewall.update_security_group_rules(sg_id, sg_rules)
+            for sg_id, ips in sg_info['sg_member_ips'].iteritems():
+                self.firewall.update_security_group_members(sg_id, ips)
+        except NotImplementedError:
+            for device in devices.values():
+                device['security_group_rules'] = (
+                    firewall.expand_port_sg_rules(
+                        device, sg_info['security_groups'],
+                        sg_info['sg_member_ips']))
+        return devices
+
     def security_groups_rule_updated(self, security_groups):
         LOG.info(_("Security group "
                    "rule updated %r"), security_groups)
@@ -153,8 +249,7 @@ class SecurityGroupAgentRpcMixin(object):
         device_ids = self.firewall.ports.keys()
         if not device_ids:
             return
-        devices = self.plugin_rpc.security_group_rules_for_devices(
-            self.context, device_ids)
+        devices = self._get_devices_with_rules(device_ids)
         with self.firewall.defer_apply():
             for device in devices.values():
                 LOG.debug(_("Update port filter for %s"), device['device'])
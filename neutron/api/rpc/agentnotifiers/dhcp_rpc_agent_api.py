@@ -13,6 +13,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
+
+import eventlet
+from oslo.config import cfg
+
 from neutron.common import constants
 from neutron.common import topics
 from neutron.common import utils
@@ -25,9 +30,14 @@ LOG = logging.getLogger(__name__)
 
 
 class DhcpAgentNotifyAPI(proxy.RpcProxy):
-    """API for plugin to notify DHCP agent."""
+    """API for plugin to notify DHCP agent.
+
+    API version history:
+        1.0 - Initial version.
+        1.1 - Added ports_update_end.
+    """
     BASE_RPC_API_VERSION = '1.0'
-    # It seems dhcp agent does not support bulk operation
+    # bulk operations are notified item by item, ports grouped by network
     VALID_RESOURCES = ['network', 'subnet', 'port']
     VALID_METHOD_NAMES = ['network.create.end',
                           'network.update.end',
@@ -42,6 +52,9 @@ class DhcpAgentNotifyAPI(proxy.RpcProxy):
     def __init__(self, topic=topics.DHCP_AGENT):
         super(DhcpAgentNotifyAPI, self).__init__(
             topic=topic, default_version=self.BASE_RPC_API_VERSION)
+        # (host, network id) -> (context, topic, ports by id) waiting to be
+        # sent as a single ports_update_end
+        self._pending_ports = {}
 
     def _get_dhcp_agents(self, context, network_id):
         plugin = manager.NeutronManager.get_plugin()
@@ -57,26 +70,30 @@ class DhcpAgentNotifyAPI(proxy.RpcProxy):
                                    payload=payload),
             topic='%s.%s' % (topics.DHCP_AGENT, host))
 
+    def _schedule_network(self, context, plugin, network_id):
+        # we don't schedule when we create network
+        # because we want to give admin a chance to
+        # schedule network manually by API
+        adminContext = (context if context.is_admin else
+                        context.elevated())
+        network = plugin.get_network(adminContext, network_id)
+        chosen_agents = plugin.schedule_network(adminContext, network)
+        if chosen_agents:
+            for agent in chosen_agents:
+                self._notification_host(
+                    context, 'network_create_end',
+                    {'network': {'id': network_id}},
+                    agent['host'])
+
     def _notification(self, context, method, payload, network_id):
         """Notify all the agents that are hosting the network."""
         plugin = manager.NeutronManager.get_plugin()
         if (method != 'network_delete_end' and utils.is_extension_supported(
                 plugin, constants.DHCP_AGENT_SCHEDULER_EXT_ALIAS)):
             if method == 'port_create_end':
-                # we don't schedule when we create network
-                # because we want to give admin a chance to
-                # schedule network manually by API
-                adminContext = (context if context.is_admin else
-                                context.elevated())
-                network = plugin.get_network(adminContext, network_id)
-                chosen_agents = plugin.schedule_network(adminContext, network)
-                if chosen_agents:
-                    for agent in chosen_agents:
-                        self._notification_host(
-                            context, 'network_create_end',
-                            {'network': {'id': network_id}},
-                            agent['host'])
+                self._schedule_network(context, plugin, network_id)
             for (host, topic) in self._get_dhcp_agents(context, network_id):
+                self._flush_ports((host, network_id))
                 self.cast(
                     context, self.make_msg(method,
                                            payload=payload),
@@ -85,8 +102,59 @@ class DhcpAgentNotifyAPI(proxy.RpcProxy):
             # besides the non-agentscheduler plugin,
             # There is no way to query who is hosting the network
             # when the network is deleted, so we need to fanout
+            for key in self._pending_ports.keys():
+                if key[1] == network_id:
+                    self._flush_ports(key)
             self._notification_fanout(context, method, payload)
 
+    def _notification_ports(self, context, method, ports, network_id):
+        """Notify the agents hosting the network of created/updated ports.
+
+        All the ports are sent in one ports_update_end per agent, which is
+        delayed by dhcp_agent_notification_delay to merge later changes of
+        the same network into it.
+        """
+        delay = cfg.CONF.dhcp_agent_notification_delay
+        if len(ports) == 1 and delay <= 0:
+            self._notification(context, method, {'port': ports[0]},
+                               network_id)
+            return
+        plugin = manager.NeutronManager.get_plugin()
+        if not utils.is_extension_supported(
+                plugin, constants.DHCP_AGENT_SCHEDULER_EXT_ALIAS):
+            self.fanout_cast(
+                context, self.make_msg('ports_update_end',
+                                       payload={'ports': ports}),
+                topic=topics.DHCP_AGENT, version='1.1')
+            return
+        if method == 'port_create_end':
+            self._schedule_network(context, plugin, network_id)
+        for (host, topic) in self._get_dhcp_agents(context, network_id):
+            key = (host, network_id)
+            pending = self._pending_ports.get(key)
+            if not pending:
+                pending = (context, topic, collections.OrderedDict())
+                self._pending_ports[key] = pending
+                if delay > 0:
+                    eventlet.spawn_after(delay, self._flush_ports, key)
+            for port in ports:
+                # keep only the latest state of a port updated twice
+                pending[2].pop(port['id'], None)
+                pending[2][port['id']] = port
+            if delay <= 0:
+                self._flush_ports(key)
+
+    def _flush_ports(self, key):
+        """Send the ports_update_end waiting for key, if any."""
+        pending = self._pending_ports.pop(key, None)
+        if not pending:
+            return
+        context, topic, ports = pending
+        self.cast(
+            context, self.make_msg('ports_update_end',
+                                   payload={'ports': ports.values()}),
+            topic='%s.%s' % (topic, key[0]), version='1.1')
+
     def _notification_fanout(self, context, method, payload):
         """Fanout the payload to all dhcp agents."""
         self.fanout_cast(
@@ -95,6 +163,7 @@ class DhcpAgentNotifyAPI(proxy.RpcProxy):
             topic=topics.DHCP_AGENT)
 
     def network_removed_from_agent(self, context, network_id, host):
+        self._flush_ports((host, network_id))
         self._notification_host(context, 'network_delete_end',
                                 {'network_id': network_id}, host)
 
@@ -112,21 +181,33 @@ class DhcpAgentNotifyAPI(proxy.RpcProxy):
         if methodname not in self.VALID_METHOD_NAMES:
             return
         obj_type = data.keys()[0]
-        if obj_type not in self.VALID_RESOURCES:
-            return
-        obj_value = data[obj_type]
-        network_id = None
-        if obj_type == 'network' and 'id' in obj_value:
-            network_id = obj_value['id']
-        elif obj_type in ['port', 'subnet'] and 'network_id' in obj_value:
-            network_id = obj_value['network_id']
-        if not network_id:
+        if obj_type in self.VALID_RESOURCES:
+            obj_values = [data[obj_type]]
+        elif obj_type[:-1] in self.VALID_RESOURCES:
+            # bulk operation, e.g. {'ports': [...]}
+            obj_values = data[obj_type]
+            obj_type = obj_type[:-1]
+        else:
             return
         methodname = methodname.replace(".", "_")
-        if methodname.endswith("_delete_end"):
-            if 'id' in obj_value:
+        ports_by_network = collections.OrderedDict()
+        for obj_value in obj_values:
+            network_id = None
+            if obj_type == 'network' and 'id' in obj_value:
+                network_id = obj_value['id']
+            elif obj_type in ['port', 'subnet'] and 'network_id' in obj_value:
+                network_id = obj_value['network_id']
+            if not network_id:
+                continue
+            if methodname.endswith("_delete_end"):
+                if 'id' in obj_value:
+                    self._notification(context, methodname,
+                                       {obj_type + '_id': obj_value['id']},
+                                       network_id)
+            elif obj_type == 'port':
+                ports_by_network.setdefault(network_id, []).append(obj_value)
+            else:
                 self._notification(context, methodname,
-                                   {obj_type + '_id': obj_value['id']},
-                                   network_id)
-        else:
-            self._notification(context, methodname, data, network_id)
+                                   {obj_type: obj_value}, network_id)
+        for network_id, ports in ports_by_network.iteritems():
+            self._notification_ports(context, methodname, ports, network_id)
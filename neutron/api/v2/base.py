@@ -25,6 +25,7 @@ from neutron.api.rpc.agentnotifiers import dhcp_rpc_agent_api
 from neutron.api.v2 import attributes
 from neutron.api.v2 import resource as wsgi_resource
 from neutron.common import exceptions
+from neutron.openstack.common import excutils
 from neutron.openstack.common import log as logging
 from neutron.openstack.common.notifier import api as notifier_api
 from neutron import policy
@@ -342,35 +343,51 @@ class Controller(object):
         if self._collection in body:
             # Have to account for bulk create
             items = body[self._collection]
-            deltas = {}
-            bulk = True
         else:
             items = [body]
-            bulk = False
+        deltas = {}
         for item in items:
             self._validate_network_tenant_ownership(request,
                                                     item[self._resource])
             policy.enforce(request.context,
                            action,
                            item[self._resource])
-            try:
-                tenant_id = item[self._resource]['tenant_id']
-                count = quota.QUOTAS.count(request.context, self._resource,
-                                           self._plugin, self._collection,
-                                           tenant_id)
-                if bulk:
-                    delta = deltas.get(tenant_id, 0) + 1
-                    deltas[tenant_id] = delta
-                else:
-                    delta = 1
-                kwargs = {self._resource: count + delta}
-            except exceptions.QuotaResourceUnknown as e:
-                # We don't want to quota this resource
-                LOG.debug(e)
-            else:
-                quota.QUOTAS.limit_check(request.context,
-                                         item[self._resource]['tenant_id'],
-                                         **kwargs)
+            tenant_id = item[self._resource]['tenant_id']
+            deltas[tenant_id] = deltas.get(tenant_id, 0) + 1
+        reservations = self._make_reservations(request.context, deltas)
+        try:
+            result = self._create(request, body, parent_id)
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                for reservation in reservations:
+                    quota.QUOTAS.cancel_reservation(request.context,
+                                                    reservation)
+        for reservation in reservations:
+            quota.QUOTAS.commit_reservation(request.context, reservation)
+        return result
+
+    def _make_reservations(self, context, deltas):
+        """Check the quotas of the tenants creating items.
+
+        :param deltas: dict of the number of items created by each tenant.
+        :returns: the list of reservations to be committed or cancelled.
+        """
+        reservations = []
+        try:
+            for tenant_id, delta in deltas.iteritems():
+                reservations.append(quota.QUOTAS.make_reservation(
+                    context, tenant_id, self._plugin, self._resource, delta))
+        except exceptions.QuotaResourceUnknown as e:
+            # We don't want to quota this resource
+            LOG.debug(e)
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                for reservation in reservations:
+                    quota.QUOTAS.cancel_reservation(context, reservation)
+        return reservations
+
+    def _create(self, request, body, parent_id):
+        action = self._plugin_handlers[self.CREATE]
 
         def notify(create_result):
             notifier_method = self._resource + '.create.end'
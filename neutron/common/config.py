@@ -46,6 +46,9 @@ core_opts = [
                help=_("The path for API extensions")),
     cfg.StrOpt('policy_file', default="policy.json",
                help=_("The policy file to use")),
+    cfg.IntOpt('policy_reload_interval', default=1,
+               help=_("Seconds between checks of the policy file for "
+                      "changes. 0 checks it on every policy evaluation")),
     cfg.StrOpt('auth_strategy', default='keystone',
                help=_("The type of authentication to use")),
     cfg.StrOpt('core_plugin',
@@ -78,6 +81,9 @@ core_opts = [
     cfg.BoolOpt('dhcp_agent_notification', default=True,
                 help=_("Allow sending resource operation"
                        " notification to DHCP agent")),
+    cfg.FloatOpt('dhcp_agent_notification_delay', default=0,
+                 help=_("Seconds port notifications to a DHCP agent are "
+                        "delayed to be sent in one message per network")),
     cfg.BoolOpt('allow_overlapping_ips', default=False,
                 help=_("Allow overlapping IP support in Neutron")),
     cfg.StrOpt('host', default=utils.get_hostname(),
@@ -25,23 +25,28 @@ UPDATE = 'update'
 AGENT = 'q-agent-notifier'
 PLUGIN = 'q-plugin'
 DHCP = 'q-dhcp-notifer'
+QUOTA_CACHE = 'q-quota-cache'
 
 L3_AGENT = 'l3_agent'
 DHCP_AGENT = 'dhcp_agent'
 
 
-def get_topic_name(prefix, table, operation):
+def get_topic_name(prefix, table, operation, host=None):
     """Create a topic name.
 
     The topic name needs to be synced between the agent and the
     plugin. The plugin will send a fanout message to all of the
     listening agents so that the agents in turn can perform their
-    updates accordingly.
+    updates accordingly, or a message to the agent of a single host
+    when the notification only concerns that host.
 
     :param prefix: Common prefix for the plugin/agent message queues.
     :param table: The table in question (NETWORK, SUBNET, PORT).
     :param operation: The operation that invokes notification (CREATE,
                       DELETE, UPDATE)
+    :param host: Optional host name of the agent to notify.
     :returns: The topic name.
     """
+    if host:
+        return '%s-%s-%s.%s' % (prefix, table, operation, host)
     return '%s-%s-%s' % (prefix, table, operation)
@@ -15,22 +15,34 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import hashlib
+
 from oslo.config import cfg
 import sqlalchemy as sa
 from sqlalchemy.orm import exc
 
+from neutron.agent.common import config as agent_config
+from neutron import context as neutron_context
 from neutron.db import model_base
 from neutron.db import models_v2
 from neutron.extensions import agent as ext_agent
 from neutron import manager
 from neutron.openstack.common import jsonutils
 from neutron.openstack.common import log as logging
+from neutron.openstack.common import loopingcall
 from neutron.openstack.common import timeutils
 
 LOG = logging.getLogger(__name__)
 cfg.CONF.register_opt(
     cfg.IntOpt('agent_down_time', default=5,
                help=_("Seconds to regard the agent is down.")))
+cfg.CONF.register_opt(
+    cfg.IntOpt('agent_heartbeat_flush_interval', default=0,
+               help=_("Seconds between two writes to the database of the "
+                      "heartbeats received from agents whose state did not "
+                      "change. 0 writes every heartbeat when received. "
+                      "agent_down_time must be greater than the "
+                      "report_interval of the agents plus this interval.")))
 
 
 class Agent(model_base.BASEV2, models_v2.HasId):
@@ -57,9 +69,113 @@ class Agent(model_base.BASEV2, models_v2.HasId):
     configurations = sa.Column(sa.String(4095), nullable=False)
 
 
+class AgentHeartbeats(object):
+    """Latest agent heartbeats, kept in memory and written in batches.
+
+    A report which does not change the state of a known agent only
+    refreshes its heartbeat here. The heartbeats are written to the
+    database every agent_heartbeat_flush_interval seconds in a single
+    transaction.
+    """
+
+    def __init__(self):
+        # (agent_type, host) -> (agent id, hash of the reported state)
+        self._agents = {}
+        # agent id -> latest heartbeat
+        self._latest = {}
+        # agent id -> latest heartbeat not written to the database yet
+        self._pending = {}
+        self._flush_loop = None
+
+    def get(self, agent_id, heartbeat=None):
+        """Return the latest of heartbeat and the one kept in memory."""
+        latest = self._latest.get(agent_id)
+        if latest is None or (heartbeat is not None and heartbeat > latest):
+            return heartbeat
+        return latest
+
+    def lookup(self, agent_type, host, state_hash):
+        """Return the id of a known agent if its state did not change."""
+        agent = self._agents.get((agent_type, host))
+        if agent and agent[1] == state_hash:
+            return agent[0]
+
+    def register(self, agent_type, host, agent_id, state_hash, heartbeat):
+        """Record an agent state which has just been written."""
+        self._agents[(agent_type, host)] = (agent_id, state_hash)
+        self._latest[agent_id] = heartbeat
+        self._pending.pop(agent_id, None)
+
+    def beat(self, agent_id, heartbeat):
+        self._latest[agent_id] = heartbeat
+        self._pending[agent_id] = heartbeat
+        self._start_flush_loop()
+
+    def forget(self, agent_id):
+        for key, agent in self._agents.items():
+            if agent[0] == agent_id:
+                del self._agents[key]
+        self._latest.pop(agent_id, None)
+        self._pending.pop(agent_id, None)
+
+    def _start_flush_loop(self):
+        interval = cfg.CONF.agent_heartbeat_flush_interval
+        if self._flush_loop or interval <= 0:
+            return
+        report_interval = getattr(getattr(cfg.CONF, 'AGENT', None),
+                                  'report_interval',
+                                  agent_config.AGENT_STATE_OPTS[0].default)
+        if cfg.CONF.agent_down_time <= report_interval + interval:
+            LOG.warning(_("agent_down_time (%(down_time)s) should be greater "
+                          "than the report_interval of the agents "
+                          "(%(report_interval)s) plus "
+                          "agent_heartbeat_flush_interval (%(interval)s), "
+                          "the agents may be regarded as down by the other "
+                          "servers"),
+                        {'down_time': cfg.CONF.agent_down_time,
+                         'report_interval': report_interval,
+                         'interval': interval})
+        self._flush_loop = loopingcall.FixedIntervalLoopingCall(self.flush)
+        self._flush_loop.start(interval=interval, initial_delay=interval)
+
+    def flush(self, context=None):
+        """Write the pending heartbeats to the database."""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        context = context or neutron_context.get_admin_context()
+        table = Agent.__table__
+        query = table.update().where(
+            table.c.id == sa.bindparam('agent_id')).values(
+                heartbeat_timestamp=sa.bindparam('heartbeat'))
+        rows = [{'agent_id': agent_id, 'heartbeat': heartbeat}
+                for agent_id, heartbeat in pending.iteritems()]
+        try:
+            with context.session.begin(subtransactions=True):
+                result = context.session.execute(query, rows)
+                if 0 <= result.rowcount < len(rows):
+                    # Agents deleted meanwhile must be created again by
+                    # their next report
+                    existing = set(agent_id for agent_id, in
+                                   context.session.query(Agent.id).filter(
+                                       Agent.id.in_(pending.keys())))
+                    for agent_id in set(pending) - existing:
+                        self.forget(agent_id)
+        except Exception:
+            LOG.exception(_("Failed writing agent heartbeats"))
+            for agent_id, heartbeat in pending.iteritems():
+                self._pending.setdefault(agent_id, heartbeat)
+
+
+def _hash_agent_state(agent_state):
+    return hashlib.md5(jsonutils.dumps(agent_state, sort_keys=True)).digest()
+
+
 class AgentDbMixin(ext_agent.AgentPluginBase):
     """Mixin class to add agent extension to db_plugin_base_v2."""
 
+    _heartbeats = AgentHeartbeats()
+
     def _get_agent(self, context, id):
         try:
             agent = self._get_by_id(context, Agent, id)
@@ -68,7 +184,14 @@ class AgentDbMixin(ext_agent.AgentPluginBase):
         return agent
 
     @classmethod
-    def is_agent_down(cls, heart_beat_time):
+    def is_agent_down(cls, heart_beat_time, agent_id=None):
+        """Check the heartbeat of an agent.
+
+        When agent_id is given, the latest heartbeat received from that
+        agent is used if it has not been written to the database yet.
+        """
+        if agent_id:
+            heart_beat_time = cls._heartbeats.get(agent_id, heart_beat_time)
         return timeutils.is_older_than(heart_beat_time,
                                        cfg.CONF.agent_down_time)
 
@@ -88,6 +211,8 @@ class AgentDbMixin(ext_agent.AgentPluginBase):
             ext_agent.RESOURCE_NAME + 's')
         res = dict((k, agent[k]) for k in attr
                    if k not in ['alive', 'configurations'])
+        res['heartbeat_timestamp'] = self._heartbeats.get(
+            res['id'], res['heartbeat_timestamp'])
         res['alive'] = not AgentDbMixin.is_agent_down(
             res['heartbeat_timestamp'])
         res['configurations'] = self.get_configuration_dict(agent)
@@ -97,6 +222,7 @@ class AgentDbMixin(ext_agent.AgentPluginBase):
         with context.session.begin(subtransactions=True):
             agent = self._get_agent(context, id)
             context.session.delete(agent)
+        self._heartbeats.forget(id)
 
     def update_agent(self, context, id, agent):
         agent_data = agent['agent']
@@ -132,14 +258,25 @@ class AgentDbMixin(ext_agent.AgentPluginBase):
         return self._make_agent_dict(agent, fields)
 
     def create_or_update_agent(self, context, agent):
-        """Create or update agent according to report."""
-        with context.session.begin(subtransactions=True):
-            res_keys = ['agent_type', 'binary', 'host', 'topic']
-            res = dict((k, agent[k]) for k in res_keys)
+        """Create or update agent according to report.
 
-            configurations_dict = agent.get('configurations', {})
+        The report of a known agent whose state did not change since its
+        previous report only refreshes its heartbeat in memory.
+        """
+        res_keys = ['agent_type', 'binary', 'host', 'topic']
+        res = dict((k, agent[k]) for k in res_keys)
+        configurations_dict = agent.get('configurations', {})
+        state_hash = _hash_agent_state([res, configurations_dict])
+        current_time = timeutils.utcnow()
+        if (cfg.CONF.agent_heartbeat_flush_interval > 0 and
+                not agent.get('start_flag')):
+            agent_id = self._heartbeats.lookup(
+                agent['agent_type'], agent['host'], state_hash)
+            if agent_id:
+                self._heartbeats.beat(agent_id, current_time)
+                return
+        with context.session.begin(subtransactions=True):
             res['configurations'] = jsonutils.dumps(configurations_dict)
-            current_time = timeutils.utcnow()
             try:
                 agent_db = self._get_agent_by_type_and_host(
                     context, agent['agent_type'], agent['host'])
@@ -154,6 +291,9 @@ class AgentDbMixin(ext_agent.AgentPluginBase):
                 res['admin_state_up'] = True
                 agent_db = Agent(**res)
                 context.session.add(agent_db)
+        if agent_db.id:
+            self._heartbeats.register(agent['agent_type'], agent['host'],
+                                      agent_db.id, state_hash, current_time)
 
 
 class AgentExtRpcCallback(object):
@@ -15,22 +15,47 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from oslo.config import cfg
 import sqlalchemy as sa
 from sqlalchemy import orm
 from sqlalchemy.orm import exc
 from sqlalchemy.orm import joinedload
 
 from neutron.common import constants
+from neutron import context as neutron_context
 from neutron.db import agents_db
+from neutron.db import l3_db
 from neutron.db import model_base
 from neutron.db import models_v2
 from neutron.extensions import dhcpagentscheduler
 from neutron.extensions import l3agentscheduler
 from neutron.openstack.common import log as logging
+from neutron.openstack.common import loopingcall
+from neutron.openstack.common import timeutils
 
 
 LOG = logging.getLogger(__name__)
 
+AGENTS_RESCHEDULE_OPTS = [
+    cfg.IntOpt('agent_reschedule_interval', default=0,
+               help=_('Seconds between two checks for routers and networks '
+                      'hosted by dead agents. 0 disables rescheduling.')),
+    cfg.IntOpt('agent_reschedule_down_time', default=60,
+               help=_('Seconds without heartbeat after which the routers '
+                      'and networks of an agent are rescheduled.')),
+    cfg.IntOpt('agent_reschedule_batch_size', default=50,
+               help=_('Maximum number of routers and networks moved off '
+                      'dead agents per check.')),
+]
+cfg.CONF.register_opts(AGENTS_RESCHEDULE_OPTS)
+
+
+def _page_by_key(query, column, limit, marker):
+    """Restrict query to limit rows following marker on a unique column."""
+    if marker:
+        query = query.filter(column > marker)
+    return query.order_by(column).limit(limit)
+
 
 class NetworkDhcpAgentBinding(model_base.BASEV2):
     """Represents binding between neutron networks and DHCP agents."""
@@ -61,6 +86,7 @@ class AgentSchedulerDbMixin(agents_db.AgentDbMixin):
 
     dhcp_agent_notifier = None
     l3_agent_notifier = None
+    _reschedule_loop = None
 
     @staticmethod
     def is_eligible_agent(active, agent):
@@ -73,7 +99,7 @@ class AgentSchedulerDbMixin(agents_db.AgentDbMixin):
             #                   (i.e. have a recent heartbeat timestamp)
             #                   are eligible, even if active is False
             return not agents_db.AgentDbMixin.is_agent_down(
-                agent['heartbeat_timestamp'])
+                agent['heartbeat_timestamp'], agent['id'])
 
     def update_agent(self, context, id, agent):
         original_agent = self.get_agent(context, id)
@@ -94,12 +120,47 @@ class AgentSchedulerDbMixin(agents_db.AgentDbMixin):
                     original_agent['host'])
         return result
 
+    def start_periodic_agent_rescheduling(self):
+        """Periodically move routers and networks off dead agents."""
+        interval = cfg.CONF.agent_reschedule_interval
+        if self._reschedule_loop or interval <= 0:
+            return
+        self._reschedule_loop = loopingcall.FixedIntervalLoopingCall(
+            self.reschedule_from_dead_agents)
+        self._reschedule_loop.start(interval=interval, initial_delay=interval)
+
+    def reschedule_from_dead_agents(self, context=None):
+        """Reschedule at most agent_reschedule_batch_size resources."""
+        context = context or neutron_context.get_admin_context()
+        try:
+            self._reschedule_from_dead_agents(
+                context, cfg.CONF.agent_reschedule_batch_size)
+        except Exception:
+            LOG.exception(_('Failed to reschedule resources of dead agents'))
+
+    def _reschedule_from_dead_agents(self, context, limit):
+        """Move up to limit resources and return how many can still move.
+
+        Scheduler mixins extend this and pass the remaining budget on.
+        """
+        return limit
+
+    def _get_dead_agent_ids(self, context, agent_type):
+        down_time = cfg.CONF.agent_reschedule_down_time
+        query = context.session.query(agents_db.Agent.id,
+                                      agents_db.Agent.heartbeat_timestamp)
+        query = query.filter(agents_db.Agent.agent_type == agent_type)
+        return [agent_id for agent_id, heartbeat in query
+                if timeutils.is_older_than(
+                    self._heartbeats.get(agent_id, heartbeat), down_time)]
+
 
 class L3AgentSchedulerDbMixin(l3agentscheduler.L3AgentSchedulerPluginBase,
                               AgentSchedulerDbMixin):
     """Mixin class to add l3 agent scheduler extension to db_plugin_base_v2."""
 
     router_scheduler = None
+    _reschedule_router_marker = None
 
     def add_router_to_l3_agent(self, context, id, router_id):
         """Add a l3 agent to host a router."""
@@ -167,7 +228,7 @@ class L3AgentSchedulerDbMixin(l3agentscheduler.L3AgentSchedulerPluginBase,
             return {'routers': []}
 
     def list_active_sync_routers_on_active_l3_agent(
-            self, context, host, router_id):
+            self, context, host, router_id, limit=None, marker=None):
         agent = self._get_agent_by_type_and_host(
             context, constants.AGENT_TYPE_L3, host)
         if not agent.admin_state_up:
@@ -177,13 +238,24 @@ class L3AgentSchedulerDbMixin(l3agentscheduler.L3AgentSchedulerPluginBase,
             RouterL3AgentBinding.l3_agent_id == agent.id)
         if router_id:
             query = query.filter(RouterL3AgentBinding.router_id == router_id)
+        if limit:
+            # Only count routers which get_sync_data will return so that
+            # a short page means there are no more routers to fetch.
+            query = query.join(
+                l3_db.Router,
+                l3_db.Router.id == RouterL3AgentBinding.router_id).filter(
+                    l3_db.Router.admin_state_up == True)
+            query = _page_by_key(query, RouterL3AgentBinding.router_id,
+                                 limit, marker)
 
         router_ids = [item[0] for item in query]
-        if router_ids:
-            return self.get_sync_data(context, router_ids=router_ids,
-                                      active=True)
-        else:
+        if not router_ids:
             return []
+        routers = self.get_sync_data(context, router_ids=router_ids,
+                                     active=True)
+        if limit:
+            routers.sort(key=lambda router: router['id'])
+        return routers
 
     def get_l3_agents_hosting_routers(self, context, router_ids,
                                       admin_state_up=None,
@@ -205,7 +277,7 @@ class L3AgentSchedulerDbMixin(l3agentscheduler.L3AgentSchedulerPluginBase,
             l3_agents = [l3_agent for l3_agent in
                          l3_agents if not
                          agents_db.AgentDbMixin.is_agent_down(
-                         l3_agent['heartbeat_timestamp'])]
+                         l3_agent['heartbeat_timestamp'], l3_agent['id'])]
         return l3_agents
 
     def _get_l3_bindings_hosting_routers(self, context, router_ids):
@@ -288,6 +360,75 @@ class L3AgentSchedulerDbMixin(l3agentscheduler.L3AgentSchedulerPluginBase,
         for router in routers:
             self.schedule_router(context, router)
 
+    def _reschedule_from_dead_agents(self, context, limit):
+        if self.router_scheduler and limit > 0:
+            limit -= self.reschedule_routers_from_dead_agents(context, limit)
+        return super(L3AgentSchedulerDbMixin,
+                     self)._reschedule_from_dead_agents(context, limit)
+
+    def reschedule_routers_from_dead_agents(self, context, limit):
+        """Move up to limit routers off dead L3 agents.
+
+        Routers no other agent can host stay bound to their dead agent.
+        The routers are considered in id order, each run resuming after
+        the last router of the previous one, so that the routers which
+        cannot be moved do not hold the others back.  Returns the number
+        of routers considered.
+        """
+        dead_agent_ids = self._get_dead_agent_ids(context,
+                                                  constants.AGENT_TYPE_L3)
+        if not dead_agent_ids:
+            return 0
+        removed = []
+        added = {}
+        with context.session.begin(subtransactions=True):
+            query = context.session.query(RouterL3AgentBinding)
+            query = query.options(joinedload('l3_agent'))
+            query = query.filter(
+                RouterL3AgentBinding.l3_agent_id.in_(dead_agent_ids))
+            if self._reschedule_router_marker:
+                query = query.filter(RouterL3AgentBinding.router_id >
+                                     self._reschedule_router_marker)
+            bindings = query.order_by(RouterL3AgentBinding.router_id).limit(
+                limit).all()
+            # Start over once the end is reached
+            self._reschedule_router_marker = (
+                bindings[-1].router_id if len(bindings) == limit else None)
+            if not bindings:
+                return 0
+            for binding in bindings:
+                context.session.delete(binding)
+            context.session.flush()
+            routers = self.get_routers(
+                context,
+                filters={'id': [binding.router_id for binding in bindings]})
+            routers = dict((router['id'], router) for router in routers)
+            for binding in bindings:
+                router = routers.get(binding.router_id)
+                agent = router and self.schedule_router(context, router)
+                if not agent:
+                    LOG.warn(_('No L3 agent can host router %(router_id)s '
+                               'of dead L3 agent %(agent_id)s'),
+                             {'router_id': binding.router_id,
+                              'agent_id': binding.l3_agent_id})
+                    old_binding = RouterL3AgentBinding()
+                    old_binding.l3_agent_id = binding.l3_agent_id
+                    old_binding.router_id = binding.router_id
+                    context.session.add(old_binding)
+                    continue
+                removed.append((binding.router_id, binding.l3_agent.host))
+                added.setdefault(agent.host, []).append(binding.router_id)
+        LOG.info(_('Rescheduled %d routers from dead L3 agents'),
+                 len(removed))
+        if self.l3_agent_notifier:
+            for router_id, host in removed:
+                self.l3_agent_notifier.router_removed_from_agent(
+                    context, router_id, host)
+            for host, router_ids in added.iteritems():
+                self.l3_agent_notifier.router_added_to_agent(
+                    context, self.get_sync_data(context, router_ids), host)
+        return len(bindings)
+
 
 class DhcpAgentSchedulerDbMixin(dhcpagentscheduler
                                 .DhcpAgentSchedulerPluginBase,
@@ -296,6 +437,7 @@ class DhcpAgentSchedulerDbMixin(dhcpagentscheduler
     """
 
     network_scheduler = None
+    _reschedule_network_marker = None
 
     def get_dhcp_agents_hosting_networks(
             self, context, network_ids, active=None):
@@ -365,22 +507,32 @@ class DhcpAgentSchedulerDbMixin(dhcpagentscheduler
         else:
             return {'networks': []}
 
-    def list_active_networks_on_active_dhcp_agent(self, context, host):
+    def list_active_networks_on_active_dhcp_agent(self, context, host,
+                                                  limit=None, marker=None):
         agent = self._get_agent_by_type_and_host(
             context, constants.AGENT_TYPE_DHCP, host)
         if not agent.admin_state_up:
             return []
         query = context.session.query(NetworkDhcpAgentBinding.network_id)
         query = query.filter(NetworkDhcpAgentBinding.dhcp_agent_id == agent.id)
+        if limit:
+            query = query.join(
+                models_v2.Network,
+                models_v2.Network.id == NetworkDhcpAgentBinding.network_id
+            ).filter(models_v2.Network.admin_state_up == True)
+            query = _page_by_key(query, NetworkDhcpAgentBinding.network_id,
+                                 limit, marker)
 
         net_ids = [item[0] for item in query]
-        if net_ids:
-            return self.get_networks(
-                context,
-                filters={'id': net_ids, 'admin_state_up': [True]}
-            )
-        else:
+        if not net_ids:
             return []
+        networks = self.get_networks(
+            context,
+            filters={'id': net_ids, 'admin_state_up': [True]}
+        )
+        if limit:
+            networks.sort(key=lambda network: network['id'])
+        return networks
 
     def list_dhcp_agents_hosting_network(self, context, network_id):
         dhcp_agents = self.get_dhcp_agents_hosting_networks(
@@ -403,3 +555,75 @@ class DhcpAgentSchedulerDbMixin(dhcpagentscheduler
     def auto_schedule_networks(self, context, host):
         if self.network_scheduler:
             self.network_scheduler.auto_schedule_networks(self, context, host)
+
+    def _reschedule_from_dead_agents(self, context, limit):
+        if self.network_scheduler and limit > 0:
+            limit -= self.reschedule_networks_from_dead_agents(context, limit)
+        return super(DhcpAgentSchedulerDbMixin,
+                     self)._reschedule_from_dead_agents(context, limit)
+
+    def reschedule_networks_from_dead_agents(self, context, limit):
+        """Move up to limit networks off dead DHCP agents.
+
+        Networks no other agent can host stay bound to their dead agents.
+        Like the routers, each run resumes after the last network of the
+        previous one.  Returns the number of networks considered.
+        """
+        dead_agent_ids = self._get_dead_agent_ids(context,
+                                                  constants.AGENT_TYPE_DHCP)
+        if not dead_agent_ids:
+            return 0
+        removed = []
+        added = []
+        with context.session.begin(subtransactions=True):
+            query = context.session.query(NetworkDhcpAgentBinding.network_id)
+            query = query.filter(
+                NetworkDhcpAgentBinding.dhcp_agent_id.in_(dead_agent_ids))
+            if self._reschedule_network_marker:
+                query = query.filter(NetworkDhcpAgentBinding.network_id >
+                                     self._reschedule_network_marker)
+            network_ids = [item[0] for item in query.distinct().order_by(
+                NetworkDhcpAgentBinding.network_id).limit(limit)]
+            # Start over once the end is reached
+            self._reschedule_network_marker = (
+                network_ids[-1] if len(network_ids) == limit else None)
+            if not network_ids:
+                return 0
+            query = context.session.query(NetworkDhcpAgentBinding)
+            query = query.options(joinedload('dhcp_agent'))
+            bindings = query.filter(
+                NetworkDhcpAgentBinding.network_id.in_(network_ids),
+                NetworkDhcpAgentBinding.dhcp_agent_id.in_(dead_agent_ids)
+            ).all()
+            old_agents = {}
+            for binding in bindings:
+                old_agents.setdefault(binding.network_id, []).append(
+                    binding.dhcp_agent)
+                context.session.delete(binding)
+            context.session.flush()
+            for network_id in network_ids:
+                agents = self.network_scheduler.schedule(
+                    self, context, {'id': network_id}) or []
+                if not agents and not self.get_dhcp_agents_hosting_networks(
+                        context, [network_id], active=True):
+                    LOG.warn(_('No DHCP agent can host network '
+                               '%s of dead DHCP agents'), network_id)
+                    for agent in old_agents[network_id]:
+                        old_binding = NetworkDhcpAgentBinding()
+                        old_binding.dhcp_agent_id = agent.id
+                        old_binding.network_id = network_id
+                        context.session.add(old_binding)
+                    continue
+                removed.extend((network_id, agent.host)
+                               for agent in old_agents[network_id])
+                added.extend((network_id, agent.host) for agent in agents)
+        LOG.info(_('Rescheduled %d networks from dead DHCP agents'),
+                 len(set(network_id for network_id, host in removed)))
+        if self.dhcp_agent_notifier:
+            for network_id, host in removed:
+                self.dhcp_agent_notifier.network_removed_from_agent(
+                    context, network_id, host)
+            for network_id, host in added:
+                self.dhcp_agent_notifier.network_added_to_agent(
+                    context, network_id, host)
+        return len(network_ids)
@@ -34,6 +34,7 @@ from neutron.openstack.common import excutils
 from neutron.openstack.common import log as logging
 from neutron.openstack.common import timeutils
 from neutron.openstack.common import uuidutils
+from neutron import quota
 
 
 LOG = logging.getLogger(__name__)
@@ -258,17 +259,21 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
         # a lot of stress on the db. Consider adding a cache layer
         return context.session.query(models_v2.Subnet).all()
 
+    @staticmethod
+    def _random_mac(base_mac):
+        mac = [int(base_mac[0], 16), int(base_mac[1], 16),
+               int(base_mac[2], 16), random.randint(0x00, 0xff),
+               random.randint(0x00, 0xff), random.randint(0x00, 0xff)]
+        if base_mac[3] != '00':
+            mac[3] = int(base_mac[3], 16)
+        return ':'.join(map(lambda x: "%02x" % x, mac))
+
     @staticmethod
     def _generate_mac(context, network_id):
         base_mac = cfg.CONF.base_mac.split(':')
         max_retries = cfg.CONF.mac_generation_retries
         for i in range(max_retries):
-            mac = [int(base_mac[0], 16), int(base_mac[1], 16),
-                   int(base_mac[2], 16), random.randint(0x00, 0xff),
-                   random.randint(0x00, 0xff), random.randint(0x00, 0xff)]
-            if base_mac[3] != '00':
-                mac[3] = int(base_mac[3], 16)
-            mac_address = ':'.join(map(lambda x: "%02x" % x, mac))
+            mac_address = NeutronDbPluginV2._random_mac(base_mac)
             if NeutronDbPluginV2._check_unique_mac(context, network_id,
                                                    mac_address):
                 LOG.debug(_("Generated mac for network %(network_id)s "
@@ -285,6 +290,38 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
                   max_retries)
         raise q_exc.MacAddressGenerationFailure(net_id=network_id)
 
+    @staticmethod
+    def _generate_macs(context, network_id, count):
+        """Generate count MAC addresses unique on the network.
+
+        Candidates are checked against the network with a single query
+        per attempt rather than one query per address.
+        """
+        base_mac = cfg.CONF.base_mac.split(':')
+        max_retries = cfg.CONF.mac_generation_retries
+        macs = set()
+        for i in range(max_retries):
+            candidates = set(NeutronDbPluginV2._random_mac(base_mac)
+                             for x in range(count - len(macs)))
+            candidates -= macs
+            mac_qry = context.session.query(models_v2.Port.mac_address)
+            in_use = mac_qry.filter(
+                models_v2.Port.network_id == network_id,
+                models_v2.Port.mac_address.in_(candidates))
+            macs |= candidates - set(mac for (mac,) in in_use)
+            if len(macs) == count:
+                LOG.debug(_("Generated %(count)d macs for network "
+                            "%(network_id)s"),
+                          {'count': count, 'network_id': network_id})
+                return list(macs)
+            LOG.debug(_("%(missing)d generated macs exist. Remaining "
+                        "attempts %(max_retries)s."),
+                      {'missing': count - len(macs),
+                       'max_retries': max_retries - (i + 1)})
+        LOG.error(_("Unable to generate mac address after %s attempts"),
+                  max_retries)
+        raise q_exc.MacAddressGenerationFailure(net_id=network_id)
+
     @staticmethod
     def _check_unique_mac(context, network_id, mac_address):
         mac_qry = context.session.query(models_v2.Port)
@@ -499,6 +536,50 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
             return {'ip_address': ip_address, 'subnet_id': subnet['id']}
         raise q_exc.IpAddressGenerationFailure(net_id=subnets[0]['network_id'])
 
+    @staticmethod
+    def _generate_ips(context, subnets, count):
+        """Generate count IP addresses.
+
+        The availability ranges of all the subnets are locked and consumed
+        in one pass, in the same order _generate_ip would use them.
+        """
+        range_qry = context.session.query(
+            models_v2.IPAvailabilityRange,
+            models_v2.IPAllocationPool.subnet_id).join(
+                models_v2.IPAllocationPool).with_lockmode('update')
+        subnet_ids = [subnet['id'] for subnet in subnets]
+        ranges = {}
+        for (ip_range, subnet_id) in range_qry.filter(
+                models_v2.IPAllocationPool.subnet_id.in_(subnet_ids)):
+            ranges.setdefault(subnet_id, []).append(ip_range)
+        ips = []
+        for subnet in subnets:
+            for ip_range in ranges.get(subnet['id'], []):
+                first = netaddr.IPAddress(ip_range['first_ip'])
+                last = netaddr.IPAddress(ip_range['last_ip'])
+                size = int(last) - int(first) + 1
+                taken = min(size, count - len(ips))
+                ips.extend({'ip_address': str(first + i),
+                            'subnet_id': subnet['id']}
+                           for i in range(taken))
+                LOG.debug(_("Allocated %(taken)d IPs from %(first_ip)s "
+                            "to %(last_ip)s"),
+                          {'taken': taken,
+                           'first_ip': ip_range['first_ip'],
+                           'last_ip': ip_range['last_ip']})
+                if taken == size:
+                    # No more free indices on subnet => delete
+                    context.session.delete(ip_range)
+                else:
+                    # increment the first free
+                    ip_range['first_ip'] = str(first + taken)
+                if len(ips) == count:
+                    return ips
+            LOG.debug(_("All IP's from subnet %(subnet_id)s (%(cidr)s) "
+                        "allocated"),
+                      {'subnet_id': subnet['id'], 'cidr': subnet['cidr']})
+        raise q_exc.IpAddressGenerationFailure(net_id=subnets[0]['network_id'])
+
     @staticmethod
     def _allocate_specific_ip(context, subnet_id, ip_address):
         """Allocate a specific IP address on the subnet."""
@@ -740,6 +821,47 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
                                 'subnet_id': result['subnet_id']})
         return ips
 
+    def _allocate_ips_for_ports(self, context, network, ports):
+        """Allocate IP addresses for a batch of ports on the same network.
+
+        Ports with configured fixed_ips are handled one at a time as in
+        _allocate_ips_for_port, while the others get their addresses from
+        a single pass over the availability ranges of each IP version.
+        Returns the list of IPs allocated for each port, in order.
+        """
+        ips = [[] for p in ports]
+        unconfigured = []
+        # The allocations of the batch are only stored at the end, so the
+        # IPs requested twice in the batch must be detected here
+        requested = set()
+        for i, p in enumerate(ports):
+            if p['fixed_ips'] is not attributes.ATTR_NOT_SPECIFIED:
+                ips[i] = self._allocate_ips_for_port(context, network,
+                                                     {'port': p})
+                for ip in ips[i]:
+                    key = (ip['subnet_id'], ip['ip_address'])
+                    if key in requested:
+                        raise q_exc.IpAddressInUse(
+                            net_id=network['id'],
+                            ip_address=ip['ip_address'])
+                    requested.add(key)
+            else:
+                unconfigured.append(i)
+        if not unconfigured:
+            return ips
+        filter = {'network_id': [network['id']]}
+        subnets = self.get_subnets(context, filters=filter)
+        for ip_version in (4, 6):
+            version_subnets = [subnet for subnet in subnets
+                               if subnet['ip_version'] == ip_version]
+            if not version_subnets:
+                continue
+            generated = NeutronDbPluginV2._generate_ips(
+                context, version_subnets, len(unconfigured))
+            for i, ip in zip(unconfigured, generated):
+                ips[i].append(ip)
+        return ips
+
     def _validate_subnet_cidr(self, context, network, new_subnet_cidr):
         """Validate the CIDR for a subnet.
 
@@ -996,6 +1118,7 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
                     'status': constants.NET_STATUS_ACTIVE}
             network = models_v2.Network(**args)
             context.session.add(network)
+            quota.QUOTAS.track_usage(context, tenant_id, 'network', 1)
         return self._make_network_dict(network)
 
     def update_network(self, context, id, network):
@@ -1032,8 +1155,14 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
 
             # clean up subnets
             subnets_qry = context.session.query(models_v2.Subnet)
-            subnets_qry.filter_by(network_id=id).delete()
+            subnets_qry = subnets_qry.filter_by(network_id=id)
+            for subnet in subnets_qry:
+                quota.QUOTAS.track_usage(context, subnet['tenant_id'],
+                                         'subnet', -1)
+            subnets_qry.delete()
             context.session.delete(network)
+            quota.QUOTAS.track_usage(context, network['tenant_id'],
+                                     'network', -1)
 
     def get_network(self, context, id, fields=None):
         network = self._get_network(context, id)
@@ -1161,6 +1290,7 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
             subnet = models_v2.Subnet(**args)
 
             context.session.add(subnet)
+            quota.QUOTAS.track_usage(context, tenant_id, 'subnet', 1)
             if s['dns_nameservers'] is not attributes.ATTR_NOT_SPECIFIED:
                 for addr in s['dns_nameservers']:
                     ns = models_v2.DNSNameServer(address=addr,
@@ -1290,6 +1420,8 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
             allocated.delete()
 
             context.session.delete(subnet)
+            quota.QUOTAS.track_usage(context, subnet['tenant_id'],
+                                     'subnet', -1)
 
     def get_subnet(self, context, id, fields=None):
         subnet = self._get_subnet(context, id)
@@ -1311,8 +1443,124 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
         return self._get_collection_count(context, models_v2.Subnet,
                                           filters=filters)
 
+    def _is_native_port_bulk_allowed(self):
+        # Plugins extending create_port (bindings, security groups, ...)
+        # need every port to go through it, hence the native bulk path
+        # is only taken when the class defining create_port also extends
+        # _create_ports, to process the batch the same way
+        if 'create_port' in vars(self):
+            return False
+        for cls in type(self).__mro__:
+            if 'create_port' in cls.__dict__:
+                return '_create_ports' in cls.__dict__
+        return False
+
     def create_port_bulk(self, context, ports):
-        return self._create_bulk('port', context, ports)
+        if not self._is_native_port_bulk_allowed():
+            return self._create_bulk('port', context, ports)
+        try:
+            with context.session.begin(subtransactions=True):
+                return self._create_ports(context,
+                                          [p['port'] for p in ports['ports']])
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                LOG.error(_("An exception occured while creating "
+                            "the ports:%s"), ports)
+
+    def _create_ports(self, context, items):
+        """Create a batch of ports with multi-row INSERTs.
+
+        MACs and IPs are generated for all the ports of a network at once,
+        then the ports and their IP allocations are inserted in a single
+        statement each. Must be called within a transaction.
+
+        Plugins extending create_port extend this method the same way to
+        use the native bulk path, see _is_native_port_bulk_allowed().
+        """
+        port_rows = []
+        ports_by_network = {}
+        for p in items:
+            port = {'id': p.get('id') or uuidutils.generate_uuid(),
+                    'tenant_id': self._get_tenant_id_for_create(context, p),
+                    'name': p['name'],
+                    'network_id': p['network_id'],
+                    'mac_address': p['mac_address'],
+                    'admin_state_up': p['admin_state_up'],
+                    'status': p.get('status', constants.PORT_STATUS_ACTIVE),
+                    'device_id': p['device_id'],
+                    'device_owner': p['device_owner']}
+            port_rows.append(port)
+            ports_by_network.setdefault(p['network_id'], []).append(
+                (p, port))
+
+        ip_rows = []
+        expiration = self._default_allocation_expiration()
+        for network_id, network_ports in ports_by_network.iteritems():
+            self._recycle_expired_ip_allocations(context, network_id)
+            network = self._get_network(context, network_id)
+
+            # Ensure that a MAC address is defined and it is unique on the
+            # network
+            missing = [port for (p, port) in network_ports
+                       if port['mac_address'] is attributes.ATTR_NOT_SPECIFIED]
+            requested = [port['mac_address'] for (p, port) in network_ports
+                         if port['mac_address'] is not
+                         attributes.ATTR_NOT_SPECIFIED]
+            if requested:
+                mac_qry = context.session.query(models_v2.Port.mac_address)
+                in_use = mac_qry.filter(
+                    models_v2.Port.network_id == network_id,
+                    models_v2.Port.mac_address.in_(requested)).first()
+                if in_use:
+                    raise q_exc.MacAddressInUse(net_id=network_id,
+                                                mac=in_use[0])
+                seen = set()
+                for mac_address in requested:
+                    if mac_address in seen:
+                        raise q_exc.MacAddressInUse(net_id=network_id,
+                                                    mac=mac_address)
+                    seen.add(mac_address)
+            if missing:
+                macs = NeutronDbPluginV2._generate_macs(
+                    context, network_id, len(missing))
+                for port, mac_address in zip(missing, macs):
+                    port['mac_address'] = mac_address
+
+            # Returns the IP's for each port
+            ips = self._allocate_ips_for_ports(
+                context, network, [p for (p, port) in network_ports])
+            for (p, port), port_ips in zip(network_ports, ips):
+                port['fixed_ips'] = port_ips
+                for ip in port_ips:
+                    LOG.debug(_("Allocated IP %(ip_address)s "
+                                "(%(network_id)s/%(subnet_id)s/%(port_id)s)"),
+                              {'ip_address': ip['ip_address'],
+                               'network_id': network_id,
+                               'subnet_id': ip['subnet_id'],
+                               'port_id': port['id']})
+                    ip_rows.append({'network_id': network_id,
+                                    'port_id': port['id'],
+                                    'ip_address': ip['ip_address'],
+                                    'subnet_id': ip['subnet_id'],
+                                    'expiration': expiration})
+
+        # An empty parameter list would insert a row of default values
+        if port_rows:
+            context.session.execute(
+                models_v2.Port.__table__.insert(),
+                [self._filter_non_model_columns(port, models_v2.Port)
+                 for port in port_rows])
+        if ip_rows:
+            context.session.execute(
+                models_v2.IPAllocation.__table__.insert(), ip_rows)
+        port_counts = {}
+        for port in port_rows:
+            tenant_id = port['tenant_id']
+            port_counts[tenant_id] = port_counts.get(tenant_id, 0) + 1
+        for tenant_id, count in port_counts.iteritems():
+            quota.QUOTAS.track_usage(context, tenant_id, 'port', count)
+        return [self._make_port_dict(port, process_extensions=False)
+                for port in port_rows]
 
     def create_port(self, context, port):
         p = port['port']
@@ -1358,6 +1606,7 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
                                   device_id=p['device_id'],
                                   device_owner=p['device_owner'])
             context.session.add(port)
+            quota.QUOTAS.track_usage(context, tenant_id, 'port', 1)
 
             # Update the allocated IP's
             if ips:
@@ -1449,6 +1698,7 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
                 LOG.debug(msg)
 
         context.session.delete(port)
+        quota.QUOTAS.track_usage(context, port['tenant_id'], 'port', -1)
 
     def get_port(self, context, id, fields=None):
         port = self._get_port(context, id)
@@ -30,15 +30,21 @@ class DhcpRpcCallbackMixin(object):
     """A mix-in that enable DHCP agent support in plugin implementations."""
 
     def _get_active_networks(self, context, **kwargs):
-        """Retrieve and return a list of the active networks."""
+        """Retrieve and return a list of the active networks.
+
+        When the agent passes limit, at most limit networks with an id
+        greater than marker are returned, sorted by id. Plugins without
+        the DHCP agent scheduler extension ignore paging.
+        """
         host = kwargs.get('host')
         plugin = manager.NeutronManager.get_plugin()
         if utils.is_extension_supported(
             plugin, constants.DHCP_AGENT_SCHEDULER_EXT_ALIAS):
-            if cfg.CONF.network_auto_schedule:
+            if cfg.CONF.network_auto_schedule and not kwargs.get('marker'):
                 plugin.auto_schedule_networks(context, host)
             nets = plugin.list_active_networks_on_active_dhcp_agent(
-                context, host)
+                context, host, limit=kwargs.get('limit'),
+                marker=kwargs.get('marker'))
         else:
             filters = dict(admin_state_up=[True])
             nets = plugin.get_networks(context, filters=filters)
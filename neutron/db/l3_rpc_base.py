@@ -33,20 +33,23 @@ class L3RpcCallbackMixin(object):
         """Sync routers according to filters to a specific agent.
 
         @param context: contain user information
-        @param kwargs: host, or router_id
+        @param kwargs: host, or router_id, and optionally limit and marker
+                       to fetch the routers one page at a time
         @return: a list of routers
                  with their interfaces and floating_ips
         """
         router_id = kwargs.get('router_id')
         host = kwargs.get('host')
+        marker = kwargs.get('marker')
         context = neutron_context.get_admin_context()
         plugin = manager.NeutronManager.get_plugin()
         if utils.is_extension_supported(
             plugin, constants.L3_AGENT_SCHEDULER_EXT_ALIAS):
-            if cfg.CONF.router_auto_schedule:
+            if cfg.CONF.router_auto_schedule and not marker:
                 plugin.auto_schedule_routers(context, host, router_id)
             routers = plugin.list_active_sync_routers_on_active_l3_agent(
-                context, host, router_id)
+                context, host, router_id, limit=kwargs.get('limit'),
+                marker=marker)
         else:
             routers = plugin.get_sync_data(context, router_id)
         LOG.debug(_("Routers returned to l3 agent:\n %s"),
@@ -73,7 +73,9 @@ class PortBindingMixin(object):
         host = port_data.get(portbindings.HOST_ID)
         host_set = attributes.is_attr_set(host)
         if not host_set:
-            _extend_port_dict_binding_host(self, port, None)
+            # Keep reporting the host the port is already bound to
+            _extend_port_dict_binding_host(self, port,
+                                           port.get(portbindings.HOST_ID))
             return
         with context.session.begin(subtransactions=True):
             bind_port = context.session.query(
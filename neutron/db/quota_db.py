@@ -15,11 +15,31 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import datetime
+import time
+
+from oslo.config import cfg
 import sqlalchemy as sa
+from sqlalchemy import func
 
 from neutron.common import exceptions
+from neutron.common import rpc as q_rpc
+from neutron.common import topics
+from neutron import context as q_context
 from neutron.db import model_base
 from neutron.db import models_v2
+from neutron.openstack.common import log as logging
+from neutron.openstack.common import loopingcall
+from neutron.openstack.common import rpc
+from neutron.openstack.common.rpc import proxy
+from neutron.openstack.common import timeutils
+
+
+LOG = logging.getLogger(__name__)
+
+# Resources whose usages are kept up to date by NeutronDbPluginV2; usages
+# of any other resource are counted on every quota check.
+TRACKED_RESOURCES = ('network', 'subnet', 'port')
 
 
 class Quota(model_base.BASEV2, models_v2.HasId):
@@ -33,6 +53,109 @@ class Quota(model_base.BASEV2, models_v2.HasId):
     limit = sa.Column(sa.Integer)
 
 
+class QuotaUsage(model_base.BASEV2):
+    """Represent the number of items of a resource owned by a tenant."""
+    __tablename__ = 'quota_usages'
+
+    tenant_id = sa.Column(sa.String(255), primary_key=True)
+    resource = sa.Column(sa.String(255), primary_key=True)
+    in_use = sa.Column(sa.Integer, nullable=False, default=0)
+
+
+class Reservation(model_base.BASEV2, models_v2.HasId):
+    """Represent items of a resource which are about to be created."""
+    tenant_id = sa.Column(sa.String(255), index=True)
+    resource = sa.Column(sa.String(255))
+    delta = sa.Column(sa.Integer, nullable=False)
+    expiration = sa.Column(sa.DateTime, nullable=False)
+
+
+class QuotaCacheRpcCallback(object):
+    """Server side of the quota cache rpc API."""
+
+    RPC_API_VERSION = '1.0'
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def create_rpc_dispatcher(self):
+        return q_rpc.PluginRpcDispatcher([self])
+
+    def tenant_quota_updated(self, context, tenant_id):
+        self.cache.invalidate(tenant_id)
+
+
+class QuotaCacheNotifyAPI(proxy.RpcProxy):
+    """API for notifying the servers that the limits of a tenant changed."""
+
+    BASE_RPC_API_VERSION = '1.0'
+
+    def __init__(self, topic=topics.QUOTA_CACHE):
+        super(QuotaCacheNotifyAPI, self).__init__(
+            topic=topic, default_version=self.BASE_RPC_API_VERSION)
+
+    def tenant_quota_updated(self, context, tenant_id):
+        self.fanout_cast(context,
+                         self.make_msg('tenant_quota_updated',
+                                       tenant_id=tenant_id),
+                         topic=self.topic)
+
+
+class TenantQuotaCache(object):
+    """Process-local cache of the tenant specific quota limits.
+
+    Entries expire after quota_cache_ttl seconds. When the limits of a
+    tenant are updated, its entry is invalidated on this server and,
+    through an rpc fanout, on all the other ones. Limits are only cached
+    once start() has set up the consumer of that fanout.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._conn = None
+        self._notifier = None
+
+    def start(self):
+        """Consume the notifications of the updates of the limits."""
+        if self._conn or cfg.CONF.QUOTAS.quota_cache_ttl <= 0:
+            return
+        try:
+            conn = rpc.create_connection(new=True)
+            conn.create_consumer(
+                topics.QUOTA_CACHE,
+                QuotaCacheRpcCallback(self).create_rpc_dispatcher(),
+                fanout=True)
+            conn.consume_in_thread()
+        except Exception:
+            LOG.exception(_("Unable to consume the quota updates, the quota "
+                            "limits of the tenants will not be cached"))
+            return
+        self._conn = conn
+
+    def get(self, tenant_id):
+        entry = self._entries.get(tenant_id)
+        if entry and entry[0] > time.time():
+            return entry[1]
+
+    def set(self, tenant_id, limits):
+        ttl = cfg.CONF.QUOTAS.quota_cache_ttl
+        # Without the notifications, the cached limits could go stale
+        if ttl <= 0 or not self._conn:
+            return
+        self._entries[tenant_id] = (time.time() + ttl, limits)
+
+    def invalidate(self, tenant_id):
+        self._entries.pop(tenant_id, None)
+
+    def tenant_quota_updated(self, context, tenant_id):
+        self.invalidate(tenant_id)
+        if cfg.CONF.QUOTAS.quota_cache_ttl <= 0:
+            return
+        if not self._notifier:
+            self._notifier = QuotaCacheNotifyAPI()
+        self._notifier.tenant_quota_updated(context, tenant_id)
+
+
 class DbQuotaDriver(object):
     """Driver to perform necessary checks to enforce quotas and obtain quota
     information.
@@ -40,6 +163,24 @@ class DbQuotaDriver(object):
     The default driver utilizes the local database.
     """
 
+    _cache = TenantQuotaCache()
+
+    @staticmethod
+    def start_cache_listener():
+        """Enable the cache of the tenant limits, at server start-up."""
+        DbQuotaDriver._cache.start()
+
+    @staticmethod
+    def _get_tenant_limits(context, tenant_id):
+        """Return the tenant specific limits, from the cache if possible."""
+        limits = DbQuotaDriver._cache.get(tenant_id)
+        if limits is None:
+            q_qry = context.session.query(Quota).filter_by(
+                tenant_id=tenant_id)
+            limits = dict((q['resource'], q['limit']) for q in q_qry)
+            DbQuotaDriver._cache.set(tenant_id, limits)
+        return limits
+
     @staticmethod
     def get_tenant_quotas(context, resources, tenant_id):
         """Given a list of resources, retrieve the quotas for the given
@@ -56,8 +197,8 @@ class DbQuotaDriver(object):
                             for key, resource in resources.items())
 
         # update with tenant specific limits
-        q_qry = context.session.query(Quota).filter_by(tenant_id=tenant_id)
-        tenant_quota.update((q['resource'], q['limit']) for q in q_qry)
+        tenant_quota.update(
+            DbQuotaDriver._get_tenant_limits(context, tenant_id))
 
         return tenant_quota
 
@@ -71,6 +212,7 @@ class DbQuotaDriver(object):
             tenant_quotas = context.session.query(Quota)
             tenant_quotas = tenant_quotas.filter_by(tenant_id=tenant_id)
             tenant_quotas.delete()
+        DbQuotaDriver._cache.tenant_quota_updated(context, tenant_id)
 
     @staticmethod
     def get_all_quotas(context, resources):
@@ -113,6 +255,7 @@ class DbQuotaDriver(object):
                                      resource=resource,
                                      limit=limit)
                 context.session.add(tenant_quota)
+        DbQuotaDriver._cache.tenant_quota_updated(context, tenant_id)
 
     def _get_quotas(self, context, tenant_id, resources, keys):
         """Retrieves the quotas for specific resources.
@@ -179,3 +322,148 @@ class DbQuotaDriver(object):
                  if quotas[key] >= 0 and quotas[key] < val]
         if overs:
             raise exceptions.OverQuota(overs=sorted(overs))
+
+
+class UsageQuotaDriver(DbQuotaDriver):
+    """Driver enforcing quotas against tracked resource usages.
+
+    Rather than counting the items of a resource on every create, this
+    driver relies on the quota_usages table, which the DB plugin keeps up
+    to date as items are created and deleted. Items being created are
+    accounted for with reservations, removed once the creation is either
+    committed or cancelled. Usages are periodically recounted to fix any
+    drift, e.g. from items created or deleted outside of the plugin.
+    """
+
+    def __init__(self):
+        self._resync_loop = None
+
+    def _start_resync_loop(self, resources, plugin):
+        interval = cfg.CONF.QUOTAS.usage_resync_interval
+        if self._resync_loop or interval <= 0:
+            return
+        self._resync_loop = loopingcall.FixedIntervalLoopingCall(
+            self.resync_usages, q_context.get_admin_context(), resources,
+            plugin)
+        self._resync_loop.start(interval=interval, initial_delay=interval)
+
+    @staticmethod
+    def _count(context, resources, resource, tenant_id, plugin):
+        return resources[resource].count(context, plugin, '%ss' % resource,
+                                         tenant_id)
+
+    def make_reservation(self, context, tenant_id, resources, resource,
+                         delta, plugin):
+        """Reserve delta items of a resource for a tenant.
+
+        :param context: The request context, for access checks.
+        :param tenant_id: The tenant_id to check the quota.
+        :param resources: A dictionary of the registered resources.
+        :param resource: The name of the resource to reserve.
+        :param delta: The number of items to reserve.
+        :param plugin: The plugin owning the resource, used for counting
+                       it when its usage is not tracked yet.
+        :return: the reservation id, None if no reservation was needed.
+        """
+        if delta < 0:
+            raise exceptions.InvalidQuotaValue(unders=[resource])
+        limit = self._get_quotas(context, tenant_id, resources,
+                                 [resource])[resource]
+        if limit < 0:
+            return
+        if resource not in TRACKED_RESOURCES:
+            in_use = self._count(context, resources, resource, tenant_id,
+                                 plugin)
+            if in_use + delta > limit:
+                raise exceptions.OverQuota(overs=[resource])
+            return
+
+        self._start_resync_loop(resources, plugin)
+        now = timeutils.utcnow()
+        with context.session.begin(subtransactions=True):
+            usage = context.session.query(QuotaUsage).with_lockmode(
+                'update').filter_by(tenant_id=tenant_id,
+                                    resource=resource).first()
+            if not usage:
+                in_use = self._count(context, resources, resource,
+                                     tenant_id, plugin)
+                usage = QuotaUsage(tenant_id=tenant_id, resource=resource,
+                                   in_use=in_use)
+                context.session.add(usage)
+            reserved = context.session.query(
+                func.sum(Reservation.delta)).filter(
+                    Reservation.tenant_id == tenant_id,
+                    Reservation.resource == resource,
+                    Reservation.expiration > now).scalar() or 0
+            if usage.in_use + reserved + delta > limit:
+                raise exceptions.OverQuota(overs=[resource])
+            expiration = now + datetime.timedelta(
+                seconds=cfg.CONF.QUOTAS.reservation_expiration)
+            reservation = Reservation(tenant_id=tenant_id,
+                                      resource=resource,
+                                      delta=delta,
+                                      expiration=expiration)
+            context.session.add(reservation)
+        return reservation.id
+
+    @staticmethod
+    def _remove_reservation(context, reservation_id):
+        with context.session.begin(subtransactions=True):
+            context.session.query(Reservation).filter_by(
+                id=reservation_id).delete()
+
+    @staticmethod
+    def commit_reservation(context, reservation_id):
+        """Commit a reservation.
+
+        The created items are already accounted for in the usages by the
+        plugin, hence the reservation is simply removed.
+        """
+        UsageQuotaDriver._remove_reservation(context, reservation_id)
+
+    @staticmethod
+    def cancel_reservation(context, reservation_id):
+        UsageQuotaDriver._remove_reservation(context, reservation_id)
+
+    @staticmethod
+    def track_usage(context, tenant_id, resource, delta):
+        """Add delta to the usage of a resource, if it is tracked.
+
+        Must be called within the transaction creating or deleting the
+        items. Usages are created upon the first reservation, hence this
+        is a no-op for tenants which did not reserve the resource yet.
+        """
+        if resource not in TRACKED_RESOURCES:
+            return
+        with context.session.begin(subtransactions=True):
+            context.session.query(QuotaUsage).filter_by(
+                tenant_id=tenant_id, resource=resource).update(
+                    {'in_use': QuotaUsage.in_use + delta},
+                    synchronize_session=False)
+
+    def resync_usages(self, context, resources, plugin):
+        """Recount the tracked usages and remove expired reservations."""
+        with context.session.begin(subtransactions=True):
+            context.session.query(Reservation).filter(
+                Reservation.expiration <= timeutils.utcnow()).delete()
+        usages = context.session.query(QuotaUsage.tenant_id,
+                                       QuotaUsage.resource).all()
+        for (tenant_id, resource) in usages:
+            if resource not in resources:
+                continue
+            with context.session.begin(subtransactions=True):
+                usage = context.session.query(QuotaUsage).with_lockmode(
+                    'update').filter_by(tenant_id=tenant_id,
+                                        resource=resource).first()
+                if not usage:
+                    continue
+                in_use = self._count(context, resources, resource,
+                                     tenant_id, plugin)
+                if in_use != usage.in_use:
+                    LOG.warn(_("Fixing %(resource)s usage of tenant "
+                               "%(tenant_id)s: %(old)d != %(new)d"),
+                             {'resource': resource,
+                              'tenant_id': tenant_id,
+                              'old': usage.in_use,
+                              'new': in_use})
+                    usage.in_use = in_use
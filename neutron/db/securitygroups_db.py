@@ -261,23 +261,30 @@ class SecurityGroupDbMixin(ext_sg.SecurityGroupPluginBase):
                 raise ext_sg.SecurityGroupNotFound(id=security_group_id)
 
             self._check_for_duplicate_rules(context, r)
-            ret = []
+            rows = []
             for rule_dict in r:
                 rule = rule_dict['security_group_rule']
                 tenant_id = self._get_tenant_id_for_create(context, rule)
-                db = SecurityGroupRule(
-                    id=uuidutils.generate_uuid(), tenant_id=tenant_id,
-                    security_group_id=rule['security_group_id'],
-                    direction=rule['direction'],
-                    remote_group_id=rule.get('remote_group_id'),
-                    ethertype=rule['ethertype'],
-                    protocol=rule['protocol'],
-                    port_range_min=rule['port_range_min'],
-                    port_range_max=rule['port_range_max'],
-                    remote_ip_prefix=rule.get('remote_ip_prefix'))
-                context.session.add(db)
-            ret.append(self._make_security_group_rule_dict(db))
-        return ret
+                rows.append({
+                    'id': uuidutils.generate_uuid(), 'tenant_id': tenant_id,
+                    'security_group_id': rule['security_group_id'],
+                    'direction': rule['direction'],
+                    'remote_group_id': rule.get('remote_group_id'),
+                    'ethertype': rule['ethertype'],
+                    'protocol': rule['protocol'],
+                    'port_range_min': rule['port_range_min'],
+                    'port_range_max': rule['port_range_max'],
+                    'remote_ip_prefix': rule.get('remote_ip_prefix')})
+            # a single executemany INSERT rather than a flush per object
+            context.session.flush()
+            context.session.execute(SecurityGroupRule.__table__.insert(),
+                                    rows)
+            # the rules of a group loaded in the session are now stale
+            for obj in context.session:
+                if (isinstance(obj, SecurityGroup) and
+                    obj.id == security_group_id):
+                    context.session.expire(obj, ['rules'])
+        return [self._make_security_group_rule_dict(row) for row in rows]
 
     def create_security_group_rule(self, context, security_group_rule):
         bulk_rule = {'security_group_rules': [security_group_rule]}
@@ -293,6 +300,7 @@ class SecurityGroupDbMixin(ext_sg.SecurityGroupPluginBase):
         """
         new_rules = set()
         tenant_ids = set()
+        remote_group_ids = set()
         for rules in security_group_rule['security_group_rules']:
             rule = rules.get('security_group_rule')
             new_rules.add(rule['security_group_id'])
@@ -314,10 +322,13 @@ class SecurityGroupDbMixin(ext_sg.SecurityGroupPluginBase):
             if rule['tenant_id'] not in tenant_ids:
                 tenant_ids.add(rule['tenant_id'])
             remote_group_id = rule.get('remote_group_id')
-            # Check that remote_group_id exists for tenant
-            if remote_group_id:
-                self.get_security_group(context, remote_group_id,
-                                        tenant_id=rule['tenant_id'])
+            # Check that remote_group_id exists for tenant, once per group
+            # as the rules of a group mostly reference the same ones
+            if (remote_group_id and
+                (remote_group_id, rule['tenant_id']) not in remote_group_ids):
+                self._get_security_group_for_tenant(
+                    context, remote_group_id, rule['tenant_id'])
+                remote_group_ids.add((remote_group_id, rule['tenant_id']))
         if len(new_rules) > 1:
             raise ext_sg.SecurityGroupNotSingleGroupRules()
         security_group_id = new_rules.pop()
@@ -327,10 +338,21 @@ class SecurityGroupDbMixin(ext_sg.SecurityGroupPluginBase):
         if len(tenant_ids) > 1:
             raise ext_sg.SecurityGroupRulesNotSingleTenant()
         for tenant_id in tenant_ids:
-            self.get_security_group(context, security_group_id,
-                                    tenant_id=tenant_id)
+            self._get_security_group_for_tenant(context, security_group_id,
+                                                tenant_id)
         return security_group_id
 
+    def _get_security_group_for_tenant(self, context, id, tenant_id):
+        """Like get_security_group but without loading the rules."""
+        if not tenant_id:
+            return self._get_security_group(context, id)
+        tmp_context_tenant_id = context.tenant_id
+        context.tenant_id = tenant_id
+        try:
+            return self._get_security_group(context, id)
+        finally:
+            context.tenant_id = tmp_context_tenant_id
+
     def _make_security_group_rule_dict(self, security_group_rule, fields=None):
         res = {'id': security_group_rule['id'],
                'tenant_id': security_group_rule['tenant_id'],
@@ -361,19 +383,33 @@ class SecurityGroupDbMixin(ext_sg.SecurityGroupPluginBase):
         return res
 
     def _check_for_duplicate_rules(self, context, security_group_rules):
+        # Load the rules of the groups once and compare them in memory
+        # instead of querying the database for every new rule.
+        sg_ids = set(i['security_group_rule']['security_group_id']
+                     for i in security_group_rules)
+        query = self._model_query(context, SecurityGroupRule)
+        existing_rules = query.filter(
+            SecurityGroupRule.security_group_id.in_(sg_ids)).all()
+
+        counts = {}
         for i in security_group_rules:
-            found_self = False
-            for j in security_group_rules:
-                if i['security_group_rule'] == j['security_group_rule']:
-                    if found_self:
-                        raise ext_sg.DuplicateSecurityGroupRuleInPost(rule=i)
-                    found_self = True
-
-            # Check in database if rule exists
+            key = self._security_group_rule_key(i['security_group_rule'])
+            counts[key] = counts.get(key, 0) + 1
+
+        for i in security_group_rules:
+            key = self._security_group_rule_key(i['security_group_rule'])
+            if counts[key] > 1:
+                raise ext_sg.DuplicateSecurityGroupRuleInPost(rule=i)
+
+            # Check if rule exists, with the semantic of the filters of
+            # get_security_group_rules
             filters = self._make_security_group_rule_filter_dict(i)
-            rules = self.get_security_group_rules(context, filters)
-            if rules:
-                raise ext_sg.SecurityGroupRuleExists(id=str(rules[0]['id']))
+            for rule in existing_rules:
+                if all(rule[k] in v for k, v in filters.iteritems()):
+                    raise ext_sg.SecurityGroupRuleExists(id=str(rule['id']))
+
+    def _security_group_rule_key(self, security_group_rule):
+        return tuple(sorted(security_group_rule.items()))
 
     def get_security_group_rules(self, context, filters=None, fields=None,
                                  sorts=None, limit=None, marker=None,
@@ -120,6 +120,25 @@ class SecurityGroupServerRpcMixin(sg_db.SecurityGroupDbMixin):
             self.notifier.security_groups_member_updated(
                 context, port.get(ext_sg.SECURITYGROUPS))
 
+    def notify_security_groups_member_updated_bulk(self, context, ports):
+        """Notify update event of security group members of several ports.
+
+        Same as notify_security_groups_member_updated() for each port,
+        but with at most one notification of each kind for all of them.
+        """
+        provider_updated = False
+        security_groups = set()
+        for port in ports:
+            if port['device_owner'] == q_const.DEVICE_OWNER_DHCP:
+                provider_updated = True
+            else:
+                security_groups.update(port.get(ext_sg.SECURITYGROUPS) or [])
+        if provider_updated:
+            self.notifier.security_groups_provider_updated(context)
+        if security_groups:
+            self.notifier.security_groups_member_updated(
+                context, list(security_groups))
+
 
 class SecurityGroupServerRpcCallbackMixin(object):
     """A mix-in that enable SecurityGroup agent support in plugin
@@ -133,10 +152,34 @@ class SecurityGroupServerRpcCallbackMixin(object):
         to source_ip_prefix and dest_ip_prefix rule
 
         :params devices: list of devices
+        :params compact: return the rules shared by the ports only once
         :returns: port correspond to the devices with security group rules
         """
         devices = kwargs.get('devices')
+        ports = self._get_ports_for_devices(devices)
+        ports = self._security_group_rules_for_ports(context, ports)
+        if kwargs.get('compact'):
+            return self._compact_security_group_rules(ports)
+        return ports
+
+    def security_group_info_for_devices(self, context, **kwargs):
+        """Return each port with the security groups it is member of.
+
+        Unlike security_group_rules_for_devices, the rules of a security
+        group and the IPs of a remote group are returned once instead of
+        being copied into every port, and are expanded by the agent.
+
+        :params devices: list of devices
+        :returns: dict with
+            devices: port correspond to the devices with their own rules
+            security_groups: rules of each security group of the ports
+            sg_member_ips: IPs of each remote group of those rules
+        """
+        devices = kwargs.get('devices')
+        ports = self._get_ports_for_devices(devices)
+        return self._security_group_info_for_ports(context, ports)
 
+    def _get_ports_for_devices(self, devices):
         ports = {}
         for device in devices:
             port = self.get_port_from_device(device)
@@ -145,7 +188,30 @@ class SecurityGroupServerRpcCallbackMixin(object):
             if port['device_owner'].startswith('network:'):
                 continue
             ports[port['id']] = port
-        return self._security_group_rules_for_ports(context, ports)
+        return ports
+
+    def _compact_security_group_rules(self, ports):
+        """Move the rules of the ports into a table of unique rules.
+
+        Ports of a host mostly share their security groups, so each rule
+        is sent once and the ports only hold indexes into the rule table:
+        {'rules': [rule, ...], 'ports': {port_id: port, ...}}
+        """
+        rules = []
+        indexes = {}
+        compact_ports = {}
+        for port_id, port in ports.iteritems():
+            port = port.copy()
+            port_rules = []
+            for rule in port.get('security_group_rules', []):
+                key = tuple(sorted(rule.items()))
+                if key not in indexes:
+                    indexes[key] = len(rules)
+                    rules.append(rule)
+                port_rules.append(indexes[key])
+            port['security_group_rules'] = port_rules
+            compact_ports[port_id] = port
+        return {'rules': rules, 'ports': compact_ports}
 
     def _select_rules_for_ports(self, context, ports):
         if not ports:
@@ -278,25 +344,80 @@ class SecurityGroupServerRpcCallbackMixin(object):
             self._add_ingress_ra_rule(port, ips)
             self._add_ingress_dhcp_rule(port, ips)
 
+    def _make_rule_dict(self, rule_in_db):
+        direction = rule_in_db['direction']
+        rule_dict = {
+            'security_group_id': rule_in_db['security_group_id'],
+            'direction': direction,
+            'ethertype': rule_in_db['ethertype'],
+        }
+        for key in ('protocol', 'port_range_min', 'port_range_max',
+                    'remote_ip_prefix', 'remote_group_id'):
+            if rule_in_db.get(key):
+                if key == 'remote_ip_prefix':
+                    direction_ip_prefix = DIRECTION_IP_PREFIX[direction]
+                    rule_dict[direction_ip_prefix] = rule_in_db[key]
+                    continue
+                rule_dict[key] = rule_in_db[key]
+        return rule_dict
+
     def _security_group_rules_for_ports(self, context, ports):
         rules_in_db = self._select_rules_for_ports(context, ports)
         for (binding, rule_in_db) in rules_in_db:
             port_id = binding['port_id']
             port = ports[port_id]
-            direction = rule_in_db['direction']
-            rule_dict = {
-                'security_group_id': rule_in_db['security_group_id'],
-                'direction': direction,
-                'ethertype': rule_in_db['ethertype'],
-            }
-            for key in ('protocol', 'port_range_min', 'port_range_max',
-                        'remote_ip_prefix', 'remote_group_id'):
-                if rule_in_db.get(key):
-                    if key == 'remote_ip_prefix':
-                        direction_ip_prefix = DIRECTION_IP_PREFIX[direction]
-                        rule_dict[direction_ip_prefix] = rule_in_db[key]
-                        continue
-                    rule_dict[key] = rule_in_db[key]
-            port['security_group_rules'].append(rule_dict)
+            port['security_group_rules'].append(
+                self._make_rule_dict(rule_in_db))
         self._apply_provider_rule(context, ports)
         return self._convert_remote_group_id_to_ip_prefix(context, ports)
+
+    def _select_sg_ids_for_ports(self, context, ports):
+        if not ports:
+            return []
+        sg_binding_port = sg_db.SecurityGroupPortBinding.port_id
+        sg_binding_sgid = sg_db.SecurityGroupPortBinding.security_group_id
+        query = context.session.query(sg_binding_port, sg_binding_sgid)
+        query = query.filter(sg_binding_port.in_(ports.keys()))
+        return query.all()
+
+    def _select_rules_for_sg_ids(self, context, sg_ids):
+        if not sg_ids:
+            return []
+        sgr_sgid = sg_db.SecurityGroupRule.security_group_id
+        query = context.session.query(sg_db.SecurityGroupRule)
+        query = query.filter(sgr_sgid.in_(sg_ids))
+        return query.all()
+
+    def _security_group_info_for_ports(self, context, ports):
+        sg_info = {'devices': ports,
+                   'security_groups': {},
+                   'sg_member_ips': {}}
+        for port in ports.values():
+            port['security_groups'] = []
+            port['security_group_rules'] = []
+            port['security_group_source_groups'] = []
+        for port_id, sg_id in self._select_sg_ids_for_ports(context, ports):
+            ports[port_id]['security_groups'].append(sg_id)
+            sg_info['security_groups'][sg_id] = []
+
+        remote_group_ids = {}
+        for rule_in_db in self._select_rules_for_sg_ids(
+                context, sg_info['security_groups'].keys()):
+            sg_id = rule_in_db['security_group_id']
+            sg_info['security_groups'][sg_id].append(
+                self._make_rule_dict(rule_in_db))
+            remote_group_id = rule_in_db['remote_group_id']
+            if remote_group_id:
+                remote_group_ids.setdefault(sg_id, set()).add(
+                    remote_group_id)
+
+        for port in ports.values():
+            source_groups = set()
+            for sg_id in port['security_groups']:
+                source_groups.update(remote_group_ids.get(sg_id, []))
+            port['security_group_source_groups'] = list(source_groups)
+        sg_info['sg_member_ips'] = self._select_ips_for_remote_group(
+            context, set().union(*remote_group_ids.values()))
+        # the DHCP and RA rules depend on the network of each port
+        self._apply_provider_rule(context, ports)
+        return sg_info
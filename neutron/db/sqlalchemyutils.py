@@ -15,6 +15,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import random
+
 import sqlalchemy
 from sqlalchemy.orm.properties import RelationshipProperty
 
@@ -24,6 +26,14 @@ from neutron.openstack.common import log as logging
 
 LOG = logging.getLogger(__name__)
 
+# Number of free rows among which allocate_free_row() picks one at random
+ALLOCATION_CANDIDATES = 20
+# Number of times allocate_free_row() tries again when the row it picked
+# was allocated by a concurrent request
+ALLOCATION_ATTEMPTS = 10
+# Number of rows inserted per statement by sync_allocations()
+SYNC_INSERT_CHUNK = 10000
+
 
 def paginate_query(query, model, limit, sorts, marker_obj=None):
     """Returns a query with sorting / pagination criteria added.
@@ -106,3 +116,101 @@ def paginate_query(query, model, limit, sorts, marker_obj=None):
         query = query.limit(limit)
 
     return query
+
+
+def allocate_free_row(session, model, key_attrs,
+                      candidates=ALLOCATION_CANDIDATES,
+                      attempts=ALLOCATION_ATTEMPTS):
+    """Mark a row of model which is not allocated as allocated.
+
+    Instead of locking the first free row, which all the concurrent
+    requests would wait for, a row is picked at random among the first
+    free ones and claimed with an UPDATE only matching it if it is still
+    free.  If a concurrent request claimed it first, another row is
+    picked among the ones not tried yet: in a REPEATABLE READ
+    transaction the candidates are read from the same snapshot, where
+    the rows claimed since are still free.  When all the attempts
+    failed, the first free row is locked and allocated.
+
+    :param model: model with an 'allocated' boolean column
+    :param key_attrs: names of the attributes identifying a row
+    :returns: the values of key_attrs of the allocated row by name, or
+              None if there is no free row.
+    """
+    columns = [getattr(model, attr) for attr in key_attrs]
+    tried = []
+    for attempt in xrange(attempts):
+        query = session.query(*columns).filter_by(allocated=False)
+        for row in tried:
+            query = query.filter(~sqlalchemy.sql.and_(
+                *[column == value for column, value in zip(columns, row)]))
+        rows = query.limit(candidates).all()
+        if not rows:
+            break
+        row = random.choice(rows)
+        keys = dict(zip(key_attrs, row))
+        count = (session.query(model).
+                 filter_by(allocated=False, **keys).
+                 update({'allocated': True}))
+        if count:
+            return keys
+        LOG.debug(_("%(model)s %(keys)s was allocated concurrently, "
+                    "trying another one"),
+                  {'model': model.__name__, 'keys': keys})
+        tried.append(row)
+    if tried:
+        LOG.debug(_("Unable to allocate a %(model)s after %(attempts)d "
+                    "attempts, locking the first free one"),
+                  {'model': model.__name__, 'attempts': len(tried)})
+    alloc = (session.query(model).
+             filter_by(allocated=False).
+             with_lockmode('update').
+             first())
+    if not alloc:
+        return None
+    alloc.allocated = True
+    return dict((attr, getattr(alloc, attr)) for attr in key_attrs)
+
+
+def sync_allocations(session, model, id_attr, ranges, **keys):
+    """Make the rows of an allocation table match ranges of ids.
+
+    The rows which are not allocated and whose id is outside the ranges
+    are deleted with a single statement.  The rows of each range are
+    counted, and only for the ranges which are not complete are the
+    existing ids loaded and the missing rows inserted, in bulk.  So when
+    the ranges did not change, the work done does not depend on their
+    size.
+
+    :param model: model with an 'allocated' boolean column
+    :param id_attr: name of the integer attribute holding the ids
+    :param ranges: list of (min, max) ranges of ids, bounds included
+    :param keys: values of the other attributes identifying the rows, e.g.
+                 the physical network of VLANs
+    """
+    column = getattr(model, id_attr)
+    query = session.query(model).filter_by(allocated=False, **keys)
+    if ranges:
+        query = query.filter(~sqlalchemy.or_(
+            *[column.between(id_min, id_max) for id_min, id_max in ranges]))
+    removed = query.delete(synchronize_session=False)
+
+    added = 0
+    for id_min, id_max in ranges:
+        in_range = (session.query(column).filter_by(**keys).
+                    filter(column.between(id_min, id_max)))
+        if in_range.count() == id_max - id_min + 1:
+            continue
+        existing = set(id for (id,) in in_range)
+        missing = [id for id in xrange(id_min, id_max + 1)
+                   if id not in existing]
+        for i in xrange(0, len(missing), SYNC_INSERT_CHUNK):
+            rows = [dict(keys, allocated=False, **{id_attr: id})
+                    for id in missing[i:i + SYNC_INSERT_CHUNK]]
+            session.execute(model.__table__.insert(), rows)
+        added += len(missing)
+    if removed or added:
+        LOG.debug(_("Synchronized %(model)s %(keys)s: %(removed)d removed "
+                    "from and %(added)d added to the pool"),
+                  {'model': model.__name__, 'keys': keys,
+                   'removed': removed, 'added': added})
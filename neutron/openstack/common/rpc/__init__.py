@@ -69,6 +69,16 @@ rpc_opts = [
     cfg.StrOpt('control_exchange',
                default='openstack',
                help='AMQP exchange to connect to if using RabbitMQ or Qpid'),
+    cfg.IntOpt('rpc_compression_threshold',
+               default=65536,
+               help='Size in bytes above which the JSON encoded replies are '
+                    'zlib compressed for the callers accepting it. 0 '
+                    'disables compression.'),
+    cfg.BoolOpt('rpc_compress_requests',
+                default=False,
+                help='Also compress the calls and casts above '
+                     'rpc_compression_threshold. Only enable it once every '
+                     'service understands compressed messages.'),
 ]
 
 CONF = cfg.CONF
@@ -28,6 +28,7 @@ AMQP, but is deprecated and predates this code.
 import collections
 import inspect
 import sys
+import time
 import uuid
 
 from eventlet import greenpool
@@ -40,6 +41,7 @@ from neutron.openstack.common.gettextutils import _
 from neutron.openstack.common import local
 from neutron.openstack.common import log as logging
 from neutron.openstack.common.rpc import common as rpc_common
+from neutron.openstack.common.rpc import instrumentation
 
 
 UNIQUE_ID = '_unique_id'
@@ -208,10 +210,11 @@ class ReplyProxy(ConnectionContext):
 
 
 def msg_reply(conf, msg_id, reply_q, connection_pool, reply=None,
-              failure=None, ending=False, log_failure=True):
+              failure=None, ending=False, log_failure=True, compress=False):
     """Sends a reply or an error on the channel signified by msg_id.
 
-    Failure should be a sys.exc_info() tuple.
+    Failure should be a sys.exc_info() tuple.  The reply is compressed if
+    compress is set, i.e. the caller accepts compressed replies.
 
     """
     with ConnectionContext(conf, connection_pool) as conn:
@@ -233,9 +236,9 @@ def msg_reply(conf, msg_id, reply_q, connection_pool, reply=None,
         # Otherwise use the msg_id for backward compatibilty.
         if reply_q:
             msg['_msg_id'] = msg_id
-            conn.direct_send(reply_q, rpc_common.serialize_msg(msg))
+            conn.direct_send(reply_q, rpc_common.serialize_msg(msg, compress))
         else:
-            conn.direct_send(msg_id, rpc_common.serialize_msg(msg))
+            conn.direct_send(msg_id, rpc_common.serialize_msg(msg, compress))
 
 
 class RpcContext(rpc_common.CommonRpcContext):
@@ -243,6 +246,7 @@ class RpcContext(rpc_common.CommonRpcContext):
     def __init__(self, **kwargs):
         self.msg_id = kwargs.pop('msg_id', None)
         self.reply_q = kwargs.pop('reply_q', None)
+        self.accept_compression = kwargs.pop('accept_compression', None)
         self.conf = kwargs.pop('conf')
         super(RpcContext, self).__init__(**kwargs)
 
@@ -251,13 +255,15 @@ class RpcContext(rpc_common.CommonRpcContext):
         values['conf'] = self.conf
         values['msg_id'] = self.msg_id
         values['reply_q'] = self.reply_q
+        values['accept_compression'] = self.accept_compression
         return self.__class__(**values)
 
     def reply(self, reply=None, failure=None, ending=False,
               connection_pool=None, log_failure=True):
         if self.msg_id:
             msg_reply(self.conf, self.msg_id, self.reply_q, connection_pool,
-                      reply, failure, ending, log_failure)
+                      reply, failure, ending, log_failure,
+                      self.accept_compression == rpc_common._COMPRESSION)
             if ending:
                 self.msg_id = None
 
@@ -274,6 +280,7 @@ def unpack_context(conf, msg):
             context_dict[key[9:]] = value
     context_dict['msg_id'] = msg.pop('_msg_id', None)
     context_dict['reply_q'] = msg.pop('_reply_q', None)
+    context_dict['accept_compression'] = msg.pop('_accept_compression', None)
     context_dict['conf'] = conf
     ctx = RpcContext.from_dict(context_dict)
     rpc_common._safe_log(LOG.debug, _('unpacked context: %s'), ctx.to_dict())
@@ -369,12 +376,13 @@ class CallbackWrapper(_ThreadPoolWithWait):
 class ProxyCallback(_ThreadPoolWithWait):
     """Calls methods on a proxy object based on method and args."""
 
-    def __init__(self, conf, proxy, connection_pool):
+    def __init__(self, conf, proxy, connection_pool, topic=None):
         super(ProxyCallback, self).__init__(
             conf=conf,
             connection_pool=connection_pool,
         )
         self.proxy = proxy
+        self.topic = topic
         self.msg_id_cache = _MsgIdCache()
 
     def __call__(self, message_data):
@@ -407,9 +415,10 @@ class ProxyCallback(_ThreadPoolWithWait):
                        connection_pool=self.connection_pool)
             return
         self.pool.spawn_n(self._process_data, ctxt, version, method,
-                          namespace, args)
+                          namespace, args, time.time())
 
-    def _process_data(self, ctxt, version, method, namespace, args):
+    def _process_data(self, ctxt, version, method, namespace, args,
+                      received=None):
         """Process a message in a new thread.
 
         If the proxy object we have has a dispatch method
@@ -418,6 +427,9 @@ class ProxyCallback(_ThreadPoolWithWait):
         the old behavior of magically calling the specified method on the
         proxy we have here.
         """
+        started = time.time()
+        sizes = {}
+        failed = False
         ctxt.update_store()
         try:
             rval = self.proxy.dispatch(ctxt, version, method, namespace,
@@ -427,21 +439,34 @@ class ProxyCallback(_ThreadPoolWithWait):
                 for x in rval:
                     ctxt.reply(x, None, connection_pool=self.connection_pool)
             else:
+                if instrumentation.get_sink():
+                    sizes['result'] = instrumentation.payload_size(rval)
                 ctxt.reply(rval, None, connection_pool=self.connection_pool)
             # This final None tells multicall that it is done.
             ctxt.reply(ending=True, connection_pool=self.connection_pool)
         except rpc_common.ClientException as e:
+            failed = True
             LOG.debug(_('Expected exception during message handling (%s)') %
                       e._exc_info[1])
             ctxt.reply(None, e._exc_info,
                        connection_pool=self.connection_pool,
                        log_failure=False)
         except Exception:
+            failed = True
             # sys.exc_info() is deleted by LOG.exception().
             exc_info = sys.exc_info()
             LOG.error(_('Exception during message handling'),
                       exc_info=exc_info)
             ctxt.reply(None, exc_info, connection_pool=self.connection_pool)
+        sink = instrumentation.get_sink()
+        if sink:
+            latencies = {'exec': instrumentation.elapsed_ms(started)}
+            if received:
+                latencies['wait'] = instrumentation.elapsed_ms(received,
+                                                               started)
+            sizes['args'] = instrumentation.payload_size(args)
+            sink.record(instrumentation.SERVER, self.topic, method,
+                        latencies, sizes, failed)
 
 
 class MulticallProxyWaiter(object):
@@ -524,9 +549,11 @@ def multicall(conf, context, topic, msg, timeout, connection_pool):
         if not connection_pool.reply_proxy:
             connection_pool.reply_proxy = ReplyProxy(conf, connection_pool)
     msg.update({'_reply_q': connection_pool.reply_proxy.get_reply_q()})
+    msg.update({'_accept_compression': rpc_common._COMPRESSION})
     wait_msg = MulticallProxyWaiter(conf, msg_id, timeout, connection_pool)
     with ConnectionContext(conf, connection_pool) as conn:
-        conn.topic_send(topic, rpc_common.serialize_msg(msg), timeout)
+        conn.topic_send(topic, rpc_common.serialize_msg(
+            msg, conf.rpc_compress_requests), timeout)
     return wait_msg
 
 
@@ -546,7 +573,8 @@ def cast(conf, context, topic, msg, connection_pool):
     _add_unique_id(msg)
     pack_context(msg, context)
     with ConnectionContext(conf, connection_pool) as conn:
-        conn.topic_send(topic, rpc_common.serialize_msg(msg))
+        conn.topic_send(topic, rpc_common.serialize_msg(
+            msg, conf.rpc_compress_requests))
 
 
 def fanout_cast(conf, context, topic, msg, connection_pool):
@@ -555,7 +583,8 @@ def fanout_cast(conf, context, topic, msg, connection_pool):
     _add_unique_id(msg)
     pack_context(msg, context)
     with ConnectionContext(conf, connection_pool) as conn:
-        conn.fanout_send(topic, rpc_common.serialize_msg(msg))
+        conn.fanout_send(topic, rpc_common.serialize_msg(
+            msg, conf.rpc_compress_requests))
 
 
 def cast_to_server(conf, context, server_params, topic, msg, connection_pool):
@@ -564,7 +593,8 @@ def cast_to_server(conf, context, server_params, topic, msg, connection_pool):
     pack_context(msg, context)
     with ConnectionContext(conf, connection_pool, pooled=False,
                            server_params=server_params) as conn:
-        conn.topic_send(topic, rpc_common.serialize_msg(msg))
+        conn.topic_send(topic, rpc_common.serialize_msg(
+            msg, conf.rpc_compress_requests))
 
 
 def fanout_cast_to_server(conf, context, server_params, topic, msg,
@@ -574,7 +604,8 @@ def fanout_cast_to_server(conf, context, server_params, topic, msg,
     pack_context(msg, context)
     with ConnectionContext(conf, connection_pool, pooled=False,
                            server_params=server_params) as conn:
-        conn.fanout_send(topic, rpc_common.serialize_msg(msg))
+        conn.fanout_send(topic, rpc_common.serialize_msg(
+            msg, conf.rpc_compress_requests))
 
 
 def notify(conf, context, topic, msg, connection_pool, envelope):
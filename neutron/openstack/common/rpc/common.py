@@ -17,9 +17,11 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import base64
 import copy
 import sys
 import traceback
+import zlib
 
 from oslo.config import cfg
 import six
@@ -61,6 +63,18 @@ So, the current message envelope just includes the envelope version.  It may
 eventually contain additional information, such as a signature for the message
 payload.
 
+A large payload may be compressed, which is flagged in the envelope:
+
+    {
+        'oslo.version': <RPC Envelope Version as a String>,
+        'oslo.message': <base64 of the zlib compressed JSON payload>,
+        'oslo.compression': 'zlib'
+    }
+
+Receivers of this version always accept compressed payloads.  Callers
+announce it with an '_accept_compression' key in their request so that only
+replies to them are compressed, unless rpc_compress_requests is set.
+
 We will JSON encode the application message payload.  The message envelope,
 which includes the JSON encoded application message body, will be passed down
 to the messaging libraries as a dict.
@@ -69,6 +83,9 @@ _RPC_ENVELOPE_VERSION = '2.0'
 
 _VERSION_KEY = 'oslo.version'
 _MESSAGE_KEY = 'oslo.message'
+_COMPRESSION_KEY = 'oslo.compression'
+
+_COMPRESSION = 'zlib'
 
 _REMOTE_POSTFIX = '_Remote'
 
@@ -161,6 +178,11 @@ class UnsupportedRpcEnvelopeVersion(RPCException):
                 "not supported by this endpoint.")
 
 
+class UnsupportedRpcCompression(RPCException):
+    message = _("Specified RPC compression, %(compression)s, "
+                "not supported by this endpoint.")
+
+
 class RpcVersionCapError(RPCException):
     message = _("Specified RPC version cap, %(version_cap)s, is too low")
 
@@ -477,12 +499,17 @@ def version_is_compatible(imp_version, version):
     return True
 
 
-def serialize_msg(raw_msg):
+def serialize_msg(raw_msg, compress=False):
     # NOTE(russellb) See the docstring for _RPC_ENVELOPE_VERSION for more
     # information about this format.
     msg = {_VERSION_KEY: _RPC_ENVELOPE_VERSION,
            _MESSAGE_KEY: jsonutils.dumps(raw_msg)}
 
+    threshold = CONF.rpc_compression_threshold
+    if compress and threshold > 0 and len(msg[_MESSAGE_KEY]) > threshold:
+        msg[_MESSAGE_KEY] = base64.b64encode(zlib.compress(msg[_MESSAGE_KEY]))
+        msg[_COMPRESSION_KEY] = _COMPRESSION
+
     return msg
 
 
@@ -525,6 +552,13 @@ def deserialize_msg(msg):
     if not version_is_compatible(_RPC_ENVELOPE_VERSION, msg[_VERSION_KEY]):
         raise UnsupportedRpcEnvelopeVersion(version=msg[_VERSION_KEY])
 
-    raw_msg = jsonutils.loads(msg[_MESSAGE_KEY])
+    payload = msg[_MESSAGE_KEY]
+    compression = msg.get(_COMPRESSION_KEY)
+    if compression == _COMPRESSION:
+        payload = zlib.decompress(base64.b64decode(payload))
+    elif compression:
+        raise UnsupportedRpcCompression(compression=compression)
+
+    raw_msg = jsonutils.loads(payload)
 
     return raw_msg
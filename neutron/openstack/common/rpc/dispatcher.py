@@ -83,10 +83,17 @@ On the client side, the same changes should be made as in example 1.  The
 minimum version that supports the new parameter should be specified.
 """
 
+import sys
+
 from neutron.openstack.common.rpc import common as rpc_common
 from neutron.openstack.common.rpc import serializer as rpc_serializer
 
 
+# Method of a message whose 'calls' argument is a list of messages to be
+# dispatched at once.  See RpcProxy.call_batch().
+BATCH_METHOD = '__batch__'
+
+
 class RpcDispatcher(object):
     """Dispatch rpc messages according to the requested API version.
 
@@ -141,6 +148,35 @@ class RpcDispatcher(object):
         :returns: Whatever is returned by the underlying method that gets
                   called.
         """
+        if method == BATCH_METHOD:
+            return self._dispatch_batch(ctxt, **kwargs)
+        return self._dispatch(ctxt, version, method, namespace, **kwargs)
+
+    def _dispatch_batch(self, ctxt, calls):
+        """Dispatch a list of messages received in one envelope.
+
+        :returns: A list holding, in the order of calls, either
+                  {'result': <return value>} or {'failure': <serialized
+                  exception>} for each message.
+        """
+        replies = []
+        for msg in calls:
+            try:
+                result = self._dispatch(ctxt, msg.get('version'),
+                                        msg['method'], msg.get('namespace'),
+                                        **msg.get('args', {}))
+                replies.append({'result': result})
+            except rpc_common.ClientException as e:
+                failure = rpc_common.serialize_remote_exception(
+                    e._exc_info, log_failure=False)
+                replies.append({'failure': failure})
+            except Exception:
+                failure = rpc_common.serialize_remote_exception(
+                    sys.exc_info())
+                replies.append({'failure': failure})
+        return replies
+
+    def _dispatch(self, ctxt, version, method, namespace, **kwargs):
         if not version:
             version = '1.0'
 
@@ -0,0 +1,261 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Count and time the RPC messages per topic and method.
+
+The server side records for each dispatched message the time it waited for
+a green thread of the pool ('wait') and the time spent executing it and
+sending the reply ('exec').  The client side records the round trip of the
+calls ('call') and the time to send the casts ('cast').  Both record the
+size of the JSON encoded arguments, and of the result on the server side.
+
+The measures are given to the sink set by rpc_instrumentation_sink, which is
+disabled by default.  LogSink aggregates them and periodically logs the
+share of the server time taken by each method, StatsdSink sends them to a
+statsd server over UDP.
+"""
+
+import bisect
+import contextlib
+import socket
+import time
+
+from oslo.config import cfg
+
+from neutron.openstack.common.gettextutils import _
+from neutron.openstack.common import importutils
+from neutron.openstack.common import jsonutils
+from neutron.openstack.common import log as logging
+
+
+instrumentation_opts = [
+    cfg.StrOpt('rpc_instrumentation_sink',
+               help='Class recording the count, latency and payload size of '
+                    'the RPC messages per topic and method, e.g. '
+                    'neutron.openstack.common.rpc.instrumentation.LogSink '
+                    'or neutron.openstack.common.rpc.instrumentation.'
+                    'StatsdSink. Disabled if not set.'),
+    cfg.IntOpt('rpc_instrumentation_report_interval',
+               default=60,
+               help='Seconds between two reports of the LogSink'),
+    cfg.StrOpt('rpc_statsd_host',
+               default='localhost',
+               help='Host of the statsd server of the StatsdSink'),
+    cfg.IntOpt('rpc_statsd_port',
+               default=8125,
+               help='UDP port of the statsd server of the StatsdSink'),
+    cfg.StrOpt('rpc_statsd_prefix',
+               default='neutron.rpc',
+               help='Prefix of the metrics sent by the StatsdSink'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(instrumentation_opts)
+LOG = logging.getLogger(__name__)
+
+SERVER = 'server'
+CLIENT = 'client'
+
+# upper bounds in ms of the buckets of the latency histograms
+LATENCY_BUCKETS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+_sink = None
+
+
+class Histogram(object):
+    """Latency histogram with the buckets of LATENCY_BUCKETS."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms):
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    @property
+    def average(self):
+        return self.total / self.count if self.count else 0.0
+
+
+class MethodStats(object):
+    """Measures of the messages of a method on a topic."""
+
+    def __init__(self):
+        self.count = 0
+        self.failures = 0
+        self.sizes = {}
+        self.latencies = {}
+
+    def add(self, latencies, sizes, failed):
+        self.count += 1
+        if failed:
+            self.failures += 1
+        for name, size in sizes.iteritems():
+            self.sizes[name] = self.sizes.get(name, 0) + size
+        for name, ms in latencies.iteritems():
+            self.latencies.setdefault(name, Histogram()).add(ms)
+
+
+class Sink(object):
+    """Destination of the measures of the RPC messages."""
+
+    def record(self, side, topic, method, latencies, sizes, failed):
+        """Record the measures of a message.
+
+        :param side: SERVER or CLIENT
+        :param latencies: durations in ms by name, e.g. 'wait' and 'exec'
+        :param sizes: payload sizes in bytes by name, e.g. 'args'
+        :param failed: whether the method raised an exception
+        """
+        raise NotImplementedError()
+
+
+class StatsSink(Sink):
+    """Aggregate the measures in memory per side, topic and method."""
+
+    def __init__(self):
+        self.stats = {}
+
+    def record(self, side, topic, method, latencies, sizes, failed):
+        key = (side, topic, method)
+        if key not in self.stats:
+            self.stats[key] = MethodStats()
+        self.stats[key].add(latencies, sizes, failed)
+
+    def server_time_shares(self):
+        """Return the share of the server exec time taken by each method."""
+        totals = dict(((topic, method), stats.latencies['exec'].total)
+                      for (side, topic, method), stats in self.stats.items()
+                      if side == SERVER and 'exec' in stats.latencies)
+        total = sum(totals.values())
+        if not total:
+            return {}
+        return dict((key, value / total) for key, value in totals.items())
+
+
+class LogSink(StatsSink):
+    """Periodically log the aggregated measures."""
+
+    def __init__(self):
+        super(LogSink, self).__init__()
+        self.last_report = time.time()
+
+    def record(self, side, topic, method, latencies, sizes, failed):
+        super(LogSink, self).record(side, topic, method, latencies, sizes,
+                                    failed)
+        now = time.time()
+        if now - self.last_report >= CONF.rpc_instrumentation_report_interval:
+            self.last_report = now
+            self.report()
+
+    def report(self):
+        shares = self.server_time_shares()
+        for key in sorted(self.stats,
+                          key=lambda key: -shares.get(key[1:], 0)):
+            side, topic, method = key
+            stats = self.stats[key]
+            latencies = ', '.join(
+                '%s avg %.1fms max %.1fms' % (name, hist.average, hist.max)
+                for name, hist in sorted(stats.latencies.items()))
+            sizes = ', '.join('%s %d bytes' % (name, size)
+                              for name, size in sorted(stats.sizes.items()))
+            LOG.info(_("RPC %(side)s %(topic)s.%(method)s: %(count)d "
+                       "messages, %(failures)d failed, %(share).1f%% of the "
+                       "server time, %(latencies)s, %(sizes)s"),
+                     {'side': side, 'topic': topic, 'method': method,
+                      'count': stats.count, 'failures': stats.failures,
+                      'share': shares.get((topic, method), 0) * 100,
+                      'latencies': latencies, 'sizes': sizes})
+
+
+class StatsdSink(Sink):
+    """Send the measures to a statsd server over UDP.
+
+    The metrics are <prefix>.<side>.<topic>.<method>.<name>, the dots of
+    the topics being replaced by underscores.
+    """
+
+    def __init__(self):
+        self.address = (CONF.rpc_statsd_host, CONF.rpc_statsd_port)
+        self.prefix = CONF.rpc_statsd_prefix
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def record(self, side, topic, method, latencies, sizes, failed):
+        name = '.'.join((self.prefix, side, topic.replace('.', '_'),
+                         method))
+        lines = ['%s.count:1|c' % name]
+        if failed:
+            lines.append('%s.failures:1|c' % name)
+        for key, ms in latencies.iteritems():
+            lines.append('%s.%s:%d|ms' % (name, key, ms))
+        for key, size in sizes.iteritems():
+            lines.append('%s.%s_bytes:%d|c' % (name, key, size))
+        try:
+            self.socket.sendto('\n'.join(lines), self.address)
+        except socket.error as e:
+            LOG.debug(_("Unable to send RPC metrics to statsd: %s"), e)
+
+
+def get_sink():
+    """Return the sink of the measures, None if not enabled."""
+    global _sink
+    if not CONF.rpc_instrumentation_sink:
+        return None
+    if _sink is None:
+        _sink = importutils.import_object(CONF.rpc_instrumentation_sink)
+    return _sink
+
+
+def reset():
+    """Drop the sink, for it to be recreated from the configuration."""
+    global _sink
+    _sink = None
+
+
+def payload_size(payload):
+    try:
+        return len(jsonutils.dumps(payload))
+    except (TypeError, ValueError):
+        return 0
+
+
+def elapsed_ms(start, end=None):
+    return ((end or time.time()) - start) * 1000
+
+
+@contextlib.contextmanager
+def measure_client(kind, topic, msg):
+    """Measure a call or a cast sent by a client."""
+    sink = get_sink()
+    if sink is None:
+        yield
+        return
+    sizes = {'args': payload_size(msg.get('args'))}
+    start = time.time()
+    failed = True
+    try:
+        yield
+        failed = False
+    finally:
+        sink.record(CLIENT, topic, msg.get('method'),
+                    {kind: elapsed_ms(start)}, sizes, failed)
@@ -21,9 +21,12 @@ For more information about rpc API version numbers, see:
     rpc/dispatcher.py
 """
 
+import eventlet
 
 from neutron.openstack.common import rpc
 from neutron.openstack.common.rpc import common as rpc_common
+from neutron.openstack.common.rpc import dispatcher as rpc_dispatcher
+from neutron.openstack.common.rpc import instrumentation
 from neutron.openstack.common.rpc import serializer as rpc_serializer
 
 
@@ -121,14 +124,100 @@ class RpcProxy(object):
         """
         self._set_version(msg, version)
         msg['args'] = self._serialize_msg_args(context, msg['args'])
-        real_topic = self._get_topic(topic)
+        return self._call(context, msg, self._get_topic(topic), timeout)
+
+    def _call(self, context, msg, real_topic, timeout):
+        """rpc.call() a message whose version and args are already set."""
         try:
-            result = rpc.call(context, real_topic, msg, timeout)
+            with instrumentation.measure_client('call', real_topic, msg):
+                result = rpc.call(context, real_topic, msg, timeout)
             return self.serializer.deserialize_entity(context, result)
         except rpc.common.Timeout as exc:
             raise rpc.common.Timeout(
                 exc.info, real_topic, msg.get('method'))
 
+    def _call_concurrently(self, context, msgs, real_topic, timeout):
+        pool = eventlet.GreenPool(len(msgs))
+        threads = [pool.spawn(self._call, context, msg, real_topic, timeout)
+                   for msg in msgs]
+        return [thread.wait() for thread in threads]
+
+    def call_many(self, context, msgs, topic=None, version=None,
+                  timeout=None):
+        """rpc.call() several remote methods concurrently.
+
+        All the messages are sent before any reply is waited for, so the
+        round trips overlap instead of adding up.
+
+        :param context: The request context
+        :param msgs: The messages to send, each including the method and
+               args.
+        :param topic: Override the topic for these messages.
+        :param version: (Optional) Override the requested API version in
+               these messages.
+        :param timeout: (Optional) A timeout to use when waiting for each
+               response.
+
+        :returns: The return values of the remote methods, in the order of
+                  msgs.  If any call fails, the exception of the first
+                  failed one in that order is raised.
+        """
+        if not msgs:
+            return []
+        for msg in msgs:
+            self._set_version(msg, version)
+            msg['args'] = self._serialize_msg_args(context, msg['args'])
+        return self._call_concurrently(context, msgs, self._get_topic(topic),
+                                       timeout)
+
+    def call_batch(self, context, msgs, topic=None, version=None,
+                   timeout=None):
+        """rpc.call() several remote methods within a single message.
+
+        The server dispatches all the messages at once and sends their
+        results back in one reply.  A server which does not know this
+        envelope gets the messages as with call_many().
+
+        :param context: The request context
+        :param msgs: The messages to send, each including the method and
+               args.
+        :param topic: Override the topic for these messages.
+        :param version: (Optional) Override the requested API version in
+               these messages.
+        :param timeout: (Optional) A timeout to use when waiting for the
+               response.
+
+        :returns: The return values of the remote methods, in the order of
+                  msgs.  If any call fails, the exception of the first
+                  failed one in that order is raised.
+        """
+        if not msgs:
+            return []
+        for msg in msgs:
+            self._set_version(msg, version)
+            msg['args'] = self._serialize_msg_args(context, msg['args'])
+        real_topic = self._get_topic(topic)
+        envelope = {'method': rpc_dispatcher.BATCH_METHOD,
+                    'namespace': None,
+                    'args': {'calls': msgs}}
+        try:
+            replies = rpc.call(context, real_topic, envelope, timeout)
+        except rpc.common.Timeout as exc:
+            raise rpc.common.Timeout(
+                exc.info, real_topic, rpc_dispatcher.BATCH_METHOD)
+        except AttributeError:
+            # the server has no dispatcher support for the envelope
+            return self._call_concurrently(context, msgs, real_topic,
+                                           timeout)
+        results = []
+        for reply in replies:
+            if 'failure' in reply:
+                raise rpc_common.deserialize_remote_exception(
+                    rpc.CONF, reply['failure'])
+            results.append(self.serializer.deserialize_entity(
+                context, reply['result']))
+        return results
+
     def multicall(self, context, msg, topic=None, version=None, timeout=None):
         """rpc.multicall() a remote method.
 
@@ -168,7 +257,9 @@ class RpcProxy(object):
         """
         self._set_version(msg, version)
         msg['args'] = self._serialize_msg_args(context, msg['args'])
-        rpc.cast(context, self._get_topic(topic), msg)
+        real_topic = self._get_topic(topic)
+        with instrumentation.measure_client('cast', real_topic, msg):
+            rpc.cast(context, real_topic, msg)
 
     def fanout_cast(self, context, msg, topic=None, version=None):
         """rpc.fanout_cast() a remote method.
@@ -184,7 +275,9 @@ class RpcProxy(object):
         """
         self._set_version(msg, version)
         msg['args'] = self._serialize_msg_args(context, msg['args'])
-        rpc.fanout_cast(context, self._get_topic(topic), msg)
+        real_topic = self._get_topic(topic)
+        with instrumentation.measure_client('fanout_cast', real_topic, msg):
+            rpc.fanout_cast(context, real_topic, msg)
 
     def cast_to_server(self, context, server_params, msg, topic=None,
                        version=None):
@@ -203,7 +296,9 @@ class RpcProxy(object):
         """
         self._set_version(msg, version)
         msg['args'] = self._serialize_msg_args(context, msg['args'])
-        rpc.cast_to_server(context, server_params, self._get_topic(topic), msg)
+        real_topic = self._get_topic(topic)
+        with instrumentation.measure_client('cast', real_topic, msg):
+            rpc.cast_to_server(context, server_params, real_topic, msg)
 
     def fanout_cast_to_server(self, context, server_params, msg, topic=None,
                               version=None):
@@ -222,5 +317,6 @@ class RpcProxy(object):
         """
         self._set_version(msg, version)
         msg['args'] = self._serialize_msg_args(context, msg['args'])
-        rpc.fanout_cast_to_server(context, server_params,
-                                  self._get_topic(topic), msg)
+        real_topic = self._get_topic(topic)
+        with instrumentation.measure_client('fanout_cast', real_topic, msg):
+            rpc.fanout_cast_to_server(context, server_params, real_topic, msg)
@@ -0,0 +1,56 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+# Copyright 2013, Big Switch Networks
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import sqlalchemy as sa
+
+from neutron.db import model_base
+
+
+class TopologyHash(model_base.BASEV2):
+    """Hash of the topology of a tenant last synchronized to the servers."""
+
+    __tablename__ = 'topologyhashes'
+
+    tenant_id = sa.Column(sa.String(255), primary_key=True)
+    hash = sa.Column(sa.String(64), nullable=False)
+
+
+def get_topology_hashes(context):
+    """Return the hash of the last synchronized topology by tenant."""
+    query = context.session.query(TopologyHash)
+    return dict((row.tenant_id, row.hash) for row in query)
+
+
+def put_topology_hash(context, tenant_id, topology_hash):
+    with context.session.begin(subtransactions=True):
+        context.session.merge(TopologyHash(tenant_id=tenant_id,
+                                           hash=topology_hash))
+
+
+def delete_topology_hash(context, tenant_id):
+    with context.session.begin(subtransactions=True):
+        context.session.query(TopologyHash).filter_by(
+            tenant_id=tenant_id).delete()
+
+
+def set_topology_hashes(context, hashes):
+    """Replace all the hashes by those of the hashes dict."""
+    with context.session.begin(subtransactions=True):
+        context.session.query(TopologyHash).delete()
+        for tenant_id, topology_hash in hashes.iteritems():
+            context.session.add(TopologyHash(tenant_id=tenant_id,
+                                             hash=topology_hash))
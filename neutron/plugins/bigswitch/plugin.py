@@ -46,10 +46,12 @@ on port-attach) on an additional PUT to do a bulk dump of all persistent data.
 
 import base64
 import copy
+import hashlib
 import httplib
 import json
 import os
 import socket
+import time
 
 from oslo.config import cfg
 
@@ -64,11 +66,13 @@ from neutron.db import api as db
 from neutron.db import db_base_plugin_v2
 from neutron.db import dhcp_rpc_base
 from neutron.db import l3_db
+from neutron.db import models_v2
 from neutron.extensions import l3
 from neutron.extensions import portbindings
 from neutron.openstack.common import log as logging
 from neutron.openstack.common import rpc
 from neutron.plugins.bigswitch.db import porttracker_db
+from neutron.plugins.bigswitch.db import topologyhash_db
 from neutron.plugins.bigswitch import routerrule_db
 from neutron.plugins.bigswitch.version import version_string_with_vcs
 
@@ -96,9 +100,19 @@ restproxy_opts = [
                        "Floodlight controller.")),
     cfg.BoolOpt('sync_data', default=False,
                 help=_("Sync data on connect")),
+    cfg.StrOpt('sync_mode', default='full',
+               help=_("How the data is synchronized: 'full' sends the whole "
+                      "topology in one request, 'tenant' sends one request "
+                      "per tenant and 'incremental' only sends the tenants "
+                      "whose topology changed since the last successful "
+                      "synchronization.")),
     cfg.IntOpt('server_timeout', default=10,
                help=_("Maximum number of seconds to wait for proxy request "
                       "to connect and complete.")),
+    cfg.IntOpt('server_retry_interval', default=30,
+               help=_("Number of seconds during which a server which could "
+                      "not be reached or returned a 5xx error is not tried "
+                      "again, unless all the servers failed.")),
     cfg.StrOpt('neutron_id', default='neutron-' + utils.get_hostname(),
                deprecated_name='quantum_id',
                help=_("User defined identifier for this Neutron deployment")),
@@ -151,7 +165,11 @@ PORTS_PATH = "/tenants/%s/networks/%s/ports/%s"
 ATTACHMENT_PATH = "/tenants/%s/networks/%s/ports/%s/attachment"
 ROUTERS_PATH = "/tenants/%s/routers/%s"
 ROUTER_INTF_PATH = "/tenants/%s/routers/%s/interfaces/%s"
+TOPOLOGY_PATH = "/topology"
+TENANT_TOPOLOGY_PATH = "/tenants/%s/topology"
+SYNC_MODES = ('full', 'tenant', 'incremental')
 SUCCESS_CODES = range(200, 207)
+IDEMPOTENT_ACTIONS = ('GET', 'PUT')
 FAILURE_CODES = [0, 301, 302, 303, 400, 401, 403, 404, 500, 501, 502, 503,
                  504, 505]
 SYNTAX_ERROR_MESSAGE = 'Syntax error in server config file, aborting plugin'
@@ -185,9 +203,43 @@ class ServerProxy(object):
         self.auth = None
         self.neutron_id = neutron_id
         self.failed = False
+        self.failed_at = 0
+        # idle keep-alive connections to the server
+        self.connections = []
         if auth:
             self.auth = 'Basic ' + base64.encodestring(auth).strip()
 
+    def _new_connection(self):
+        if self.ssl:
+            return httplib.HTTPSConnection(
+                self.server, self.port, timeout=self.timeout)
+        return httplib.HTTPConnection(
+            self.server, self.port, timeout=self.timeout)
+
+    def _get_connection(self):
+        """Return a connection to the server and whether it was idle."""
+        if self.connections:
+            return self.connections.pop(), True
+        return self._new_connection(), False
+
+    def close(self):
+        """Close the idle connections."""
+        while self.connections:
+            self.connections.pop().close()
+
+    def _response(self, conn):
+        response = conn.getresponse()
+        # the response must be read before the connection is reused
+        respstr = response.read()
+        respdata = respstr
+        if response.status in self.success_codes:
+            try:
+                respdata = json.loads(respstr)
+            except ValueError:
+                # response was not JSON, ignore the exception
+                pass
+        return (response.status, response.reason, respstr, respdata)
+
     def rest_call(self, action, resource, data, headers):
         uri = self.base_uri + resource
         body = json.dumps(data)
@@ -209,39 +261,31 @@ class ServerProxy(object):
                     "headers=%(headers)r"),
                   {'resource': resource, 'data': data, 'headers': headers})
 
-        conn = None
-        if self.ssl:
-            conn = httplib.HTTPSConnection(
-                self.server, self.port, timeout=self.timeout)
-            if conn is None:
-                LOG.error(_('ServerProxy: Could not establish HTTPS '
-                            'connection'))
-                return 0, None, None, None
-        else:
-            conn = httplib.HTTPConnection(
-                self.server, self.port, timeout=self.timeout)
-            if conn is None:
-                LOG.error(_('ServerProxy: Could not establish HTTP '
-                            'connection'))
-                return 0, None, None, None
-
+        conn, idle = self._get_connection()
         try:
-            conn.request(action, uri, body, headers)
-            response = conn.getresponse()
-            respstr = response.read()
-            respdata = respstr
-            if response.status in self.success_codes:
-                try:
-                    respdata = json.loads(respstr)
-                except ValueError:
-                    # response was not JSON, ignore the exception
-                    pass
-            ret = (response.status, response.reason, respstr, respdata)
-        except (socket.timeout, socket.error) as e:
+            sent = False
+            try:
+                conn.request(action, uri, body, headers)
+                sent = True
+                ret = self._response(conn)
+            except socket.timeout:
+                raise
+            except (socket.error, httplib.HTTPException):
+                # The server may have closed the idle connection. The request
+                # is sent again on a new one, unless the server may have
+                # processed it already and it is not idempotent.
+                if not idle or (sent and action not in IDEMPOTENT_ACTIONS):
+                    raise
+                conn.close()
+                conn = self._new_connection()
+                conn.request(action, uri, body, headers)
+                ret = self._response(conn)
+            self.connections.append(conn)
+        except (socket.timeout, socket.error, httplib.HTTPException) as e:
             LOG.error(_('ServerProxy: %(action)s failure, %(e)r'),
                       {'action': action, 'e': e})
+            conn.close()
             ret = 0, None, None, None
-        conn.close()
         LOG.debug(_("ServerProxy: status=%(status)d, reason=%(reason)r, "
                     "ret=%(ret)s, data=%(data)r"), {'status': ret[0],
                                                     'reason': ret[1],
@@ -253,9 +297,11 @@ class ServerProxy(object):
 class ServerPool(object):
 
     def __init__(self, servers, ssl, auth, neutron_id, timeout=10,
-                 base_uri='/quantum/v1.0', name='NeutronRestProxy'):
+                 base_uri='/quantum/v1.0', name='NeutronRestProxy',
+                 retry_interval=30):
         self.base_uri = base_uri
         self.timeout = timeout
+        self.retry_interval = retry_interval
         self.name = name
         self.auth = auth
         self.ssl = ssl
@@ -263,11 +309,21 @@ class ServerPool(object):
         self.servers = []
         for server_port in servers:
             self.servers.append(self.server_proxy_for(*server_port))
+        # server of the last successful call
+        self.active_server = None
 
     def server_proxy_for(self, server, port):
         return ServerProxy(server, port, self.ssl, self.auth, self.neutron_id,
                            self.timeout, self.base_uri, self.name)
 
+    def server_down(self, resp):
+        """Return whether the server is unreachable or broken.
+
+        Note: Unlike the other failures, such as a 404 for a missing
+        resource, these are not tried again on the server for a while.
+        """
+        return resp[0] == 0 or resp[0] >= 500
+
     def server_failure(self, resp, ignore_codes=[]):
         """Define failure codes as required.
 
@@ -283,13 +339,32 @@ class ServerPool(object):
         """
         return resp[0] in SUCCESS_CODES
 
+    def servers_to_try(self):
+        """Return the servers to try in order.
+
+        The healthy servers come first, starting with the server of the last
+        successful call whose connections are open. The servers which failed
+        less than retry_interval seconds ago are skipped, unless all the
+        servers did, in which case only the one which failed first is tried.
+        """
+        now = time.time()
+        healthy = sorted((s for s in self.servers if not s.failed),
+                         key=lambda s: s is not self.active_server)
+        failed = sorted((s for s in self.servers if s.failed),
+                        key=lambda s: s.failed_at)
+        retry = [s for s in failed
+                 if now - s.failed_at >= self.retry_interval]
+        if not healthy and not retry:
+            retry = failed[:1]
+        return healthy + retry
+
     @utils.synchronized('bsn-rest-call', external=True)
     def rest_call(self, action, resource, data, headers, ignore_codes):
-        good_first = sorted(self.servers, key=lambda x: x.failed)
-        for active_server in good_first:
+        for active_server in self.servers_to_try():
             ret = active_server.rest_call(action, resource, data, headers)
             if not self.server_failure(ret, ignore_codes):
                 active_server.failed = False
+                self.active_server = active_server
                 return ret
             else:
                 LOG.error(_('ServerProxy: %(action)s failure for servers: '
@@ -297,7 +372,10 @@ class ServerPool(object):
                           {'action': action,
                            'server': (active_server.server,
                                       active_server.port)})
-                active_server.failed = True
+                if self.server_down(ret):
+                    active_server.failed = True
+                    active_server.failed_at = time.time()
+                    active_server.close()
 
         # All servers failed, reset server list and try again next time
         LOG.error(_('ServerProxy: %(action)s failure for all servers: '
@@ -360,8 +438,9 @@ class NeutronRestProxyV2(db_base_plugin_v2.NeutronDbPluginV2,
         assert all(len(s) == 2 for s in servers), SYNTAX_ERROR_MESSAGE
 
         # init network ctrl connections
-        self.servers = ServerPool(servers, server_ssl, server_auth, neutron_id,
-                                  timeout, BASE_URI)
+        self.servers = ServerPool(
+            servers, server_ssl, server_auth, neutron_id, timeout, BASE_URI,
+            retry_interval=cfg.CONF.RESTPROXY.server_retry_interval)
 
         # init dhcp support
         self.topic = topics.PLUGIN
@@ -1137,71 +1216,179 @@ class NeutronRestProxyV2(db_base_plugin_v2.NeutronDbPluginV2,
         """Pushes all data to network ctrl (networks/ports, ports/attachments).
 
         This gives the controller an option to re-sync it's persistent store
-        with neutron's current view of that data.
+        with neutron's current view of that data.  Depending on sync_mode,
+        the topology is sent in one request or tenant by tenant.
         """
         admin_context = qcontext.get_admin_context()
+        sync_mode = cfg.CONF.RESTPROXY.sync_mode
+        if sync_mode not in SYNC_MODES:
+            LOG.warning(_("Unknown sync_mode %s, sending the whole "
+                          "topology"), sync_mode)
+            sync_mode = 'full'
+        if sync_mode == 'full':
+            return self._send_full_topology(admin_context)
+        return self._send_tenant_topologies(
+            admin_context, incremental=(sync_mode == 'incremental'))
+
+    def _send_full_topology(self, context):
         networks = []
         routers = []
+        hashes = {}
+        for tenant_id in self._get_topology_tenant_ids(context):
+            topology = self._get_tenant_topology(context, tenant_id)
+            hashes[tenant_id] = self._get_topology_hash(topology)
+            networks.extend(topology['networks'])
+            routers.extend(topology['routers'])
 
-        all_networks = super(NeutronRestProxyV2,
-                             self).get_networks(admin_context) or []
-        for net in all_networks:
-            mapped_network = self._get_mapped_network_with_subnets(net)
-            net_fl_ips = self._get_network_with_floatingips(mapped_network)
+        try:
+            data = {
+                'networks': networks,
+                'routers': routers,
+            }
+            ret = self.servers.put(TOPOLOGY_PATH, data)
+            if not self.servers.action_success(ret):
+                raise RemoteRestError(ret[2])
+        except RemoteRestError as e:
+            LOG.error(_('NeutronRestProxy: Unable to update remote '
+                        'topology: %s'), e.message)
+            raise
+        topologyhash_db.set_topology_hashes(context, hashes)
+        return ret
+
+    def _send_tenant_topologies(self, context, incremental=False):
+        """Send the topology of each tenant in its own request.
 
-            ports = []
-            net_filter = {'network_id': [net.get('id')]}
-            net_ports = super(NeutronRestProxyV2,
-                              self).get_ports(admin_context,
-                                              filters=net_filter) or []
-            for port in net_ports:
+        With incremental, the tenants whose topology has the same hash as
+        when it was last sent are skipped.  The tenants which have no more
+        resources are sent an empty topology.  Returns the response of the
+        last request, None if nothing was sent.
+        """
+        ret = None
+        hashes = topologyhash_db.get_topology_hashes(context)
+        tenant_ids = set(self._get_topology_tenant_ids(context))
+        for tenant_id in sorted(tenant_ids | set(hashes)):
+            topology = self._get_tenant_topology(context, tenant_id)
+            topology_hash = self._get_topology_hash(topology)
+            if incremental and hashes.get(tenant_id) == topology_hash:
+                continue
+            try:
+                ret = self.servers.put(TENANT_TOPOLOGY_PATH % tenant_id,
+                                       topology)
+                if not self.servers.action_success(ret):
+                    raise RemoteRestError(ret[2])
+            except RemoteRestError as e:
+                LOG.error(_('NeutronRestProxy: Unable to update remote '
+                            'topology of tenant %(tenant_id)s: %(error)s'),
+                          {'tenant_id': tenant_id, 'error': e.message})
+                raise
+            if tenant_id in tenant_ids:
+                topologyhash_db.put_topology_hash(context, tenant_id,
+                                                  topology_hash)
+            else:
+                topologyhash_db.delete_topology_hash(context, tenant_id)
+        return ret
+
+    def _get_topology_tenant_ids(self, context):
+        tenant_ids = set()
+        for model in (models_v2.Network, l3_db.Router):
+            query = context.session.query(model.tenant_id).distinct()
+            tenant_ids.update(tenant_id for (tenant_id,) in query)
+        return sorted(tenant_ids)
+
+    def _get_topology_hash(self, topology):
+        return hashlib.sha1(json.dumps(topology, sort_keys=True)).hexdigest()
+
+    def _get_tenant_topology(self, context, tenant_id):
+        """Return the networks and routers of a tenant.
+
+        The subnets, ports and floating IPs of all the networks are fetched
+        at once, and the lists are sorted by id so that the same topology
+        always has the same hash.
+        """
+        by_id = lambda resource: resource['id']
+        plugin = super(NeutronRestProxyV2, self)
+        tenant_filter = {'tenant_id': [tenant_id]}
+        all_networks = plugin.get_networks(context,
+                                           filters=tenant_filter) or []
+        net_ids = [net['id'] for net in all_networks]
+        external_ids = set()
+        subnets = {}
+        ports = {}
+        floatingips = {}
+        if net_ids:
+            query = context.session.query(
+                l3_db.ExternalNetwork.network_id).filter(
+                    l3_db.ExternalNetwork.network_id.in_(net_ids))
+            external_ids.update(net_id for (net_id,) in query)
+            net_filter = {'network_id': net_ids}
+            for subnet in plugin.get_subnets(context, filters=net_filter):
+                subnets.setdefault(subnet['network_id'], []).append(
+                    self._map_state_and_status(subnet))
+            for port in plugin.get_ports(context, filters=net_filter):
                 mapped_port = self._map_state_and_status(port)
                 mapped_port['attachment'] = {
                     'id': port.get('device_id'),
                     'mac': port.get('mac_address'),
                 }
-                ports.append(mapped_port)
-            net_fl_ips['ports'] = ports
-
-            networks.append(net_fl_ips)
-
-        all_routers = super(NeutronRestProxyV2,
-                            self).get_routers(admin_context) or []
-        for router in all_routers:
-            interfaces = []
-            mapped_router = self._map_state_and_status(router)
+                ports.setdefault(port['network_id'], []).append(mapped_port)
+            fip_filter = {'floating_network_id': net_ids}
+            for fl_ip in plugin.get_floatingips(context, filters=fip_filter):
+                floatingips.setdefault(fl_ip['floating_network_id'],
+                                       []).append(fl_ip)
+
+        # networks with their subnets, as used by the router interfaces
+        mapped_networks = {}
+        networks = []
+        for net in sorted(all_networks, key=by_id):
+            network = self._map_state_and_status(net)
+            network['subnets'] = sorted(subnets.get(net['id'], []),
+                                        key=by_id)
+            for subnet in network['subnets']:
+                if subnet['gateway_ip']:
+                    # FIX: For backward compatibility with wire protocol
+                    network['gateway'] = subnet['gateway_ip']
+                    break
+            else:
+                network['gateway'] = ''
+            network[l3.EXTERNAL] = net['id'] in external_ids
+            mapped_networks[net['id']] = copy.copy(network)
+            network['floatingips'] = sorted(floatingips.get(net['id'], []),
+                                            key=by_id)
+            network['ports'] = sorted(ports.get(net['id'], []), key=by_id)
+            networks.append(network)
+
+        all_routers = plugin.get_routers(context, filters=tenant_filter) or []
+        router_ports = {}
+        if all_routers:
             router_filter = {
-                'device_owner': ["network:router_interface"],
-                'device_id': [router.get('id')]
+                'device_owner': [l3_db.DEVICE_OWNER_ROUTER_INTF],
+                'device_id': [router['id'] for router in all_routers]
             }
-            router_ports = super(NeutronRestProxyV2,
-                                 self).get_ports(admin_context,
-                                                 filters=router_filter) or []
-            for port in router_ports:
+            for port in sorted(plugin.get_ports(context,
+                                                filters=router_filter),
+                               key=by_id):
+                router_ports.setdefault(port['device_id'], []).append(port)
+        routers = []
+        for router in sorted(all_routers, key=by_id):
+            interfaces = []
+            mapped_router = self._map_state_and_status(router)
+            for port in router_ports.get(router['id'], []):
                 net_id = port.get('network_id')
                 subnet_id = port['fixed_ips'][0]['subnet_id']
-                intf_details = self._get_router_intf_details(admin_context,
-                                                             net_id,
-                                                             subnet_id)
-                interfaces.append(intf_details)
+                subnet = [s for s in subnets.get(net_id, [])
+                          if s['id'] == subnet_id]
+                if net_id in mapped_networks and subnet:
+                    interfaces.append({'id': net_id,
+                                       'network': mapped_networks[net_id],
+                                       'subnet': subnet[0]})
+                else:
+                    # interface on the network of another tenant
+                    interfaces.append(self._get_router_intf_details(
+                        context, net_id, subnet_id))
             mapped_router['interfaces'] = interfaces
-
             routers.append(mapped_router)
 
-        try:
-            resource = '/topology'
-            data = {
-                'networks': networks,
-                'routers': routers,
-            }
-            ret = self.servers.put(resource, data)
-            if not self.servers.action_success(ret):
-                raise RemoteRestError(ret[2])
-            return ret
-        except RemoteRestError as e:
-            LOG.error(_('NeutronRestProxy: Unable to update remote '
-                        'topology: %s'), e.message)
-            raise
+        return {'networks': networks, 'routers': routers}
 
     def _add_host_route(self, context, destination, port):
         subnet = {}
@@ -232,6 +232,7 @@ class BrocadePluginV2(db_base_plugin_v2.NeutronDbPluginV2,
         self.router_scheduler = importutils.import_object(
             cfg.CONF.router_scheduler_driver
         )
+        self.start_periodic_agent_rescheduling()
         self.brocade_init()
 
     def brocade_init(self):
@@ -49,6 +49,12 @@ agent_opts = [
     #TODO(rkukura): Change default to False before havana rc1
     cfg.BoolOpt('rpc_support_old_agents', default=True,
                 help=_("Enable server RPC compatibility with old agents")),
+    cfg.BoolOpt('rpc_port_update_fanout', default=True,
+                help=_("Fanout port_update to all the agents, as the agents "
+                       "which do not consume their per-host port_update "
+                       "topic expect. Disable once all the agents are "
+                       "upgraded, to notify only the host of a bound "
+                       "port.")),
 ]
 
 
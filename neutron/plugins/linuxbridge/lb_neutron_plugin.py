@@ -183,8 +183,14 @@ class AgentNotifierApi(proxy.RpcProxy,
         if cfg.CONF.AGENT.rpc_support_old_agents:
             kwargs['vlan_id'] = vlan_id
         msg = self.make_msg('port_update', **kwargs)
-        self.fanout_cast(context, msg,
-                         topic=self.topic_port_update)
+        host = port.get(portbindings.HOST_ID)
+        if host and not cfg.CONF.AGENT.rpc_port_update_fanout:
+            # Only the agent of the host the port is bound to cares
+            self.cast(context, msg,
+                      topic=topics.get_topic_name(self.topic, topics.PORT,
+                                                  topics.UPDATE, host))
+        else:
+            self.fanout_cast(context, msg, topic=self.topic_port_update)
 
 
 class LinuxBridgePluginV2(db_base_plugin_v2.NeutronDbPluginV2,
@@ -255,6 +261,7 @@ class LinuxBridgePluginV2(db_base_plugin_v2.NeutronDbPluginV2,
         self.router_scheduler = importutils.import_object(
             cfg.CONF.router_scheduler_driver
         )
+        self.start_periodic_agent_rescheduling()
         LOG.debug(_("Linux Bridge Plugin initialization complete"))
 
     def _setup_rpc(self):
@@ -464,6 +471,33 @@ class LinuxBridgePluginV2(db_base_plugin_v2.NeutronDbPluginV2,
         self.notify_security_groups_member_updated(context, port)
         return port
 
+    def create_port_bulk(self, context, ports):
+        native = self._is_native_port_bulk_allowed()
+        ports = super(LinuxBridgePluginV2, self).create_port_bulk(context,
+                                                                   ports)
+        if native:
+            # Otherwise create_port() notified each port already
+            self.notify_security_groups_member_updated_bulk(context, ports)
+        return ports
+
+    def _create_ports(self, context, items):
+        # Same processing as create_port() for each port of the batch
+        sgids = []
+        for item in items:
+            # Set port status as 'DOWN'. This will be updated by agent
+            item['status'] = q_const.PORT_STATUS_DOWN
+            self._ensure_default_security_group_on_port(context,
+                                                        {'port': item})
+            sgids.append(self._get_security_groups_on_port(context,
+                                                           {'port': item}))
+        ports = super(LinuxBridgePluginV2, self)._create_ports(context, items)
+        for item, port, port_sgids in zip(items, ports, sgids):
+            self._process_portbindings_create_and_update(context, item,
+                                                         port)
+            self._process_port_create_security_group(context, port,
+                                                     port_sgids)
+        return ports
+
     def update_port(self, context, id, port):
         original_port = self.get_port(context, id)
         session = context.session
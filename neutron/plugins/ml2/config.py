@@ -32,6 +32,18 @@ ml2_opts = [
                 help=_("An ordered list of networking mechanism driver "
                        "entrypoints to be loaded from the "
                        "neutron.ml2.mechanism_drivers namespace.")),
+    cfg.BoolOpt('parallel_postcommit',
+                default=False,
+                help=_("Call the *_postcommit methods of the mechanism "
+                       "drivers concurrently instead of in order. Only "
+                       "suitable when the drivers are independent of each "
+                       "other.")),
+    cfg.BoolOpt('rpc_port_update_fanout', default=True,
+                help=_("Fanout port_update to all the agents, as the agents "
+                       "which do not consume their per-host port_update "
+                       "topic expect. Disable once all the agents are "
+                       "upgraded, to notify only the host of a bound "
+                       "port.")),
 ]
 
 
@@ -23,6 +23,7 @@ from neutron.common import exceptions as exc
 from neutron.common import utils
 from neutron.db import api as db_api
 from neutron.db import model_base
+from neutron.db import sqlalchemyutils
 from neutron.openstack.common import log
 from neutron.plugins.common import utils as plugin_utils
 from neutron.plugins.ml2 import driver_api as api
@@ -96,62 +97,26 @@ class VlanTypeDriver(api.TypeDriver):
     def _sync_vlan_allocations(self):
         session = db_api.get_session()
         with session.begin(subtransactions=True):
-            # get existing allocations for all physical networks
-            allocations = dict()
-            allocs = (session.query(VlanAllocation).
-                      with_lockmode('update'))
-            for alloc in allocs:
-                if alloc.physical_network not in allocations:
-                    allocations[alloc.physical_network] = set()
-                allocations[alloc.physical_network].add(alloc)
+            # lock the existing allocations against concurrent
+            # synchronizations, without loading them
+            (session.query(VlanAllocation.physical_network,
+                           VlanAllocation.vlan_id).
+             with_lockmode('update').all())
 
             # process vlan ranges for each configured physical network
             for (physical_network,
                  vlan_ranges) in self.network_vlan_ranges.iteritems():
-                # determine current configured allocatable vlans for
-                # this physical network
-                vlan_ids = set()
-                for vlan_min, vlan_max in vlan_ranges:
-                    vlan_ids |= set(xrange(vlan_min, vlan_max + 1))
-
-                # remove from table unallocated vlans not currently
-                # allocatable
-                if physical_network in allocations:
-                    for alloc in allocations[physical_network]:
-                        try:
-                            # see if vlan is allocatable
-                            vlan_ids.remove(alloc.vlan_id)
-                        except KeyError:
-                            # it's not allocatable, so check if its allocated
-                            if not alloc.allocated:
-                                # it's not, so remove it from table
-                                LOG.debug(_("Removing vlan %(vlan_id)s on "
-                                            "physical network "
-                                            "%(physical_network)s from pool"),
-                                          {'vlan_id': alloc.vlan_id,
-                                           'physical_network':
-                                           physical_network})
-                                session.delete(alloc)
-                    del allocations[physical_network]
-
-                # add missing allocatable vlans to table
-                for vlan_id in sorted(vlan_ids):
-                    alloc = VlanAllocation(physical_network=physical_network,
-                                           vlan_id=vlan_id,
-                                           allocated=False)
-                    session.add(alloc)
+                sqlalchemyutils.sync_allocations(
+                    session, VlanAllocation, 'vlan_id', vlan_ranges,
+                    physical_network=physical_network)
 
             # remove from table unallocated vlans for any unconfigured
             # physical networks
-            for allocs in allocations.itervalues():
-                for alloc in allocs:
-                    if not alloc.allocated:
-                        LOG.debug(_("Removing vlan %(vlan_id)s on physical "
-                                    "network %(physical_network)s from pool"),
-                                  {'vlan_id': alloc.vlan_id,
-                                   'physical_network':
-                                   alloc.physical_network})
-                        session.delete(alloc)
+            query = session.query(VlanAllocation).filter_by(allocated=False)
+            if self.network_vlan_ranges:
+                query = query.filter(~VlanAllocation.physical_network.in_(
+                    self.network_vlan_ranges.keys()))
+            query.delete(synchronize_session=False)
 
     def get_type(self):
         return TYPE_VLAN
@@ -220,19 +185,14 @@ class VlanTypeDriver(api.TypeDriver):
 
     def allocate_tenant_segment(self, session):
         with session.begin(subtransactions=True):
-            alloc = (session.query(VlanAllocation).
-                     filter_by(allocated=False).
-                     with_lockmode('update').
-                     first())
+            alloc = sqlalchemyutils.allocate_free_row(
+                session, VlanAllocation, ('physical_network', 'vlan_id'))
             if alloc:
                 LOG.debug(_("Allocating vlan %(vlan_id)s on physical network "
-                            "%(physical_network)s from pool"),
-                          {'vlan_id': alloc.vlan_id,
-                           'physical_network': alloc.physical_network})
-                alloc.allocated = True
+                            "%(physical_network)s from pool"), alloc)
                 return {api.NETWORK_TYPE: TYPE_VLAN,
-                        api.PHYSICAL_NETWORK: alloc.physical_network,
-                        api.SEGMENTATION_ID: alloc.vlan_id}
+                        api.PHYSICAL_NETWORK: alloc['physical_network'],
+                        api.SEGMENTATION_ID: alloc['vlan_id']}
 
     def release_segment(self, session, segment):
         physical_network = segment[api.PHYSICAL_NETWORK]
@@ -13,8 +13,11 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import sys
+import time
 
+import eventlet
 from oslo.config import cfg
 import stevedore
 
@@ -133,6 +136,10 @@ class MechanismManager(stevedore.named.NamedExtensionManager):
                                                invoke_on_load=True)
         LOG.info(_("Loaded mechanism driver names: %s"), self.names())
         self._register_mechanisms()
+        # Number of calls and seconds spent in each method of each driver,
+        # by (driver name, method name)
+        self.call_counts = collections.defaultdict(int)
+        self.call_times = collections.defaultdict(float)
 
     def _register_mechanisms(self):
         """Register all mechanism drivers.
@@ -156,6 +163,30 @@ class MechanismManager(stevedore.named.NamedExtensionManager):
             LOG.info(_("Initializing mechanism driver '%s'"), driver.name)
             driver.obj.initialize()
 
+    def _call_on_driver(self, driver, method_name, context):
+        """Call a method of a mechanism driver and record its duration.
+
+        :returns: False if the driver raised an exception, True otherwise.
+        """
+        start = time.time()
+        try:
+            getattr(driver.obj, method_name)(context)
+            return True
+        except Exception:
+            LOG.exception(
+                _("Mechanism driver '%(name)s' failed in %(method)s"),
+                {'name': driver.name, 'method': method_name}
+            )
+            return False
+        finally:
+            elapsed = time.time() - start
+            self.call_counts[(driver.name, method_name)] += 1
+            self.call_times[(driver.name, method_name)] += elapsed
+            LOG.debug(_("Mechanism driver '%(name)s' %(method)s took "
+                        "%(elapsed).3f seconds"),
+                      {'name': driver.name, 'method': method_name,
+                       'elapsed': elapsed})
+
     def _call_on_drivers(self, method_name, context,
                          continue_on_failure=False):
         """Helper method for calling a method across all mechanism drivers.
@@ -169,13 +200,7 @@ class MechanismManager(stevedore.named.NamedExtensionManager):
         """
         error = False
         for driver in self.ordered_mech_drivers:
-            try:
-                getattr(driver.obj, method_name)(context)
-            except Exception:
-                LOG.exception(
-                    _("Mechanism driver '%(name)s' failed in %(method)s"),
-                    {'name': driver.name, 'method': method_name}
-                )
+            if not self._call_on_driver(driver, method_name, context):
                 error = True
                 if not continue_on_failure:
                     break
@@ -184,6 +209,31 @@ class MechanismManager(stevedore.named.NamedExtensionManager):
                 method=method_name
             )
 
+    def _call_postcommit_on_drivers(self, method_name, context,
+                                    continue_on_failure=False):
+        """Helper method for calling a postcommit method on all drivers.
+
+        With the parallel_postcommit option, the drivers are called
+        concurrently on a green pool, so that the time taken is the one
+        of the slowest driver rather than the sum of all of them. All the
+        drivers are then called even if one of them fails.
+
+        :raises: neutron.plugins.ml2.common.MechanismDriverError
+        if any mechanism driver call fails.
+        """
+        drivers = self.ordered_mech_drivers
+        if not cfg.CONF.ml2.parallel_postcommit or len(drivers) < 2:
+            self._call_on_drivers(method_name, context, continue_on_failure)
+            return
+        pool = eventlet.GreenPool(len(drivers))
+        threads = [pool.spawn(self._call_on_driver, driver, method_name,
+                              context)
+                   for driver in drivers]
+        if not all([thread.wait() for thread in threads]):
+            raise ml2_exc.MechanismDriverError(
+                method=method_name
+            )
+
     def create_network_precommit(self, context):
         """Notify all mechanism drivers of a network creation.
 
@@ -209,7 +259,7 @@ class MechanismManager(stevedore.named.NamedExtensionManager):
         any required cleanup. There is no guarantee that all mechanism
         drivers are called in this case.
         """
-        self._call_on_drivers("create_network_postcommit", context)
+        self._call_postcommit_on_drivers("create_network_postcommit", context)
 
     def update_network_precommit(self, context):
         """Notify all mechanism drivers of a network update.
@@ -237,7 +287,7 @@ class MechanismManager(stevedore.named.NamedExtensionManager):
         retrying the call or deleting the network. There is no
         guarantee that all mechanism drivers are called in this case.
         """
-        self._call_on_drivers("update_network_postcommit", context)
+        self._call_postcommit_on_drivers("update_network_postcommit", context)
 
     def delete_network_precommit(self, context):
         """Notify all mechanism drivers of a network deletion.
@@ -267,8 +317,8 @@ class MechanismManager(stevedore.named.NamedExtensionManager):
         and it doesn't make sense to undo the action by recreating the
         network.
         """
-        self._call_on_drivers("delete_network_postcommit", context,
-                              continue_on_failure=True)
+        self._call_postcommit_on_drivers("delete_network_postcommit", context,
+                                         continue_on_failure=True)
 
     def create_port_precommit(self, context):
         """Notify all mechanism drivers of a port creation.
@@ -295,7 +345,7 @@ class MechanismManager(stevedore.named.NamedExtensionManager):
         cleanup. There is no guarantee that all mechanism drivers are
         called in this case.
         """
-        self._call_on_drivers("create_port_postcommit", context)
+        self._call_postcommit_on_drivers("create_port_postcommit", context)
 
     def update_port_precommit(self, context):
         """Notify all mechanism drivers of a port update.
@@ -323,7 +373,7 @@ class MechanismManager(stevedore.named.NamedExtensionManager):
         retrying the call or deleting the port. There is no
         guarantee that all mechanism drivers are called in this case.
         """
-        self._call_on_drivers("update_port_postcommit", context)
+        self._call_postcommit_on_drivers("update_port_postcommit", context)
 
     def delete_port_precommit(self, context):
         """Notify all mechanism drivers of a port deletion.
@@ -353,5 +403,5 @@ class MechanismManager(stevedore.named.NamedExtensionManager):
         and it doesn't make sense to undo the action by recreating the
         port.
         """
-        self._call_on_drivers("delete_port_postcommit", context,
-                              continue_on_failure=True)
+        self._call_postcommit_on_drivers("delete_port_postcommit", context,
+                                         continue_on_failure=True)
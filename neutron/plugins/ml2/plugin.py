@@ -102,6 +102,7 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
         self.router_scheduler = importutils.import_object(
             cfg.CONF.router_scheduler_driver
         )
+        self.start_periodic_agent_rescheduling()
 
         LOG.info(_("Modular L2 Plugin initialization complete"))
 
@@ -13,6 +13,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from oslo.config import cfg
+
 from neutron.agent import securitygroups_rpc as sg_rpc
 from neutron.common import constants as q_const
 from neutron.common import rpc as q_rpc
@@ -22,8 +24,10 @@ from neutron.db import api as db_api
 from neutron.db import dhcp_rpc_base
 from neutron.db import l3_rpc_base
 from neutron.db import securitygroups_rpc_base as sg_db_rpc
+from neutron.extensions import portbindings
 from neutron.openstack.common import log
 from neutron.openstack.common.rpc import proxy
+from neutron.plugins.ml2 import config  # noqa
 from neutron.plugins.ml2 import db
 from neutron.plugins.ml2 import driver_api as api
 
@@ -194,13 +198,19 @@ class AgentNotifierApi(proxy.RpcProxy,
 
     def port_update(self, context, port, network_type, segmentation_id,
                     physical_network):
-        self.fanout_cast(context,
-                         self.make_msg('port_update',
-                                       port=port,
-                                       network_type=network_type,
-                                       segmentation_id=segmentation_id,
-                                       physical_network=physical_network),
-                         topic=self.topic_port_update)
+        msg = self.make_msg('port_update',
+                            port=port,
+                            network_type=network_type,
+                            segmentation_id=segmentation_id,
+                            physical_network=physical_network)
+        host = port.get(portbindings.HOST_ID)
+        if host and not cfg.CONF.ml2.rpc_port_update_fanout:
+            # Only the agent of the host the port is bound to cares
+            self.cast(context, msg,
+                      topic=topics.get_topic_name(self.topic, topics.PORT,
+                                                  topics.UPDATE, host))
+        else:
+            self.fanout_cast(context, msg, topic=self.topic_port_update)
 
     # TODO(rkukura): Add tunnel_update() here if not
     # implemented via a driver.
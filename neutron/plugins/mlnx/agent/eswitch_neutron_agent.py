@@ -41,10 +41,12 @@ LOG = logging.getLogger(__name__)
 
 
 class EswitchManager(object):
-    def __init__(self, interface_mappings, endpoint, timeout):
-        self.utils = utils.EswitchUtils(endpoint, timeout)
+    def __init__(self, interface_mappings, endpoint, timeout,
+                 batch_requests=False):
+        self.utils = utils.EswitchUtils(endpoint, timeout, batch_requests)
         self.interface_mappings = interface_mappings
         self.network_map = {}
+        self.attached_vnics = {}
         self.utils.define_fabric_mappings(interface_mappings)
 
     def get_port_id_by_mac(self, port_mac):
@@ -55,13 +57,22 @@ class EswitchManager(object):
         err_msg = _("Agent cache inconsistency - port id "
                     "is not stored for %s") % port_mac
         LOG.error(err_msg)
-        raise exceptions.MlnxException(err_msg)
+        raise exceptions.MlnxException(err_msg=err_msg)
 
     def get_vnics_mac(self):
-        return set(self.utils.get_attached_vnics().keys())
+        """Refresh the vNICs attached to the eSwitch and return their MACs.
+
+        The vNIC table is only read once per polling cycle, the other
+        lookups use the copy kept in attached_vnics.
+        """
+        self.attached_vnics = self.utils.get_attached_vnics()
+        return set(self.attached_vnics.keys())
 
     def vnic_port_exists(self, port_mac):
-        return port_mac in self.utils.get_attached_vnics()
+        return port_mac in self.attached_vnics
+
+    def batch(self):
+        return self.utils.batch()
 
     def remove_network(self, network_id):
         if network_id in self.network_map:
@@ -105,10 +116,11 @@ class EswitchManager(object):
                        'to eSwitch for vNIC mac_address %(mac)s'),
                      {'seg_id': seg_id,
                       'mac': port_mac})
-            self.utils.set_port_vlan_id(physical_network,
-                                        seg_id,
-                                        port_mac)
-            self.utils.port_up(physical_network, port_mac)
+            with self.utils.batch():
+                self.utils.set_port_vlan_id(physical_network,
+                                            seg_id,
+                                            port_mac)
+                self.utils.port_up(physical_network, port_mac)
         elif network_type == constants.TYPE_IB:
             LOG.debug(_('Network Type IB currently not supported'))
         else:
@@ -215,11 +227,13 @@ class MlnxEswitchNeutronAgent(object):
     def _setup_eswitches(self, interface_mapping):
         daemon = cfg.CONF.ESWITCH.daemon_endpoint
         timeout = cfg.CONF.ESWITCH.request_timeout
-        self.eswitch = EswitchManager(interface_mapping, daemon, timeout)
+        batch_requests = cfg.CONF.ESWITCH.batch_requests
+        self.eswitch = EswitchManager(interface_mapping, daemon, timeout,
+                                      batch_requests)
 
     def _report_state(self):
         try:
-            devices = len(self.eswitch.get_vnics_mac())
+            devices = len(self.eswitch.attached_vnics)
             self.agent_state['configurations']['devices'] = devices
             self.state_rpc.report_state(self.context,
                                         self.agent_state)
@@ -262,12 +276,14 @@ class MlnxEswitchNeutronAgent(object):
     def process_network_ports(self, port_info):
         resync_a = False
         resync_b = False
-        if 'added' in port_info:
-            LOG.debug(_("ports added!"))
-            resync_a = self.treat_devices_added(port_info['added'])
-        if 'removed' in port_info:
-            LOG.debug(_("ports removed!"))
-            resync_b = self.treat_devices_removed(port_info['removed'])
+        # The eSwitch commands of the cycle are sent in a single request
+        with self.eswitch.batch():
+            if 'added' in port_info:
+                LOG.debug(_("ports added!"))
+                resync_a = self.treat_devices_added(port_info['added'])
+            if 'removed' in port_info:
+                LOG.debug(_("ports removed!"))
+                resync_b = self.treat_devices_removed(port_info['removed'])
         # If one of the above opertaions fails => resync with plugin
         return (resync_a | resync_b)
 
@@ -15,6 +15,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import contextlib
+
 import zmq
 
 from neutron.openstack.common import jsonutils
@@ -25,10 +27,12 @@ LOG = logging.getLogger(__name__)
 
 
 class EswitchUtils(object):
-    def __init__(self, daemon_endpoint, timeout):
+    def __init__(self, daemon_endpoint, timeout, batch_requests=False):
         self.__conn = None
         self.daemon = daemon_endpoint
         self.timeout = timeout
+        self.batch_requests = batch_requests
+        self._batch = None
 
     @property
     def _conn(self):
@@ -55,10 +59,13 @@ class EswitchUtils(object):
             self._conn.close()
             self.poller.unregister(self._conn)
             self.__conn = None
-            raise exceptions.MlnxException(_("eSwitchD: Request timeout"))
+            raise exceptions.MlnxException(
+                err_msg=_("eSwitchD: Request timeout"))
 
     def parse_response_msg(self, recv_msg):
-        msg = jsonutils.loads(recv_msg)
+        return self._parse_response(jsonutils.loads(recv_msg))
+
+    def _parse_response(self, msg):
         if msg['status'] == 'OK':
             if 'response' in msg:
                 return msg.get('response')
@@ -69,7 +76,38 @@ class EswitchUtils(object):
         else:
             error_msg = _("Unknown operation status %s") % msg['status']
         LOG.error(error_msg)
-        raise exceptions.MlnxException(error_msg)
+        raise exceptions.MlnxException(err_msg=error_msg)
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Send the commands issued in the block in a single request.
+
+        The commands are only batched when batch_requests is set, and are
+        sent when the block exits, even on error.  Commands which return
+        a response are never batched.
+        """
+        if not self.batch_requests or self._batch is not None:
+            yield
+            return
+        self._batch = []
+        try:
+            yield
+        finally:
+            commands, self._batch = self._batch, None
+            if commands:
+                self._send_batch(commands)
+
+    def _send_batch(self, commands):
+        LOG.debug(_("Sending %d commands to eSwitchD"), len(commands))
+        msg = jsonutils.dumps({'action': 'batch', 'commands': commands})
+        for response in self.send_msg(msg):
+            self._parse_response(response)
+
+    def _send_command(self, command):
+        if self._batch is not None:
+            self._batch.append(command)
+        else:
+            self.send_msg(jsonutils.dumps(command))
 
     def get_attached_vnics(self):
         LOG.debug(_("get_attached_vnics"))
@@ -84,48 +122,44 @@ class EswitchUtils(object):
                   {'port_mac': port_mac,
                    'segmentation_id': segmentation_id,
                    'physical_network': physical_network})
-        msg = jsonutils.dumps({'action': 'set_vlan',
-                               'fabric': physical_network,
-                               'port_mac': port_mac,
-                               'vlan': segmentation_id})
-        self.send_msg(msg)
+        self._send_command({'action': 'set_vlan',
+                            'fabric': physical_network,
+                            'port_mac': port_mac,
+                            'vlan': segmentation_id})
 
     def define_fabric_mappings(self, interface_mapping):
-        for fabric, phy_interface in interface_mapping.iteritems():
-            LOG.debug(_("Define Fabric %(fabric)s on interface %(ifc)s"),
-                      {'fabric': fabric,
-                       'ifc': phy_interface})
-            msg = jsonutils.dumps({'action': 'define_fabric_mapping',
-                                   'fabric': fabric,
-                                   'interface': phy_interface})
-            self.send_msg(msg)
+        with self.batch():
+            for fabric, phy_interface in interface_mapping.iteritems():
+                LOG.debug(_("Define Fabric %(fabric)s on interface %(ifc)s"),
+                          {'fabric': fabric,
+                           'ifc': phy_interface})
+                self._send_command({'action': 'define_fabric_mapping',
+                                    'fabric': fabric,
+                                    'interface': phy_interface})
 
     def port_up(self, fabric, port_mac):
         LOG.debug(_("Port Up for %(port_mac)s on fabric %(fabric)s"),
                   {'port_mac': port_mac, 'fabric': fabric})
-        msg = jsonutils.dumps({'action': 'port_up',
-                               'fabric': fabric,
-                               'ref_by': 'mac_address',
-                               'mac': 'port_mac'})
-        self.send_msg(msg)
+        self._send_command({'action': 'port_up',
+                            'fabric': fabric,
+                            'ref_by': 'mac_address',
+                            'mac': port_mac})
 
     def port_down(self, fabric, port_mac):
         LOG.debug(_("Port Down for %(port_mac)s on fabric %(fabric)s"),
                   {'port_mac': port_mac, 'fabric': fabric})
-        msg = jsonutils.dumps({'action': 'port_down',
-                               'fabric': fabric,
-                               'ref_by': 'mac_address',
-                               'mac': port_mac})
-        self.send_msg(msg)
+        self._send_command({'action': 'port_down',
+                            'fabric': fabric,
+                            'ref_by': 'mac_address',
+                            'mac': port_mac})
 
     def port_release(self, fabric, port_mac):
         LOG.debug(_("Port Release for %(port_mac)s on fabric %(fabric)s"),
                   {'port_mac': port_mac, 'fabric': fabric})
-        msg = jsonutils.dumps({'action': 'port_release',
-                               'fabric': fabric,
-                               'ref_by': 'mac_address',
-                               'mac': port_mac})
-        self.send_msg(msg)
+        self._send_command({'action': 'port_release',
+                            'fabric': fabric,
+                            'ref_by': 'mac_address',
+                            'mac': port_mac})
 
     def get_eswitch_ports(self, fabric):
         # TODO(irena) - to implement for next phase
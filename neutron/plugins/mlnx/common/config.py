@@ -47,6 +47,10 @@ eswitch_opts = [
     cfg.IntOpt('request_timeout', default=3000,
                help=_("The number of milliseconds the agent will wait for "
                       "response on request to daemon.")),
+    cfg.BoolOpt('batch_requests', default=False,
+                help=_("Send the eSwitch commands of a polling cycle to the "
+                       "daemon in a single request. The daemon must support "
+                       "the batch action.")),
 ]
 
 agent_opts = [
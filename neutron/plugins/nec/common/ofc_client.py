@@ -25,9 +25,17 @@ from neutron.plugins.nec.common import exceptions as nexc
 
 LOG = logging.getLogger(__name__)
 
+# Methods which can be sent again when the OFC might have processed them
+IDEMPOTENT_METHODS = ('GET', 'PUT')
+
 
 class OFCClient(object):
-    """A HTTP/HTTPS client for OFC Drivers."""
+    """A HTTP/HTTPS client for OFC Drivers.
+
+    The connections to the OFC are kept open and reused by the following
+    requests, so that the requests made in sequence for a Neutron
+    operation do not each pay a TCP (and SSL) handshake.
+    """
 
     def __init__(self, host="127.0.0.1", port=8888, use_ssl=False,
                  key_file=None, cert_file=None):
@@ -44,7 +52,8 @@ class OFCClient(object):
         self.use_ssl = use_ssl
         self.key_file = key_file
         self.cert_file = cert_file
-        self.connection = None
+        # Idle connections, kept open between the requests
+        self.connections = []
 
     def get_connection_type(self):
         """Returns the proper connection type."""
@@ -53,6 +62,70 @@ class OFCClient(object):
         else:
             return httplib.HTTPConnection
 
+    def _new_connection(self):
+        connection_type = self.get_connection_type()
+        # Open connection, handling SSL certs
+        certs = {'key_file': self.key_file, 'cert_file': self.cert_file}
+        certs = dict((x, certs[x]) for x in certs if certs[x] is not None)
+        if self.use_ssl and len(certs):
+            return connection_type(self.host, self.port, **certs)
+        else:
+            return connection_type(self.host, self.port)
+
+    def _response(self, conn):
+        res = conn.getresponse()
+        data = res.read()
+        return res, data
+
+    def _request(self, conn, method, action, body, headers):
+        conn.request(method, action, body, headers)
+        return self._response(conn)
+
+    def _send(self, method, action, body, headers):
+        """Send a request on an idle connection or a new one.
+
+        An idle connection might have been closed by the OFC since its
+        last request, in which case the request is sent again once on a
+        new connection. When it failed after the request was sent, the OFC
+        may have processed it, and only GET and PUT requests are sent again.
+        """
+        if self.connections:
+            conn = self.connections.pop()
+            sent = False
+            try:
+                conn.request(method, action, body, headers)
+                sent = True
+                res, data = self._response(conn)
+            except (socket.error, IOError, httplib.HTTPException) as e:
+                conn.close()
+                if sent and method not in IDEMPOTENT_METHODS:
+                    raise
+                LOG.debug(_("Idle connection to OFC %(host)s:%(port)s "
+                            "failed (%(error)s), retrying on a new one"),
+                          {'host': self.host, 'port': self.port,
+                           'error': e})
+                conn = None
+        else:
+            conn = None
+        if conn is None:
+            conn = self._new_connection()
+            try:
+                res, data = self._request(conn, method, action, body,
+                                          headers)
+            except Exception:
+                conn.close()
+                raise
+        if res.will_close:
+            conn.close()
+        else:
+            self.connections.append(conn)
+        return res, data
+
+    def close(self):
+        """Close the idle connections."""
+        while self.connections:
+            self.connections.pop().close()
+
     def do_request(self, method, action, body=None):
         LOG.debug(_("Client request: %(host)s:%(port)s "
                     "%(method)s %(action)s [%(body)s]"),
@@ -61,18 +134,8 @@ class OFCClient(object):
         if type(body) is dict:
             body = json.dumps(body)
         try:
-            connection_type = self.get_connection_type()
             headers = {"Content-Type": "application/json"}
-            # Open connection and send request, handling SSL certs
-            certs = {'key_file': self.key_file, 'cert_file': self.cert_file}
-            certs = dict((x, certs[x]) for x in certs if certs[x] is not None)
-            if self.use_ssl and len(certs):
-                conn = connection_type(self.host, self.port, **certs)
-            else:
-                conn = connection_type(self.host, self.port)
-            conn.request(method, action, body, headers)
-            res = conn.getresponse()
-            data = res.read()
+            res, data = self._send(method, action, body, headers)
             LOG.debug(_("OFC returns [%(status)s:%(data)s]"),
                       {'status': res.status,
                        'data': data})
@@ -85,7 +148,7 @@ class OFCClient(object):
             else:
                 reason = _("An operation on OFC is failed.")
                 raise nexc.OFCException(reason=reason)
-        except (socket.error, IOError) as e:
+        except (socket.error, IOError, httplib.HTTPException) as e:
             reason = _("Failed to connect OFC : %s") % str(e)
             LOG.error(reason)
             raise nexc.OFCException(reason=reason)
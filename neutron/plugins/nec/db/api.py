@@ -179,6 +179,15 @@ def get_portinfo(session, id):
         return None
 
 
+def get_portinfos(session, ids):
+    """Return the portinfos of the given port ids, by port id."""
+    if not ids:
+        return {}
+    query = session.query(nmodels.PortInfo).filter(
+        nmodels.PortInfo.id.in_(ids))
+    return dict((portinfo.id, portinfo) for portinfo in query)
+
+
 def add_portinfo(session, id, datapath_id='', port_no=0,
                  vlan_id=OFP_VLAN_NONE, mac=''):
     try:
@@ -115,6 +115,7 @@ class NECPluginV2(nec_plugin_base.NECPluginV2Base,
         self.router_scheduler = importutils.import_object(
             config.CONF.router_scheduler_driver
         )
+        self.start_periodic_agent_rescheduling()
 
     def setup_rpc(self):
         self.topic = topics.PLUGIN
@@ -141,6 +142,22 @@ class NECPluginV2(nec_plugin_base.NECPluginV2Base,
         obj_updater = getattr(super(NECPluginV2, self), "update_%s" % resource)
         obj_updater(context, id, request)
 
+    def _get_port_status_if_ready(self, port, network, portinfo):
+        """Return ACTIVE if the port can be activated, DOWN otherwise."""
+        if not port['admin_state_up']:
+            LOG.debug(_("activate_port_if_ready(): skip, "
+                        "port.admin_state_up is False."))
+            return OperationalStatus.DOWN
+        elif not network['admin_state_up']:
+            LOG.debug(_("activate_port_if_ready(): skip, "
+                        "network.admin_state_up is False."))
+            return OperationalStatus.DOWN
+        elif not portinfo:
+            LOG.debug(_("activate_port_if_ready(): skip, "
+                        "no portinfo for this port."))
+            return OperationalStatus.DOWN
+        return OperationalStatus.ACTIVE
+
     def activate_port_if_ready(self, context, port, network=None):
         """Activate port by creating port on OFC if ready.
 
@@ -154,19 +171,8 @@ class NECPluginV2(nec_plugin_base.NECPluginV2Base,
             network = super(NECPluginV2, self).get_network(context,
                                                            port['network_id'])
 
-        port_status = OperationalStatus.ACTIVE
-        if not port['admin_state_up']:
-            LOG.debug(_("activate_port_if_ready(): skip, "
-                        "port.admin_state_up is False."))
-            port_status = OperationalStatus.DOWN
-        elif not network['admin_state_up']:
-            LOG.debug(_("activate_port_if_ready(): skip, "
-                        "network.admin_state_up is False."))
-            port_status = OperationalStatus.DOWN
-        elif not ndb.get_portinfo(context.session, port['id']):
-            LOG.debug(_("activate_port_if_ready(): skip, "
-                        "no portinfo for this port."))
-            port_status = OperationalStatus.DOWN
+        port_status = self._get_port_status_if_ready(
+            port, network, ndb.get_portinfo(context.session, port['id']))
 
         # activate packet_filters before creating port on OFC.
         if self.packet_filter_enabled:
@@ -197,6 +203,58 @@ class NECPluginV2(nec_plugin_base.NECPluginV2Base,
             self._update_resource_status(context, "port", port['id'],
                                          port_status)
 
+    def activate_ports_if_ready(self, context, ports):
+        """Activate several ports, creating them on OFC in bulk.
+
+        Same as activate_port_if_ready() for each port, but the ports and
+        their packet_filters which are ready are created with one call of
+        the OFC manager.  Used for the ports reported by an agent, all of
+        its ports when it resynchronizes.
+        """
+        networks = {}
+        for net_id in set(port['network_id'] for port in ports):
+            networks[net_id] = super(NECPluginV2, self).get_network(context,
+                                                                    net_id)
+        portinfos = ndb.get_portinfos(context.session,
+                                      [port['id'] for port in ports])
+        port_statuses = dict(
+            (port['id'], self._get_port_status_if_ready(
+                port, networks[port['network_id']],
+                portinfos.get(port['id'])))
+            for port in ports)
+        ready_ports = [port for port in ports if
+                       port_statuses[port['id']] is OperationalStatus.ACTIVE]
+
+        # activate packet_filters before creating ports on OFC.
+        if self.packet_filter_enabled and ready_ports:
+            filters = dict(in_port=[port['id'] for port in ready_ports],
+                           status=[OperationalStatus.DOWN],
+                           admin_state_up=[True])
+            pfs = (super(NECPluginV2, self).
+                   get_packet_filters(context, filters=filters))
+            self._activate_packet_filters_if_ready(
+                context, pfs, networks,
+                dict((port['id'], port) for port in ready_ports), portinfos)
+
+        new_ports = []
+        for port in ready_ports:
+            if self.ofc.exists_ofc_port(context, port['id']):
+                LOG.debug(_("activate_ports_if_ready(): skip, "
+                            "ofc_port %s already exists."), port['id'])
+            else:
+                new_ports.append(port)
+        if new_ports:
+            failures = self.ofc.create_ofc_ports(context, new_ports)
+            for port_id, exc in failures.iteritems():
+                reason = _("create_ofc_port() failed due to %s") % exc
+                LOG.error(reason)
+                port_statuses[port_id] = OperationalStatus.ERROR
+
+        for port in ports:
+            if port_statuses[port['id']] != port['status']:
+                self._update_resource_status(context, "port", port['id'],
+                                             port_statuses[port['id']])
+
     def deactivate_port(self, context, port):
         """Deactivate port by deleting port from OFC if exists.
 
@@ -458,6 +516,28 @@ class NECPluginV2(nec_plugin_base.NECPluginV2Base,
 
     # For PacketFilter Extension
 
+    def _get_packet_filter_status_if_ready(self, packet_filter, network,
+                                           in_port, portinfo):
+        """Return ACTIVE if the packet_filter can be activated."""
+        in_port_id = packet_filter.get("in_port")
+        if not packet_filter['admin_state_up']:
+            LOG.debug(_("_activate_packet_filter_if_ready(): skip, "
+                        "packet_filter.admin_state_up is False."))
+            return OperationalStatus.DOWN
+        elif not network['admin_state_up']:
+            LOG.debug(_("_activate_packet_filter_if_ready(): skip, "
+                        "network.admin_state_up is False."))
+            return OperationalStatus.DOWN
+        elif in_port_id and in_port_id is in_port.get('id'):
+            LOG.debug(_("_activate_packet_filter_if_ready(): skip, "
+                        "invalid in_port_id."))
+            return OperationalStatus.DOWN
+        elif in_port_id and not portinfo:
+            LOG.debug(_("_activate_packet_filter_if_ready(): skip, "
+                        "no portinfo for in_port."))
+            return OperationalStatus.DOWN
+        return OperationalStatus.ACTIVE
+
     def _activate_packet_filter_if_ready(self, context, packet_filter,
                                          network=None, in_port=None):
         """Activate packet_filter by creating filter on OFC if ready.
@@ -473,24 +553,12 @@ class NECPluginV2(nec_plugin_base.NECPluginV2Base,
         in_port_id = packet_filter.get("in_port")
         if in_port_id and not in_port:
             in_port = super(NECPluginV2, self).get_port(context, in_port_id)
+        portinfo = None
+        if in_port_id:
+            portinfo = ndb.get_portinfo(context.session, in_port_id)
 
-        pf_status = OperationalStatus.ACTIVE
-        if not packet_filter['admin_state_up']:
-            LOG.debug(_("_activate_packet_filter_if_ready(): skip, "
-                        "packet_filter.admin_state_up is False."))
-            pf_status = OperationalStatus.DOWN
-        elif not network['admin_state_up']:
-            LOG.debug(_("_activate_packet_filter_if_ready(): skip, "
-                        "network.admin_state_up is False."))
-            pf_status = OperationalStatus.DOWN
-        elif in_port_id and in_port_id is in_port.get('id'):
-            LOG.debug(_("_activate_packet_filter_if_ready(): skip, "
-                        "invalid in_port_id."))
-            pf_status = OperationalStatus.DOWN
-        elif in_port_id and not ndb.get_portinfo(context.session, in_port_id):
-            LOG.debug(_("_activate_packet_filter_if_ready(): skip, "
-                        "no portinfo for in_port."))
-            pf_status = OperationalStatus.DOWN
+        pf_status = self._get_packet_filter_status_if_ready(
+            packet_filter, network, in_port, portinfo)
 
         if pf_status in [OperationalStatus.ACTIVE]:
             if self.ofc.exists_ofc_packet_filter(context, packet_filter['id']):
@@ -512,6 +580,50 @@ class NECPluginV2(nec_plugin_base.NECPluginV2Base,
             self._update_resource_status(context, "packet_filter",
                                          packet_filter['id'], pf_status)
 
+    def _activate_packet_filters_if_ready(self, context, packet_filters,
+                                          networks, in_ports, portinfos):
+        """Activate the packet_filters of activated ports in bulk.
+
+        :param networks: networks by id, the missing networks of the
+                         packet_filters are fetched and added
+        :param in_ports: in_ports of the packet_filters, by id
+        :param portinfos: portinfos of the in_ports, by port id
+        """
+        pf_statuses = {}
+        new_pfs = []
+        for pf in packet_filters:
+            net_id = pf['network_id']
+            if net_id not in networks:
+                # The network of a packet_filter may not be the network
+                # of its in_port
+                networks[net_id] = super(NECPluginV2,
+                                         self).get_network(context, net_id)
+            in_port_id = pf.get('in_port')
+            pf_status = self._get_packet_filter_status_if_ready(
+                pf, networks[net_id],
+                in_ports.get(in_port_id), portinfos.get(in_port_id))
+            pf_statuses[pf['id']] = pf_status
+            if pf_status is not OperationalStatus.ACTIVE:
+                continue
+            if self.ofc.exists_ofc_packet_filter(context, pf['id']):
+                LOG.debug(_("_activate_packet_filters_if_ready(): skip, "
+                            "ofc_packet_filter %s already exists."),
+                          pf['id'])
+            else:
+                new_pfs.append(pf)
+        if new_pfs:
+            failures = self.ofc.create_ofc_packet_filters(context, new_pfs)
+            for pf_id, exc in failures.iteritems():
+                reason = _("create_ofc_packet_filter() failed due to "
+                           "%s") % exc
+                LOG.error(reason)
+                pf_statuses[pf_id] = OperationalStatus.ERROR
+
+        for pf in packet_filters:
+            if pf_statuses[pf['id']] != pf['status']:
+                self._update_resource_status(context, "packet_filter",
+                                             pf['id'], pf_statuses[pf['id']])
+
     def _deactivate_packet_filter(self, context, packet_filter):
         """Deactivate packet_filter by deleting filter from OFC if exixts."""
         pf_status = OperationalStatus.DOWN
@@ -654,6 +766,7 @@ class NECPluginV2RPCCallbacks(object):
                     "kwargs=%s ."), kwargs)
         datapath_id = kwargs['datapath_id']
         session = rpc_context.session
+        added_ports = []
         for p in kwargs.get('port_added', []):
             id = p['id']
             portinfo = ndb.get_portinfo(session, id)
@@ -662,10 +775,14 @@ class NECPluginV2RPCCallbacks(object):
             ndb.add_portinfo(session, id, datapath_id, p['port_no'],
                              mac=p.get('mac', ''))
             port = self._get_port(rpc_context, id)
+            if port and portinfo:
+                self.plugin.deactivate_port(rpc_context, port)
+                # The status of the port was changed
+                port = self._get_port(rpc_context, id)
             if port:
-                if portinfo:
-                    self.plugin.deactivate_port(rpc_context, port)
-                self.plugin.activate_port_if_ready(rpc_context, port)
+                added_ports.append(port)
+        if added_ports:
+            self.plugin.activate_ports_if_ready(rpc_context, added_ports)
         for id in kwargs.get('port_removed', []):
             portinfo = ndb.get_portinfo(session, id)
             if not portinfo:
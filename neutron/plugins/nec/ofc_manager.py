@@ -50,6 +50,13 @@ class OFCManager(object):
     def _del_ofc_item(self, context, resource, neutron_id):
         ndb.del_ofc_item_lookup_both(context.session, resource, neutron_id)
 
+    def _get_ofc_network_id(self, context, network_id, tenant_id, cache):
+        if network_id not in cache:
+            ofc_net_id = self._get_ofc_id(context, "ofc_network", network_id)
+            cache[network_id] = self.driver.convert_ofc_network_id(
+                context, ofc_net_id, tenant_id)
+        return cache[network_id]
+
     def create_ofc_tenant(self, context, tenant_id):
         desc = "ID=%s at OpenStack." % tenant_id
         ofc_tenant_id = self.driver.create_tenant(desc, tenant_id)
@@ -99,6 +106,36 @@ class OFCManager(object):
         ofc_port_id = self.driver.create_port(ofc_net_id, portinfo, port_id)
         self._add_ofc_item(context, "ofc_port", port_id, ofc_port_id)
 
+    def create_ofc_ports(self, context, ports):
+        """Create several ports on OFC, e.g. when an agent resynchronizes.
+
+        The OFC has no bulk API, so the ports are still created one by one,
+        but on the connection kept open by the OFC client, and the OFC ids
+        of the networks and the portinfos are looked up once for all the
+        ports.  Returns the exceptions of the ports which could not be
+        created, by port id.
+        """
+        portinfos = ndb.get_portinfos(context.session,
+                                      [port['id'] for port in ports])
+        ofc_net_ids = {}
+        failures = {}
+        for port in ports:
+            try:
+                ofc_net_id = self._get_ofc_network_id(
+                    context, port['network_id'], port['tenant_id'],
+                    ofc_net_ids)
+                portinfo = portinfos.get(port['id'])
+                if not portinfo:
+                    raise nexc.PortInfoNotFound(id=port['id'])
+                ofc_port_id = self.driver.create_port(ofc_net_id, portinfo,
+                                                      port['id'])
+                self._add_ofc_item(context, "ofc_port", port['id'],
+                                   ofc_port_id)
+            except (nexc.OFCException, nexc.OFCConsistencyBroken,
+                    nexc.PortInfoNotFound) as exc:
+                failures[port['id']] = exc
+        return failures
+
     def exists_ofc_port(self, context, port_id):
         return self._exists_ofc_item(context, "ofc_port", port_id)
 
@@ -125,6 +162,39 @@ class OFCManager(object):
                                               filter_dict, portinfo, filter_id)
         self._add_ofc_item(context, "ofc_packet_filter", filter_id, ofc_pf_id)
 
+    def create_ofc_packet_filters(self, context, filters):
+        """Create several packet_filters on OFC.
+
+        Like create_ofc_ports(), the packet_filters are created in sequence
+        on the same connection, with the lookups done once.  Returns the
+        exceptions of the packet_filters which could not be created, by
+        packet_filter id.
+        """
+        in_port_ids = [filter_dict['in_port'] for filter_dict in filters
+                       if filter_dict.get('in_port')]
+        portinfos = ndb.get_portinfos(context.session, in_port_ids)
+        ofc_net_ids = {}
+        failures = {}
+        for filter_dict in filters:
+            try:
+                ofc_net_id = self._get_ofc_network_id(
+                    context, filter_dict['network_id'],
+                    filter_dict['tenant_id'], ofc_net_ids)
+                in_port_id = filter_dict.get('in_port')
+                portinfo = None
+                if in_port_id:
+                    portinfo = portinfos.get(in_port_id)
+                    if not portinfo:
+                        raise nexc.PortInfoNotFound(id=in_port_id)
+                ofc_pf_id = self.driver.create_filter(
+                    ofc_net_id, filter_dict, portinfo, filter_dict['id'])
+                self._add_ofc_item(context, "ofc_packet_filter",
+                                   filter_dict['id'], ofc_pf_id)
+            except (nexc.OFCException, nexc.OFCConsistencyBroken,
+                    nexc.PortInfoNotFound) as exc:
+                failures[filter_dict['id']] = exc
+        return failures
+
     def exists_ofc_packet_filter(self, context, filter_id):
         return self._exists_ofc_item(context, "ofc_packet_filter", filter_id)
 
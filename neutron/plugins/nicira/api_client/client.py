@@ -47,6 +47,9 @@ class NvpApiClient(object):
     __metaclass__ = ABCMeta
 
     CONN_IDLE_TIMEOUT = 60 * 15
+    # Bounds in seconds of the time a failed API provider is avoided
+    PROVIDER_BACKOFF_MIN = 1
+    PROVIDER_BACKOFF_MAX = 60
 
     def _create_connection(self, host, port, is_ssl):
         if is_ssl:
@@ -105,7 +108,9 @@ class NvpApiClient(object):
     def acquire_connection(self, auto_login=True, headers=None, rid=-1):
         '''Check out an available HTTPConnection instance.
 
-        Blocks until a connection is available.
+        The connection is taken from the pool of the API provider with the
+        fewest outstanding requests, skipping the providers which failed
+        recently. Blocks until a connection is available.
         :auto_login: automatically logins before returning conn
         :headers: header to pass on to login attempt
         :param rid: request id passed in from request eventlet.
@@ -115,10 +120,15 @@ class NvpApiClient(object):
         if not self._api_providers:
             LOG.warn(_("[%d] no API providers currently available."), rid)
             return None
-        if self._conn_pool.empty():
+        provider = self._select_provider()
+        conn_pool = self._conn_pools[provider]
+        if conn_pool.empty():
             LOG.debug(_("[%d] Waiting to acquire API client connection."), rid)
-        priority, conn = self._conn_pool.get()
+        self._outstanding[provider] += 1
+        wait_start = time.time()
+        conn = conn_pool.get()
         now = time.time()
+        self.wait_times[provider] += now - wait_start
         if getattr(conn, 'last_used', now) < now - self.CONN_IDLE_TIMEOUT:
             LOG.info(_("[%(rid)d] Connection %(conn)s idle for %(sec)0.2f "
                        "seconds; reconnecting."),
@@ -127,17 +137,16 @@ class NvpApiClient(object):
             conn = self._create_connection(*self._conn_params(conn))
 
         conn.last_used = now
-        conn.priority = priority  # stash current priority for release
-        qsize = self._conn_pool.qsize()
         LOG.debug(_("[%(rid)d] Acquired connection %(conn)s. %(qsize)d "
                     "connection(s) available."),
-                  {'rid': rid, 'conn': _conn_str(conn), 'qsize': qsize})
+                  {'rid': rid, 'conn': _conn_str(conn),
+                   'qsize': conn_pool.qsize()})
         if auto_login and self.auth_cookie(conn) is None:
             self._wait_for_login(conn, headers)
         return conn
 
     def release_connection(self, http_conn, bad_state=False,
-                           service_unavail=False, rid=-1):
+                           service_unavail=False, rid=-1, redirected=False):
         '''Mark HTTPConnection instance as available for check-out.
 
         :param http_conn: An HTTPConnection instance obtained from this
@@ -146,9 +155,11 @@ class NvpApiClient(object):
                 (e.g. connection fault.)
         :service_unavail: True if http_conn returned 503 response.
         :param rid: request id passed in from request eventlet.
+        :param redirected: True if http_conn was redirected to another API
+                provider, which should then be used instead.
         '''
         conn_params = self._conn_params(http_conn)
-        if self._conn_params(http_conn) not in self._api_providers:
+        if conn_params not in self._api_providers:
             LOG.debug(_("[%(rid)d] Released connection %(conn)s is not an "
                         "API provider for the cluster"),
                       {'rid': rid, 'conn': _conn_str(http_conn)})
@@ -156,37 +167,52 @@ class NvpApiClient(object):
         elif hasattr(http_conn, "no_release"):
             return
 
+        self._outstanding[conn_params] -= 1
+        self.request_counts[conn_params] += 1
+        self.request_times[conn_params] += time.time() - http_conn.last_used
+        if bad_state or service_unavail or redirected:
+            self._back_off(conn_params)
+        else:
+            self._backoffs.pop(conn_params, None)
         if bad_state:
             # Reconnect to provider.
             LOG.warn(_("[%(rid)d] Connection returned in bad state, "
                        "reconnecting to %(conn)s"),
                      {'rid': rid, 'conn': _conn_str(http_conn)})
-            http_conn = self._create_connection(*self._conn_params(http_conn))
-            priority = self._next_conn_priority
-            self._next_conn_priority += 1
-        elif service_unavail:
-            # http_conn returned a service unaviable response, put other
-            # connections to the same controller at end of priority queue,
-            conns = []
-            while not self._conn_pool.empty():
-                priority, conn = self._conn_pool.get()
-                if self._conn_params(conn) == conn_params:
-                    priority = self._next_conn_priority
-                    self._next_conn_priority += 1
-                conns.append((priority, conn))
-            for priority, conn in conns:
-                self._conn_pool.put((priority, conn))
-            # put http_conn at end of queue also
-            priority = self._next_conn_priority
-            self._next_conn_priority += 1
-        else:
-            priority = http_conn.priority
+            http_conn = self._create_connection(*conn_params)
 
-        self._conn_pool.put((priority, http_conn))
+        conn_pool = self._conn_pools[conn_params]
+        conn_pool.put(http_conn)
         LOG.debug(_("[%(rid)d] Released connection %(conn)s. %(qsize)d "
                     "connection(s) available."),
                   {'rid': rid, 'conn': _conn_str(http_conn),
-                   'qsize': self._conn_pool.qsize()})
+                   'qsize': conn_pool.qsize()})
+
+    def _select_provider(self):
+        '''Return the API provider with the fewest outstanding requests.
+
+        The providers backing off after a failure are only used if all the
+        providers are, starting with the one whose backoff ends first.
+        '''
+        now = time.time()
+
+        def load(provider):
+            backoff_end = self._backoffs.get(provider, (0, 0))[0]
+            return (backoff_end > now, self._outstanding[provider],
+                    backoff_end)
+
+        return min(sorted(self._api_providers), key=load)
+
+    def _back_off(self, conn_params):
+        '''Avoid an API provider, for twice as long as last time.'''
+        delay = self._backoffs.get(conn_params, (0, 0))[1] * 2
+        delay = min(max(delay, self.PROVIDER_BACKOFF_MIN),
+                    self.PROVIDER_BACKOFF_MAX)
+        self._backoffs[conn_params] = (time.time() + delay, delay)
+        LOG.warn(_("Avoiding API provider %(host)s:%(port)s for %(sec)d "
+                   "seconds"),
+                 {'host': conn_params[0], 'port': conn_params[1],
+                  'sec': delay})
 
     def _wait_for_login(self, conn, headers=None):
         '''Block until a login has occurred for the current API provider.'''
@@ -261,22 +287,13 @@ class NvpApiClient(object):
     def update_providers(self, api_providers):
         new_providers = set([tuple(p) for p in api_providers])
         if new_providers != self._api_providers:
-            new_conns = []
-            while not self._conn_pool.empty():
-                priority, conn = self._conn_pool.get_nowait()
-                if self._conn_params(conn) in new_providers:
-                    new_conns.append((priority, conn))
-
-            to_subtract = self._api_providers - new_providers
-            for p in to_subtract:
+            # Connections in use to a removed provider are dropped when
+            # they are released
+            for p in self._api_providers - new_providers:
                 self._set_provider_data(p, None)
-            to_add = new_providers - self._api_providers
-            for unused_i in range(self._concurrent_connections):
-                for host, port, is_ssl in to_add:
-                    conn = self._create_connection(host, port, is_ssl)
-                    new_conns.append((self._next_conn_priority, conn))
-                    self._next_conn_priority += 1
-
-            for priority, conn in new_conns:
-                self._conn_pool.put((priority, conn))
+                del self._conn_pools[p]
+                self._outstanding.pop(p, None)
+                self._backoffs.pop(p, None)
+            for p in new_providers - self._api_providers:
+                self._add_provider(p)
             self._api_providers = new_providers
@@ -18,6 +18,7 @@
 # @author: Aaron Rosen, Nicira Networks, Inc.
 
 
+import collections
 import eventlet
 import logging
 import time
@@ -44,7 +45,8 @@ class NvpApiClientEventlet(client.NvpApiClient):
             is_ssl).
         :param user: login username.
         :param password: login password.
-        :param concurrent_connections: total number of concurrent connections.
+        :param concurrent_connections: number of concurrent connections to
+            each API provider.
         :param use_https: whether or not to use https for requests.
         :param connect_timeout: connection timeout in seconds.
         :param nvp_gen_timeout controls how long the generation id is kept
@@ -54,8 +56,6 @@ class NvpApiClientEventlet(client.NvpApiClient):
             api_providers = []
         self._api_providers = set([tuple(p) for p in api_providers])
         self._api_provider_data = {}  # tuple(semaphore, nvp_session_cookie)
-        for p in self._api_providers:
-            self._set_provider_data(p, (eventlet.semaphore.Semaphore(1), None))
         self._user = user
         self._password = password
         self._concurrent_connections = concurrent_connections
@@ -65,14 +65,27 @@ class NvpApiClientEventlet(client.NvpApiClient):
         self._nvp_config_gen_ts = None
         self._nvp_gen_timeout = nvp_gen_timeout
 
-        # Connection pool is a list of queues.
-        self._conn_pool = eventlet.queue.PriorityQueue()
-        self._next_conn_priority = 1
-        for host, port, is_ssl in api_providers:
-            for i in range(concurrent_connections):
-                conn = self._create_connection(host, port, is_ssl)
-                self._conn_pool.put((self._next_conn_priority, conn))
-                self._next_conn_priority += 1
+        # Idle connections to each API provider, the most recently used
+        # first so that the others may expire
+        self._conn_pools = {}
+        # Connections checked out or waited for, per API provider
+        self._outstanding = collections.defaultdict(int)
+        # tuple(end, delay) of the backoff of the failed API providers
+        self._backoffs = {}
+        # Seconds spent waiting for and using connections, per API provider
+        self.wait_times = collections.defaultdict(float)
+        self.request_times = collections.defaultdict(float)
+        self.request_counts = collections.defaultdict(int)
+        for p in self._api_providers:
+            self._add_provider(p)
+
+    def _add_provider(self, conn_params):
+        self._set_provider_data(conn_params,
+                                (eventlet.semaphore.Semaphore(1), None))
+        conn_pool = eventlet.queue.LifoQueue()
+        for i in range(self._concurrent_connections):
+            conn_pool.put(self._create_connection(*conn_params))
+        self._conn_pools[conn_params] = conn_pool
 
     def acquire_redirect_connection(self, conn_params, auto_login=True,
                                     headers=None):
@@ -85,56 +98,30 @@ class NvpApiClientEventlet(client.NvpApiClient):
             headers: headers to pass on if auto_login
 
         Returns: An available HTTPConnection instance corresponding to the
-                 specified conn_params. If a connection did not previously
-                 exist, new connections are created with the highest prioity
-                 in the connection pool and one of these new connections
-                 returned.
+                 specified conn_params. If the redirect target was not an API
+                 provider yet, it is added to the API providers. Having no
+                 outstanding request, it is then selected by the next
+                 requests.
         """
-        result_conn = None
-        data = self._get_provider_data(conn_params)
-        if data:
-            # redirect target already exists in provider data and connections
-            # to the provider have been added to the connection pool. Try to
-            # obtain a connection from the pool, note that it's possible that
-            # all connection to the provider are currently in use.
-            conns = []
-            while not self._conn_pool.empty():
-                priority, conn = self._conn_pool.get_nowait()
-                if not result_conn and self._conn_params(conn) == conn_params:
-                    conn.priority = priority
-                    result_conn = conn
-                else:
-                    conns.append((priority, conn))
-            for priority, conn in conns:
-                self._conn_pool.put((priority, conn))
+        # The connections report the default port of a redirect without one
+        conn_params = self._normalize_conn_params(conn_params)
+        if conn_params not in self._conn_pools:
+            self._api_providers.add(conn_params)
+            self._add_provider(conn_params)
+        conn_pool = self._conn_pools[conn_params]
+        if conn_pool.empty():
             # hack: if no free connections available, create new connection
             # and stash "no_release" attribute (so that we only exceed
             # self._concurrent_connections temporarily)
-            if not result_conn:
-                conn = self._create_connection(*conn_params)
-                conn.priority = 0  # redirect connections ahve highest priority
-                conn.no_release = True
-                result_conn = conn
+            conn = self._create_connection(*conn_params)
+            conn.no_release = True
         else:
-            #redirect target not already known, setup provider lists
-            self._api_providers.update([conn_params])
-            self._set_provider_data(conn_params,
-                                    (eventlet.semaphore.Semaphore(1), None))
-            # redirects occur during cluster upgrades, i.e. results to old
-            # redirects to new, so give redirect targets highest priority
-            priority = 0
-            for i in range(self._concurrent_connections):
-                conn = self._create_connection(*conn_params)
-                conn.priority = priority
-                if i == self._concurrent_connections - 1:
-                    break
-                self._conn_pool.put((priority, conn))
-            result_conn = conn
-        if result_conn:
-            result_conn.last_used = time.time()
-            if auto_login and self.auth_cookie(conn) is None:
-                self._wait_for_login(result_conn, headers)
-        return result_conn
+            conn = conn_pool.get_nowait()
+            self._outstanding[conn_params] += 1
+        conn.last_used = time.time()
+        if auto_login and self.auth_cookie(conn) is None:
+            self._wait_for_login(conn, headers)
+        return conn
 
     def _login(self, conn=None, headers=None):
         '''Issue login request and update authentication cookie.'''
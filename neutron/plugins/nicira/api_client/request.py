@@ -188,8 +188,7 @@ class NvpApiRequest(object):
             # our server did not process our request and may be in an
             # errored state. Raise an exception, which will cause the
             # the conn to be released with is_conn_error == True
-            # which puts the conn on the back of the client's priority
-            # queue.
+            # which makes the client back off from the API provider.
             if response.status >= 500:
                 LOG.warn(_("[%(rid)d] Request '%(method) %(url)s' "
                            "received: %(status)s"),
@@ -263,7 +262,7 @@ class NvpApiRequest(object):
         # case 2, redirect location includes a scheme
         # so setup a new connection and authenticate
         if allow_release_conn:
-            self._api_client.release_connection(conn)
+            self._api_client.release_connection(conn, redirected=True)
         conn_params = (result.hostname, result.port, result.scheme == "https")
         conn = self._api_client.acquire_redirect_connection(conn_params, True,
                                                             self._headers)
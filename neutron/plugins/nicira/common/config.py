@@ -44,6 +44,20 @@ nvp_opts = [
     cfg.StrOpt('default_transport_type', default='stt',
                help=_("The default network tranport type to use (stt, gre, "
                       "bridge, ipsec_gre, or ipsec_stt)")),
+    cfg.IntOpt('state_sync_interval', default=120,
+               help=_("Interval in seconds between two synchronizations of "
+                      "the operational status of the logical switches, "
+                      "ports and routers from NVP (0 disables the "
+                      "synchronization)")),
+    cfg.IntOpt('state_sync_chunk_size', default=500,
+               help=_("Number of logical switches, ports or routers "
+                      "fetched in a single request during the status "
+                      "synchronization")),
+    cfg.IntOpt('cache_ttl', default=60,
+               help=_("Number of seconds the cluster version, the logical "
+                      "switches of the networks and the logical port of "
+                      "each port looked up in NVP are cached (0 disables "
+                      "the cache)")),
 ]
 
 connection_opts = [
@@ -0,0 +1,197 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Nicira, Inc.
+# All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from neutron.common import constants
+from neutron import context as q_context
+from neutron.db import l3_db
+from neutron.db import models_v2
+from neutron.openstack.common import log as logging
+from neutron.openstack.common import loopingcall
+from neutron.plugins.nicira import nvplib
+
+
+LOG = logging.getLogger(__name__)
+
+LSWITCH_FIELDS = "uuid,tags,fabric_status"
+LPORT_FIELDS = "uuid,tags,fabric_status_up"
+LROUTER_FIELDS = "uuid,tags,fabric_status"
+
+# Ports which are not mapped to a logical port of a logical switch
+UNMAPPED_PORT_OWNERS = (l3_db.DEVICE_OWNER_FLOATINGIP,
+                        l3_db.DEVICE_OWNER_ROUTER_GW)
+
+
+def _get_tag(nvp_resource, scope):
+    for tag in nvp_resource.get('tags', []):
+        if tag['scope'] == scope:
+            return tag['tag']
+
+
+def _fabric_status(nvp_resource, relation, attribute):
+    status = nvp_resource.get('_relations', {}).get(relation, {})
+    return status.get(attribute)
+
+
+class NvpSynchronizer(object):
+    """Copy the operational status of the NVP resources in the database.
+
+    The logical switches, ports and routers are fetched from NVP in pages
+    of chunk_size resources every interval seconds, and the status of the
+    corresponding networks, ports and routers is stored in the database,
+    where the API requests read it.  The resources found in the database
+    but not in NVP are set in ERROR.
+    """
+
+    def __init__(self, cluster, interval, chunk_size):
+        self.cluster = cluster
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self._sync_loop = None
+
+    def start(self):
+        if self._sync_loop or self.interval <= 0:
+            return
+        self._sync_loop = loopingcall.FixedIntervalLoopingCall(
+            self.synchronize_state)
+        self._sync_loop.start(interval=self.interval,
+                              initial_delay=self.interval)
+
+    def stop(self):
+        if self._sync_loop:
+            self._sync_loop.stop()
+            self._sync_loop = None
+
+    def synchronize_state(self, context=None):
+        context = context or q_context.get_admin_context()
+        try:
+            self.synchronize_networks(context)
+            self.synchronize_ports(context)
+            self.synchronize_routers(context)
+        except Exception:
+            LOG.exception(_("Unable to synchronize the status of the "
+                            "resources with NVP"))
+
+    def _get_pages(self, resource, fields, relations):
+        path = nvplib._build_uri_path(resource, parent_resource_id='*',
+                                      fields=fields, relations=relations)
+        return nvplib.get_query_pages(path, self.cluster, self.chunk_size)
+
+    def _update_status(self, context, model, statuses):
+        """Update the status of the rows of model, by id."""
+        if not statuses:
+            return
+        with context.session.begin(subtransactions=True):
+            query = context.session.query(model).filter(
+                model.id.in_(statuses.keys()))
+            for row in query:
+                if row.status != statuses[row.id]:
+                    LOG.debug(_("Status of %(model)s %(id)s changed from "
+                                "%(old)s to %(new)s in NVP"),
+                              {'model': model.__name__, 'id': row.id,
+                               'old': row.status, 'new': statuses[row.id]})
+                    row.status = statuses[row.id]
+
+    def _synchronize(self, context, model, expected_ids, pages, get_statuses,
+                     error_status):
+        # Only the resources which were in the database before NVP is
+        # queried are set in ERROR, the others might not be there yet.
+        expected_ids = set(expected_ids)
+        for page in pages:
+            statuses = get_statuses(page)
+            self._update_status(context, model, statuses)
+            expected_ids.difference_update(statuses)
+        if expected_ids:
+            LOG.warning(_("%(count)d %(model)s not found in NVP"),
+                        {'count': len(expected_ids),
+                         'model': model.__name__})
+            self._update_status(
+                context, model,
+                dict((id, error_status) for id in expected_ids))
+
+    def synchronize_networks(self, context):
+        external_ids = context.session.query(
+            l3_db.ExternalNetwork.network_id).subquery()
+        network_ids = [id for (id,) in context.session.query(
+            models_v2.Network.id).filter(~models_v2.Network.id.in_(
+                external_ids))]
+
+        # A network is only ACTIVE if all its logical switches are, and
+        # they might not be in the same page.
+        down_ids = set()
+
+        def get_statuses(lswitches):
+            statuses = {}
+            for lswitch in lswitches:
+                network_id = (_get_tag(lswitch, 'quantum_net_id') or
+                              lswitch['uuid'])
+                if not _fabric_status(lswitch, 'LogicalSwitchStatus',
+                                      'fabric_status'):
+                    down_ids.add(network_id)
+                if network_id in down_ids:
+                    statuses[network_id] = constants.NET_STATUS_DOWN
+                else:
+                    statuses[network_id] = constants.NET_STATUS_ACTIVE
+            return statuses
+
+        pages = self._get_pages(nvplib.LSWITCH_RESOURCE, LSWITCH_FIELDS,
+                                'LogicalSwitchStatus')
+        self._synchronize(context, models_v2.Network, network_ids, pages,
+                          get_statuses, constants.NET_STATUS_ERROR)
+
+    def synchronize_ports(self, context):
+        external_ids = context.session.query(
+            l3_db.ExternalNetwork.network_id).subquery()
+        port_ids = [id for (id,) in context.session.query(
+            models_v2.Port.id).filter(
+                ~models_v2.Port.device_owner.in_(UNMAPPED_PORT_OWNERS),
+                ~models_v2.Port.network_id.in_(external_ids))]
+
+        def get_statuses(lports):
+            statuses = {}
+            for lport in lports:
+                port_id = _get_tag(lport, 'q_port_id')
+                if not port_id:
+                    continue
+                if _fabric_status(lport, 'LogicalPortStatus',
+                                  'fabric_status_up'):
+                    statuses[port_id] = constants.PORT_STATUS_ACTIVE
+                else:
+                    statuses[port_id] = constants.PORT_STATUS_DOWN
+            return statuses
+
+        pages = self._get_pages(nvplib.LSWITCHPORT_RESOURCE, LPORT_FIELDS,
+                                'LogicalPortStatus')
+        self._synchronize(context, models_v2.Port, port_ids, pages,
+                          get_statuses, constants.PORT_STATUS_ERROR)
+
+    def synchronize_routers(self, context):
+        router_ids = [id for (id,) in context.session.query(l3_db.Router.id)]
+
+        def get_statuses(lrouters):
+            statuses = {}
+            for lrouter in lrouters:
+                if _fabric_status(lrouter, 'LogicalRouterStatus',
+                                  'fabric_status'):
+                    statuses[lrouter['uuid']] = constants.NET_STATUS_ACTIVE
+                else:
+                    statuses[lrouter['uuid']] = constants.NET_STATUS_DOWN
+            return statuses
+
+        pages = self._get_pages(nvplib.LROUTER_RESOURCE, LROUTER_FIELDS,
+                                'LogicalRouterStatus')
+        self._synchronize(context, l3_db.Router, router_ids, pages,
+                          get_statuses, constants.NET_STATUS_ERROR)
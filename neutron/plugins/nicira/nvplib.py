@@ -23,6 +23,7 @@
 import hashlib
 import inspect
 import json
+import time
 
 from oslo.config import cfg
 
@@ -70,8 +71,59 @@ DNAT_KEYS = ["to_dst_port", "to_dst_ip_min", "to_dst_ip_max"]
 # TODO(bgh): it would be more efficient to use a bitmap
 taken_context_ids = []
 
-# XXX Only cache default for now
-_lqueue_cache = {}
+
+class NvpCache(object):
+    """Values looked up in NVP, kept for cache_ttl seconds.
+
+    The entries are dropped explicitly when the plugin changes the
+    corresponding NVP resources; the TTL bounds how long changes made
+    by other Neutron servers or directly in NVP go unnoticed.  A
+    cache_ttl of 0 disables the cache.  The expired entries which are
+    not looked up again are purged at most once per TTL.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._next_purge = 0
+
+    def get(self, key):
+        """Return the value stored for key, None if absent or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] < time.time():
+            del self._entries[key]
+            return None
+        return entry[0]
+
+    def set(self, key, value):
+        ttl = cfg.CONF.NVP.cache_ttl
+        if ttl <= 0:
+            return
+        now = time.time()
+        if now >= self._next_purge:
+            for k, entry in self._entries.items():
+                if entry[1] < now:
+                    del self._entries[k]
+            self._next_purge = now + ttl
+        self._entries[key] = (value, now + ttl)
+
+    def invalidate(self, key=None):
+        """Drop the entry for key, or all the entries if key is None."""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+
+# Version of the controllers of each cluster
+cluster_version_cache = NvpCache()
+# Logical switches implementing each network, main one first
+lswitches_cache = NvpCache()
+# NVP logical port uuid of each neutron port
+port_id_cache = NvpCache()
+# Network of each logical switch found in lswitches_cache
+lswitch_network_cache = NvpCache()
 
 
 def version_dependent(func):
@@ -138,6 +190,9 @@ def _check_and_truncate_name(display_name):
 
 def get_cluster_version(cluster):
     """Return major/minor version #."""
+    version = cluster_version_cache.get(cluster)
+    if version:
+        return version
     # Get control-cluster nodes
     uri = "/ws.v1/control-cluster/node?_page_length=1&fields=uuid"
     res = do_request(HTTP_GET, uri, cluster=cluster)
@@ -151,24 +206,36 @@ def get_cluster_version(cluster):
     version_parts = res["version"].split(".")
     version = "%s.%s" % tuple(version_parts[:2])
     LOG.info(_("NVP controller cluster version: %s"), version)
+    cluster_version_cache.set(cluster, version)
     return version
 
 
-def get_all_query_pages(path, c):
-    need_more_results = True
-    result_list = []
-    page_cursor = None
+def get_query_pages(path, c, page_length=None):
+    """Yield the results of a query page by page.
+
+    :param page_length: number of results per page, the NVP default if None
+    """
     query_marker = "&" if (path.find("?") != -1) else "?"
-    while need_more_results:
-        page_cursor_str = (
-            "_page_cursor=%s" % page_cursor if page_cursor else "")
+    page_cursor = None
+    while True:
+        params = []
+        if page_length:
+            params.append("_page_length=%d" % page_length)
+        if page_cursor:
+            params.append("_page_cursor=%s" % page_cursor)
         body = do_request(HTTP_GET,
-                          "%s%s%s" % (path, query_marker, page_cursor_str),
+                          "%s%s%s" % (path, query_marker, '&'.join(params)),
                           cluster=c)
+        yield body['results']
         page_cursor = body.get('page_cursor')
         if not page_cursor:
-            need_more_results = False
-        result_list.extend(body['results'])
+            break
+
+
+def get_all_query_pages(path, c):
+    result_list = []
+    for page in get_query_pages(path, c):
+        result_list.extend(page)
     return result_list
 
 
@@ -176,6 +243,13 @@ def get_all_query_pages(path, c):
 # Network functions
 # -------------------------------------------------------------------
 def get_lswitches(cluster, neutron_net_id):
+    """Return the logical switches of a network, main switch first.
+
+    The result is cached, and shared by the callers.
+    """
+    results = lswitches_cache.get(neutron_net_id)
+    if results is not None:
+        return results
     lswitch_uri_path = _build_uri_path(LSWITCH_RESOURCE, neutron_net_id,
                                        relations="LogicalSwitchStatus")
     results = []
@@ -195,6 +269,9 @@ def get_lswitches(cluster, neutron_net_id):
                 extra_switches = get_all_query_pages(extra_lswitch_uri_path,
                                                      cluster)
                 results.extend(extra_switches)
+        lswitches_cache.set(neutron_net_id, results)
+        for lswitch in results:
+            lswitch_network_cache.set(lswitch['uuid'], neutron_net_id)
         return results
     except exception.NotFound:
         raise exception.NetworkNotFound(net_id=neutron_net_id)
@@ -233,6 +310,8 @@ def create_lswitch(cluster, tenant_id, display_name,
     uri = _build_uri_path(LSWITCH_RESOURCE)
     lswitch = do_request(HTTP_POST, uri, json.dumps(lswitch_obj),
                          cluster=cluster)
+    if neutron_net_id:
+        lswitches_cache.invalidate(neutron_net_id)
     LOG.debug(_("Created logical switch: %s"), lswitch['uuid'])
     return lswitch
 
@@ -245,6 +324,8 @@ def update_lswitch(cluster, lswitch_id, display_name,
                             {"tag": NEUTRON_VERSION, "scope": "quantum"}]}
     if "tags" in kwargs:
         lswitch_obj["tags"].extend(kwargs["tags"])
+    lswitches_cache.invalidate(
+        lswitch_network_cache.get(lswitch_id) or lswitch_id)
     try:
         return do_request(HTTP_PUT, uri, json.dumps(lswitch_obj),
                           cluster=cluster)
@@ -406,7 +487,9 @@ def delete_network(cluster, net_id, lswitch_id):
 
 #TODO(salvatore-orlando): Simplify and harmonize
 def delete_networks(cluster, net_id, lswitch_ids):
+    lswitches_cache.invalidate(net_id)
     for ls_id in lswitch_ids:
+        lswitch_network_cache.invalidate(ls_id)
         path = "/ws.v1/lswitch/%s" % ls_id
         try:
             do_request(HTTP_DELETE, path, cluster=cluster)
@@ -434,6 +517,7 @@ def query_lrouter_lports(cluster, lr_uuid, fields="*",
 
 
 def delete_port(cluster, switch, port):
+    lswitches_cache.invalidate(lswitch_network_cache.get(switch) or switch)
     uri = "/ws.v1/lswitch/" + switch + "/lport/" + port
     try:
         do_request(HTTP_DELETE, uri, cluster=cluster)
@@ -568,9 +652,21 @@ def create_lport(cluster, lswitch_uuid, tenant_id, neutron_port_id,
 
     LOG.debug(_("Created logical port %(result)s on logical swtich %(uuid)s"),
               {'result': result['uuid'], 'uuid': lswitch_uuid})
+    _count_lswitch_lport(lswitch_uuid)
     return result
 
 
+def _count_lswitch_lport(lswitch_uuid):
+    """Count a new logical port in the cached logical switch, if any."""
+    lswitches = lswitches_cache.get(lswitch_network_cache.get(lswitch_uuid))
+    for lswitch in lswitches or []:
+        if lswitch['uuid'] == lswitch_uuid:
+            status = lswitch.get('_relations', {}).get('LogicalSwitchStatus')
+            if status and 'lport_count' in status:
+                status['lport_count'] += 1
+            return
+
+
 def create_router_lport(cluster, lrouter_uuid, tenant_id, neutron_port_id,
                         display_name, admin_status_enabled, ip_addresses):
     """Creates a logical port on the assigned logical router."""
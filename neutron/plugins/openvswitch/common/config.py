@@ -68,6 +68,12 @@ agent_opts = [
                        "(gre and/or vxlan)")),
     cfg.IntOpt('vxlan_udp_port', default=constants.VXLAN_UDP_PORT,
                help=_("The UDP port to use for VXLAN tunnels.")),
+    cfg.BoolOpt('rpc_port_update_fanout', default=True,
+                help=_("Fanout port_update to all the agents, as the agents "
+                       "which do not consume their per-host port_update "
+                       "topic expect. Disable once all the agents are "
+                       "upgraded, to notify only the host of a bound "
+                       "port.")),
 ]
 
 
@@ -23,6 +23,7 @@ from neutron.common import exceptions as q_exc
 import neutron.db.api as db
 from neutron.db import models_v2
 from neutron.db import securitygroups_db as sg_db
+from neutron.db import sqlalchemyutils
 from neutron.extensions import securitygroup as ext_sg
 from neutron import manager
 from neutron.openstack.common import log as logging
@@ -61,56 +62,21 @@ def sync_vlan_allocations(network_vlan_ranges):
 
     session = db.get_session()
     with session.begin():
-        # get existing allocations for all physical networks
-        allocations = dict()
-        allocs = (session.query(ovs_models_v2.VlanAllocation).
-                  all())
-        for alloc in allocs:
-            if alloc.physical_network not in allocations:
-                allocations[alloc.physical_network] = set()
-            allocations[alloc.physical_network].add(alloc)
-
         # process vlan ranges for each configured physical network
         for physical_network, vlan_ranges in network_vlan_ranges.iteritems():
-            # determine current configured allocatable vlans for this
-            # physical network
-            vlan_ids = set()
-            for vlan_range in vlan_ranges:
-                vlan_ids |= set(xrange(vlan_range[0], vlan_range[1] + 1))
-
-            # remove from table unallocated vlans not currently allocatable
-            if physical_network in allocations:
-                for alloc in allocations[physical_network]:
-                    try:
-                        # see if vlan is allocatable
-                        vlan_ids.remove(alloc.vlan_id)
-                    except KeyError:
-                        # it's not allocatable, so check if its allocated
-                        if not alloc.allocated:
-                            # it's not, so remove it from table
-                            LOG.debug(_("Removing vlan %(vlan_id)s on "
-                                        "physical network "
-                                        "%(physical_network)s from pool"),
-                                      {'vlan_id': alloc.vlan_id,
-                                       'physical_network': physical_network})
-                            session.delete(alloc)
-                del allocations[physical_network]
-
-            # add missing allocatable vlans to table
-            for vlan_id in sorted(vlan_ids):
-                alloc = ovs_models_v2.VlanAllocation(physical_network, vlan_id)
-                session.add(alloc)
+            sqlalchemyutils.sync_allocations(
+                session, ovs_models_v2.VlanAllocation, 'vlan_id',
+                vlan_ranges, physical_network=physical_network)
 
         # remove from table unallocated vlans for any unconfigured physical
         # networks
-        for allocs in allocations.itervalues():
-            for alloc in allocs:
-                if not alloc.allocated:
-                    LOG.debug(_("Removing vlan %(vlan_id)s on physical "
-                                "network %(physical_network)s from pool"),
-                              {'vlan_id': alloc.vlan_id,
-                               'physical_network': alloc.physical_network})
-                    session.delete(alloc)
+        query = (session.query(ovs_models_v2.VlanAllocation).
+                 filter_by(allocated=False))
+        if network_vlan_ranges:
+            query = query.filter(
+                ~ovs_models_v2.VlanAllocation.physical_network.in_(
+                    network_vlan_ranges.keys()))
+        query.delete(synchronize_session=False)
 
 
 def get_vlan_allocation(physical_network, vlan_id):
@@ -127,17 +93,13 @@ def get_vlan_allocation(physical_network, vlan_id):
 
 def reserve_vlan(session):
     with session.begin(subtransactions=True):
-        alloc = (session.query(ovs_models_v2.VlanAllocation).
-                 filter_by(allocated=False).
-                 with_lockmode('update').
-                 first())
+        alloc = sqlalchemyutils.allocate_free_row(
+            session, ovs_models_v2.VlanAllocation,
+            ('physical_network', 'vlan_id'))
         if alloc:
             LOG.debug(_("Reserving vlan %(vlan_id)s on physical network "
-                        "%(physical_network)s from pool"),
-                      {'vlan_id': alloc.vlan_id,
-                       'physical_network': alloc.physical_network})
-            alloc.allocated = True
-            return (alloc.physical_network, alloc.vlan_id)
+                        "%(physical_network)s from pool"), alloc)
+            return (alloc['physical_network'], alloc['vlan_id'])
     raise q_exc.NoNetworkAvailable()
 
 
@@ -206,8 +168,8 @@ def release_vlan(session, physical_network, vlan_id, network_vlan_ranges):
 def sync_tunnel_allocations(tunnel_id_ranges):
     """Synchronize tunnel_allocations table with configured tunnel ranges."""
 
-    # determine current configured allocatable tunnels
-    tunnel_ids = set()
+    # determine current configured allocatable tunnel ranges
+    ranges = []
     for tunnel_id_range in tunnel_id_ranges:
         tun_min, tun_max = tunnel_id_range
         if tun_max + 1 - tun_min > 1000000:
@@ -215,29 +177,12 @@ def sync_tunnel_allocations(tunnel_id_ranges):
                         "%(tun_min)s:%(tun_max)s"),
                       {'tun_min': tun_min, 'tun_max': tun_max})
         else:
-            tunnel_ids |= set(xrange(tun_min, tun_max + 1))
+            ranges.append((tun_min, tun_max))
 
     session = db.get_session()
     with session.begin():
-        # remove from table unallocated tunnels not currently allocatable
-        allocs = (session.query(ovs_models_v2.TunnelAllocation).
-                  all())
-        for alloc in allocs:
-            try:
-                # see if tunnel is allocatable
-                tunnel_ids.remove(alloc.tunnel_id)
-            except KeyError:
-                # it's not allocatable, so check if its allocated
-                if not alloc.allocated:
-                    # it's not, so remove it from table
-                    LOG.debug(_("Removing tunnel %s from pool"),
-                              alloc.tunnel_id)
-                    session.delete(alloc)
-
-        # add missing allocatable tunnels to table
-        for tunnel_id in sorted(tunnel_ids):
-            alloc = ovs_models_v2.TunnelAllocation(tunnel_id)
-            session.add(alloc)
+        sqlalchemyutils.sync_allocations(
+            session, ovs_models_v2.TunnelAllocation, 'tunnel_id', ranges)
 
 
 def get_tunnel_allocation(tunnel_id):
@@ -254,14 +199,11 @@ def get_tunnel_allocation(tunnel_id):
 
 def reserve_tunnel(session):
     with session.begin(subtransactions=True):
-        alloc = (session.query(ovs_models_v2.TunnelAllocation).
-                 filter_by(allocated=False).
-                 with_lockmode('update').
-                 first())
+        alloc = sqlalchemyutils.allocate_free_row(
+            session, ovs_models_v2.TunnelAllocation, ('tunnel_id',))
         if alloc:
-            LOG.debug(_("Reserving tunnel %s from pool"), alloc.tunnel_id)
-            alloc.allocated = True
-            return alloc.tunnel_id
+            LOG.debug(_("Reserving tunnel %s from pool"), alloc['tunnel_id'])
+            return alloc['tunnel_id']
     raise q_exc.NoNetworkAvailable()
 
 
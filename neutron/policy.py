@@ -20,6 +20,7 @@ Policy engine for neutron.  Largely copied from nova.
 """
 import itertools
 import re
+import time
 
 from oslo.config import cfg
 
@@ -35,6 +36,11 @@ from neutron.openstack.common import policy
 LOG = logging.getLogger(__name__)
 _POLICY_PATH = None
 _POLICY_CACHE = {}
+_POLICY_CHECKED_AT = 0
+# Admin rights resolved from the current rules, see _get_admin_cache
+_ADMIN_CACHE = {}
+# Bound on the number of distinct role sets whose admin rights are kept
+_ADMIN_CACHE_SIZE = 1024
 ADMIN_CTX_POLICY = 'context_is_admin'
 # Maps deprecated 'extension' policies to new-style policies
 DEPRECATED_POLICY_MAP = {
@@ -54,19 +60,32 @@ DEPRECATED_ACTION_MAP = {
 }
 
 cfg.CONF.import_opt('policy_file', 'neutron.common.config')
+cfg.CONF.import_opt('policy_reload_interval', 'neutron.common.config')
 
 
 def reset():
     global _POLICY_PATH
     global _POLICY_CACHE
+    global _POLICY_CHECKED_AT
+    global _ADMIN_CACHE
     _POLICY_PATH = None
     _POLICY_CACHE = {}
+    _POLICY_CHECKED_AT = 0
+    _ADMIN_CACHE = {}
     policy.reset()
 
 
 def init():
     global _POLICY_PATH
     global _POLICY_CACHE
+    global _POLICY_CHECKED_AT
+    now = time.time()
+    # init is called for every policy check and every new context: the
+    # policy file is only looked at again once policy_reload_interval
+    # has elapsed since the last time it was checked
+    if (_POLICY_CACHE and
+            now - _POLICY_CHECKED_AT < cfg.CONF.policy_reload_interval):
+        return
     if not _POLICY_PATH:
         _POLICY_PATH = utils.find_config_file({}, cfg.CONF.policy_file)
         if not _POLICY_PATH:
@@ -75,6 +94,7 @@ def init():
     # is reset only if the file has changed
     utils.read_cached_file(_POLICY_PATH, _POLICY_CACHE,
                            reload_func=_set_rules)
+    _POLICY_CHECKED_AT = now
 
 
 def get_resource_and_action(action):
@@ -344,9 +364,54 @@ def enforce(context, action, target, plugin=None):
                         exc=exceptions.PolicyNotAuthorized, action=action)
 
 
+def _is_role_only_rule(rule):
+    """Verify that the outcome of a rule only depends on the roles."""
+    if isinstance(rule, (policy.RoleCheck, policy.TrueCheck,
+                         policy.FalseCheck)):
+        return True
+    elif isinstance(rule, policy.RuleCheck):
+        return (rule.match in policy._rules and
+                _is_role_only_rule(policy._rules[rule.match]))
+    elif isinstance(rule, policy.NotCheck):
+        return _is_role_only_rule(rule.rule)
+    elif isinstance(rule, (policy.AndCheck, policy.OrCheck)):
+        return all(_is_role_only_rule(sub_rule) for sub_rule in rule.rules)
+    return False
+
+
+def _get_admin_cache():
+    """Return the admin rights resolved from the rules currently loaded.
+
+    The cache is discarded whenever the rules are replaced.
+    """
+    global _ADMIN_CACHE
+    if _ADMIN_CACHE.get('rules') is not policy._rules:
+        admin_rule = (policy._rules or {}).get(ADMIN_CTX_POLICY)
+        _ADMIN_CACHE = {'rules': policy._rules,
+                        'role_only': (admin_rule is not None and
+                                      _is_role_only_rule(admin_rule)),
+                        'is_admin': {}}
+    return _ADMIN_CACHE
+
+
 def check_is_admin(context):
     """Verify context has admin rights according to policy settings."""
     init()
+    cache = _get_admin_cache()
+    if not cache['role_only']:
+        return _check_is_admin(context)
+    # The admin rule only looks at roles, which are compared ignoring
+    # case: resolve it once per set of roles
+    roles = frozenset(role.lower() for role in context.roles)
+    is_admin = cache['is_admin']
+    if roles not in is_admin:
+        if len(is_admin) >= _ADMIN_CACHE_SIZE:
+            is_admin.clear()
+        is_admin[roles] = _check_is_admin(context)
+    return is_admin[roles]
+
+
+def _check_is_admin(context):
     # the target is user-self
     credentials = context.to_dict()
     target = credentials
@@ -380,10 +445,9 @@ def get_admin_roles():
     init()
     if not policy._rules or ADMIN_CTX_POLICY not in policy._rules:
         return ['admin']
-    try:
-        admin_ctx_rule = policy._rules[ADMIN_CTX_POLICY]
-    except (KeyError, TypeError):
-        return
-    roles = []
-    _extract_roles(admin_ctx_rule, roles)
-    return roles
+    cache = _get_admin_cache()
+    if 'roles' not in cache:
+        roles = []
+        _extract_roles(policy._rules[ADMIN_CTX_POLICY], roles)
+        cache['roles'] = roles
+    return list(cache['roles'])
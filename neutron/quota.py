@@ -48,6 +48,20 @@ quota_opts = [
     cfg.StrOpt('quota_driver',
                default='neutron.quota.ConfDriver',
                help=_('Default driver to use for quota checks')),
+    cfg.IntOpt('quota_cache_ttl',
+               default=60,
+               help=_('Seconds during which the quota limits of a tenant '
+                      'are cached by the DB quota drivers, 0 to disable')),
+    cfg.IntOpt('reservation_expiration',
+               default=120,
+               help=_('Number of seconds after which a quota reservation '
+                      'which has been neither committed nor cancelled is '
+                      'ignored')),
+    cfg.IntOpt('usage_resync_interval',
+               default=600,
+               help=_('Seconds between resynchronizations of the tracked '
+                      'quota usages with the actual resource counts, '
+                      '0 to disable')),
 ]
 # Register the configuration options
 cfg.CONF.register_opts(quota_opts, 'QUOTAS')
@@ -205,14 +219,23 @@ class QuotaEngine(object):
     def __init__(self, quota_driver_class=None):
         """Initialize a Quota object."""
 
-        if not quota_driver_class:
-            quota_driver_class = cfg.CONF.QUOTAS.quota_driver
+        self._resources = {}
+        self._driver = None
+        self._driver_class = quota_driver_class
 
-        if isinstance(quota_driver_class, basestring):
-            quota_driver_class = importutils.import_object(quota_driver_class)
+    def get_driver(self):
+        """Return the quota driver, loading it on first use.
 
-        self._resources = {}
-        self._driver = quota_driver_class
+        The driver is loaded lazily so that the configured one is used even
+        when this module is imported before the configuration is parsed.
+        """
+        if self._driver is None:
+            _driver_class = (self._driver_class or
+                             cfg.CONF.QUOTAS.quota_driver)
+            if isinstance(_driver_class, basestring):
+                _driver_class = importutils.import_object(_driver_class)
+            self._driver = _driver_class
+        return self._driver
 
     def __contains__(self, resource):
         return resource in self._resources
@@ -277,8 +300,67 @@ class QuotaEngine(object):
         :param context: The request context, for access checks.
         """
 
-        return self._driver.limit_check(context, tenant_id,
-                                        self._resources, values)
+        return self.get_driver().limit_check(context, tenant_id,
+                                             self._resources, values)
+
+    def make_reservation(self, context, tenant_id, plugin, resource, delta):
+        """Check the quota of a resource before creating delta more items.
+
+        Drivers tracking resource usages reserve delta items of the
+        resource and return the reservation id; the reservation must be
+        then committed, or cancelled if the creation fails. Other drivers
+        count the resource and check the quota limit, returning None.
+
+        This method will raise a QuotaResourceUnknown exception if the
+        resource is unknown, and an OverQuota exception if creating delta
+        more items would put the tenant over the quota.
+
+        :param context: The request context, for access checks.
+        :param tenant_id: The tenant_id to check the quota.
+        :param plugin: The plugin owning the resource, for counting it.
+        :param resource: The name of the resource, as a string.
+        :param delta: The number of items about to be created.
+        """
+        driver = self.get_driver()
+        if hasattr(driver, 'make_reservation'):
+            if resource not in self._resources:
+                raise exceptions.QuotaResourceUnknown(unknown=[resource])
+            return driver.make_reservation(context, tenant_id,
+                                           self._resources, resource,
+                                           delta, plugin)
+        count = self.count(context, resource, plugin, '%ss' % resource,
+                           tenant_id)
+        self.limit_check(context, tenant_id, **{resource: count + delta})
+
+    def commit_reservation(self, context, reservation_id):
+        """Commit a reservation once the resources have been created."""
+        if reservation_id:
+            self.get_driver().commit_reservation(context, reservation_id)
+
+    def cancel_reservation(self, context, reservation_id):
+        """Cancel a reservation as the resources could not be created."""
+        if reservation_id:
+            self.get_driver().cancel_reservation(context, reservation_id)
+
+    def start_cache_listener(self):
+        """Let the driver listen to the updates of the cached limits.
+
+        Called once at server start-up; a no-op unless the driver caches
+        the quota limits.
+        """
+        driver = self.get_driver()
+        if hasattr(driver, 'start_cache_listener'):
+            driver.start_cache_listener()
+
+    def track_usage(self, context, tenant_id, resource, delta):
+        """Record that delta items of a resource were created or deleted.
+
+        Meant to be called by plugins within the transaction creating or
+        deleting the items; it is a no-op unless the driver tracks usages.
+        """
+        driver = self.get_driver()
+        if hasattr(driver, 'track_usage'):
+            driver.track_usage(context, tenant_id, resource, delta)
 
     @property
     def resources(self):
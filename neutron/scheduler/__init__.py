@@ -33,4 +33,10 @@ AGENTS_SCHEDULER_OPTS = [
                 help=_('Allow auto scheduling routers to L3 agent.')),
     cfg.IntOpt('dhcp_agents_per_network', default=1,
                help=_('Number of DHCP agents scheduled to host a network.')),
+    cfg.IntOpt('max_routers_per_agent', default=0,
+               help=_('Maximum number of routers auto scheduled to a L3 '
+                      'agent. 0 means no limit.')),
+    cfg.IntOpt('max_networks_per_agent', default=0,
+               help=_('Maximum number of networks auto scheduled to a DHCP '
+                      'agent. 0 means no limit.')),
 ]
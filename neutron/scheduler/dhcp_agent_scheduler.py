@@ -18,6 +18,7 @@
 import random
 
 from oslo.config import cfg
+from sqlalchemy import func
 
 from neutron.common import constants
 from neutron.db import agents_db
@@ -28,6 +29,17 @@ from neutron.openstack.common import log as logging
 LOG = logging.getLogger(__name__)
 
 
+def _count_networks_by_agent(context, agent_ids):
+    """Return a dict mapping each DHCP agent id to its number of networks."""
+    binding = agentschedulers_db.NetworkDhcpAgentBinding
+    query = context.session.query(binding.dhcp_agent_id,
+                                  func.count(binding.network_id))
+    query = query.filter(binding.dhcp_agent_id.in_(agent_ids))
+    loads = dict.fromkeys(agent_ids, 0)
+    loads.update(query.group_by(binding.dhcp_agent_id))
+    return loads
+
+
 class ChanceScheduler(object):
     """Allocate a DHCP agent for a network in a random way.
     More sophisticated scheduler (similar to filter scheduler in nova?)
@@ -44,6 +56,10 @@ class ChanceScheduler(object):
                   {'network_id': network_id,
                    'agent_id': agent})
 
+    def _choose_network_agents(self, plugin, context, agents, n_agents):
+        """Choose n_agents agents from agents to host a new network."""
+        return random.sample(agents, n_agents)
+
     def schedule(self, plugin, context, network):
         """Schedule the network to active DHCP agent(s).
 
@@ -71,14 +87,15 @@ class ChanceScheduler(object):
             active_dhcp_agents = [
                 agent for agent in set(enabled_dhcp_agents)
                 if not agents_db.AgentDbMixin.is_agent_down(
-                    agent['heartbeat_timestamp'])
+                    agent['heartbeat_timestamp'], agent['id'])
                 and agent not in dhcp_agents
             ]
             if not active_dhcp_agents:
                 LOG.warn(_('No more DHCP agents'))
                 return
             n_agents = min(len(active_dhcp_agents), n_agents)
-            chosen_agents = random.sample(active_dhcp_agents, n_agents)
+            chosen_agents = self._choose_network_agents(
+                plugin, context, active_dhcp_agents, n_agents)
             for agent in chosen_agents:
                 self._schedule_bind_network(context, agent, network['id'])
         return chosen_agents
@@ -88,6 +105,7 @@ class ChanceScheduler(object):
         the specified host.
         """
         agents_per_network = cfg.CONF.dhcp_agents_per_network
+        max_networks = cfg.CONF.max_networks_per_agent
         with context.session.begin(subtransactions=True):
             query = context.session.query(agents_db.Agent)
             query = query.filter(agents_db.Agent.agent_type ==
@@ -97,7 +115,7 @@ class ChanceScheduler(object):
             dhcp_agents = query.all()
             for dhcp_agent in dhcp_agents:
                 if agents_db.AgentDbMixin.is_agent_down(
-                    dhcp_agent.heartbeat_timestamp):
+                    dhcp_agent.heartbeat_timestamp, dhcp_agent.id):
                     LOG.warn(_('DHCP agent %s is not active'), dhcp_agent.id)
                     continue
                 fields = ['network_id', 'enable_dhcp']
@@ -107,7 +125,17 @@ class ChanceScheduler(object):
                 if not net_ids:
                     LOG.debug(_('No non-hosted networks'))
                     return False
-                for net_id in net_ids:
+                free = None
+                if max_networks > 0:
+                    hosted = _count_networks_by_agent(context, [dhcp_agent.id])
+                    free = max_networks - hosted[dhcp_agent.id]
+                for net_id in sorted(net_ids):
+                    if free is not None and free <= 0:
+                        LOG.warn(_('DHCP agent %(agent_id)s already hosts '
+                                   '%(max)d networks'),
+                                 {'agent_id': dhcp_agent.id,
+                                  'max': max_networks})
+                        break
                     agents = plugin.get_dhcp_agents_hosting_networks(
                         context, [net_id], active=True)
                     if len(agents) >= agents_per_network:
@@ -118,4 +146,18 @@ class ChanceScheduler(object):
                     binding.dhcp_agent = dhcp_agent
                     binding.network_id = net_id
                     context.session.add(binding)
+                    if free is not None:
+                        free -= 1
         return True
+
+
+class LeastNetworksScheduler(ChanceScheduler):
+    """Allocate the least loaded DHCP agents for a new network."""
+
+    def _choose_network_agents(self, plugin, context, agents, n_agents):
+        loads = _count_networks_by_agent(
+            context, [agent['id'] for agent in agents])
+        # shuffle first so that equally loaded agents are picked at random
+        agents = random.sample(agents, len(agents))
+        agents.sort(key=lambda agent: loads[agent['id']])
+        return agents[:n_agents]
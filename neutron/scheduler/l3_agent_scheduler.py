@@ -17,6 +17,8 @@
 
 import random
 
+from oslo.config import cfg
+from sqlalchemy import func
 from sqlalchemy.orm import exc
 from sqlalchemy.sql import exists
 
@@ -30,12 +32,27 @@ from neutron.openstack.common import log as logging
 LOG = logging.getLogger(__name__)
 
 
+def _count_routers_by_agent(context, agent_ids):
+    """Return a dict mapping each L3 agent id to its number of routers."""
+    binding = agentschedulers_db.RouterL3AgentBinding
+    query = context.session.query(binding.l3_agent_id,
+                                  func.count(binding.router_id))
+    query = query.filter(binding.l3_agent_id.in_(agent_ids))
+    loads = dict.fromkeys(agent_ids, 0)
+    loads.update(query.group_by(binding.l3_agent_id))
+    return loads
+
+
 class ChanceScheduler(object):
     """Allocate a L3 agent for a router in a random way.
     More sophisticated scheduler (similar to filter scheduler in nova?)
     can be introduced later.
     """
 
+    def _choose_router_agent(self, plugin, context, candidates):
+        """Choose an agent from candidates to host a new router."""
+        return random.choice(candidates)
+
     def auto_schedule_routers(self, plugin, context, host, router_id):
         """Schedule non-hosted routers to L3 Agent running on host.
         If router_id is given, only this router is scheduled
@@ -57,7 +74,7 @@ class ChanceScheduler(object):
                           host)
                 return False
             if agents_db.AgentDbMixin.is_agent_down(
-                l3_agent.heartbeat_timestamp):
+                l3_agent.heartbeat_timestamp, l3_agent.id):
                 LOG.warn(_('L3 agent %s is not active'), l3_agent.id)
             # check if the specified router is hosted
             if router_id:
@@ -100,6 +117,17 @@ class ChanceScheduler(object):
                            ' on host %s'), host)
                 return False
 
+            max_routers = cfg.CONF.max_routers_per_agent
+            if max_routers > 0:
+                hosted = _count_routers_by_agent(context, [l3_agent.id])
+                free = max_routers - hosted[l3_agent.id]
+                if free <= 0:
+                    LOG.warn(_('L3 agent %(agent_id)s already hosts '
+                               '%(max)d routers'),
+                             {'agent_id': l3_agent.id, 'max': max_routers})
+                    return False
+                router_ids = sorted(router_ids)[:free]
+
             # binding
             for router_id in router_ids:
                 binding = agentschedulers_db.RouterL3AgentBinding()
@@ -138,7 +166,8 @@ class ChanceScheduler(object):
                          sync_router['id'])
                 return
 
-            chosen_agent = random.choice(candidates)
+            chosen_agent = self._choose_router_agent(plugin, context,
+                                                     candidates)
             binding = agentschedulers_db.RouterL3AgentBinding()
             binding.l3_agent = chosen_agent
             binding.router_id = sync_router['id']
@@ -148,3 +177,14 @@ class ChanceScheduler(object):
                       {'router_id': sync_router['id'],
                        'agent_id': chosen_agent['id']})
             return chosen_agent
+
+
+class LeastRoutersScheduler(ChanceScheduler):
+    """Allocate a L3 agent for a new router that is the least loaded."""
+
+    def _choose_router_agent(self, plugin, context, candidates):
+        loads = _count_routers_by_agent(
+            context, [candidate['id'] for candidate in candidates])
+        least = min(loads.itervalues())
+        return random.choice([candidate for candidate in candidates
+                              if loads[candidate['id']] == least])
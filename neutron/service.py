@@ -28,6 +28,7 @@ from neutron.openstack.common import importutils
 from neutron.openstack.common import log as logging
 from neutron.openstack.common import loopingcall
 from neutron.openstack.common.rpc import service
+from neutron import quota
 from neutron import wsgi
 
 
@@ -108,6 +109,9 @@ def _run_wsgi(app_name):
     if not app:
         LOG.error(_('No known API applications configured.'))
         return
+    # The API application loaded the plugin, listen to the quota updates of
+    # the other servers before serving requests
+    quota.QUOTAS.start_cache_listener()
     server = wsgi.Server("Neutron")
     server.start(app, cfg.CONF.bind_port, cfg.CONF.bind_host)
     # Dump all option values here after all options are parsed
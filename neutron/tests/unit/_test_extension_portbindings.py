@@ -178,6 +178,15 @@ class PortBindingsHostTestCaseMixin(object):
         for port in ports:
             self.assertEqual('testhosttemp', port[portbindings.HOST_ID])
 
+    def test_port_vif_host_kept_on_update(self):
+        host_arg = {portbindings.HOST_ID: self.hostname}
+        with self.port(name='name', arg_list=(portbindings.HOST_ID,),
+                       **host_arg) as port:
+            data = {'port': {'admin_state_up': False}}
+            req = self.new_update_request('ports', data, port['port']['id'])
+            res = self.deserialize(self.fmt, req.get_response(self.api))
+            self._check_response_portbindings_host(res['port'])
+
     def test_ports_vif_host_list(self):
         cfg.CONF.set_default('allow_overlapping_ips', True)
         host_arg = {portbindings.HOST_ID: self.hostname}
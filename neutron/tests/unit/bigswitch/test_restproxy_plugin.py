@@ -15,8 +15,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import httplib
 import os
+import socket
 
+import mock
 from mock import patch
 from oslo.config import cfg
 import webob.exc
@@ -24,6 +27,8 @@ import webob.exc
 import neutron.common.test_lib as test_lib
 from neutron.extensions import portbindings
 from neutron.manager import NeutronManager
+from neutron.plugins.bigswitch import plugin
+from neutron.tests import base
 from neutron.tests.unit import _test_extension_portbindings as test_bindings
 import neutron.tests.unit.test_db_plugin as test_plugin
 
@@ -214,7 +219,210 @@ class TestBigSwitchProxySubnetsV2(test_plugin.TestSubnetsV2,
 
 class TestBigSwitchProxySync(BigSwitchProxyPluginV2TestCase):
 
+    def setUp(self):
+        super(TestBigSwitchProxySync, self).setUp()
+        self.plugin_obj = NeutronManager.get_plugin()
+        put_patch = patch.object(self.plugin_obj.servers, 'put',
+                                 wraps=self.plugin_obj.servers.put)
+        self.put = put_patch.start()
+        self.addCleanup(put_patch.stop)
+
+    def _sent_topologies(self):
+        sent = dict((args[0], args[1])
+                    for args, kwargs in self.put.call_args_list
+                    if args[0].endswith('topology'))
+        self.put.reset_mock()
+        return sent
+
     def test_send_data(self):
-        plugin_obj = NeutronManager.get_plugin()
-        result = plugin_obj._send_all_data()
+        result = self.plugin_obj._send_all_data()
         self.assertEqual(result[0], 200)
+
+    def test_send_data_full(self):
+        with self.port() as port:
+            with self.network(tenant_id='tenant2'):
+                self.plugin_obj._send_all_data()
+        topology = self._sent_topologies()['/topology']
+        self.assertEqual(2, len(topology['networks']))
+        network = [net for net in topology['networks']
+                   if net['id'] == port['port']['network_id']][0]
+        self.assertEqual(1, len(network['subnets']))
+        self.assertEqual(network['subnets'][0]['gateway_ip'],
+                         network['gateway'])
+        self.assertEqual(port['port']['id'], network['ports'][0]['id'])
+        self.assertEqual({'id': port['port']['device_id'],
+                          'mac': port['port']['mac_address']},
+                         network['ports'][0]['attachment'])
+
+    def test_send_data_per_tenant(self):
+        cfg.CONF.set_override('sync_mode', 'tenant', 'RESTPROXY')
+        with self.port() as port:
+            with self.network(tenant_id='tenant2'):
+                result = self.plugin_obj._send_all_data()
+                self.assertEqual(result[0], 200)
+                sent = self._sent_topologies()
+                self.assertEqual(sorted(['/tenants/%s/topology' %
+                                         self._tenant_id,
+                                         '/tenants/tenant2/topology']),
+                                 sorted(sent))
+                topology = sent['/tenants/%s/topology' % self._tenant_id]
+                self.assertEqual(port['port']['network_id'],
+                                 topology['networks'][0]['id'])
+                self.assertEqual(port['port']['id'],
+                                 topology['networks'][0]['ports'][0]['id'])
+                # without incremental, everything is sent again
+                self.plugin_obj._send_all_data()
+                self.assertEqual(2, len(self._sent_topologies()))
+
+    def test_send_data_incremental(self):
+        cfg.CONF.set_override('sync_mode', 'incremental', 'RESTPROXY')
+        tenant1_path = '/tenants/%s/topology' % self._tenant_id
+        with self.network() as net:
+            with self.network(tenant_id='tenant2'):
+                self.plugin_obj._send_all_data()
+                self.assertEqual(2, len(self._sent_topologies()))
+                self.assertIsNone(self.plugin_obj._send_all_data())
+                self.assertEqual({}, self._sent_topologies())
+                with self.subnet(network=net):
+                    self.plugin_obj._send_all_data()
+                    self.assertEqual([tenant1_path],
+                                     self._sent_topologies().keys())
+            # a tenant without resources is sent an empty topology once
+            self.plugin_obj._send_all_data()
+            sent = self._sent_topologies()
+            self.assertEqual(['/tenants/tenant2/topology', tenant1_path],
+                             sorted(sent))
+            self.assertEqual({'networks': [], 'routers': []},
+                             sent['/tenants/tenant2/topology'])
+            self.plugin_obj._send_all_data()
+            self.assertEqual({}, self._sent_topologies())
+
+    def test_send_data_incremental_after_full(self):
+        with self.network():
+            self.plugin_obj._send_all_data()
+            self._sent_topologies()
+            cfg.CONF.set_override('sync_mode', 'incremental', 'RESTPROXY')
+            self.assertIsNone(self.plugin_obj._send_all_data())
+            self.assertEqual({}, self._sent_topologies())
+
+    def test_send_data_failure_keeps_hash(self):
+        cfg.CONF.set_override('sync_mode', 'incremental', 'RESTPROXY')
+        with self.network():
+            with patch.object(self.plugin_obj.servers, 'put',
+                              return_value=(500, 'Error', 'Error', '')):
+                self.assertRaises(plugin.RemoteRestError,
+                                  self.plugin_obj._send_all_data)
+            self.plugin_obj._send_all_data()
+            self.assertEqual(1, self.put.call_count)
+
+
+class TestBigSwitchServerPool(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestBigSwitchServerPool, self).setUp()
+        self.connections = []
+        self.calls = []
+        self.failing_ports = set()
+        self.statuses = {}
+        self.httpPatch = patch('httplib.HTTPConnection', create=True,
+                               side_effect=self._new_connection)
+        self.addCleanup(self.httpPatch.stop)
+        self.httpPatch.start()
+        self.pool = plugin.ServerPool([('localhost', 9000),
+                                       ('localhost', 8899)],
+                                      False, None, 'neutron', timeout=1,
+                                      retry_interval=30)
+
+    def _new_connection(self, server, port, timeout):
+        conn = mock.Mock()
+
+        def request(action, uri, body, headers):
+            self.calls.append(port)
+
+        def getresponse():
+            response = mock.Mock()
+            response.status = 500 if port in self.failing_ports else 200
+            response.status = self.statuses.get(port, response.status)
+            response.read.return_value = '{}'
+            return response
+
+        conn.request.side_effect = request
+        conn.getresponse.side_effect = getresponse
+        self.connections.append(conn)
+        return conn
+
+    def test_connection_reused(self):
+        for i in range(3):
+            self.assertEqual(200, self.pool.get('/networks')[0])
+        self.assertEqual(1, len(self.connections))
+        self.assertEqual(3, self.connections[0].request.call_count)
+        self.assertFalse(self.connections[0].close.called)
+
+    def test_reconnect_closed_idle_connection(self):
+        self.pool.get('/networks')
+        self.connections[0].request.side_effect = httplib.BadStatusLine('')
+        self.assertEqual(200, self.pool.get('/networks')[0])
+        self.assertEqual(2, len(self.connections))
+        self.assertTrue(self.connections[0].close.called)
+
+    def test_post_not_resent_after_idle_connection_response_error(self):
+        self.pool.post('/networks', {})
+        self.connections[0].getresponse.side_effect = (
+            httplib.BadStatusLine(''))
+        self.assertEqual(200, self.pool.post('/networks', {})[0])
+        # the request may have been processed, it is not sent again to the
+        # same server
+        self.assertEqual([9000, 9000, 8899], self.calls)
+
+    def test_post_resent_when_idle_connection_send_fails(self):
+        self.pool.post('/networks', {})
+        self.connections[0].request.side_effect = socket.error()
+        self.assertEqual(200, self.pool.post('/networks', {})[0])
+        self.assertEqual([9000, 9000], self.calls)
+        self.assertFalse(self.pool.servers[0].failed)
+
+    def test_new_connection_error_not_retried(self):
+        self.httpPatch.stop()
+        conn = mock.Mock()
+        conn.request.side_effect = socket.error()
+        with patch('httplib.HTTPConnection', create=True,
+                   return_value=conn):
+            self.assertEqual(0, self.pool.get('/networks')[0])
+        self.httpPatch.start()
+        self.assertEqual(2, conn.request.call_count)
+        self.assertEqual([], self.pool.servers[0].connections)
+
+    def test_failed_server_not_retried(self):
+        self.failing_ports.add(9000)
+        self.assertEqual(200, self.pool.get('/networks')[0])
+        self.assertEqual([9000, 8899], self.calls)
+        self.assertEqual(200, self.pool.get('/networks')[0])
+        self.assertEqual([9000, 8899, 8899], self.calls)
+        # the idle connection to the failed server was closed
+        self.assertTrue(self.connections[0].close.called)
+
+    def test_client_error_does_not_fail_server(self):
+        self.statuses[9000] = 404
+        self.assertEqual(200, self.pool.get('/networks')[0])
+        self.assertEqual([9000, 8899], self.calls)
+        self.assertFalse(self.pool.servers[0].failed)
+        self.assertFalse(self.connections[0].close.called)
+
+    def test_failed_server_retried_after_interval(self):
+        self.failing_ports.add(9000)
+        self.pool.get('/networks')
+        self.failing_ports.add(8899)
+        with patch('time.time', return_value=self.pool.servers[0].failed_at
+                   + 31):
+            self.assertEqual(0, self.pool.get('/networks')[0])
+        self.assertEqual([9000, 8899, 8899, 9000], self.calls)
+
+    def test_all_failed_servers_probe_one(self):
+        self.failing_ports.update([9000, 8899])
+        self.assertEqual(0, self.pool.get('/networks')[0])
+        self.assertEqual([9000, 8899], self.calls)
+        self.failing_ports.clear()
+        self.assertEqual(200, self.pool.get('/networks')[0])
+        self.assertEqual([9000, 8899, 9000], self.calls)
+        self.assertEqual(200, self.pool.get('/networks')[0])
+        self.assertEqual([9000, 8899, 9000, 9000], self.calls)
@@ -26,6 +26,8 @@ class ConfigurationTest(base.BaseTestCase):
                          cfg.CONF.AGENT.polling_interval)
         self.assertEqual(True,
                          cfg.CONF.AGENT.rpc_support_old_agents)
+        self.assertEqual(True,
+                         cfg.CONF.AGENT.rpc_port_update_fanout)
         self.assertEqual('sudo',
                          cfg.CONF.AGENT.root_helper)
         self.assertEqual('local',
@@ -23,6 +23,7 @@ import stubout
 
 from neutron.agent import rpc as agent_rpc
 from neutron.common import topics
+from neutron.extensions import portbindings
 from neutron.openstack.common import context
 from neutron.openstack.common import rpc
 from neutron.plugins.linuxbridge import lb_neutron_plugin as plb
@@ -73,7 +74,7 @@ class rpcApiTestCase(base.BaseTestCase):
         cfg.CONF.set_override('rpc_support_old_agents', False, 'AGENT')
         rpcapi = plb.AgentNotifierApi(topics.AGENT)
         expected_msg = rpcapi.make_msg('port_update',
-                                       port='fake_port',
+                                       port={'id': 'fake_port'},
                                        network_type='vlan',
                                        physical_network='fake_net',
                                        segmentation_id='fake_vlan_id')
@@ -83,7 +84,47 @@ class rpcApiTestCase(base.BaseTestCase):
                                                 topics.UPDATE),
                           'port_update', rpc_method='fanout_cast',
                           expected_msg=expected_msg,
-                          port='fake_port',
+                          port={'id': 'fake_port'},
+                          physical_network='fake_net',
+                          vlan_id='fake_vlan_id')
+
+    def test_port_update_bound_port(self):
+        cfg.CONF.set_override('rpc_support_old_agents', False, 'AGENT')
+        cfg.CONF.set_override('rpc_port_update_fanout', False, 'AGENT')
+        rpcapi = plb.AgentNotifierApi(topics.AGENT)
+        port = {'id': 'fake_port', portbindings.HOST_ID: 'fake_host'}
+        expected_msg = rpcapi.make_msg('port_update',
+                                       port=port,
+                                       network_type='vlan',
+                                       physical_network='fake_net',
+                                       segmentation_id='fake_vlan_id')
+        self._test_lb_api(rpcapi,
+                          topics.get_topic_name(topics.AGENT,
+                                                topics.PORT,
+                                                topics.UPDATE,
+                                                'fake_host'),
+                          'port_update', rpc_method='cast',
+                          expected_msg=expected_msg,
+                          port=port,
+                          physical_network='fake_net',
+                          vlan_id='fake_vlan_id')
+
+    def test_port_update_bound_port_fanout(self):
+        cfg.CONF.set_override('rpc_support_old_agents', False, 'AGENT')
+        rpcapi = plb.AgentNotifierApi(topics.AGENT)
+        port = {'id': 'fake_port', portbindings.HOST_ID: 'fake_host'}
+        expected_msg = rpcapi.make_msg('port_update',
+                                       port=port,
+                                       network_type='vlan',
+                                       physical_network='fake_net',
+                                       segmentation_id='fake_vlan_id')
+        self._test_lb_api(rpcapi,
+                          topics.get_topic_name(topics.AGENT,
+                                                topics.PORT,
+                                                topics.UPDATE),
+                          'port_update', rpc_method='fanout_cast',
+                          expected_msg=expected_msg,
+                          port=port,
                           physical_network='fake_net',
                           vlan_id='fake_vlan_id')
 
@@ -91,7 +132,7 @@ class rpcApiTestCase(base.BaseTestCase):
         cfg.CONF.set_override('rpc_support_old_agents', True, 'AGENT')
         rpcapi = plb.AgentNotifierApi(topics.AGENT)
         expected_msg = rpcapi.make_msg('port_update',
-                                       port='fake_port',
+                                       port={'id': 'fake_port'},
                                        network_type='vlan',
                                        physical_network='fake_net',
                                        segmentation_id='fake_vlan_id',
@@ -102,7 +143,7 @@ class rpcApiTestCase(base.BaseTestCase):
                                                 topics.UPDATE),
                           'port_update', rpc_method='fanout_cast',
                           expected_msg=expected_msg,
-                          port='fake_port',
+                          port={'id': 'fake_port'},
                           physical_network='fake_net',
                           vlan_id='fake_vlan_id')
 
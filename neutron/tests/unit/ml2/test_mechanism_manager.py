@@ -0,0 +1,99 @@
+# Copyright (c) 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import eventlet
+import mock
+
+from neutron.plugins.ml2.common import exceptions as ml2_exc
+from neutron.plugins.ml2 import config
+from neutron.plugins.ml2 import managers
+from neutron.tests import base
+
+
+class FakeDriver(object):
+
+    def __init__(self, name, calls, delay=0, fail=False):
+        self.name = name
+        self.obj = mock.Mock()
+
+        def call(context):
+            eventlet.sleep(delay)
+            calls.append(name)
+            if fail:
+                raise Exception()
+
+        self.obj.create_port_precommit.side_effect = call
+        self.obj.create_port_postcommit.side_effect = call
+        self.obj.delete_port_postcommit.side_effect = call
+
+
+class MechanismManagerTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(MechanismManagerTestCase, self).setUp()
+        config.cfg.CONF.set_override('mechanism_drivers',
+                                     ['logger', 'test'],
+                                     'ml2')
+        self.addCleanup(config.cfg.CONF.reset)
+        self.manager = managers.MechanismManager()
+        self.calls = []
+
+    def _set_drivers(self, *drivers):
+        self.manager.ordered_mech_drivers = [
+            FakeDriver(name, self.calls, delay, fail)
+            for name, delay, fail in drivers]
+
+    def test_postcommit_serial(self):
+        self._set_drivers(('slow', 0.01, False), ('fast', 0, False))
+        self.manager.create_port_postcommit(mock.Mock())
+        self.assertEqual(['slow', 'fast'], self.calls)
+
+    def test_postcommit_serial_failure(self):
+        self._set_drivers(('fail', 0, True), ('ok', 0, False))
+        self.assertRaises(ml2_exc.MechanismDriverError,
+                          self.manager.create_port_postcommit, mock.Mock())
+        self.assertEqual(['fail'], self.calls)
+
+    def test_postcommit_parallel(self):
+        config.cfg.CONF.set_override('parallel_postcommit', True, 'ml2')
+        self._set_drivers(('slow', 0.01, False), ('fast', 0, False))
+        self.manager.create_port_postcommit(mock.Mock())
+        self.assertEqual(['fast', 'slow'], self.calls)
+
+    def test_postcommit_parallel_failure(self):
+        config.cfg.CONF.set_override('parallel_postcommit', True, 'ml2')
+        self._set_drivers(('fail', 0, True), ('ok', 0.01, False))
+        self.assertRaises(ml2_exc.MechanismDriverError,
+                          self.manager.delete_port_postcommit, mock.Mock())
+        self.assertEqual(['fail', 'ok'], self.calls)
+
+    def test_precommit_serial_with_parallel_postcommit(self):
+        config.cfg.CONF.set_override('parallel_postcommit', True, 'ml2')
+        self._set_drivers(('slow', 0.01, False), ('fast', 0, False))
+        self.manager.create_port_precommit(mock.Mock())
+        self.assertEqual(['slow', 'fast'], self.calls)
+
+    def test_call_times_recorded(self):
+        self._set_drivers(('slow', 0.01, False), ('fail', 0, True))
+        for i in range(2):
+            self.assertRaises(ml2_exc.MechanismDriverError,
+                              self.manager.delete_port_postcommit,
+                              mock.Mock())
+        for name in ('slow', 'fail'):
+            self.assertEqual(
+                2, self.manager.call_counts[(name, 'delete_port_postcommit')])
+        self.assertTrue(
+            self.manager.call_times[('slow', 'delete_port_postcommit')] >=
+            0.02)
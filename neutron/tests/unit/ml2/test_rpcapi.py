@@ -18,9 +18,11 @@ Unit Tests for ml2 rpc
 """
 
 import mock
+from oslo.config import cfg
 
 from neutron.agent import rpc as agent_rpc
 from neutron.common import topics
+from neutron.extensions import portbindings
 from neutron.openstack.common import context
 from neutron.openstack.common import rpc
 from neutron.plugins.ml2 import rpc as plugin_rpc
@@ -66,7 +68,35 @@ class RpcApiTestCase(base.BaseTestCase):
                                                  topics.PORT,
                                                  topics.UPDATE),
                            'port_update', rpc_method='fanout_cast',
-                           port='fake_port',
+                           port={'id': 'fake_port'},
+                           network_type='fake_network_type',
+                           segmentation_id='fake_segmentation_id',
+                           physical_network='fake_physical_network')
+
+    def test_port_update_bound_port(self):
+        cfg.CONF.set_override('rpc_port_update_fanout', False, 'ml2')
+        rpcapi = plugin_rpc.AgentNotifierApi(topics.AGENT)
+        self._test_rpc_api(rpcapi,
+                           topics.get_topic_name(topics.AGENT,
+                                                 topics.PORT,
+                                                 topics.UPDATE,
+                                                 'fake_host'),
+                           'port_update', rpc_method='cast',
+                           port={'id': 'fake_port',
+                                 portbindings.HOST_ID: 'fake_host'},
+                           network_type='fake_network_type',
+                           segmentation_id='fake_segmentation_id',
+                           physical_network='fake_physical_network')
+
+    def test_port_update_bound_port_fanout(self):
+        rpcapi = plugin_rpc.AgentNotifierApi(topics.AGENT)
+        self._test_rpc_api(rpcapi,
+                           topics.get_topic_name(topics.AGENT,
+                                                 topics.PORT,
+                                                 topics.UPDATE),
+                           'port_update', rpc_method='fanout_cast',
+                           port={'id': 'fake_port',
+                                 portbindings.HOST_ID: 'fake_host'},
                            network_type='fake_network_type',
                            segmentation_id='fake_segmentation_id',
                            physical_network='fake_physical_network')
@@ -0,0 +1,127 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+# Copyright 2013 OpenStack Foundation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Stand-in for the Mellanox eSwitch daemon.
+
+The requests of the eSwitch agent are answered from an in-memory vNIC
+table, in process with handle_request or over ZeroMQ with serve.  Run
+as a script, it serves a table of generated vNICs, for instance to
+measure the throughput of an agent with hundreds of vNICs:
+
+    python -m neutron.tests.unit.mlnx.fake_eswitchd tcp://0.0.0.0:5001 500
+"""
+
+import sys
+
+import zmq
+
+from neutron.openstack.common import jsonutils
+
+
+def generate_vnics(count):
+    return ['fa:16:3e:%02x:%02x:%02x' % (i >> 16 & 0xff, i >> 8 & 0xff,
+                                         i & 0xff)
+            for i in range(count)]
+
+
+class FakeEswitchd(object):
+
+    def __init__(self, macs=()):
+        self.fabrics = {}
+        self.vnics = {}
+        for mac in macs:
+            self.add_vnic(mac)
+        # The actions of the requests received, a batch is one request
+        self.requests = []
+        self._actions = {'get_vnics': self.get_vnics,
+                         'define_fabric_mapping': self.define_fabric_mapping,
+                         'set_vlan': self.set_vlan,
+                         'port_up': self.port_up,
+                         'port_down': self.port_down,
+                         'port_release': self.port_release,
+                         'batch': self.batch}
+
+    def add_vnic(self, mac):
+        self.vnics[mac] = {'mac': mac, 'vlan': None, 'state': 'down',
+                           'attached': True}
+
+    def detach_vnic(self, mac):
+        self.vnics[mac]['attached'] = False
+
+    def _get_vnic(self, mac):
+        if mac not in self.vnics:
+            raise ValueError("vNIC %s not found" % mac)
+        return self.vnics[mac]
+
+    def get_vnics(self, msg):
+        return dict((mac, {'mac': mac}) for mac, vnic in self.vnics.items()
+                    if vnic['attached'])
+
+    def define_fabric_mapping(self, msg):
+        self.fabrics[msg['fabric']] = msg['interface']
+
+    def set_vlan(self, msg):
+        self._get_vnic(msg['port_mac'])['vlan'] = msg['vlan']
+
+    def port_up(self, msg):
+        self._get_vnic(msg['mac'])['state'] = 'up'
+
+    def port_down(self, msg):
+        self._get_vnic(msg['mac'])['state'] = 'down'
+
+    def port_release(self, msg):
+        vnic = self._get_vnic(msg['mac'])
+        vnic['vlan'] = None
+        vnic['state'] = 'down'
+
+    def batch(self, msg):
+        # Every command is run, even after a failed one
+        return [self._run(command) for command in msg['commands']]
+
+    def _run(self, msg):
+        action = msg.get('action')
+        if action not in self._actions:
+            return {'status': 'FAIL', 'action': action,
+                    'reason': 'unknown action'}
+        try:
+            response = self._actions[action](msg)
+        except ValueError as e:
+            return {'status': 'FAIL', 'action': action, 'reason': str(e)}
+        if response is None:
+            return {'status': 'OK'}
+        return {'status': 'OK', 'response': response}
+
+    def handle_request(self, msg):
+        msg = jsonutils.loads(msg)
+        self.requests.append(msg.get('action'))
+        return jsonutils.dumps(self._run(msg))
+
+    def serve(self, endpoint):
+        socket = zmq.Context().socket(zmq.REP)
+        socket.bind(endpoint)
+        while True:
+            socket.send(self.handle_request(socket.recv()))
+
+
+def main():
+    endpoint = sys.argv[1] if len(sys.argv) > 1 else 'tcp://127.0.0.1:5001'
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    FakeEswitchd(generate_vnics(count)).serve(endpoint)
+
+
+if __name__ == '__main__':
+    main()
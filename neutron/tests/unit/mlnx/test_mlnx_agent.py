@@ -0,0 +1,135 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+# Copyright 2013 OpenStack Foundation.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+
+import mock
+from oslo.config import cfg
+
+# pyzmq is not a test requirement, mock it for the agent and fake_eswitchd
+# which import it.
+try:
+    import zmq  # noqa
+except ImportError:
+    sys.modules['zmq'] = mock.Mock()
+
+from neutron.plugins.mlnx.agent import eswitch_neutron_agent
+from neutron.plugins.mlnx.agent import utils
+from neutron.plugins.mlnx.common import constants
+from neutron.plugins.mlnx.common import exceptions
+from neutron.tests import base
+from neutron.tests.unit.mlnx import fake_eswitchd
+
+VNICS = 300
+
+
+class TestEswitchAgent(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestEswitchAgent, self).setUp()
+        self.addCleanup(cfg.CONF.reset)
+        cfg.CONF.set_override('report_interval', 0, 'AGENT')
+        self.macs = fake_eswitchd.generate_vnics(VNICS)
+        self.eswitchd = fake_eswitchd.FakeEswitchd(self.macs)
+        parser = utils.EswitchUtils(None, None)
+        send_patcher = mock.patch.object(
+            utils.EswitchUtils, 'send_msg',
+            side_effect=lambda msg: parser.parse_response_msg(
+                self.eswitchd.handle_request(msg)))
+        send_patcher.start()
+        self.addCleanup(send_patcher.stop)
+        rpc_patcher = mock.patch.object(
+            eswitch_neutron_agent.MlnxEswitchNeutronAgent, '_setup_rpc')
+        rpc_patcher.start()
+        self.addCleanup(rpc_patcher.stop)
+
+    def _create_agent(self, batch_requests):
+        cfg.CONF.set_override('batch_requests', batch_requests, 'ESWITCH')
+        agent = eswitch_neutron_agent.MlnxEswitchNeutronAgent(
+            {'physnet1': 'eth2'})
+        agent.context = mock.Mock()
+        agent.agent_id = 'mlnx-agent'
+        agent.plugin_rpc = mock.Mock()
+        agent.plugin_rpc.get_device_details.side_effect = (
+            lambda context, device, agent_id: {
+                'port_id': 'port-' + device, 'port_mac': device,
+                'network_id': 'net-id', 'network_type': constants.TYPE_VLAN,
+                'physical_network': 'physnet1', 'vlan_id': 10,
+                'admin_state_up': True})
+        self.eswitchd.requests = []
+        return agent
+
+    def _poll(self, agent, ports=None):
+        port_info = agent.update_ports(ports or set())
+        return agent.process_network_ports(port_info), port_info['current']
+
+    def _assert_vnics_up(self):
+        for vnic in self.eswitchd.vnics.values():
+            self.assertEqual(10, vnic['vlan'])
+            self.assertEqual('up', vnic['state'])
+
+    def test_fabric_mappings(self):
+        self._create_agent(True)
+        self.assertEqual({'physnet1': 'eth2'}, self.eswitchd.fabrics)
+
+    def test_poll_cycle_batched(self):
+        agent = self._create_agent(True)
+        self.assertFalse(self._poll(agent)[0])
+        self.assertEqual(['get_vnics', 'batch'], self.eswitchd.requests)
+        self._assert_vnics_up()
+
+    def test_poll_cycle_not_batched(self):
+        agent = self._create_agent(False)
+        self.assertFalse(self._poll(agent)[0])
+        self.assertEqual(1 + 2 * VNICS, len(self.eswitchd.requests))
+        self.assertEqual(1, self.eswitchd.requests.count('get_vnics'))
+        self._assert_vnics_up()
+
+    def test_poll_cycle_removed_vnics_batched(self):
+        agent = self._create_agent(True)
+        ports = self._poll(agent)[1]
+        agent.plugin_rpc.update_device_down.return_value = {'exists': True}
+        for mac in self.macs[:10]:
+            self.eswitchd.detach_vnic(mac)
+        self.eswitchd.requests = []
+        self.assertFalse(self._poll(agent, ports)[0])
+        self.assertEqual(['get_vnics', 'batch'], self.eswitchd.requests)
+        for mac in self.macs[:10]:
+            self.assertIsNone(self.eswitchd.vnics[mac]['vlan'])
+
+    def test_batch_failure(self):
+        agent = self._create_agent(True)
+        port_info = agent.update_ports(set())
+        del self.eswitchd.vnics[self.macs[0]]
+        self.assertRaises(exceptions.MlnxException,
+                          agent.process_network_ports, port_info)
+        # The commands of the other vNICs were still sent
+        self._assert_vnics_up()
+
+    def test_port_update_uses_cached_vnics(self):
+        agent = self._create_agent(True)
+        self._poll(agent)
+        self.eswitchd.requests = []
+        callbacks = eswitch_neutron_agent.MlnxEswitchRpcCallbacks(
+            agent.context, agent.eswitch)
+        port = {'id': 'port-id', 'network_id': 'net-id',
+                'mac_address': self.macs[0], 'admin_state_up': False}
+        callbacks.port_update(agent.context, port=port, vlan_id=10,
+                              physical_network='physnet1',
+                              network_type=constants.TYPE_VLAN)
+        self.assertEqual(['port_down'], self.eswitchd.requests)
+        self.assertEqual('down', self.eswitchd.vnics[self.macs[0]]['state'])
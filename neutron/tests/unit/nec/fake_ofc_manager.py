@@ -13,6 +13,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import functools
+
 import mock
 
 
@@ -30,9 +32,14 @@ def patch_ofc_manager():
     m.delete_ofc_network.side_effect = f.delete_ofc_net
     m.exists_ofc_network.side_effect = f.exists_ofc_net
     m.create_ofc_port.side_effect = f.create_ofc_port
+    # The bulk methods go through the mocked methods of a single item
+    m.create_ofc_ports.side_effect = functools.partial(
+        f.create_ofc_ports, m.create_ofc_port)
     m.delete_ofc_port.side_effect = f.delete_ofc_port
     m.exists_ofc_port.side_effect = f.exists_ofc_port
     m.create_ofc_packet_filter.side_effect = f.create_ofc_pf
+    m.create_ofc_packet_filters.side_effect = functools.partial(
+        f.create_ofc_pfs, m.create_ofc_packet_filter)
     m.delete_ofc_packet_filter.side_effect = f.delete_ofc_pf
     m.exists_ofc_packet_filter.side_effect = f.exists_ofc_pf
     m.set_raise_exc = f.set_raise_exc
@@ -85,6 +92,15 @@ class FakeOFCManager(object):
         self._raise_exc('create_ofc_port')
         self.ofc_ports.update({port_id: True})
 
+    def create_ofc_ports(self, create_ofc_port, context, ports):
+        failures = {}
+        for port in ports:
+            try:
+                create_ofc_port(context, port['id'], port)
+            except Exception as exc:
+                failures[port['id']] = exc
+        return failures
+
     def exists_ofc_port(self, context, port_id):
         self._raise_exc('exists_ofc_port')
         return self.ofc_ports.get(port_id, False)
@@ -97,6 +113,15 @@ class FakeOFCManager(object):
         self._raise_exc('create_ofc_packet_filter')
         self.ofc_pfs.update({pf_id: True})
 
+    def create_ofc_pfs(self, create_ofc_pf, context, pf_dicts):
+        failures = {}
+        for pf_dict in pf_dicts:
+            try:
+                create_ofc_pf(context, pf_dict['id'], pf_dict)
+            except Exception as exc:
+                failures[pf_dict['id']] = exc
+        return failures
+
     def exists_ofc_pf(self, context, pf_id):
         self._raise_exc('exists_ofc_packet_filter')
         return self.ofc_pfs.get(pf_id, False)
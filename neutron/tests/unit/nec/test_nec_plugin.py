@@ -13,6 +13,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import contextlib
 import os
 
 import fixtures
@@ -148,10 +149,59 @@ class TestNecPortsV2Callback(NecPluginV2TestCase):
 
             expected = [
                 mock.call.exists_ofc_port(mock.ANY, port_id),
+                mock.call.create_ofc_ports(mock.ANY, [mock.ANY]),
                 mock.call.create_ofc_port(mock.ANY, port_id, mock.ANY),
             ]
             self.ofc.assert_has_calls(expected)
 
+    def test_portinfo_create_several_ports(self):
+        with self.subnet() as subnet:
+            with contextlib.nested(self.port(subnet=subnet),
+                                   self.port(subnet=subnet)) as ports:
+                port_ids = [port['port']['id'] for port in ports]
+                self.rpcapi_update_ports(
+                    added=[{'id': port_ids[0], 'port_no': 123},
+                           {'id': port_ids[1], 'port_no': 124}])
+
+                # The ports are created on OFC with a single bulk call
+                self.assertEqual(self.ofc.create_ofc_ports.call_count, 1)
+                ports = self.ofc.create_ofc_ports.call_args[0][1]
+                self.assertEqual(port_ids, [port['id'] for port in ports])
+                for port_id in port_ids:
+                    sport = self.plugin.get_port(self.context, port_id)
+                    self.assertEqual(sport['status'], 'ACTIVE')
+
+    def test_portinfo_create_several_ports_failure(self):
+        self.ofc.set_raise_exc('create_ofc_port',
+                               nexc.OFCException(reason='hoge'))
+        with self.subnet() as subnet:
+            with contextlib.nested(
+                self.port(subnet=subnet),
+                self.port(subnet=subnet, admin_state_up=False)) as ports:
+                port_ids = [port['port']['id'] for port in ports]
+                self.rpcapi_update_ports(
+                    added=[{'id': port_ids[0], 'port_no': 123},
+                           {'id': port_ids[1], 'port_no': 124}])
+
+                sport = self.plugin.get_port(self.context, port_ids[0])
+                self.assertEqual(sport['status'], 'ERROR')
+                sport = self.plugin.get_port(self.context, port_ids[1])
+                self.assertEqual(sport['status'], 'DOWN')
+
+    def test_activate_packet_filters_on_other_network(self):
+        with contextlib.nested(self.port(), self.network()) as (port, net):
+            port = port['port']
+            net_id = net['network']['id']
+            pf = {'id': 'pf-id', 'network_id': net_id,
+                  'in_port': port['id'], 'admin_state_up': True,
+                  'status': 'DOWN'}
+            networks = {port['network_id']: self.plugin.get_network(
+                self.context, port['network_id'])}
+            with mock.patch.object(self.plugin, '_update_resource_status'):
+                self.plugin._activate_packet_filters_if_ready(
+                    self.context, [pf], networks, {port['id']: port}, {})
+            self.assertEqual(net_id, networks[net_id]['id'])
+
     def test_portinfo_delete_before_port_deletion(self):
         self._test_portinfo_delete()
 
@@ -188,6 +238,7 @@ class TestNecPortsV2Callback(NecPluginV2TestCase):
 
         expected = [
             mock.call.exists_ofc_port(mock.ANY, port_id),
+            mock.call.create_ofc_ports(mock.ANY, [mock.ANY]),
             mock.call.create_ofc_port(mock.ANY, port_id, mock.ANY),
             mock.call.exists_ofc_port(mock.ANY, port_id),
             mock.call.delete_ofc_port(mock.ANY, port_id, mock.ANY),
@@ -271,10 +322,12 @@ class TestNecPortsV2Callback(NecPluginV2TestCase):
 
             expected = [
                 mock.call.exists_ofc_port(mock.ANY, port_id),
+                mock.call.create_ofc_ports(mock.ANY, [mock.ANY]),
                 mock.call.create_ofc_port(mock.ANY, port_id, mock.ANY),
                 mock.call.exists_ofc_port(mock.ANY, port_id),
                 mock.call.delete_ofc_port(mock.ANY, port_id, mock.ANY),
                 mock.call.exists_ofc_port(mock.ANY, port_id),
+                mock.call.create_ofc_ports(mock.ANY, [mock.ANY]),
                 mock.call.create_ofc_port(mock.ANY, port_id, mock.ANY),
             ]
             self.ofc.assert_has_calls(expected)
@@ -491,6 +544,7 @@ class TestNecPluginOfcManager(NecPluginV2TestCase):
                                          net['name']),
 
             mock.call.exists_ofc_port(ctx, p1['id']),
+            mock.call.create_ofc_ports(ctx, [mock.ANY]),
             mock.call.create_ofc_port(ctx, p1['id'], mock.ANY),
 
             mock.call.exists_ofc_port(ctx, p1['id']),
@@ -522,6 +576,7 @@ class TestNecPluginOfcManager(NecPluginV2TestCase):
             mock.call.create_ofc_network(ctx, self._tenant_id,
                                          net['id'], net['name']),
             mock.call.exists_ofc_port(ctx, p['id']),
+            mock.call.create_ofc_ports(ctx, [mock.ANY]),
             mock.call.create_ofc_port(ctx, p['id'], mock.ANY),
             mock.call.exists_ofc_port(ctx, p['id']),
             mock.call.delete_ofc_port(ctx, p['id'], mock.ANY),
@@ -0,0 +1,106 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation.  All rights reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import httplib
+import socket
+
+import mock
+
+from neutron.plugins.nec.common import exceptions as nexc
+from neutron.plugins.nec.common import ofc_client
+from neutron.tests import base
+
+
+class OFCClientTest(base.BaseTestCase):
+
+    def setUp(self):
+        super(OFCClientTest, self).setUp()
+        connection_patcher = mock.patch.object(ofc_client.httplib,
+                                               'HTTPConnection')
+        self.connection_type = connection_patcher.start()
+        self.addCleanup(connection_patcher.stop)
+        self.connection_type.side_effect = self._new_connection
+        self.connections = []
+        self.client = ofc_client.OFCClient()
+
+    def _new_connection(self, host, port):
+        conn = mock.Mock()
+        res = conn.getresponse.return_value
+        res.status = httplib.OK
+        res.read.return_value = '{"id": "ofc-id"}'
+        res.will_close = False
+        self.connections.append(conn)
+        return conn
+
+    def test_connection_reused(self):
+        self.assertEqual({'id': 'ofc-id'}, self.client.get('/tenants'))
+        self.client.post('/tenants', body={'id': 'tenant'})
+        self.assertEqual(1, len(self.connections))
+        self.assertEqual(2, self.connections[0].request.call_count)
+
+    def test_connection_closed_by_ofc_not_reused(self):
+        self.client.get('/tenants')
+        self.connections[0].getresponse.return_value.will_close = True
+        self.client.get('/tenants')
+        self.client.get('/tenants')
+        self.assertEqual(2, len(self.connections))
+        self.assertTrue(self.connections[0].close.called)
+
+    def test_idle_connection_failure_retried(self):
+        self.client.get('/tenants')
+        self.connections[0].request.side_effect = socket.error()
+        self.assertEqual({'id': 'ofc-id'}, self.client.get('/tenants'))
+        self.assertEqual(2, len(self.connections))
+        self.assertTrue(self.connections[0].close.called)
+        self.assertEqual([self.connections[1]], self.client.connections)
+
+    def test_idle_connection_response_failure_post_not_retried(self):
+        self.client.get('/tenants')
+        self.connections[0].getresponse.side_effect = httplib.BadStatusLine('')
+        self.assertRaises(nexc.OFCException, self.client.post, '/tenants',
+                          body={'id': 'tenant'})
+        self.assertEqual(1, len(self.connections))
+        self.assertTrue(self.connections[0].close.called)
+        self.assertEqual([], self.client.connections)
+
+    def test_idle_connection_response_failure_put_retried(self):
+        self.client.get('/tenants')
+        self.connections[0].getresponse.side_effect = httplib.BadStatusLine('')
+        self.client.put('/tenants/tenant', body={'id': 'tenant'})
+        self.assertEqual(2, len(self.connections))
+        self.assertEqual(1, self.connections[1].request.call_count)
+
+    def test_new_connection_failure(self):
+        self.connection_type.side_effect = None
+        conn = self.connection_type.return_value
+        conn.request.side_effect = socket.error()
+        self.assertRaises(nexc.OFCException, self.client.get, '/tenants')
+        self.assertTrue(conn.close.called)
+        self.assertEqual([], self.client.connections)
+
+    def test_error_status(self):
+        self.client.get('/tenants')
+        res = self.connections[0].getresponse.return_value
+        res.status = httplib.INTERNAL_SERVER_ERROR
+        self.assertRaises(nexc.OFCException, self.client.get, '/tenants')
+        # The response was read, the connection can still be used
+        self.assertEqual(self.connections, self.client.connections)
+
+    def test_close(self):
+        self.client.get('/tenants')
+        self.client.close()
+        self.assertTrue(self.connections[0].close.called)
+        self.assertEqual([], self.client.connections)
@@ -18,6 +18,7 @@
 from neutron import context
 from neutron.openstack.common import uuidutils
 from neutron.plugins.nec.common import config
+from neutron.plugins.nec.common import exceptions as nexc
 from neutron.plugins.nec.db import api as ndb
 from neutron.plugins.nec.db import models as nmodels  # noqa
 from neutron.plugins.nec import ofc_manager
@@ -174,6 +175,40 @@ class OFCManagerTest(OFCManagerTestBase):
         self.assertFalse(ndb.get_ofc_item(self.ctx.session,
                                           'ofc_packet_filter', f))
 
+    def testm_create_ofc_ports(self):
+        """test create ofc_ports in bulk."""
+        t, n, p1, p2, none = self.get_random_params()
+        self.ofc.create_ofc_tenant(self.ctx, t)
+        self.ofc.create_ofc_network(self.ctx, t, n)
+        ndb.add_portinfo(self.ctx.session, p1, "0xabc", 4, 65535,
+                         "00:14:22:33:44:55")
+        ports = [{'id': p1, 'tenant_id': t, 'network_id': n},
+                 {'id': p2, 'tenant_id': t, 'network_id': n},
+                 {'id': none, 'tenant_id': t, 'network_id': none}]
+        failures = self.ofc.create_ofc_ports(self.ctx, ports)
+        self.assertEqual(set([p2, none]), set(failures))
+        self.assertIsInstance(failures[p2], nexc.PortInfoNotFound)
+        self.assertIsInstance(failures[none], nexc.OFCConsistencyBroken)
+        port = ndb.get_ofc_item(self.ctx.session, 'ofc_port', p1)
+        self.assertEqual(port.ofc_id, "ofc-" + p1[:-4])
+        self.assertFalse(ndb.get_ofc_item(self.ctx.session, 'ofc_port', p2))
+
+    def testn_create_ofc_packet_filters(self):
+        """test create ofc_filters in bulk."""
+        t, n, p, f1, f2 = self.get_random_params()
+        self.ofc.create_ofc_tenant(self.ctx, t)
+        self.ofc.create_ofc_network(self.ctx, t, n)
+        ndb.add_portinfo(self.ctx.session, p, "0xabc", 5, 65535,
+                         "00:15:22:33:44:55")
+        pfs = [{'id': f1, 'tenant_id': t, 'network_id': n},
+               {'id': f2, 'tenant_id': t, 'network_id': n, 'in_port': p}]
+        self.assertEqual({}, self.ofc.create_ofc_packet_filters(self.ctx,
+                                                                pfs))
+        for f in (f1, f2):
+            _filter = ndb.get_ofc_item(self.ctx.session,
+                                       'ofc_packet_filter', f)
+            self.assertEqual(_filter.ofc_id, "ofc-" + f[:-4])
+
 
 class OFCManagerTestWithOldMapping(OFCManagerTestBase):
 
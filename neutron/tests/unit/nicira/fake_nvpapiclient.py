@@ -106,6 +106,10 @@ class FakeClient:
         LROUTER_LPORT_RESOURCE: ['LogicalPortAttachment'],
     }
 
+    # Operational status of the resources, which can be changed by the
+    # tests to emulate failures in the fabric
+    STATUS_FIELDS = ('fabric_status', 'fabric_status_up')
+
     _fake_lswitch_dict = {}
     _fake_lrouter_dict = {}
     _fake_lswitch_lport_dict = {}
@@ -157,6 +161,7 @@ class FakeClient:
         fake_lswitch['zone_uuid'] = zone_uuid
         fake_lswitch['tenant_id'] = self._get_tag(fake_lswitch, 'os_tid')
         fake_lswitch['lport_count'] = 0
+        fake_lswitch['fabric_status'] = True
         return fake_lswitch
 
     def _build_lrouter(self, body, uuid=None):
@@ -175,6 +180,7 @@ class FakeClient:
                                            uuidutils.generate_uuid())
         self._fake_lrouter_dict[fake_lrouter['uuid']] = fake_lrouter
         fake_lrouter['lport_count'] = 0
+        fake_lrouter['fabric_status'] = True
         return fake_lrouter
 
     def _add_lqueue(self, body):
@@ -194,6 +200,7 @@ class FakeClient:
         fake_lport['neutron_port_id'] = self._get_tag(fake_lport,
                                                       'q_port_id')
         fake_lport['neutron_device_id'] = self._get_tag(fake_lport, 'vm_id')
+        fake_lport['fabric_status_up'] = False
         self._fake_lswitch_lport_dict[fake_lport['uuid']] = fake_lport
 
         fake_lswitch = self._fake_lswitch_dict[ls_uuid]
@@ -398,6 +405,9 @@ class FakeClient:
             for item in res_dict.itervalues():
                 if 'tags' in item:
                     item['tags_json'] = json.dumps(item['tags'])
+                for field in self.STATUS_FIELDS:
+                    if field in item:
+                        item['%s_json' % field] = json.dumps(item[field])
             if resource_type in (self.LSWITCH_LPORT_RESOURCE,
                                  self.LSWITCH_LPORT_ATT,
                                  self.LSWITCH_LPORT_STATUS):
@@ -411,12 +421,23 @@ class FakeClient:
                 parent_func = lambda x: True
 
             items = [_build_item(res_dict[res_uuid])
-                     for res_uuid in res_dict
+                     for res_uuid in sorted(res_dict)
                      if (parent_func(res_uuid) and
                          _tag_match(res_uuid) and
                          _attr_match(res_uuid))]
-            return json.dumps({'results': items,
-                               'result_count': len(items)})
+            response = {'result_count': len(items)}
+            # The page cursor is the uuid of the last item of the page
+            params = urlparse.parse_qs(query or '')
+            if '_page_cursor' in params:
+                page_cursor = params['_page_cursor'][0]
+                items = [item for item in items if item['uuid'] > page_cursor]
+            if '_page_length' in params:
+                page_length = int(params['_page_length'][0])
+                if len(items) > page_length:
+                    items = items[:page_length]
+                    response['page_cursor'] = items[-1]['uuid']
+            response['results'] = items
+            return json.dumps(response)
 
     def _show(self, resource_type, response_file,
               uuid1, uuid2=None, relations=None):
@@ -429,6 +450,9 @@ class FakeClient:
             for item in res_dict.itervalues():
                 if 'tags' in item:
                     item['tags_json'] = json.dumps(item['tags'])
+                for field in self.STATUS_FIELDS:
+                    if field in item:
+                        item['%s_json' % field] = json.dumps(item[field])
 
                 # replace sec prof rules with their json dump
                 def jsonify_rules(rule_key):
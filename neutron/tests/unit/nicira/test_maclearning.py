@@ -25,6 +25,7 @@ from neutron.api.v2 import attributes
 from neutron.common.test_lib import test_config
 from neutron import context
 from neutron.extensions import agent
+from neutron import manager
 from neutron.openstack.common import log as logging
 import neutron.plugins.nicira as nvp_plugin
 from neutron.tests.unit.nicira import fake_nvpapiclient
@@ -92,6 +93,8 @@ class MacLearningDBTestCase(test_db_plugin.NeutronDbPluginV2TestCase):
         self.addCleanup(self.restore_resource_attribute_map)
         self.addCleanup(cfg.CONF.reset)
         super(MacLearningDBTestCase, self).setUp()
+        self.addCleanup(
+            manager.NeutronManager.get_plugin()._synchronizer.stop)
 
     def restore_resource_attribute_map(self):
         # Restore the original RESOURCE_ATTRIBUTE_MAP
@@ -89,9 +89,14 @@ class NiciraPluginV2TestCase(test_plugin.NeutronDbPluginV2TestCase):
         instance.return_value.get_nvp_version.return_value = "2.999"
         instance.return_value.request.side_effect = _fake_request
         super(NiciraPluginV2TestCase, self).setUp(self._plugin_name)
+        self.addCleanup(
+            manager.NeutronManager.get_plugin()._synchronizer.stop)
         cfg.CONF.set_override('metadata_mode', None, 'NVP')
         self.addCleanup(self.fc.reset_all)
         self.addCleanup(self.mock_nvpapi.stop)
+        for cache in (nvplib.cluster_version_cache, nvplib.lswitches_cache,
+                      nvplib.lswitch_network_cache, nvplib.port_id_cache):
+            self.addCleanup(cache.invalidate)
 
 
 class TestNiciraBasicGet(test_plugin.TestBasicGet, NiciraPluginV2TestCase):
@@ -116,6 +121,37 @@ class TestNiciraPortsV2(test_plugin.TestPortsV2, NiciraPluginV2TestCase):
                     # creating another port should see an exception
                     self._create_port('json', net['network']['id'], 400)
 
+    def test_update_port_does_not_query_nvp(self):
+        with self.port() as port:
+            with mock.patch.object(self.fc, 'handle_get',
+                                   wraps=self.fc.handle_get) as handle_get:
+                self._update('ports', port['port']['id'],
+                             {'port': {'name': 'new-name'}})
+                self.assertFalse(handle_get.called)
+
+    def test_update_port_admin_state_refreshes_status(self):
+        with self.port() as port:
+            with mock.patch.object(nvplib, 'get_port_status',
+                                   return_value=constants.PORT_STATUS_DOWN):
+                res = self._update('ports', port['port']['id'],
+                                   {'port': {'admin_state_up': False}})
+                self.assertEqual(constants.PORT_STATUS_DOWN,
+                                 res['port']['status'])
+
+    def test_create_port_refetches_almost_full_lswitch(self):
+        cfg.CONF.set_override('max_lp_per_overlay_ls', 2, group='NVP')
+        with self.network() as net:
+            with self.subnet(network=net) as sub:
+                with self.port(subnet=sub):
+                    plugin = manager.NeutronManager.get_plugin()
+                    nvplib.get_lswitches(plugin.cluster,
+                                         net['network']['id'])
+                    with mock.patch.object(
+                        nvplib.lswitches_cache, 'invalidate',
+                        wraps=nvplib.lswitches_cache.invalidate) as inv:
+                        with self.port(subnet=sub):
+                            inv.assert_any_call(net['network']['id'])
+
     def test_exhaust_ports_bridged_network(self):
         cfg.CONF.set_override('max_lp_per_bridged_ls', 1, group="NVP")
         providernet_args = {pnet.NETWORK_TYPE: 'flat',
@@ -290,6 +326,8 @@ class NiciraSecurityGroupsTestCase(ext_sg.SecurityGroupDBTestCase):
 
         instance.return_value.request.side_effect = _fake_request
         super(NiciraSecurityGroupsTestCase, self).setUp(self._plugin_name)
+        self.addCleanup(
+            manager.NeutronManager.get_plugin()._synchronizer.stop)
 
     def tearDown(self):
         super(NiciraSecurityGroupsTestCase, self).tearDown()
@@ -832,6 +870,10 @@ class TestNiciraQoSQueue(NiciraPluginV2TestCase):
 class NiciraNeutronNVPOutOfSync(test_l3_plugin.L3NatTestCaseBase,
                                 NiciraPluginV2TestCase):
 
+    def _synchronize_state(self):
+        plugin = manager.NeutronManager.get_plugin()
+        plugin._synchronizer.synchronize_state()
+
     def test_delete_network_not_in_nvp(self):
         res = self._create_network('json', 'net1', True)
         net1 = self.deserialize('json', res)
@@ -844,6 +886,7 @@ class NiciraNeutronNVPOutOfSync(test_l3_plugin.L3NatTestCaseBase,
         res = self._create_network('json', 'net1', True)
         self.deserialize('json', res)
         self.fc._fake_lswitch_dict.clear()
+        self._synchronize_state()
         req = self.new_list_request('networks')
         nets = self.deserialize('json', req.get_response(self.api))
         self.assertEqual(nets['networks'][0]['status'],
@@ -853,6 +896,7 @@ class NiciraNeutronNVPOutOfSync(test_l3_plugin.L3NatTestCaseBase,
         res = self._create_network('json', 'net1', True)
         net = self.deserialize('json', res)
         self.fc._fake_lswitch_dict.clear()
+        self._synchronize_state()
         req = self.new_show_request('networks', net['network']['id'])
         net = self.deserialize('json', req.get_response(self.api))
         self.assertEqual(net['network']['status'],
@@ -874,6 +918,7 @@ class NiciraNeutronNVPOutOfSync(test_l3_plugin.L3NatTestCaseBase,
         res = self._create_port('json', net1['network']['id'])
         self.deserialize('json', res)
         self.fc._fake_lswitch_lport_dict.clear()
+        self._synchronize_state()
         req = self.new_list_request('ports')
         nets = self.deserialize('json', req.get_response(self.api))
         self.assertEqual(nets['ports'][0]['status'],
@@ -886,6 +931,7 @@ class NiciraNeutronNVPOutOfSync(test_l3_plugin.L3NatTestCaseBase,
         port = self.deserialize('json', res)
         self.fc._fake_lswitch_lport_dict.clear()
         self.fc._fake_lswitch_lportstatus_dict.clear()
+        self._synchronize_state()
         req = self.new_show_request('ports', port['port']['id'])
         net = self.deserialize('json', req.get_response(self.api))
         self.assertEqual(net['port']['status'],
@@ -937,6 +983,7 @@ class NiciraNeutronNVPOutOfSync(test_l3_plugin.L3NatTestCaseBase,
         res = self._create_router('json', 'tenant')
         self.deserialize('json', res)
         self.fc._fake_lrouter_dict.clear()
+        self._synchronize_state()
         req = self.new_list_request('routers')
         routers = self.deserialize('json', req.get_response(self.ext_api))
         self.assertEqual(routers['routers'][0]['status'],
@@ -946,6 +993,7 @@ class NiciraNeutronNVPOutOfSync(test_l3_plugin.L3NatTestCaseBase,
         res = self._create_router('json', 'tenant')
         router = self.deserialize('json', res)
         self.fc._fake_lrouter_dict.clear()
+        self._synchronize_state()
         req = self.new_show_request('routers', router['router']['id'])
         router = self.deserialize('json', req.get_response(self.ext_api))
         self.assertEqual(router['router']['status'],
@@ -0,0 +1,116 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 OpenStack Foundation.
+# All Rights Reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import mock
+
+from neutron.plugins.nicira.api_client import client_eventlet as nace
+from neutron.tests import base
+
+PROVIDER_1 = ("10.0.0.1", 443, True)
+PROVIDER_2 = ("10.0.0.2", 443, True)
+
+
+class NvpApiClientEventletTest(base.BaseTestCase):
+
+    def setUp(self):
+        super(NvpApiClientEventletTest, self).setUp()
+        self.client = nace.NvpApiClientEventlet(
+            [PROVIDER_1, PROVIDER_2], "admin", "admin",
+            concurrent_connections=2)
+        time_patcher = mock.patch.object(nace.client.time, 'time')
+        self.time = time_patcher.start()
+        self.addCleanup(time_patcher.stop)
+        self.time.return_value = 1000
+
+    def _acquire(self):
+        conn = self.client.acquire_connection(auto_login=False)
+        return self.client._conn_params(conn), conn
+
+    def test_least_outstanding_provider(self):
+        provider_a, conn_a = self._acquire()
+        provider_b, conn_b = self._acquire()
+        self.assertEqual(set([PROVIDER_1, PROVIDER_2]),
+                         set([provider_a, provider_b]))
+        self.client.release_connection(conn_b)
+        self.assertEqual(provider_b, self._acquire()[0])
+        self.assertEqual(provider_a, self._acquire()[0])
+
+    def test_failed_provider_backs_off(self):
+        provider, conn = self._acquire()
+        self.client.release_connection(conn, bad_state=True)
+        for i in range(2):
+            self.assertNotEqual(provider, self._acquire()[0])
+        self.time.return_value += self.client.PROVIDER_BACKOFF_MIN
+        self.assertEqual(provider, self._acquire()[0])
+
+    def test_backoff_doubles_until_success(self):
+        provider, conn = self._acquire()
+        for delay in (1, 2, 4):
+            self.client.release_connection(conn, service_unavail=True)
+            self.assertEqual(delay, self.client._backoffs[provider][1])
+            conn = self.client.acquire_redirect_connection(provider, False)
+        self.client.release_connection(conn)
+        self.assertNotIn(provider, self.client._backoffs)
+
+    def test_all_providers_backing_off(self):
+        provider_a, conn_a = self._acquire()
+        provider_b, conn_b = self._acquire()
+        self.client.release_connection(conn_a, bad_state=True)
+        self.time.return_value += 0.5
+        self.client.release_connection(conn_b, bad_state=True)
+        self.assertEqual(provider_a, self._acquire()[0])
+
+    def test_redirect_connection_to_new_provider(self):
+        provider = ("10.0.0.3", 443, True)
+        conn = self.client.acquire_redirect_connection(provider, False)
+        self.assertEqual(provider, self.client._conn_params(conn))
+        self.assertIn(provider, self.client._api_providers)
+        self.client.release_connection(conn)
+        self.assertEqual(2, self.client._conn_pools[provider].qsize())
+
+    def test_redirect_connection_without_port(self):
+        provider = ("10.0.0.3", 443, True)
+        conn = self.client.acquire_redirect_connection(
+            ("10.0.0.3", None, True), False)
+        self.assertEqual(1, self.client._outstanding[provider])
+        self.client.release_connection(conn)
+        self.assertEqual(0, self.client._outstanding[provider])
+        self.assertEqual(2, self.client._conn_pools[provider].qsize())
+        self.assertNotIn(("10.0.0.3", None, True), self.client._api_providers)
+
+    def test_redirected_provider_avoided(self):
+        provider, conn = self._acquire()
+        self.client.release_connection(conn, redirected=True)
+        self.assertNotEqual(provider, self._acquire()[0])
+
+    def test_metrics(self):
+        provider, conn = self._acquire()
+        self.time.return_value += 2
+        self.client.release_connection(conn)
+        self.assertEqual(1, self.client.request_counts[provider])
+        self.assertEqual(2, self.client.request_times[provider])
+        self.assertEqual(0, self.client.wait_times[provider])
+
+    def test_update_providers(self):
+        provider = ("10.0.0.3", 443, True)
+        provider_1, conn = self._acquire()
+        self.client.update_providers([PROVIDER_2, provider])
+        self.assertEqual(set([PROVIDER_2, provider]),
+                         set(self.client._conn_pools))
+        # Connections to a removed provider are dropped
+        self.client.release_connection(conn)
+        self.assertNotIn(PROVIDER_1, self.client._conn_pools)
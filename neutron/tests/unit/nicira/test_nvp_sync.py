@@ -0,0 +1,150 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Nicira, Inc.
+# All Rights Reserved
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from neutron.common import constants
+from neutron import context
+from neutron import manager
+from neutron.plugins.nicira.common import sync
+from neutron.tests.unit.nicira import test_nicira_plugin
+import neutron.tests.unit.test_l3_plugin as test_l3_plugin
+
+
+class NvpSynchronizerTestCase(test_l3_plugin.L3NatTestCaseBase,
+                              test_nicira_plugin.NiciraPluginV2TestCase):
+
+    def setUp(self):
+        super(NvpSynchronizerTestCase, self).setUp()
+        self.synchronizer = manager.NeutronManager.get_plugin()._synchronizer
+        handle_get_patcher = mock.patch.object(self.fc, 'handle_get',
+                                               wraps=self.fc.handle_get)
+        self.handle_get = handle_get_patcher.start()
+        self.addCleanup(handle_get_patcher.stop)
+
+    def _get_status(self, resource, id, api=None):
+        req = self.new_show_request(resource, id)
+        res = self.deserialize('json', req.get_response(api or self.api))
+        return res[resource[:-1]]['status']
+
+    def _get_lport(self, port_id):
+        for lport in self.fc._fake_lswitch_lport_dict.itervalues():
+            if lport['neutron_port_id'] == port_id:
+                return lport
+
+    def test_get_does_not_query_nvp(self):
+        with self.port() as port:
+            with self.router():
+                self.handle_get.reset_mock()
+                self._list('networks')
+                self._list('ports')
+                self._show('ports', port['port']['id'])
+                self._show('networks', port['port']['network_id'])
+                req = self.new_list_request('routers')
+                req.get_response(self.ext_api)
+                self.assertFalse(self.handle_get.called)
+
+    def test_synchronize_status(self):
+        with self.port() as port:
+            with self.router() as router:
+                port_id = port['port']['id']
+                net_id = port['port']['network_id']
+                router_id = router['router']['id']
+                self.fc._fake_lswitch_dict[net_id]['fabric_status'] = False
+                self.fc._fake_lrouter_dict[router_id]['fabric_status'] = False
+                self._get_lport(port_id)['fabric_status_up'] = True
+                self.synchronizer.synchronize_state()
+                self.assertEqual(constants.NET_STATUS_DOWN,
+                                 self._get_status('networks', net_id))
+                self.assertEqual(constants.PORT_STATUS_ACTIVE,
+                                 self._get_status('ports', port_id))
+                self.assertEqual(constants.NET_STATUS_DOWN,
+                                 self._get_status('routers', router_id,
+                                                  self.ext_api))
+                self.fc._fake_lswitch_dict[net_id]['fabric_status'] = True
+                self.fc._fake_lrouter_dict[router_id]['fabric_status'] = True
+                self._get_lport(port_id)['fabric_status_up'] = False
+                self.synchronizer.synchronize_state()
+                self.assertEqual(constants.NET_STATUS_ACTIVE,
+                                 self._get_status('networks', net_id))
+                self.assertEqual(constants.PORT_STATUS_DOWN,
+                                 self._get_status('ports', port_id))
+                self.assertEqual(constants.NET_STATUS_ACTIVE,
+                                 self._get_status('routers', router_id,
+                                                  self.ext_api))
+
+    def test_synchronize_in_chunks(self):
+        self.synchronizer.chunk_size = 2
+        with self.network() as net1:
+            with self.network() as net2:
+                with self.network() as net3:
+                    nets = [net1, net2, net3]
+                    for net in nets:
+                        self.fc._fake_lswitch_dict[
+                            net['network']['id']]['fabric_status'] = False
+                    self.handle_get.reset_mock()
+                    self.synchronizer.synchronize_networks(
+                        context.get_admin_context())
+                    urls = [args[0] for args, kwargs in
+                            self.handle_get.call_args_list]
+                    self.assertEqual(2, len(urls))
+                    for url in urls:
+                        self.assertIn('_page_length=2', url)
+                    for net in nets:
+                        self.assertEqual(
+                            constants.NET_STATUS_DOWN,
+                            self._get_status('networks',
+                                             net['network']['id']))
+
+    def test_synchronize_extended_network_down(self):
+        with self.network() as net:
+            net_id = net['network']['id']
+            # An extra logical switch of the network, after the main one
+            self.fc._fake_lswitch_dict['~extra'] = dict(
+                self.fc._fake_lswitch_dict[net_id], uuid='~extra',
+                fabric_status=False,
+                tags=[{'scope': 'quantum_net_id', 'tag': net_id}])
+            self.synchronizer.chunk_size = 1
+            self.synchronizer.synchronize_state()
+            self.assertEqual(constants.NET_STATUS_DOWN,
+                             self._get_status('networks', net_id))
+
+    def test_start_disabled(self):
+        synchronizer = sync.NvpSynchronizer(None, 0, 10)
+        with mock.patch.object(sync.loopingcall,
+                               'FixedIntervalLoopingCall') as loop:
+            synchronizer.start()
+            self.assertFalse(loop.called)
+
+    def test_start(self):
+        synchronizer = sync.NvpSynchronizer(None, 60, 10)
+        with mock.patch.object(sync.loopingcall,
+                               'FixedIntervalLoopingCall') as loop:
+            synchronizer.start()
+            loop.assert_called_once_with(synchronizer.synchronize_state)
+            loop.return_value.start.assert_called_once_with(
+                interval=60, initial_delay=60)
+
+    def test_stop(self):
+        synchronizer = sync.NvpSynchronizer(None, 60, 10)
+        with mock.patch.object(sync.loopingcall,
+                               'FixedIntervalLoopingCall') as loop:
+            synchronizer.start()
+            synchronizer.stop()
+            loop.return_value.stop.assert_called_once_with()
+            synchronizer.stop()
+            self.assertEqual(1, loop.return_value.stop.call_count)
@@ -18,6 +18,8 @@
 import mock
 import os
 
+from oslo.config import cfg
+
 from neutron.common import constants
 from neutron.common import exceptions
 import neutron.plugins.nicira as nvp_plugin
@@ -61,6 +63,14 @@ class NvplibTestCase(base.BaseTestCase):
         super(NvplibTestCase, self).setUp()
         self.addCleanup(self.fc.reset_all)
         self.addCleanup(self.mock_nvpapi.stop)
+        for cache in (nvplib.cluster_version_cache, nvplib.lswitches_cache,
+                      nvplib.lswitch_network_cache, nvplib.port_id_cache):
+            self.addCleanup(cache.invalidate)
+
+    def _get_requests(self):
+        return [args for args, kwargs in
+                self.fake_cluster.api_client.request.call_args_list
+                if args[0] == 'GET']
 
     def _build_tag_dict(self, tags):
         # This syntax is needed for python 2.6 compatibility
@@ -342,6 +352,60 @@ class TestNvplibLogicalSwitches(NvplibTestCase):
         self.assertIn('new_tag', switch_tags)
         self.assertEqual(switch_tags['new_tag'], 'xxx')
 
+    def test_get_lswitches_cached(self):
+        lswitch = nvplib.create_lswitch(self.fake_cluster,
+                                        'pippo',
+                                        'fake-switch')
+        res_lswitch = nvplib.get_lswitches(self.fake_cluster,
+                                           lswitch['uuid'])
+        self.assertEqual(res_lswitch, nvplib.get_lswitches(self.fake_cluster,
+                                                           lswitch['uuid']))
+        self.assertEqual(1, len(self._get_requests()))
+
+    def test_get_lswitches_cache_disabled(self):
+        cfg.CONF.set_override('cache_ttl', 0, 'NVP')
+        self.addCleanup(cfg.CONF.clear_override, 'cache_ttl', 'NVP')
+        lswitch = nvplib.create_lswitch(self.fake_cluster,
+                                        'pippo',
+                                        'fake-switch')
+        for i in range(2):
+            nvplib.get_lswitches(self.fake_cluster, lswitch['uuid'])
+        self.assertEqual(2, len(self._get_requests()))
+
+    def test_cache_purges_expired_entries(self):
+        cache = nvplib.NvpCache()
+        with mock.patch('time.time', return_value=0):
+            cache.set('expired', 'value')
+        ttl = cfg.CONF.NVP.cache_ttl
+        with mock.patch('time.time', return_value=ttl + 1):
+            cache.set('key', 'value')
+        self.assertEqual(['key'], cache._entries.keys())
+
+    def test_get_lswitches_cached_lport_count(self):
+        lswitch = nvplib.create_lswitch(self.fake_cluster,
+                                        'pippo',
+                                        'fake-switch')
+        res_lswitch = nvplib.get_lswitches(self.fake_cluster,
+                                           lswitch['uuid'])
+        nvplib.create_lport(self.fake_cluster, lswitch['uuid'], 'pippo',
+                            'neutron_port_id', 'name', 'device_id', True)
+        res_lswitch = nvplib.get_lswitches(self.fake_cluster,
+                                           lswitch['uuid'])
+        self.assertEqual(1, res_lswitch[0]['_relations']
+                         ['LogicalSwitchStatus']['lport_count'])
+        self.assertEqual(1, len(self._get_requests()))
+
+    def test_update_lswitch_invalidates_cache(self):
+        lswitch = nvplib.create_lswitch(self.fake_cluster,
+                                        'pippo',
+                                        'fake-switch')
+        nvplib.get_lswitches(self.fake_cluster, lswitch['uuid'])
+        nvplib.update_lswitch(self.fake_cluster, lswitch['uuid'],
+                              'new-name')
+        res_lswitch = nvplib.get_lswitches(self.fake_cluster,
+                                           lswitch['uuid'])
+        self.assertEqual('new-name', res_lswitch[0]['display_name'])
+
     def test_update_non_existing_lswitch_raises(self):
         self.assertRaises(exceptions.NetworkNotFound,
                           nvplib.update_lswitch,
@@ -1154,6 +1218,16 @@ class TestNvplibClusterVersion(NvplibTestCase):
             version = nvplib.get_cluster_version('whatever')
             self.assertEqual(version, '3.0')
 
+    def test_get_cluster_version_cached(self):
+        results = [{'result_count': 1, 'results': [{'uuid': 'xyz'}]},
+                   {'version': '3.0.9999'}]
+        with mock.patch.object(nvplib, 'do_request',
+                               side_effect=results) as do_request:
+            for i in range(2):
+                self.assertEqual('3.0', nvplib.get_cluster_version(
+                    self.fake_cluster))
+            self.assertEqual(2, do_request.call_count)
+
     def test_get_cluster_version_no_nodes(self):
         def fakedorequest(*args, **kwargs):
             uri = args[1]
@@ -107,6 +107,7 @@ class ConfigurationTest(testtools.TestCase):
                         '--config-file', NVP_INI_FULL_PATH])
         cfg.CONF.set_override('core_plugin', NVP_PLUGIN_PATH)
         plugin = NeutronManager().get_plugin()
+        self.addCleanup(plugin._synchronizer.stop)
         cluster = plugin.cluster
         self._assert_required_options(cluster)
         self._assert_extra_options(cluster)
@@ -116,6 +117,7 @@ class ConfigurationTest(testtools.TestCase):
                         '--config-file', NVP_INI_PATH])
         cfg.CONF.set_override('core_plugin', NVP_PLUGIN_PATH)
         plugin = NeutronManager().get_plugin()
+        self.addCleanup(plugin._synchronizer.stop)
         self._assert_required_options(plugin.cluster)
 
     def test_defaults(self):
@@ -124,6 +126,8 @@ class ConfigurationTest(testtools.TestCase):
         self.assertEqual(5, cfg.CONF.NVP.concurrent_connections)
         self.assertEqual('access_network', cfg.CONF.NVP.metadata_mode)
         self.assertEqual('stt', cfg.CONF.NVP.default_transport_type)
+        self.assertEqual(120, cfg.CONF.NVP.state_sync_interval)
+        self.assertEqual(500, cfg.CONF.NVP.state_sync_chunk_size)
 
         self.assertIsNone(cfg.CONF.default_tz_uuid)
         self.assertIsNone(cfg.CONF.nvp_cluster_uuid)
@@ -143,7 +147,8 @@ class ConfigurationTest(testtools.TestCase):
                         '--config-file', NVP_INI_FULL_PATH])
         cfg.CONF.set_override('core_plugin', NVP_PLUGIN_PATH)
         # Load the configuration, and initialize the plugin
-        NeutronManager().get_plugin()
+        plugin = NeutronManager().get_plugin()
+        self.addCleanup(plugin._synchronizer.stop)
         self.assertIn('extensions', cfg.CONF.api_extensions_path)
 
 
@@ -167,6 +172,7 @@ class OldConfigurationTest(testtools.TestCase):
                         '--config-file', NVP_INI_DEPR_PATH])
         cfg.CONF.set_override('core_plugin', NVP_PLUGIN_PATH)
         plugin = NeutronManager().get_plugin()
+        self.addCleanup(plugin._synchronizer.stop)
         cluster = plugin.cluster
         self._assert_required_options(cluster)
         # Verify nvp_controller_connection has been fully parsed
@@ -15,6 +15,7 @@
 
 import contextlib
 import copy
+import datetime
 
 import mock
 from oslo.config import cfg
@@ -34,6 +35,8 @@ from neutron.extensions import l3agentscheduler
 from neutron import manager
 from neutron.openstack.common import timeutils
 from neutron.openstack.common import uuidutils
+from neutron.scheduler import dhcp_agent_scheduler
+from neutron.scheduler import l3_agent_scheduler
 from neutron.tests.unit import test_agent_ext_plugin
 from neutron.tests.unit import test_db_plugin as test_plugin
 from neutron.tests.unit import test_extensions
@@ -188,6 +191,16 @@ class AgentSchedulerTestMixIn(object):
                 agent_data['host'] == host):
                 return agent_data['id']
 
+    def _set_agent_dead(self, agent_id):
+        plugin = manager.NeutronManager.get_plugin()
+        heartbeat = timeutils.utcnow() - datetime.timedelta(
+            seconds=cfg.CONF.agent_reschedule_down_time + 1)
+        session = self.adminContext.session
+        with session.begin(subtransactions=True):
+            agent_db = session.query(agents_db.Agent).get(agent_id)
+            agent_db.heartbeat_timestamp = heartbeat
+        plugin._heartbeats.forget(agent_id)
+
 
 class OvsAgentSchedulerTestCase(test_l3_plugin.L3NatTestCaseMixin,
                                 test_agent_ext_plugin.AgentDBTestMixIn,
@@ -303,6 +316,82 @@ class OvsAgentSchedulerTestCase(test_l3_plugin.L3NatTestCaseMixin,
                 sub1['subnet']['network_id'])
         self.assertEqual(1, len(dhcp_agents['agents']))
 
+    def test_get_active_networks_info_paged(self):
+        cfg.CONF.set_override('allow_overlapping_ips', True)
+        with contextlib.nested(self.subnet(), self.subnet(),
+                               self.subnet()) as subnets:
+            dhcp_rpc = dhcp_rpc_base.DhcpRpcCallbackMixin()
+            self._register_agent_states()
+            net_ids = sorted(sub['subnet']['network_id'] for sub in subnets)
+            page1 = dhcp_rpc.get_active_networks_info(
+                self.adminContext, host=DHCP_HOSTA, limit=2)
+            page2 = dhcp_rpc.get_active_networks_info(
+                self.adminContext, host=DHCP_HOSTA, limit=2,
+                marker=page1[-1]['id'])
+        self.assertEqual(net_ids[:2], [net['id'] for net in page1])
+        self.assertEqual(net_ids[2:], [net['id'] for net in page2])
+
+    def test_network_auto_schedule_with_max_networks_per_agent(self):
+        cfg.CONF.set_override('max_networks_per_agent', 2)
+        cfg.CONF.set_override('allow_overlapping_ips', True)
+        with contextlib.nested(self.subnet(), self.subnet(),
+                               self.subnet()):
+            dhcp_rpc = dhcp_rpc_base.DhcpRpcCallbackMixin()
+            self._register_agent_states()
+            hosta_id = self._get_agent_id(constants.AGENT_TYPE_DHCP,
+                                          DHCP_HOSTA)
+            hostc_id = self._get_agent_id(constants.AGENT_TYPE_DHCP,
+                                          DHCP_HOSTC)
+            dhcp_rpc.get_active_networks(self.adminContext, host=DHCP_HOSTA)
+            dhcp_rpc.get_active_networks(self.adminContext, host=DHCP_HOSTA)
+            # the remaining network goes to the second agent
+            dhcp_rpc.get_active_networks(self.adminContext, host=DHCP_HOSTC)
+            networks = self._list_networks_hosted_by_dhcp_agent(hosta_id)
+            num_hosta_nets = len(networks['networks'])
+            networks = self._list_networks_hosted_by_dhcp_agent(hostc_id)
+            num_hostc_nets = len(networks['networks'])
+        self.assertEqual(2, num_hosta_nets)
+        self.assertEqual(1, num_hostc_nets)
+
+    def test_network_schedule_least_networks(self):
+        scheduler = dhcp_agent_scheduler.LeastNetworksScheduler()
+        with contextlib.nested(self.network(),
+                               self.network()) as (net1, net2):
+            self._register_agent_states()
+            hosta_id = self._get_agent_id(constants.AGENT_TYPE_DHCP,
+                                          DHCP_HOSTA)
+            hostc_id = self._get_agent_id(constants.AGENT_TYPE_DHCP,
+                                          DHCP_HOSTC)
+            self._add_network_to_dhcp_agent(hosta_id,
+                                            net1['network']['id'])
+            agents = scheduler.schedule(self.agentscheduler_dbMinxin,
+                                        self.adminContext, net2['network'])
+        self.assertEqual([hostc_id], [agent['id'] for agent in agents])
+
+    def test_reschedule_networks_from_dead_agent(self):
+        plugin = self.agentscheduler_dbMinxin
+        with contextlib.nested(
+            self.subnet(),
+            mock.patch.object(plugin, 'dhcp_agent_notifier')
+        ) as (subnet, notifier):
+            network_id = subnet['subnet']['network_id']
+            dhcp_rpc = dhcp_rpc_base.DhcpRpcCallbackMixin()
+            self._register_agent_states()
+            dhcp_rpc.get_active_networks(self.adminContext, host=DHCP_HOSTA)
+            hosta_id = self._get_agent_id(constants.AGENT_TYPE_DHCP,
+                                          DHCP_HOSTA)
+            hostc_id = self._get_agent_id(constants.AGENT_TYPE_DHCP,
+                                          DHCP_HOSTC)
+            self._set_agent_dead(hosta_id)
+            plugin.reschedule_from_dead_agents(self.adminContext)
+            dhcp_agents = self._list_dhcp_agents_hosting_network(network_id)
+        self.assertEqual([hostc_id],
+                         [agent['id'] for agent in dhcp_agents['agents']])
+        notifier.network_removed_from_agent.assert_called_once_with(
+            mock.ANY, network_id, DHCP_HOSTA)
+        notifier.network_added_to_agent.assert_called_once_with(
+            mock.ANY, network_id, DHCP_HOSTC)
+
     def test_network_auto_schedule_with_hosted(self):
         # one agent hosts all the networks, other hosts none
         cfg.CONF.set_override('allow_overlapping_ips', True)
@@ -575,6 +664,154 @@ class OvsAgentSchedulerTestCase(test_l3_plugin.L3NatTestCaseMixin,
         self.assertEqual(1, len(l3_agents['agents']))
         self.assertEqual(L3_HOSTA, l3_agents['agents'][0]['host'])
 
+    def test_sync_routers_paged(self):
+        with contextlib.nested(self.router(), self.router(),
+                               self.router()) as routers:
+            l3_rpc = l3_rpc_base.L3RpcCallbackMixin()
+            self._register_agent_states()
+            router_ids = sorted(router['router']['id'] for router in routers)
+            page1 = l3_rpc.sync_routers(self.adminContext, host=L3_HOSTA,
+                                        limit=2)
+            page2 = l3_rpc.sync_routers(self.adminContext, host=L3_HOSTA,
+                                        limit=2, marker=page1[-1]['id'])
+        self.assertEqual(router_ids[:2], [router['id'] for router in page1])
+        self.assertEqual(router_ids[2:], [router['id'] for router in page2])
+
+    def test_router_auto_schedule_with_max_routers_per_agent(self):
+        cfg.CONF.set_override('max_routers_per_agent', 2)
+        with contextlib.nested(self.router(), self.router(),
+                               self.router()):
+            l3_rpc = l3_rpc_base.L3RpcCallbackMixin()
+            self._register_agent_states()
+            hosta_id = self._get_agent_id(constants.AGENT_TYPE_L3,
+                                          L3_HOSTA)
+            hostb_id = self._get_agent_id(constants.AGENT_TYPE_L3,
+                                          L3_HOSTB)
+            l3_rpc.sync_routers(self.adminContext, host=L3_HOSTA)
+            l3_rpc.sync_routers(self.adminContext, host=L3_HOSTA)
+            # the remaining router goes to the second agent
+            l3_rpc.sync_routers(self.adminContext, host=L3_HOSTB)
+            hosta_routers = self._list_routers_hosted_by_l3_agent(hosta_id)
+            num_hosta_routers = len(hosta_routers['routers'])
+            hostb_routers = self._list_routers_hosted_by_l3_agent(hostb_id)
+            num_hostb_routers = len(hostb_routers['routers'])
+        self.assertEqual(2, num_hosta_routers)
+        self.assertEqual(1, num_hostb_routers)
+
+    def test_router_schedule_least_routers(self):
+        scheduler = l3_agent_scheduler.LeastRoutersScheduler()
+        with contextlib.nested(self.router(), self.router(),
+                               self.router()) as routers:
+            self._register_agent_states()
+            hosta_id = self._get_agent_id(constants.AGENT_TYPE_L3,
+                                          L3_HOSTA)
+            hostb_id = self._get_agent_id(constants.AGENT_TYPE_L3,
+                                          L3_HOSTB)
+            self._add_router_to_l3_agent(hosta_id,
+                                         routers[0]['router']['id'])
+            self._add_router_to_l3_agent(hosta_id,
+                                         routers[1]['router']['id'])
+            agent = scheduler.schedule(self.agentscheduler_dbMinxin,
+                                       self.adminContext,
+                                       routers[2]['router'])
+        self.assertEqual(hostb_id, agent['id'])
+
+    def test_reschedule_routers_from_dead_agent(self):
+        plugin = self.agentscheduler_dbMinxin
+        with contextlib.nested(
+            self.router(), self.router(),
+            mock.patch.object(plugin, 'l3_agent_notifier')
+        ) as (router1, router2, notifier):
+            l3_rpc = l3_rpc_base.L3RpcCallbackMixin()
+            self._register_agent_states()
+            l3_rpc.sync_routers(self.adminContext, host=L3_HOSTA)
+            hosta_id = self._get_agent_id(constants.AGENT_TYPE_L3,
+                                          L3_HOSTA)
+            hostb_id = self._get_agent_id(constants.AGENT_TYPE_L3,
+                                          L3_HOSTB)
+            self._set_agent_dead(hosta_id)
+            plugin.reschedule_from_dead_agents(self.adminContext)
+            hosta_routers = self._list_routers_hosted_by_l3_agent(hosta_id)
+            hostb_routers = self._list_routers_hosted_by_l3_agent(hostb_id)
+        self.assertEqual(0, len(hosta_routers['routers']))
+        self.assertEqual(2, len(hostb_routers['routers']))
+        self.assertEqual(
+            2, notifier.router_removed_from_agent.call_count)
+        self.assertEqual(
+            [mock.call(mock.ANY, mock.ANY, L3_HOSTB)],
+            notifier.router_added_to_agent.call_args_list)
+
+    def test_reschedule_routers_from_dead_agent_in_batches(self):
+        cfg.CONF.set_override('agent_reschedule_batch_size', 1)
+        plugin = self.agentscheduler_dbMinxin
+        with contextlib.nested(
+            self.router(), self.router(),
+            mock.patch.object(plugin, 'l3_agent_notifier')):
+            l3_rpc = l3_rpc_base.L3RpcCallbackMixin()
+            self._register_agent_states()
+            l3_rpc.sync_routers(self.adminContext, host=L3_HOSTA)
+            hosta_id = self._get_agent_id(constants.AGENT_TYPE_L3,
+                                          L3_HOSTA)
+            self._set_agent_dead(hosta_id)
+            plugin.reschedule_from_dead_agents(self.adminContext)
+            num_after_first = len(self._list_routers_hosted_by_l3_agent(
+                hosta_id)['routers'])
+            plugin.reschedule_from_dead_agents(self.adminContext)
+            num_after_second = len(self._list_routers_hosted_by_l3_agent(
+                hosta_id)['routers'])
+        self.assertEqual(1, num_after_first)
+        self.assertEqual(0, num_after_second)
+
+    def test_reschedule_routers_after_unplaceable_batch(self):
+        cfg.CONF.set_override('agent_reschedule_batch_size', 1)
+        plugin = self.agentscheduler_dbMinxin
+        schedule_router = plugin.schedule_router
+        with contextlib.nested(
+            self.router(), self.router(),
+            mock.patch.object(plugin, 'l3_agent_notifier')
+        ) as (router1, router2, notifier):
+            router_ids = sorted([router1['router']['id'],
+                                 router2['router']['id']])
+            l3_rpc = l3_rpc_base.L3RpcCallbackMixin()
+            self._register_agent_states()
+            l3_rpc.sync_routers(self.adminContext, host=L3_HOSTA)
+            hosta_id = self._get_agent_id(constants.AGENT_TYPE_L3,
+                                          L3_HOSTA)
+            self._set_agent_dead(hosta_id)
+            # The first router of the batch order cannot be placed
+            with mock.patch.object(
+                plugin, 'schedule_router',
+                side_effect=lambda context, router: (
+                    None if router['id'] == router_ids[0]
+                    else schedule_router(context, router))):
+                for i in range(2):
+                    plugin.reschedule_from_dead_agents(self.adminContext)
+            hosta_routers = self._list_routers_hosted_by_l3_agent(hosta_id)
+        self.assertEqual([router_ids[0]],
+                         [router['id'] for router in hosta_routers['routers']])
+
+    def test_reschedule_routers_without_live_agent(self):
+        plugin = self.agentscheduler_dbMinxin
+        with contextlib.nested(
+            self.router(),
+            mock.patch.object(plugin, 'l3_agent_notifier')
+        ) as (router, notifier):
+            l3_rpc = l3_rpc_base.L3RpcCallbackMixin()
+            self._register_agent_states()
+            l3_rpc.sync_routers(self.adminContext, host=L3_HOSTA)
+            hosta_id = self._get_agent_id(constants.AGENT_TYPE_L3,
+                                          L3_HOSTA)
+            hostb_id = self._get_agent_id(constants.AGENT_TYPE_L3,
+                                          L3_HOSTB)
+            self._disable_agent(hostb_id)
+            self._set_agent_dead(hosta_id)
+            plugin.reschedule_from_dead_agents(self.adminContext)
+            l3_agents = self._list_l3_agents_hosting_router(
+                router['router']['id'])
+        self.assertEqual([hosta_id],
+                         [agent['id'] for agent in l3_agents['agents']])
+        self.assertFalse(notifier.router_removed_from_agent.called)
+
     def test_router_auto_schedule_restart_l3_agent(self):
         with self.router():
             l3_rpc = l3_rpc_base.L3RpcCallbackMixin()
@@ -1025,6 +1262,74 @@ class OvsDhcpAgentNotifierTestCase(test_l3_plugin.L3NatTestCaseMixin,
                 self.assertIn(expected, mock_dhcp.call_args_list)
 
 
+    def _register_dhcp_hosta(self):
+        dhcp_hosta = {
+            'binary': 'neutron-dhcp-agent',
+            'host': DHCP_HOSTA,
+            'topic': 'dhcp_agent',
+            'configurations': {'dhcp_driver': 'dhcp_driver',
+                               'use_namespaces': True,
+                               },
+            'agent_type': constants.AGENT_TYPE_DHCP}
+        self._register_one_agent_state(dhcp_hosta)
+
+    def _get_ports_update_casts(self, mock_dhcp):
+        return [call for call in mock_dhcp.call_args_list
+                if call[0][1]['method'] == 'ports_update_end']
+
+    def test_bulk_port_create_notification(self):
+        self._register_dhcp_hosta()
+        with mock.patch.object(self.dhcp_notifier, 'cast') as mock_dhcp:
+            with self.network(do_delete=False) as net1:
+                with self.subnet(network=net1, do_delete=False):
+                    network_id = net1['network']['id']
+                    res = self._create_port_bulk(self.fmt, 3, network_id,
+                                                 'port', True)
+                    ports = self.deserialize(self.fmt, res)['ports']
+            port_casts = self._get_ports_update_casts(mock_dhcp)
+        self.assertEqual(1, len(port_casts))
+        self.assertEqual(
+            mock.call(mock.ANY,
+                      self.dhcp_notifier.make_msg(
+                          'ports_update_end', payload={'ports': ports}),
+                      topic='dhcp_agent.' + DHCP_HOSTA, version='1.1'),
+            port_casts[0])
+        self.assertIn(
+            mock.call(mock.ANY,
+                      self.dhcp_notifier.make_msg(
+                          'network_create_end',
+                          payload={'network': {'id': network_id}}),
+                      topic='dhcp_agent.' + DHCP_HOSTA),
+            mock_dhcp.call_args_list)
+
+    def test_delayed_port_notifications_coalesced(self):
+        cfg.CONF.set_override('dhcp_agent_notification_delay', 1)
+        self._register_dhcp_hosta()
+        with contextlib.nested(
+            mock.patch.object(self.dhcp_notifier, 'cast'),
+            mock.patch('eventlet.spawn_after')
+        ) as (mock_dhcp, spawn_after):
+            with self.network(do_delete=False) as net1:
+                with self.subnet(network=net1, do_delete=False) as subnet1:
+                    with contextlib.nested(
+                        self.port(subnet=subnet1, no_delete=True),
+                        self.port(subnet=subnet1, no_delete=True)
+                    ) as (port1, port2):
+                        self.assertEqual(
+                            [], self._get_ports_update_casts(mock_dhcp))
+                        # flush as the timer would after the delay
+                        delay, flush, key = spawn_after.call_args[0]
+                        flush(key)
+            port_casts = self._get_ports_update_casts(mock_dhcp)
+        self.assertEqual(1, spawn_after.call_count)
+        self.assertEqual(1, delay)
+        self.assertEqual(1, len(port_casts))
+        self.assertEqual(
+            [port1['port']['id'], port2['port']['id']],
+            [port['id'] for port in port_casts[0][0][1]['args']['payload'][
+                'ports']])
+
+
 class OvsL3AgentNotifierTestCase(test_l3_plugin.L3NatTestCaseMixin,
                                  test_agent_ext_plugin.AgentDBTestMixIn,
                                  AgentSchedulerTestMixIn,
@@ -13,7 +13,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import contextlib
+
+import mock
+
 from neutron.extensions import portbindings
+from neutron.extensions import securitygroup as ext_sg
+from neutron import manager
+from neutron.plugins.openvswitch import ovs_neutron_plugin
 from neutron.tests.unit import _test_extension_portbindings as test_bindings
 from neutron.tests.unit import test_db_plugin as test_plugin
 from neutron.tests.unit import test_security_groups_rpc as test_sg_rpc
@@ -63,6 +70,33 @@ class TestOpenvswitchPortBinding(OpenvswitchPluginV2TestCase,
         test_sg_rpc.set_firewall_driver(self.FIREWALL_DRIVER)
         super(TestOpenvswitchPortBinding, self).setUp()
 
+    def test_create_ports_bulk_native_with_extensions(self):
+        plugin = manager.NeutronManager.get_plugin()
+        with contextlib.nested(
+            self.network(),
+            mock.patch.object(ovs_neutron_plugin.OVSNeutronPluginV2,
+                              'create_port'),
+            mock.patch.object(plugin, 'notifier')
+        ) as (net, create_port, notifier):
+            res = self._create_port_bulk(
+                self.fmt, 2, net['network']['id'], 'test', True,
+                override={0: {portbindings.HOST_ID: 'fake_host'}})
+            self.assertEqual(201, res.status_int)
+            ports = self.deserialize(self.fmt, res)['ports']
+            # The batch did not go through create_port
+            self.assertFalse(create_port.called)
+            self.assertEqual('fake_host', ports[0][portbindings.HOST_ID])
+            # One notification for the whole batch
+            self.assertEqual(
+                1, notifier.security_groups_member_updated.call_count)
+            port = self._show('ports', ports[0]['id'])['port']
+            self.assertEqual('fake_host', port[portbindings.HOST_ID])
+            for port in ports:
+                self.assertEqual('DOWN', port['status'])
+                if self.HAS_PORT_FILTER:
+                    self.assertEqual(1, len(port[ext_sg.SECURITYGROUPS]))
+                self._delete('ports', port['id'])
+
 
 class TestOpenvswitchPortBindingNoSG(TestOpenvswitchPortBinding):
     HAS_PORT_FILTER = False
@@ -13,12 +13,17 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import contextlib
+
+import mock
 import testtools
 from testtools import matchers
 
 from neutron.common import exceptions as q_exc
 from neutron.db import api as db
+from neutron.db import sqlalchemyutils
 from neutron.plugins.openvswitch import ovs_db_v2
+from neutron.plugins.openvswitch import ovs_models_v2
 from neutron.tests import base
 from neutron.tests.unit import test_db_plugin as test_plugin
 
@@ -137,6 +142,56 @@ class VlanAllocationsTest(base.BaseTestCase):
             ovs_db_v2.release_vlan(self.session, PHYS_NET, vlan_id,
                                    VLAN_RANGES)
 
+    def test_vlan_allocated_concurrently(self):
+        choices = []
+
+        def choice_allocated_concurrently(rows):
+            # The first row picked is reserved by another request
+            row = rows[0]
+            if not choices:
+                ovs_db_v2.reserve_specific_vlan(db.get_session(), *row)
+            choices.append(row)
+            return row
+
+        with mock.patch.object(sqlalchemyutils.random, 'choice',
+                               side_effect=choice_allocated_concurrently):
+            physical_network, vlan_id = ovs_db_v2.reserve_vlan(self.session)
+        self.assertEqual(2, len(choices))
+        self.assertNotEqual(choices[0], (physical_network, vlan_id))
+        self.assertTrue(ovs_db_v2.get_vlan_allocation(PHYS_NET,
+                                                      vlan_id).allocated)
+
+    def test_vlan_always_allocated_concurrently(self):
+        def choice_allocated_concurrently(rows):
+            ovs_db_v2.reserve_specific_vlan(db.get_session(), *rows[0])
+            return rows[0]
+
+        with mock.patch.object(sqlalchemyutils.random, 'choice',
+                               side_effect=choice_allocated_concurrently):
+            with testtools.ExpectedException(q_exc.NoNetworkAvailable):
+                ovs_db_v2.reserve_vlan(self.session)
+
+    def test_vlan_snapshot_candidates_stale(self):
+        # In a REPEATABLE READ transaction, the rows claimed concurrently
+        # still look free to the candidate queries, only the UPDATEs
+        # see that they are not.
+        choices = []
+
+        def choice(rows):
+            for row in rows:
+                self.assertNotIn(row, choices)
+            choices.append(rows[0])
+            return rows[0]
+
+        with contextlib.nested(
+            mock.patch.object(sqlalchemyutils.random, 'choice',
+                              side_effect=choice),
+            mock.patch('sqlalchemy.orm.Query.update', return_value=0)):
+            physical_network, vlan_id = ovs_db_v2.reserve_vlan(self.session)
+        self.assertEqual(sqlalchemyutils.ALLOCATION_ATTEMPTS, len(choices))
+        self.assertTrue(ovs_db_v2.get_vlan_allocation(PHYS_NET,
+                                                      vlan_id).allocated)
+
     def test_specific_vlan_inside_pool(self):
         vlan_id = VLAN_MIN + 5
         self.assertFalse(ovs_db_v2.get_vlan_allocation(PHYS_NET,
@@ -210,6 +265,27 @@ class TunnelAllocationsTest(base.BaseTestCase):
                          allocated)
         self.assertIsNone(ovs_db_v2.get_tunnel_allocation(TUN_MAX + 5 + 1))
 
+    def test_sync_tunnel_allocations_in_chunks(self):
+        ovs_db_v2.reserve_specific_tunnel(self.session, TUN_MAX + 20)
+        with mock.patch.object(sqlalchemyutils, 'SYNC_INSERT_CHUNK', 3):
+            ovs_db_v2.sync_tunnel_allocations([(TUN_MIN, TUN_MAX + 10),
+                                               (TUN_MAX, TUN_MAX + 12)])
+
+        self.assertIsNone(ovs_db_v2.get_tunnel_allocation(TUN_MIN - 1))
+        for tunnel_id in xrange(TUN_MIN, TUN_MAX + 13):
+            self.assertFalse(ovs_db_v2.get_tunnel_allocation(tunnel_id).
+                             allocated)
+        self.assertIsNone(ovs_db_v2.get_tunnel_allocation(TUN_MAX + 13))
+        self.assertTrue(ovs_db_v2.get_tunnel_allocation(TUN_MAX + 20).
+                        allocated)
+
+    def test_sync_tunnel_allocations_unchanged(self):
+        table = ovs_models_v2.TunnelAllocation.__table__
+        with mock.patch.object(table, 'insert') as insert:
+            ovs_db_v2.sync_tunnel_allocations(TUNNEL_RANGES)
+            self.assertFalse(insert.called)
+        self.assertFalse(ovs_db_v2.get_tunnel_allocation(TUN_MAX).allocated)
+
     def test_tunnel_pool(self):
         tunnel_ids = set()
         for x in xrange(TUN_MIN, TUN_MAX + 1):
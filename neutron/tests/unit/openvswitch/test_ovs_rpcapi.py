@@ -18,10 +18,16 @@
 Unit Tests for openvswitch rpc
 """
 
+import collections
+
+import mock
+from oslo.config import cfg
 import stubout
 
 from neutron.agent import rpc as agent_rpc
 from neutron.common import topics
+from neutron import context as neutron_context
+from neutron.extensions import portbindings
 from neutron.openstack.common import context
 from neutron.openstack.common import rpc
 from neutron.plugins.openvswitch.common import constants
@@ -75,7 +81,35 @@ class rpcApiTestCase(base.BaseTestCase):
                                                  topics.PORT,
                                                  topics.UPDATE),
                            'port_update', rpc_method='fanout_cast',
-                           port='fake_port',
+                           port={'id': 'fake_port'},
+                           network_type='fake_network_type',
+                           segmentation_id='fake_segmentation_id',
+                           physical_network='fake_physical_network')
+
+    def test_port_update_bound_port(self):
+        cfg.CONF.set_override('rpc_port_update_fanout', False, 'AGENT')
+        rpcapi = povs.AgentNotifierApi(topics.AGENT)
+        self._test_ovs_api(rpcapi,
+                           topics.get_topic_name(topics.AGENT,
+                                                 topics.PORT,
+                                                 topics.UPDATE,
+                                                 'fake_host'),
+                           'port_update', rpc_method='cast',
+                           port={'id': 'fake_port',
+                                 portbindings.HOST_ID: 'fake_host'},
+                           network_type='fake_network_type',
+                           segmentation_id='fake_segmentation_id',
+                           physical_network='fake_physical_network')
+
+    def test_port_update_bound_port_fanout(self):
+        rpcapi = povs.AgentNotifierApi(topics.AGENT)
+        self._test_ovs_api(rpcapi,
+                           topics.get_topic_name(topics.AGENT,
+                                                 topics.PORT,
+                                                 topics.UPDATE),
+                           'port_update', rpc_method='fanout_cast',
+                           port={'id': 'fake_port',
+                                 portbindings.HOST_ID: 'fake_host'},
                            network_type='fake_network_type',
                            segmentation_id='fake_segmentation_id',
                            physical_network='fake_physical_network')
@@ -116,3 +150,48 @@ class rpcApiTestCase(base.BaseTestCase):
                            'update_device_up', rpc_method='call',
                            device='fake_device',
                            agent_id='fake_agent_id')
+
+
+class PortUpdateMessageCountTestCase(base.BaseTestCase):
+    """Count the port_update messages delivered to a fleet of agents."""
+
+    HOSTS = 100
+
+    def setUp(self):
+        super(PortUpdateMessageCountTestCase, self).setUp()
+        cfg.CONF.set_override('rpc_backend',
+                              'neutron.openstack.common.rpc.impl_fake')
+        cfg.CONF.set_override('rpc_port_update_fanout', False, 'AGENT')
+        self.received = collections.defaultdict(int)
+        for i in range(self.HOSTS):
+            host = 'host%d' % i
+            dispatcher = mock.Mock()
+            dispatcher.dispatch.side_effect = self._make_receiver(host)
+            connection = agent_rpc.create_consumers(
+                dispatcher, topics.AGENT,
+                [[topics.PORT, topics.UPDATE, host]])
+            self.addCleanup(connection.close)
+        self.notifier = povs.AgentNotifierApi(topics.AGENT)
+        self.context = neutron_context.get_admin_context()
+
+    def _make_receiver(self, host):
+        def receive(*args, **kwargs):
+            self.received[host] += 1
+        return receive
+
+    def _update_ports(self, hosts):
+        for i, host in enumerate(hosts):
+            self.notifier.port_update(self.context,
+                                      {'id': 'port%d' % i,
+                                       portbindings.HOST_ID: host},
+                                      'vlan', 1, 'physnet1')
+
+    def test_bound_ports_notify_their_host_only(self):
+        self._update_ports(['host%d' % i for i in range(self.HOSTS)])
+        # one message per update instead of one per agent and update
+        self.assertEqual(self.HOSTS, sum(self.received.values()))
+        self.assertEqual(set([1]), set(self.received.values()))
+
+    def test_unbound_ports_notify_all_hosts(self):
+        self._update_ports([None, None])
+        self.assertEqual(2 * self.HOSTS, sum(self.received.values()))
@@ -16,8 +16,10 @@
 #    under the License.
 
 import copy
+import datetime
 import time
 
+import mock
 from oslo.config import cfg
 from webob import exc
 
@@ -29,6 +31,8 @@ from neutron import context
 from neutron.db import agents_db
 from neutron.db import db_base_plugin_v2
 from neutron.extensions import agent
+from neutron import manager
+from neutron.openstack.common import jsonutils
 from neutron.openstack.common import log as logging
 from neutron.openstack.common import timeutils
 from neutron.openstack.common import uuidutils
@@ -218,6 +222,71 @@ class AgentDBTestCase(AgentDBTestMixIn,
             query_string='binary=neutron-l3-agent&host=' + L3_HOSTB)
         self.assertFalse(agents['agents'][0]['alive'])
 
+    def _report_state(self, agent_state):
+        callback = agents_db.AgentExtRpcCallback()
+        callback.report_state(self.adminContext,
+                              agent_state={'agent_state': agent_state},
+                              time=timeutils.strtime())
+
+    def _get_agent_db(self, agent_state):
+        self.adminContext.session.expire_all()
+        return self.adminContext.session.query(agents_db.Agent).filter_by(
+            agent_type=agent_state['agent_type'],
+            host=agent_state['host']).one()
+
+    def test_unchanged_report_only_refreshes_heartbeat(self):
+        cfg.CONF.set_override('agent_heartbeat_flush_interval', 2)
+        l3_hosta = self._register_agent_states()[0]
+        agent_db = self._get_agent_db(l3_hosta)
+        heartbeat = agent_db.heartbeat_timestamp
+        later = heartbeat + datetime.timedelta(seconds=3)
+        timeutils.set_time_override(later)
+        self.addCleanup(timeutils.clear_time_override)
+        self._report_state(l3_hosta)
+        self.assertEqual(heartbeat,
+                         self._get_agent_db(l3_hosta).heartbeat_timestamp)
+        plugin = manager.NeutronManager.get_plugin()
+        self.assertEqual(later, plugin.get_agent(
+            self.adminContext, agent_db.id)['heartbeat_timestamp'])
+        plugin._heartbeats.flush(self.adminContext)
+        self.assertEqual(later,
+                         self._get_agent_db(l3_hosta).heartbeat_timestamp)
+
+    def test_unchanged_report_written_without_flush_interval(self):
+        l3_hosta = self._register_agent_states()[0]
+        later = (self._get_agent_db(l3_hosta).heartbeat_timestamp +
+                 datetime.timedelta(seconds=3))
+        timeutils.set_time_override(later)
+        self.addCleanup(timeutils.clear_time_override)
+        self._report_state(l3_hosta)
+        self.assertEqual(later,
+                         self._get_agent_db(l3_hosta).heartbeat_timestamp)
+
+    def test_flush_interval_longer_than_down_time_warns(self):
+        cfg.CONF.set_override('agent_down_time', 5)
+        cfg.CONF.set_override('agent_heartbeat_flush_interval', 2)
+        heartbeats = agents_db.AgentHeartbeats()
+        with mock.patch.object(agents_db.LOG, 'warning') as warning:
+            with mock.patch.object(agents_db.loopingcall,
+                                   'FixedIntervalLoopingCall'):
+                heartbeats.beat('fake_agent', timeutils.utcnow())
+        self.assertTrue(warning.called)
+
+    def test_changed_report_is_written(self):
+        l3_hosta = self._register_agent_states()[0]
+        l3_hosta['configurations']['routers'] = 3
+        self._report_state(l3_hosta)
+        agent_db = self._get_agent_db(l3_hosta)
+        self.assertEqual(3, jsonutils.loads(
+            agent_db.configurations)['routers'])
+
+    def test_report_recreates_deleted_agent(self):
+        l3_hosta = self._register_agent_states()[0]
+        agent_id = self._get_agent_db(l3_hosta).id
+        self._delete('agents', agent_id)
+        self._report_state(l3_hosta)
+        self.assertNotEqual(agent_id, self._get_agent_db(l3_hosta).id)
+
 
 class AgentDBTestCaseXML(AgentDBTestCase):
     fmt = 'xml'
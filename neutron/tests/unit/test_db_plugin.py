@@ -36,6 +36,7 @@ from neutron.common import config
 from neutron.common import exceptions as q_exc
 from neutron.common.test_lib import test_config
 from neutron import context
+from neutron.db import agents_db
 from neutron.db import api as db
 from neutron.db import db_base_plugin_v2
 from neutron.db import models_v2
@@ -83,6 +84,9 @@ class NeutronDbPluginV2TestCase(testlib_api.WebTestCase):
         NeutronManager._instance = None
         # Make sure at each test according extensions for the plugin is loaded
         PluginAwareExtensionManager._instance = None
+        # Make sure agent heartbeats kept in memory by a previous test
+        # are not reused
+        agents_db.AgentDbMixin._heartbeats = agents_db.AgentHeartbeats()
         # Save the attributes map in case the plugin will alter it
         # loading extensions
         # Note(salvatore-orlando): shallow copy is not good enough in
@@ -830,6 +834,54 @@ class TestPortsV2(NeutronDbPluginV2TestCase):
             for p in self.deserialize(self.fmt, res)['ports']:
                 self._delete('ports', p['id'])
 
+    def test_create_ports_bulk_native_allocates_distinct_addresses(self):
+        if self._skip_native_bulk:
+            self.skipTest("Plugin does not support native bulk port create")
+        with self.subnet() as subnet:
+            net_id = subnet['subnet']['network_id']
+            res = self._create_port_bulk(self.fmt, 10, net_id, 'test', True)
+            self.assertEqual(res.status_int, 201)
+            ports = self.deserialize(self.fmt, res)['ports']
+            macs = set(p['mac_address'] for p in ports)
+            ips = set(p['fixed_ips'][0]['ip_address'] for p in ports)
+            self.assertEqual(len(macs), 10)
+            self.assertEqual(len(ips), 10)
+            for p in ports:
+                self.assertEqual(p['fixed_ips'][0]['subnet_id'],
+                                 subnet['subnet']['id'])
+                self._delete('ports', p['id'])
+
+    def test_create_ports_bulk_native_duplicate_mac(self):
+        if self._skip_native_bulk:
+            self.skipTest("Plugin does not support native bulk port create")
+        with self.network() as net:
+            overrides = {0: {'mac_address': '00:11:22:33:44:55'},
+                         1: {'mac_address': '00:11:22:33:44:55'}}
+            res = self._create_port_bulk(self.fmt, 2, net['network']['id'],
+                                         'test', True,
+                                         override=overrides)
+            self.assertEqual(res.status_int, 409)
+            req = self.new_list_request('ports')
+            ports = self.deserialize(self.fmt, req.get_response(self.api))
+            self.assertEqual(len(ports['ports']), 0)
+
+    def test_create_ports_bulk_native_duplicate_ip(self):
+        if self._skip_native_bulk:
+            self.skipTest("Plugin does not support native bulk port create")
+        with self.subnet() as subnet:
+            fixed_ips = [{'subnet_id': subnet['subnet']['id'],
+                          'ip_address': '10.0.0.5'}]
+            overrides = {0: {'fixed_ips': fixed_ips},
+                         1: {'fixed_ips': fixed_ips}}
+            res = self._create_port_bulk(self.fmt, 2,
+                                         subnet['subnet']['network_id'],
+                                         'test', True,
+                                         override=overrides)
+            self.assertEqual(res.status_int, 409)
+            req = self.new_list_request('ports')
+            ports = self.deserialize(self.fmt, req.get_response(self.api))
+            self.assertEqual(len(ports['ports']), 0)
+
     def test_create_ports_bulk_emulated(self):
         real_has_attr = hasattr
 
@@ -761,6 +761,18 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
         self.call_driver.assert_called_once_with('reload_allocations',
                                                  fake_network)
 
+    def test_ports_update_end(self):
+        payload = dict(ports=[vars(fake_port1), vars(fake_port2)])
+        self.cache.get_network_by_id.return_value = fake_network
+        self.dhcp.ports_update_end(None, payload)
+        self.cache.assert_has_calls(
+            [mock.call.get_network_by_id(fake_port1.network_id),
+             mock.call.put_port(mock.ANY),
+             mock.call.get_network_by_id(fake_port2.network_id),
+             mock.call.put_port(mock.ANY)])
+        self.call_driver.assert_called_once_with('reload_allocations',
+                                                 fake_network)
+
     def test_port_delete_end(self):
         payload = dict(port_id=fake_port2.id)
         self.cache.get_network_by_id.return_value = fake_network
@@ -823,7 +835,28 @@ class TestDhcpPluginApiProxy(base.BaseTestCase):
     def test_get_active_networks_info(self):
         self.proxy.get_active_networks_info()
         self.make_msg.assert_called_once_with('get_active_networks_info',
-                                              host='foo')
+                                              host='foo', limit=500,
+                                              marker=None)
+
+    def test_get_active_networks_info_paged(self):
+        cfg.CONF.set_override('rpc_page_size', 2, 'AGENT')
+        self.call.side_effect = [[dict(id='a'), dict(id='b')],
+                                 [dict(id='c')]]
+        retval = self.proxy.get_active_networks_info()
+        self.assertEqual([n.id for n in retval], ['a', 'b', 'c'])
+        self.assertEqual(self.make_msg.call_args_list,
+                         [mock.call('get_active_networks_info', host='foo',
+                                    limit=2, marker=None),
+                          mock.call('get_active_networks_info', host='foo',
+                                    limit=2, marker='b')])
+
+    def test_get_active_networks_info_paging_unsupported(self):
+        cfg.CONF.set_override('rpc_page_size', 2, 'AGENT')
+        networks = [dict(id='a'), dict(id='b')]
+        self.call.return_value = networks
+        retval = self.proxy.get_active_networks_info()
+        self.assertEqual([n.id for n in retval], ['a', 'b'])
+        self.assertEqual(self.call.call_count, 2)
 
     def test_create_dhcp_port(self):
         port_body = (
@@ -17,11 +17,13 @@ import contextlib
 import os
 
 import mock
+from sqlalchemy import event
 import webob.exc
 
 from neutron.api.v2 import attributes as attr
 from neutron.common.test_lib import test_config
 from neutron import context
+from neutron.db import api as db_api
 from neutron.db import db_base_plugin_v2
 from neutron.db import securitygroups_db
 from neutron.extensions import securitygroup as ext_sg
@@ -1022,6 +1024,45 @@ class TestSecurityGroups(SecurityGroupDBTestCase):
             self.deserialize(self.fmt, res)
             self.assertEqual(res.status_int, 201)
 
+    def test_create_security_group_rule_bulk_native_many_rules(self):
+        if self._skip_native_bulk:
+            self.skipTest("Plugin does not support native bulk "
+                          "security_group_rule create")
+        statements = []
+        counting = []
+
+        def _count_statement(conn, cursor, statement, parameters, context,
+                             executemany):
+            if counting:
+                statements.append((statement, executemany and parameters))
+
+        engine = db_api.get_session().get_bind()
+        with self.security_group() as sg:
+            sg_id = sg['security_group']['id']
+            rules = {'security_group_rules': [
+                self._build_security_group_rule(
+                    sg_id, 'ingress', 'tcp', str(port), str(port),
+                    '10.0.0.1/24')['security_group_rule']
+                for port in range(1000, 1050)]}
+            event.listen(engine, 'before_cursor_execute', _count_statement)
+            counting.append(True)
+            res = self._create_security_group_rule(self.fmt, rules)
+            del counting[:]
+            self.assertEqual(res.status_int, 201)
+            created = self.deserialize(self.fmt, res)['security_group_rules']
+            self.assertEqual(range(1000, 1050),
+                             sorted(r['port_range_min'] for r in created))
+            res = self._list('security-group-rules',
+                             query_params='security_group_id=%s' % sg_id)
+            self.assertEqual(52, len(res['security_group_rules']))
+            # the rules are checked and inserted with a few statements,
+            # not one per rule
+            inserts = [len(rows) for statement, rows in statements
+                       if rows and statement.startswith(
+                           'INSERT INTO securitygrouprules')]
+            self.assertIn(50, inserts)
+            self.assertTrue(len(statements) < 20)
+
     def test_create_security_group_rule_bulk_emulated(self):
         real_has_attr = hasattr
 
@@ -20,6 +20,7 @@ from mock import call
 from oslo.config import cfg
 
 from neutron.agent.common import config as a_cfg
+from neutron.agent import firewall
 from neutron.agent.linux.iptables_firewall import IptablesFirewallDriver
 from neutron.tests import base
 from neutron.tests.unit import test_api_v2
@@ -896,6 +897,67 @@ class IptablesFirewallTestCase(base.BaseTestCase):
 
         self.v4filter_inst.assert_has_calls(calls)
 
+    def test_expand_port_sg_rules_shared_security_group(self):
+        port = self._fake_port()
+        port['security_groups'] = ['fake_sgid']
+        port['security_group_rules'] = [{'ethertype': 'IPv4',
+                                         'direction': 'ingress',
+                                         'protocol': 'udp'}]
+        self.firewall.update_security_group_rules(
+            'fake_sgid',
+            [{'ethertype': 'IPv4', 'direction': 'ingress',
+              'protocol': 'tcp'},
+             {'ethertype': 'IPv4', 'direction': 'egress',
+              'remote_group_id': 'fake_sgid'},
+             {'ethertype': 'IPv6', 'direction': 'ingress',
+              'remote_group_id': 'fake_sgid'}])
+        self.firewall.update_security_group_members(
+            'fake_sgid', [FAKE_IP['IPv4'], '10.0.0.2', 'fe80::2'])
+        port = self.firewall._expand_port_sg_rules(port)
+        self.assertEqual(
+            [{'ethertype': 'IPv4', 'direction': 'ingress',
+              'protocol': 'udp'},
+             {'ethertype': 'IPv4', 'direction': 'ingress',
+              'protocol': 'tcp'},
+             {'ethertype': 'IPv6', 'direction': 'ingress',
+              'remote_group_id': 'fake_sgid',
+              'source_ip_prefix': 'fe80::2/128'}],
+            self.firewall._select_sgr_by_direction(port, 'ingress'))
+        self.assertEqual(
+            [{'ethertype': 'IPv4', 'direction': 'egress',
+              'remote_group_id': 'fake_sgid',
+              'dest_ip_prefix': '10.0.0.2/32'}],
+            self.firewall._select_sgr_by_direction(port, 'egress'))
+
+    def test_sg_rules_expanded_once_per_port(self):
+        port = self._fake_port()
+        port['security_groups'] = ['fake_sgid']
+        with mock.patch.object(firewall, 'expand_port_sg_rules',
+                               return_value=[]) as expand:
+            self.firewall.prepare_port_filter(port)
+        self.assertEqual(1, expand.call_count)
+
+    def test_remove_port_filter_prunes_security_groups(self):
+        port = self._fake_port()
+        port['security_groups'] = ['fake_sgid']
+        other_port = self._fake_port()
+        other_port['device'] = 'tapother_dev'
+        other_port['security_groups'] = ['other_sgid']
+        self.firewall.update_security_group_rules(
+            'fake_sgid', [{'ethertype': 'IPv4', 'direction': 'ingress',
+                           'remote_group_id': 'remote_sgid'}])
+        self.firewall.update_security_group_rules('other_sgid', [])
+        self.firewall.update_security_group_members(
+            'remote_sgid', ['10.0.0.2'])
+        self.firewall.prepare_port_filter(port)
+        self.firewall.prepare_port_filter(other_port)
+        self.firewall.remove_port_filter(other_port)
+        self.assertEqual(['fake_sgid'], self.firewall.sg_rules.keys())
+        self.assertEqual(['remote_sgid'], self.firewall.sg_member_ips.keys())
+        self.firewall.remove_port_filter(port)
+        self.assertEqual({}, self.firewall.sg_rules)
+        self.assertEqual({}, self.firewall.sg_member_ips)
+
     def test_remove_unknown_port(self):
         port = self._fake_port()
         self.firewall.remove_port_filter(port)
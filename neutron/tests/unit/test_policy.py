@@ -15,12 +15,15 @@
 
 """Test of Policy Engine For Neutron"""
 
+import contextlib
 import json
 import StringIO
+import time
 import urllib2
 
 import fixtures
 import mock
+from oslo.config import cfg
 
 import neutron
 from neutron.common import exceptions
@@ -64,6 +67,29 @@ class PolicyFileTestCase(base.BaseTestCase):
                               action,
                               self.target)
 
+    def test_policy_file_checked_once_per_interval(self):
+        def fake_find_config_file(_1, _2):
+            return self.tempdir.join('policy')
+
+        cfg.CONF.set_override('policy_reload_interval', 60)
+        with contextlib.nested(
+            mock.patch.object(neutron.common.utils,
+                              'find_config_file',
+                              new=fake_find_config_file),
+            mock.patch.object(neutron.common.utils,
+                              'read_cached_file',
+                              wraps=neutron.common.utils.read_cached_file)
+        ) as (find_config_file, read_cached_file):
+            with open(fake_find_config_file(None, None), "w") as policyfile:
+                policyfile.write("""{"example:test": ""}""")
+            for i in range(3):
+                policy.enforce(self.context, "example:test", self.target)
+            self.assertEqual(read_cached_file.call_count, 1)
+            with mock.patch.object(policy.time, 'time',
+                                   return_value=time.time() + 61):
+                policy.enforce(self.context, "example:test", self.target)
+            self.assertEqual(read_cached_file.call_count, 2)
+
 
 class PolicyTestCase(base.BaseTestCase):
     def setUp(self):
@@ -399,6 +425,29 @@ class NeutronPolicyTestCase(base.BaseTestCase):
     def test_enforce_tenant_id_check_invalid_parent_resource_raises(self):
         self._test_enforce_tenant_id_raises('tenant_id:%(foobaz_tenant_id)s')
 
+    def test_check_is_admin_resolved_once_per_role_set(self):
+        common_policy.set_rules(common_policy.Rules(self.rules))
+        with contextlib.nested(
+            mock.patch.object(policy, 'init'),
+            mock.patch.object(common_policy, 'check',
+                              wraps=common_policy.check)
+        ) as (init, check):
+            self.assertTrue(context.Context('', 'fake',
+                                            roles=['admin']).is_admin)
+            self.assertTrue(context.Context('', 'fake',
+                                            roles=['AdMiN']).is_admin)
+            self.assertEqual(check.call_count, 1)
+            self.assertFalse(context.Context('', 'fake',
+                                             roles=['user']).is_admin)
+            self.assertEqual(check.call_count, 2)
+            # Rules which are not based on roles only are always evaluated
+            self.rules[policy.ADMIN_CTX_POLICY] = common_policy.parse_rule(
+                self.admin_or_owner_legacy)
+            common_policy.set_rules(common_policy.Rules(self.rules))
+            self.assertTrue(context.Context('', 'admin_tenant').is_admin)
+            self.assertTrue(context.Context('', 'admin_tenant').is_admin)
+            self.assertEqual(check.call_count, 4)
+
     def test_get_roles_context_is_admin_rule_missing(self):
         rules = dict((k, common_policy.parse_rule(v)) for k, v in {
             "some_other_rule": "role:admin",
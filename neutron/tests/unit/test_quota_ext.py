@@ -15,6 +15,7 @@ from neutron.plugins.linuxbridge.db import l2network_db_v2
 from neutron import quota
 from neutron.tests import base
 from neutron.tests.unit import test_api_v2
+from neutron.tests.unit import test_db_plugin
 from neutron.tests.unit import test_extensions
 from neutron.tests.unit import testlib_api
 
@@ -51,6 +52,10 @@ class QuotaExtensionTestCase(testlib_api.WebTestCase):
             group='QUOTAS')
         quota.QUOTAS = quota.QuotaEngine()
         quota.register_resources_from_config()
+        cache_patcher = mock.patch.object(quota_db.DbQuotaDriver, '_cache',
+                                          quota_db.TenantQuotaCache())
+        cache_patcher.start()
+        self.addCleanup(cache_patcher.stop)
         self._plugin_patcher = mock.patch(TARGET_PLUGIN, autospec=True)
         self.plugin = self._plugin_patcher.start()
         self.plugin.return_value.supported_extension_aliases = ['quotas']
@@ -285,6 +290,63 @@ class QuotaExtensionDbTestCase(QuotaExtensionTestCase):
                                      tenant_id,
                                      network=-2)
 
+    def test_quotas_limits_cached_until_updated(self):
+        tenant_id = 'tenant_id1'
+        env = {'neutron.context': context.Context('', tenant_id,
+                                                  is_admin=True)}
+        ctx = context.get_admin_context()
+        quotas = {'quota': {'network': 5}}
+        quota.QUOTAS.start_cache_listener()
+        with mock.patch.object(quota_db.QuotaCacheNotifyAPI,
+                               'fanout_cast') as fanout_cast:
+            self.api.put(_get_path('quotas', id=tenant_id, fmt=self.fmt),
+                         self.serialize(quotas), extra_environ=env)
+            self.assertEqual(fanout_cast.call_count, 1)
+            limits = quota_db.DbQuotaDriver.get_tenant_quotas(
+                ctx, quota.QUOTAS.resources, tenant_id)
+            self.assertEqual(limits['network'], 5)
+            # Changes not made through the driver go unnoticed...
+            with ctx.session.begin():
+                ctx.session.query(quota_db.Quota).update({'limit': 6})
+            limits = quota_db.DbQuotaDriver.get_tenant_quotas(
+                ctx, quota.QUOTAS.resources, tenant_id)
+            self.assertEqual(limits['network'], 5)
+            # ...until a server notifies the update
+            quota_db.QuotaCacheRpcCallback(
+                quota_db.DbQuotaDriver._cache).tenant_quota_updated(
+                    ctx, tenant_id=tenant_id)
+            limits = quota_db.DbQuotaDriver.get_tenant_quotas(
+                ctx, quota.QUOTAS.resources, tenant_id)
+            self.assertEqual(limits['network'], 6)
+            self.api.delete(_get_path('quotas', id=tenant_id, fmt=self.fmt),
+                            extra_environ=env)
+            self.assertEqual(fanout_cast.call_count, 2)
+            limits = quota_db.DbQuotaDriver.get_tenant_quotas(
+                ctx, quota.QUOTAS.resources, tenant_id)
+            self.assertEqual(limits['network'], 10)
+
+    def test_quotas_limits_not_cached_without_ttl(self):
+        cfg.CONF.set_override('quota_cache_ttl', 0, group='QUOTAS')
+        ctx = context.get_admin_context()
+        quota_db.DbQuotaDriver.get_tenant_quotas(
+            ctx, quota.QUOTAS.resources, 'tenant_id1')
+        self.assertIsNone(quota_db.DbQuotaDriver._cache.get('tenant_id1'))
+
+    def test_quotas_limits_not_cached_without_listener(self):
+        ctx = context.get_admin_context()
+        quota_db.DbQuotaDriver.get_tenant_quotas(
+            ctx, quota.QUOTAS.resources, 'tenant_id1')
+        self.assertIsNone(quota_db.DbQuotaDriver._cache.get('tenant_id1'))
+
+    def test_quotas_limits_not_cached_when_listener_fails(self):
+        ctx = context.get_admin_context()
+        with mock.patch.object(quota_db.rpc, 'create_connection',
+                               side_effect=Exception()):
+            quota.QUOTAS.start_cache_listener()
+        quota_db.DbQuotaDriver.get_tenant_quotas(
+            ctx, quota.QUOTAS.resources, 'tenant_id1')
+        self.assertIsNone(quota_db.DbQuotaDriver._cache.get('tenant_id1'))
+
     def test_quotas_get_tenant_from_request_context(self):
         tenant_id = 'tenant_id1'
         env = {'neutron.context': context.Context('', tenant_id,
@@ -384,3 +446,68 @@ class TestDbQuotaDriver(base.BaseTestCase):
             get_tenant_quotas.assert_called_once_with(ctx,
                                                       default_quotas,
                                                       target_tenant)
+
+
+class TestUsageQuotaDriver(test_db_plugin.NeutronDbPluginV2TestCase):
+    """Test for neutron.db.quota_db.UsageQuotaDriver."""
+
+    def setUp(self):
+        super(TestUsageQuotaDriver, self).setUp()
+        cfg.CONF.set_override('quota_network', 2, group='QUOTAS')
+        cfg.CONF.set_override('usage_resync_interval', 0, group='QUOTAS')
+        self.driver = quota_db.UsageQuotaDriver()
+        cache_patcher = mock.patch.object(quota_db.DbQuotaDriver, '_cache',
+                                          quota_db.TenantQuotaCache())
+        cache_patcher.start()
+        self.addCleanup(cache_patcher.stop)
+        driver_patcher = mock.patch.object(quota.QUOTAS, '_driver',
+                                           self.driver)
+        driver_patcher.start()
+        self.addCleanup(driver_patcher.stop)
+        self.ctx = context.get_admin_context()
+
+    def _get_usage(self, resource):
+        return self.ctx.session.query(quota_db.QuotaUsage).filter_by(
+            tenant_id=self._tenant_id, resource=resource).one().in_use
+
+    def test_create_over_quota(self):
+        with self.network():
+            with self.network():
+                res = self._create_network(self.fmt, 'n3', True)
+                self.assertEqual(res.status_int, 409)
+                self.assertEqual(self._get_usage('network'), 2)
+
+    def test_usage_tracked_by_plugin(self):
+        with self.network() as net:
+            self.assertEqual(self._get_usage('network'), 1)
+            with self.port(network=net):
+                self.assertEqual(self._get_usage('port'), 1)
+            self.assertEqual(self._get_usage('port'), 0)
+        self.assertEqual(self._get_usage('network'), 0)
+
+    def test_usage_not_counted_once_tracked(self):
+        with self.network():
+            plugin = manager.NeutronManager.get_plugin()
+            with mock.patch.object(plugin, 'get_networks_count') as count:
+                with self.network():
+                    self.assertFalse(count.called)
+
+    def test_reservation_cancelled_on_failure(self):
+        plugin = manager.NeutronManager.get_plugin()
+        with mock.patch.object(plugin, 'create_network',
+                               side_effect=RuntimeError):
+            res = self._create_network(self.fmt, 'n1', True)
+            self.assertEqual(res.status_int, 500)
+        self.assertEqual(
+            self.ctx.session.query(quota_db.Reservation).count(), 0)
+        self.assertEqual(self._get_usage('network'), 0)
+
+    def test_resync_usages(self):
+        with self.network():
+            usage = self.ctx.session.query(quota_db.QuotaUsage).filter_by(
+                tenant_id=self._tenant_id, resource='network').one()
+            usage.in_use = 5
+            self.ctx.session.flush()
+            self.driver.resync_usages(self.ctx, quota.QUOTAS.resources,
+                                      manager.NeutronManager.get_plugin())
+            self.assertEqual(self._get_usage('network'), 1)
@@ -0,0 +1,328 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import socket
+import time
+
+import eventlet
+import mock
+from oslo.config import cfg
+
+from neutron.openstack.common import context
+from neutron.openstack.common import rpc
+from neutron.openstack.common.rpc import amqp
+from neutron.openstack.common.rpc import common as rpc_common
+from neutron.openstack.common.rpc import dispatcher
+from neutron.openstack.common.rpc import instrumentation
+from neutron.openstack.common.rpc import proxy
+from neutron.tests import base
+
+TOPIC = 'test-rpc-proxy'
+# round trip delay added by the broker stand-in for each message
+LATENCY = 0.05
+
+
+class FakeCallback(object):
+    RPC_API_VERSION = '1.0'
+
+    def __init__(self):
+        self.calls = []
+
+    def echo(self, context, value):
+        self.calls.append(value)
+        return value
+
+    def fail(self, context, value):
+        raise ValueError(value)
+
+
+class OldRpcDispatcher(dispatcher.RpcDispatcher):
+    """Dispatcher of a server not knowing the batch envelope."""
+
+    def dispatch(self, ctxt, version, method, namespace, **kwargs):
+        return self._dispatch(ctxt, version, method, namespace, **kwargs)
+
+
+class BrokerStandInDispatcher(dispatcher.RpcDispatcher):
+    """Delay every message as a round trip through a broker would."""
+
+    def __init__(self, callbacks):
+        super(BrokerStandInDispatcher, self).__init__(callbacks)
+        self.messages = 0
+
+    def dispatch(self, ctxt, version, method, namespace, **kwargs):
+        self.messages += 1
+        eventlet.sleep(LATENCY)
+        return super(BrokerStandInDispatcher, self).dispatch(
+            ctxt, version, method, namespace, **kwargs)
+
+
+class RpcProxyMultiCallTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(RpcProxyMultiCallTestCase, self).setUp()
+        cfg.CONF.set_override('rpc_backend',
+                              'neutron.openstack.common.rpc.impl_fake')
+        self.callback = FakeCallback()
+        self.proxy = proxy.RpcProxy(TOPIC, '1.0')
+        self.context = context.RequestContext('fake_user', 'fake_project')
+
+    def _create_server(self, dispatcher_cls=dispatcher.RpcDispatcher):
+        server = dispatcher_cls([self.callback])
+        conn = rpc.create_connection(new=True)
+        conn.create_consumer(TOPIC, server, fanout=False)
+        self.addCleanup(conn.close)
+        return server
+
+    def _make_msgs(self, count):
+        return [self.proxy.make_msg('echo', value=i) for i in range(count)]
+
+    def test_call_many(self):
+        self._create_server()
+        self.assertEqual(range(5),
+                         self.proxy.call_many(self.context,
+                                              self._make_msgs(5)))
+
+    def test_call_many_empty(self):
+        self.assertEqual([], self.proxy.call_many(self.context, []))
+
+    def test_call_many_raises_failure(self):
+        self._create_server()
+        msgs = self._make_msgs(2) + [self.proxy.make_msg('fail', value='x')]
+        self.assertRaises(ValueError,
+                          self.proxy.call_many, self.context, msgs)
+        self.assertEqual([0, 1], sorted(self.callback.calls))
+
+    def test_call_batch(self):
+        server = self._create_server(BrokerStandInDispatcher)
+        self.assertEqual(range(5),
+                         self.proxy.call_batch(self.context,
+                                               self._make_msgs(5)))
+        self.assertEqual(1, server.messages)
+
+    def test_call_batch_raises_failure(self):
+        self._create_server()
+        msgs = [self.proxy.make_msg('fail', value='x')] + self._make_msgs(2)
+        self.assertRaises(ValueError,
+                          self.proxy.call_batch, self.context, msgs)
+        # the other calls of the envelope were still dispatched
+        self.assertEqual([0, 1], self.callback.calls)
+
+    def test_call_batch_checks_version(self):
+        self._create_server()
+        msgs = self._make_msgs(1)
+        self.assertRaises(rpc.common.RemoteError,
+                          self.proxy.call_batch, self.context, msgs,
+                          version='2.0')
+
+    def test_call_batch_old_server(self):
+        self._create_server(OldRpcDispatcher)
+        self.assertEqual(range(3),
+                         self.proxy.call_batch(self.context,
+                                               self._make_msgs(3)))
+
+    def test_benchmark_against_broker_stand_in(self):
+        count = 20
+        server = self._create_server(BrokerStandInDispatcher)
+
+        start = time.time()
+        for msg in self._make_msgs(count):
+            self.proxy.call(self.context, msg)
+        serial = time.time() - start
+
+        start = time.time()
+        self.proxy.call_many(self.context, self._make_msgs(count))
+        pipelined = time.time() - start
+
+        start = time.time()
+        self.proxy.call_batch(self.context, self._make_msgs(count))
+        batched = time.time() - start
+
+        # serial calls pay one round trip each, the others about one
+        self.assertTrue(serial >= count * LATENCY)
+        self.assertTrue(pipelined < serial / 4)
+        self.assertTrue(batched < serial / 4)
+        self.assertEqual(2 * count + 1, server.messages)
+
+
+class RpcCompressionTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(RpcCompressionTestCase, self).setUp()
+        cfg.CONF.set_override('rpc_compression_threshold', 100)
+        self.small = {'args': 'x' * 10}
+        self.large = {'args': 'x' * 1000}
+
+    def test_serialize_compressed_above_threshold(self):
+        msg = rpc_common.serialize_msg(self.large, compress=True)
+        self.assertEqual('zlib', msg['oslo.compression'])
+        self.assertTrue(len(msg['oslo.message']) < 100)
+        self.assertEqual(self.large, rpc_common.deserialize_msg(msg))
+
+    def test_serialize_not_compressed_below_threshold(self):
+        msg = rpc_common.serialize_msg(self.small, compress=True)
+        self.assertNotIn('oslo.compression', msg)
+        self.assertEqual(self.small, rpc_common.deserialize_msg(msg))
+
+    def test_serialize_not_compressed_if_not_accepted(self):
+        msg = rpc_common.serialize_msg(self.large)
+        self.assertNotIn('oslo.compression', msg)
+
+    def test_serialize_compression_disabled(self):
+        cfg.CONF.set_override('rpc_compression_threshold', 0)
+        msg = rpc_common.serialize_msg(self.large, compress=True)
+        self.assertNotIn('oslo.compression', msg)
+
+    def test_deserialize_unsupported_compression(self):
+        msg = rpc_common.serialize_msg(self.small)
+        msg['oslo.compression'] = 'lzma'
+        self.assertRaises(rpc_common.UnsupportedRpcCompression,
+                          rpc_common.deserialize_msg, msg)
+
+    def _reply(self, request):
+        ctxt = amqp.unpack_context(cfg.CONF, request)
+        with mock.patch.object(amqp, 'ConnectionContext') as conn_ctxt:
+            ctxt.reply(self.large, connection_pool=mock.Mock())
+        conn = conn_ctxt.return_value.__enter__.return_value
+        return conn.direct_send.call_args_list[0][0][1]
+
+    def test_reply_compressed_if_accepted(self):
+        reply = self._reply({'_msg_id': 'id', '_reply_q': 'q',
+                             '_accept_compression': 'zlib'})
+        self.assertEqual('zlib', reply['oslo.compression'])
+        self.assertEqual(self.large,
+                         rpc_common.deserialize_msg(reply)['result'])
+
+    def test_reply_not_compressed_for_old_caller(self):
+        reply = self._reply({'_msg_id': 'id', '_reply_q': 'q'})
+        self.assertNotIn('oslo.compression', reply)
+
+
+class RpcInstrumentationTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(RpcInstrumentationTestCase, self).setUp()
+        cfg.CONF.set_override('rpc_backend',
+                              'neutron.openstack.common.rpc.impl_fake')
+        self._set_sink('StatsSink')
+        self.callback = FakeCallback()
+        self.proxy = proxy.RpcProxy(TOPIC, '1.0')
+        self.context = context.RequestContext('fake_user', 'fake_project')
+
+    def _set_sink(self, name):
+        cfg.CONF.set_override('rpc_instrumentation_sink',
+                              instrumentation.__name__ + '.' + name)
+        instrumentation.reset()
+        self.addCleanup(instrumentation.reset)
+
+    def _create_server(self):
+        server = dispatcher.RpcDispatcher([self.callback])
+        conn = rpc.create_connection(new=True)
+        conn.create_consumer(TOPIC, server, fanout=False)
+        self.addCleanup(conn.close)
+
+    def test_disabled(self):
+        cfg.CONF.set_override('rpc_instrumentation_sink', None)
+        self.assertIsNone(instrumentation.get_sink())
+
+    def test_client_call_and_cast(self):
+        self._create_server()
+        self.proxy.call(self.context, self.proxy.make_msg('echo', value=1))
+        self.proxy.cast(self.context, self.proxy.make_msg('echo', value=2))
+        self.assertRaises(ValueError, self.proxy.call, self.context,
+                          self.proxy.make_msg('fail', value=3))
+        stats = instrumentation.get_sink().stats
+        echo = stats[(instrumentation.CLIENT, TOPIC, 'echo')]
+        self.assertEqual(2, echo.count)
+        self.assertEqual(0, echo.failures)
+        self.assertEqual(1, echo.latencies['call'].count)
+        self.assertEqual(1, echo.latencies['cast'].count)
+        self.assertEqual(2 * len('{"value": 1}'), echo.sizes['args'])
+        fail = stats[(instrumentation.CLIENT, TOPIC, 'fail')]
+        self.assertEqual(1, fail.failures)
+
+    def _process(self, callback, method, **args):
+        message = {'method': method, 'args': args, 'version': '1.0',
+                   '_msg_id': 'id', '_reply_q': 'q'}
+        with mock.patch.object(amqp, 'ConnectionContext'):
+            callback(message)
+            callback.wait()
+
+    def test_server_dispatch(self):
+        callback = amqp.ProxyCallback(
+            cfg.CONF, dispatcher.RpcDispatcher([self.callback]),
+            mock.Mock(), topic=TOPIC)
+        self._process(callback, 'echo', value='x' * 10)
+        self._process(callback, 'fail', value='x')
+        sink = instrumentation.get_sink()
+        echo = sink.stats[(instrumentation.SERVER, TOPIC, 'echo')]
+        self.assertEqual(1, echo.count)
+        self.assertEqual(['exec', 'wait'], sorted(echo.latencies))
+        self.assertEqual({'args': len('{"value": "xxxxxxxxxx"}'),
+                          'result': len('"xxxxxxxxxx"')}, echo.sizes)
+        fail = sink.stats[(instrumentation.SERVER, TOPIC, 'fail')]
+        self.assertEqual(1, fail.failures)
+        shares = sink.server_time_shares()
+        self.assertAlmostEqual(1.0, sum(shares.values()))
+
+    def test_histogram(self):
+        histogram = instrumentation.Histogram()
+        for ms in (0.5, 3, 3, 20000):
+            histogram.add(ms)
+        self.assertEqual([1, 2, 0, 0, 0, 0, 0, 0, 1], histogram.buckets)
+        self.assertEqual(20000, histogram.max)
+        self.assertEqual(20006.5 / 4, histogram.average)
+
+    def test_server_time_shares(self):
+        sink = instrumentation.StatsSink()
+        for method, ms in (('slow', 30), ('slow', 10), ('fast', 10)):
+            sink.record(instrumentation.SERVER, TOPIC, method,
+                        {'exec': ms}, {}, False)
+        sink.record(instrumentation.CLIENT, TOPIC, 'other',
+                    {'call': 100}, {}, False)
+        self.assertEqual({(TOPIC, 'slow'): 0.8, (TOPIC, 'fast'): 0.2},
+                         sink.server_time_shares())
+
+    def test_log_sink_reports(self):
+        cfg.CONF.set_override('rpc_instrumentation_report_interval', 0)
+        self._set_sink('LogSink')
+        with mock.patch.object(instrumentation.LOG, 'info') as log:
+            instrumentation.get_sink().record(
+                instrumentation.SERVER, TOPIC, 'echo', {'exec': 4},
+                {'args': 10}, False)
+        self.assertEqual(1, log.call_count)
+        values = log.call_args[0][1]
+        self.assertEqual(100, values['share'])
+        self.assertEqual('exec avg 4.0ms max 4.0ms', values['latencies'])
+
+    def test_statsd_sink(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        server.bind(('127.0.0.1', 0))
+        server.settimeout(5)
+        self.addCleanup(server.close)
+        cfg.CONF.set_override('rpc_statsd_host', '127.0.0.1')
+        cfg.CONF.set_override('rpc_statsd_port', server.getsockname()[1])
+        self._set_sink('StatsdSink')
+        instrumentation.get_sink().record(
+            instrumentation.SERVER, 'q-plugin.host', 'echo', {'exec': 4},
+            {'args': 10}, True)
+        self.assertEqual(['neutron.rpc.server.q-plugin_host.echo.count:1|c',
+                          'neutron.rpc.server.q-plugin_host.echo.failures:1|c',
+                          'neutron.rpc.server.q-plugin_host.echo.exec:4|ms',
+                          'neutron.rpc.server.q-plugin_host.echo.args_bytes:'
+                          '10|c'],
+                         server.recv(1024).split('\n'))
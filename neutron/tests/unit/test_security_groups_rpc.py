@@ -16,6 +16,7 @@
 #    under the License.
 
 from contextlib import nested
+import copy
 
 import mock
 from mock import call
@@ -29,6 +30,8 @@ from neutron.agent import securitygroups_rpc as sg_rpc
 from neutron import context
 from neutron.db import securitygroups_rpc_base as sg_db_rpc
 from neutron.extensions import securitygroup as ext_sg
+from neutron.openstack.common import jsonutils
+from neutron.openstack.common.rpc import common as rpc_common
 from neutron.openstack.common.rpc import proxy
 from neutron.tests import base
 from neutron.tests.unit import test_extension_security_group as test_sg
@@ -393,6 +396,104 @@ class SGServerRpcCallBackMixinTestCase(test_sg.SecurityGroupDBTestCase):
                 self._delete('ports', port_id1)
                 self._delete('ports', port_id2)
 
+    def test_security_group_rules_for_devices_compact(self):
+        with self.network() as n:
+            with nested(self.subnet(n),
+                        self.security_group()) as (subnet_v4, sg1):
+                sg1_id = sg1['security_group']['id']
+                rule1 = self._build_security_group_rule(
+                    sg1_id, 'ingress', 'tcp', '22', '22')
+                rules = {
+                    'security_group_rules': [rule1['security_group_rule']]}
+                res = self._create_security_group_rule(self.fmt, rules)
+                self.assertEqual(res.status_int, 201)
+
+                port_ids = []
+                for i in range(2):
+                    res = self._create_port(
+                        self.fmt, n['network']['id'],
+                        security_groups=[sg1_id])
+                    port = self.deserialize(self.fmt, res)['port']
+                    port_ids.append(port['id'])
+                ctx = context.get_admin_context()
+
+                def _get_rules(**kwargs):
+                    self.rpc.devices = dict(
+                        (port_id, self._show('ports', port_id)['port'])
+                        for port_id in port_ids)
+                    return self.rpc.security_group_rules_for_devices(
+                        ctx, devices=port_ids, **kwargs)
+
+                ports_rpc = _get_rules()
+                compact = _get_rules(compact=True)
+                # both ports share the three rules of the group
+                self.assertEqual(3, len(compact['rules']))
+                for port_id in port_ids:
+                    self.assertEqual(
+                        [0, 1, 2],
+                        sorted(compact['ports'][port_id]
+                               ['security_group_rules']))
+                self.assertEqual(ports_rpc,
+                                 sg_rpc.expand_security_group_rules(compact))
+                for port_id in port_ids:
+                    self._delete('ports', port_id)
+
+    def test_security_group_info_for_devices(self):
+        with self.network() as n:
+            with nested(self.subnet(n),
+                        self.security_group(),
+                        self.security_group()) as (subnet_v4, sg1, sg2):
+                sg1_id = sg1['security_group']['id']
+                sg2_id = sg2['security_group']['id']
+                rule1 = self._build_security_group_rule(
+                    sg1_id, 'ingress', 'tcp', '24', '25',
+                    remote_group_id=sg1_id)
+                rule2 = self._build_security_group_rule(
+                    sg2_id, 'ingress', 'tcp', '22', '22')
+                rules = {
+                    'security_group_rules': [rule1['security_group_rule'],
+                                             rule2['security_group_rule']]}
+                res = self._create_security_group_rule(self.fmt, rules)
+                self.assertEqual(res.status_int, 201)
+
+                port_ids = []
+                for sg_ids in ([sg1_id], [sg1_id, sg2_id]):
+                    res = self._create_port(
+                        self.fmt, n['network']['id'],
+                        security_groups=sg_ids)
+                    port = self.deserialize(self.fmt, res)['port']
+                    port_ids.append(port['id'])
+                ctx = context.get_admin_context()
+
+                def _get_ports():
+                    self.rpc.devices = dict(
+                        (port_id, self._show('ports', port_id)['port'])
+                        for port_id in port_ids)
+
+                _get_ports()
+                ports_rpc = self.rpc.security_group_rules_for_devices(
+                    ctx, devices=port_ids)
+                _get_ports()
+                sg_info = self.rpc.security_group_info_for_devices(
+                    ctx, devices=port_ids)
+
+                # the rules of each group are sent once
+                self.assertEqual(3, len(sg_info['security_groups'][sg1_id]))
+                self.assertEqual(3, len(sg_info['security_groups'][sg2_id]))
+                self.assertEqual([sg1_id], sg_info['sg_member_ips'].keys())
+                self.assertEqual(2, len(sg_info['sg_member_ips'][sg1_id]))
+                for port_id in port_ids:
+                    port = sg_info['devices'][port_id]
+                    self.assertEqual([sg1_id],
+                                     port['security_group_source_groups'])
+                    expected = ports_rpc[port_id]['security_group_rules']
+                    rules = firewall_base.expand_port_sg_rules(
+                        port, sg_info['security_groups'],
+                        sg_info['sg_member_ips'])
+                    self.assertEqual(sorted(expected), sorted(rules))
+                for port_id in port_ids:
+                    self._delete('ports', port_id)
+
 
 class SGServerRpcCallBackMixinTestCaseXML(SGServerRpcCallBackMixinTestCase):
     fmt = 'xml'
@@ -437,6 +538,7 @@ class SecurityGroupAgentRpcTestCase(base.BaseTestCase):
         self.agent.firewall = self.firewall
         rpc = mock.Mock()
         self.agent.plugin_rpc = rpc
+        self.agent.use_sg_info_rpc = False
         self.fake_device = {'device': 'fake_device',
                             'security_groups': ['fake_sgid1', 'fake_sgid2'],
                             'security_group_source_groups': ['fake_sgid2'],
@@ -502,6 +604,65 @@ class SecurityGroupAgentRpcTestCase(base.BaseTestCase):
         self.firewall.assert_has_calls(calls)
 
 
+class SecurityGroupAgentSgInfoRpcTestCase(base.BaseTestCase):
+    def setUp(self):
+        super(SecurityGroupAgentSgInfoRpcTestCase, self).setUp()
+        self.agent = sg_rpc.SecurityGroupAgentRpcMixin()
+        self.agent.context = None
+        self.firewall = mock.Mock()
+        firewall_object = firewall_base.FirewallDriver()
+        self.firewall.defer_apply.side_effect = firewall_object.defer_apply
+        self.agent.firewall = self.firewall
+        self.rpc = mock.Mock()
+        self.agent.plugin_rpc = self.rpc
+        self.rule = {'direction': 'ingress', 'ethertype': 'IPv4',
+                     'security_group_id': 'fake_sgid1',
+                     'remote_group_id': 'fake_sgid1'}
+        self.fake_device = {'device': 'fake_device',
+                            'fixed_ips': ['10.0.0.3'],
+                            'security_groups': ['fake_sgid1'],
+                            'security_group_source_groups': ['fake_sgid1'],
+                            'security_group_rules': []}
+        self.rpc.security_group_info_for_devices.return_value = {
+            'devices': {'fake_device': self.fake_device},
+            'security_groups': {'fake_sgid1': [self.rule]},
+            'sg_member_ips': {'fake_sgid1': ['10.0.0.3', '10.0.0.4']}}
+
+    def test_prepare_devices_filter(self):
+        self.agent.prepare_devices_filter(['fake_device'])
+        self.assertTrue(self.agent.use_sg_info_rpc)
+        self.firewall.assert_has_calls(
+            [call.update_security_group_rules('fake_sgid1', [self.rule]),
+             call.update_security_group_members('fake_sgid1',
+                                                ['10.0.0.3', '10.0.0.4']),
+             call.defer_apply(),
+             call.prepare_port_filter(self.fake_device)])
+        self.assertFalse(self.rpc.security_group_rules_for_devices.called)
+
+    def test_prepare_devices_filter_expands_rules(self):
+        self.firewall.update_security_group_rules.side_effect = (
+            NotImplementedError)
+        self.agent.prepare_devices_filter(['fake_device'])
+        rule = dict(self.rule, source_ip_prefix='10.0.0.4/32')
+        self.assertEqual([rule], self.fake_device['security_group_rules'])
+        self.firewall.prepare_port_filter.assert_called_once_with(
+            self.fake_device)
+
+    def test_prepare_devices_filter_old_plugin(self):
+        self.rpc.security_group_info_for_devices.side_effect = (
+            AttributeError)
+        self.rpc.security_group_rules_for_devices.return_value = {
+            'fake_device': self.fake_device}
+        self.agent.prepare_devices_filter(['fake_device'])
+        self.agent.refresh_firewall = mock.Mock()
+        self.agent.prepare_devices_filter(['fake_device'])
+        self.assertFalse(self.agent.use_sg_info_rpc)
+        self.assertEqual(
+            1, self.rpc.security_group_info_for_devices.call_count)
+        self.assertEqual(
+            2, self.rpc.security_group_rules_for_devices.call_count)
+
+
 class FakeSGRpcApi(agent_rpc.PluginApi,
                    sg_rpc.SecurityGroupServerRpcApiMixin):
     pass
@@ -518,12 +679,88 @@ class SecurityGroupServerRpcApiTestCase(base.BaseTestCase):
         self.rpc.call.assert_has_calls(
             [call(None,
              {'args':
-                 {'devices': ['fake_device']},
+                 {'devices': ['fake_device'], 'compact': True},
              'method': 'security_group_rules_for_devices',
              'namespace': None},
              version=sg_rpc.SG_RPC_VERSION,
              topic='fake_topic')])
 
+    def test_security_group_rules_for_devices_paged(self):
+        cfg.CONF.set_override('rpc_page_size', 2, 'AGENT')
+        self.rpc.call.side_effect = [{'dev1': 1, 'dev2': 2}, {'dev3': 3}]
+        devices = self.rpc.security_group_rules_for_devices(
+            None, ['dev3', 'dev1', 'dev2'])
+        self.assertEqual(devices, {'dev1': 1, 'dev2': 2, 'dev3': 3})
+        self.assertEqual(
+            [c[0][1]['args']['devices'] for c in self.rpc.call.call_args_list],
+            [['dev1', 'dev2'], ['dev3']])
+
+    def test_security_group_info_for_devices_paged(self):
+        cfg.CONF.set_override('rpc_page_size', 2, 'AGENT')
+        self.rpc.call.side_effect = [
+            {'devices': {'dev1': 1, 'dev2': 2},
+             'security_groups': {'sg1': [], 'sg2': []},
+             'sg_member_ips': {'sg1': []}},
+            {'devices': {'dev3': 3},
+             'security_groups': {'sg1': []},
+             'sg_member_ips': {}}]
+        sg_info = self.rpc.security_group_info_for_devices(
+            None, ['dev3', 'dev1', 'dev2'])
+        self.assertEqual({'devices': {'dev1': 1, 'dev2': 2, 'dev3': 3},
+                          'security_groups': {'sg1': [], 'sg2': []},
+                          'sg_member_ips': {'sg1': []}}, sg_info)
+        self.assertEqual(
+            [c[0][1]['method'] for c in self.rpc.call.call_args_list],
+            ['security_group_info_for_devices'] * 2)
+
+    def test_security_group_rules_for_devices_compact_reply(self):
+        rule = {'direction': 'ingress', 'ethertype': 'IPv4'}
+        self.rpc.call.return_value = {
+            'rules': [rule],
+            'ports': {'dev1': {'id': 'dev1', 'security_group_rules': [0]},
+                      'dev2': {'id': 'dev2', 'security_group_rules': []}}}
+        devices = self.rpc.security_group_rules_for_devices(
+            None, ['dev1', 'dev2'])
+        self.assertEqual(
+            {'dev1': {'id': 'dev1', 'security_group_rules': [rule]},
+             'dev2': {'id': 'dev2', 'security_group_rules': []}},
+            devices)
+
+    def test_compact_reply_size(self):
+        # 100 ports of a host in the same two groups of 20 rules
+        rules = [{'direction': 'ingress', 'ethertype': 'IPv4',
+                  'protocol': 'tcp', 'port_range_min': port,
+                  'port_range_max': port,
+                  'security_group_id': 'sg-%d' % (port % 2),
+                  'source_ip_prefix': '10.0.%d.0/24' % port}
+                 for port in range(1000, 1040)]
+        ports = {}
+        for i in range(100):
+            port_id = 'port-%03d' % i
+            ports[port_id] = {'id': port_id,
+                              'device': port_id,
+                              'fixed_ips': ['10.1.0.%d' % i],
+                              'security_groups': ['sg-0', 'sg-1'],
+                              'security_group_rules': [r.copy()
+                                                       for r in rules]}
+        compact = FakeSGCallback()._compact_security_group_rules(ports)
+        self.assertEqual(rules, sorted(compact['rules'],
+                                       key=lambda r: r['port_range_min']))
+        self.assertEqual(ports, sg_rpc.expand_security_group_rules(
+            copy.deepcopy(compact)))
+
+        cfg.CONF.set_override('rpc_compression_threshold', 1024)
+        full_size = len(jsonutils.dumps(ports))
+        compact_size = len(jsonutils.dumps(compact))
+        compressed = rpc_common.serialize_msg({'result': compact},
+                                              compress=True)
+        compressed_size = len(compressed['oslo.message'])
+        # full: 738490 bytes, compact: 36752 bytes, compressed: 2576 bytes
+        self.assertTrue(compact_size * 10 < full_size)
+        self.assertTrue(compressed_size * 10 < compact_size)
+        self.assertEqual({'result': compact},
+                         rpc_common.deserialize_msg(compressed))
+
 
 class FakeSGNotifierAPI(proxy.RpcProxy,
                         sg_rpc.SecurityGroupAgentRpcApiMixin):
@@ -1016,6 +1253,7 @@ class TestSecurityGroupAgentWithIptables(base.BaseTestCase):
 
         self.rpc = mock.Mock()
         self.agent.plugin_rpc = self.rpc
+        self.agent.use_sg_info_rpc = False
         rule1 = [{'direction': 'ingress',
                   'protocol': 'udp',
                   'ethertype': 'IPv4',
@@ -1181,6 +1419,25 @@ class SGNotificationTestMixin():
                  call.security_groups_rule_updated(mock.ANY,
                                                    [security_group_id])])
 
+    def test_security_group_rule_bulk_updated(self):
+        if self._skip_native_bulk:
+            self.skipTest("Plugin does not support native bulk "
+                          "security_group_rule create")
+        with self.security_group() as sg:
+            security_group_id = sg['security_group']['id']
+            rules = {'security_group_rules': [
+                self._build_security_group_rule(
+                    security_group_id, 'ingress', 'tcp', str(port),
+                    str(port))['security_group_rule']
+                for port in range(80, 90)]}
+            self.notifier.reset_mock()
+            res = self._create_security_group_rule(self.fmt, rules)
+            self.assertEqual(res.status_int, 201)
+            self.assertEqual(
+                [call.security_groups_rule_updated(mock.ANY,
+                                                   [security_group_id])],
+                self.notifier.mock_calls)
+
     def test_security_group_member_updated(self):
         with self.network() as n:
             with self.subnet(n):